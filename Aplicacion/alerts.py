@@ -0,0 +1,348 @@
+"""
+Motor de alertas por SMS
+
+Antes, TwilioNotifier.send_collision_alert se negaba a enviar durante
+COLLISION_COOLDOWN segundos y las colisiones de esa ventana se perdían; cada
+alerta enviada era además un SMS cobrado. El motor:
+
+- agrupa los eventos de cada tipo dentro de una ventana (ALERT_DIGEST_WINDOW)
+  en un solo resumen: cantidad, primera y última hora y distancia mínima
+- escala la severidad: un resumen con ALERT_ESCALATE_COUNT eventos o una
+  distancia de ALERT_ESCALATE_DISTANCE o menos pasa a crítico, se envía sin
+  esperar el fin de la ventana y llega también a ALERT_ESCALATION_PHONES
+- limita los envíos con un balde de fichas por destinatario; lo que no tiene
+  ficha espera en la bandeja de salida y se fusiona con lo siguiente del mismo
+  tipo, así que una ráfaga termina en pocos SMS sin perder la cuenta
+- guarda en disco la bandeja de salida, los resúmenes abiertos y los baldes:
+  nada se pierde si la aplicación se reinicia (la entrega es "al menos una vez":
+  si se cierra justo durante un envío, ese SMS puede repetirse)
+
+    engine = AlertEngine(TwilioNotifier())
+    engine.start()
+    engine.report(AlertEngine.COLLISION, distance=12.5)
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+import config
+from scheduler import SYSTEM_CLOCK
+
+
+class Digest:
+    """Eventos de un tipo agrupados en una ventana"""
+
+    __slots__ = ("kind", "severity", "count", "first", "last", "min_distance")
+
+    def __init__(self, kind: str, severity: str, count: int = 0, first: float = 0.0,
+                 last: float = 0.0, min_distance: Optional[float] = None):
+        self.kind = kind
+        self.severity = severity
+        self.count = count
+        self.first = first  # Hora de la PC del primer evento
+        self.last = last  # Hora de la PC del último evento
+        self.min_distance = min_distance  # cm, None si ningún evento la trajo
+
+    def add(self, at: float, distance: Optional[float], severity: str):
+        if self.count == 0:
+            self.first = at
+        self.count += 1
+        self.first = min(self.first, at)
+        self.last = max(self.last, at)
+        if distance is not None and (self.min_distance is None or distance < self.min_distance):
+            self.min_distance = distance
+        self.severity = max(self.severity, severity, key=AlertEngine.SEVERITIES.index)
+
+    def merge(self, other: "Digest"):
+        """Suma otro resumen del mismo tipo"""
+        self.first = min(self.first, other.first) if self.count else other.first
+        self.last = max(self.last, other.last)
+        self.count += other.count
+        if other.min_distance is not None and (self.min_distance is None or other.min_distance < self.min_distance):
+            self.min_distance = other.min_distance
+        self.severity = max(self.severity, other.severity, key=AlertEngine.SEVERITIES.index)
+
+    def to_dict(self) -> Dict:
+        return {"kind": self.kind, "severity": self.severity, "count": self.count,
+                "first": self.first, "last": self.last, "min_distance": self.min_distance}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Digest":
+        return cls(data["kind"], data["severity"], data["count"], data["first"],
+                   data["last"], data.get("min_distance"))
+
+    def __repr__(self):
+        return f"Digest({self.kind} x{self.count}, {self.severity})"
+
+
+class TokenBucket:
+    """Hasta `capacity` envíos seguidos, luego uno cada 1/`rate` segundos"""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float, tokens: Optional[float] = None, updated: float = 0.0):
+        self.capacity = capacity
+        self.rate = rate  # Fichas por segundo
+        self.tokens = capacity if tokens is None else tokens
+        self.updated = updated
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class AlertEngine:
+    """Resúmenes por ventana, escalamiento, límite por destinatario y bandeja persistente"""
+
+    # Tipos de alerta
+    COLLISION = "collision"
+    EMERGENCY_REVERSE = "emergency_reverse"
+    DEADMAN = "deadman"
+
+    LABELS = {
+        COLLISION: "Colisiones",
+        EMERGENCY_REVERSE: "Reversas de emergencia",
+        DEADMAN: "Paradas por enlace perdido",
+    }
+
+    # Severidades, de menor a mayor
+    WARNING = "warning"
+    CRITICAL = "critical"
+    SEVERITIES = (WARNING, CRITICAL)
+
+    def __init__(self, notifier, clock=SYSTEM_CLOCK, outbox_path: str = config.ALERT_OUTBOX_FILE,
+                 recipients: Optional[Dict[str, List[str]]] = None,
+                 window: float = config.ALERT_DIGEST_WINDOW,
+                 bucket_capacity: float = config.ALERT_BUCKET_CAPACITY,
+                 bucket_refill: float = config.ALERT_BUCKET_REFILL,
+                 on_sent: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            notifier: TwilioNotifier (se usa send_custom_message)
+            clock: Fuente de la hora (ventanas, baldes y reintentos)
+            outbox_path: Archivo JSON con la bandeja de salida (None: solo en memoria)
+            recipients: Destinatarios por severidad (por defecto los de config)
+            window: Duración de la ventana de cada resumen (s)
+            bucket_capacity: SMS seguidos por destinatario
+            bucket_refill: Segundos para recuperar un SMS
+            on_sent: Se llama con (destinatario, mensaje) tras cada envío exitoso
+        """
+        self.notifier = notifier
+        self.clock = clock
+        self.outbox_path = outbox_path
+        if recipients is None:
+            warning = [phone for phone in [config.TWILIO_PHONE_TO] if phone]
+            recipients = {self.WARNING: warning, self.CRITICAL: warning + config.ALERT_ESCALATION_PHONES}
+        self.recipients = recipients
+        self.window = window
+        self.bucket_capacity = bucket_capacity
+        self.bucket_refill = bucket_refill
+        self.on_sent = on_sent
+        self.metrics = {"events": 0, "digests": 0, "escalations": 0, "sent": 0, "failed": 0, "merged": 0}
+
+        self._lock = threading.Lock()
+        self._open: Dict[str, Digest] = {}  # Resúmenes con la ventana abierta, por tipo
+        self._outbox: List[Dict] = []  # {"id", "to", "digest", "attempts", "next_attempt"}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._next_id = 1
+        self._in_flight = set()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._load()
+
+    # -------------------------
+    # Entrada de eventos
+    # -------------------------
+    def report(self, kind: str, at: Optional[float] = None, distance: Optional[float] = None,
+               severity: str = WARNING):
+        """Agrega un evento al resumen abierto de su tipo (o abre uno)"""
+        with self._lock:
+            now = self.clock.time()
+            digest = self._open.get(kind)
+            if digest is None:
+                digest = self._open[kind] = Digest(kind, severity)
+            was_critical = digest.severity == self.CRITICAL
+            digest.add(now if at is None else at, distance, severity)
+            if digest.count >= config.ALERT_ESCALATE_COUNT or (
+                    distance is not None and distance <= config.ALERT_ESCALATE_DISTANCE):
+                digest.severity = self.CRITICAL
+            if digest.severity == self.CRITICAL and not was_critical:
+                self.metrics["escalations"] += 1
+            self.metrics["events"] += 1
+            self._save()
+
+    # -------------------------
+    # Cierre de ventanas y envío
+    # -------------------------
+    def tick(self) -> int:
+        """
+        Cierra las ventanas vencidas (o críticas) y envía lo que tenga ficha
+        Returns:
+            Cantidad de SMS enviados
+        """
+        with self._lock:
+            now = self.clock.time()
+            for kind, digest in list(self._open.items()):
+                if digest.severity == self.CRITICAL or now - digest.first >= self.window:
+                    del self._open[kind]
+                    self._enqueue(digest, now)
+            batches = self._take_due(now)
+            self._save()
+
+        sent = 0
+        for recipient, entries in batches:
+            body = self.format_message([entry["digest"] for entry in entries])
+            ok = self.notifier.send_custom_message(body, phone_to=recipient)
+            with self._lock:
+                ids = {entry["id"] for entry in entries}
+                self._in_flight -= ids
+                if ok:
+                    self._outbox = [entry for entry in self._outbox if entry["id"] not in ids]
+                    self.metrics["sent"] += 1
+                    sent += 1
+                else:
+                    # Reintento con espera creciente; la ficha gastada no se devuelve
+                    self.metrics["failed"] += 1
+                    retry_at = self.clock.time()
+                    for entry in entries:
+                        entry["attempts"] += 1
+                        entry["next_attempt"] = retry_at + min(
+                            config.ALERT_RETRY_MAX, config.ALERT_RETRY_INTERVAL * 2 ** (entry["attempts"] - 1))
+                self._save()
+            if ok and self.on_sent:
+                self.on_sent(recipient, body)
+        return sent
+
+    def _enqueue(self, digest: Digest, now: float):
+        """Pone el resumen en la bandeja de cada destinatario de su severidad"""
+        self.metrics["digests"] += 1
+        for recipient in self.recipients.get(digest.severity, []):
+            pending = next((entry for entry in self._outbox
+                            if entry["to"] == recipient and entry["digest"].kind == digest.kind
+                            and entry["id"] not in self._in_flight), None)
+            if pending:
+                # Sin ficha todavía: se suma a lo que ya espera en vez de ocupar otro SMS
+                pending["digest"].merge(digest)
+                self.metrics["merged"] += 1
+                continue
+            self._outbox.append({"id": self._next_id, "to": recipient, "attempts": 0, "next_attempt": now,
+                                 "digest": Digest.from_dict(digest.to_dict())})
+            self._next_id += 1
+
+    def _take_due(self, now: float) -> List:
+        """Entradas vencidas agrupadas por destinatario con ficha disponible (un SMS cada uno)"""
+        due: Dict[str, List[Dict]] = {}
+        for entry in self._outbox:
+            if entry["id"] not in self._in_flight and entry["next_attempt"] <= now:
+                due.setdefault(entry["to"], []).append(entry)
+        batches = []
+        for recipient, entries in due.items():
+            if self._bucket(recipient).take(now):
+                self._in_flight.update(entry["id"] for entry in entries)
+                batches.append((recipient, entries))
+        return batches
+
+    def _bucket(self, recipient: str) -> TokenBucket:
+        bucket = self._buckets.get(recipient)
+        if bucket is None:
+            bucket = self._buckets[recipient] = TokenBucket(
+                self.bucket_capacity, 1.0 / self.bucket_refill, updated=self.clock.time())
+        return bucket
+
+    @classmethod
+    def format_message(cls, digests: List[Digest]) -> str:
+        """Un SMS con una línea por resumen"""
+        critical = any(digest.severity == cls.CRITICAL for digest in digests)
+        lines = ["‼️ ALERTA CRÍTICA DEL CARRITO ‼️" if critical else "🚨 ALERTA DEL CARRITO 🚨", ""]
+        for digest in sorted(digests, key=lambda digest: digest.first):
+            first = time.strftime("%H:%M:%S", time.localtime(digest.first))
+            last = time.strftime("%H:%M:%S", time.localtime(digest.last))
+            span = first if digest.count == 1 else f"{first}-{last}"
+            line = f"{cls.LABELS.get(digest.kind, digest.kind)}: {digest.count} ({span})"
+            if digest.min_distance is not None:
+                line += f", mín. {digest.min_distance:.1f} cm"
+            lines.append(line)
+        lines += ["", "El sistema se detuvo automáticamente.",
+                  f"Fecha: {time.strftime('%d/%m/%Y', time.localtime(digests[0].last))}"]
+        return "\n".join(lines)
+
+    # -------------------------
+    # Hilo de entrega
+    # -------------------------
+    def start(self, interval: float = config.ALERT_TICK_INTERVAL) -> threading.Thread:
+        """Llama a tick() cada `interval` segundos en un hilo propio (los envíos bloquean)"""
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.tick()
+                except Exception as e:
+                    print(f"✗ Error en el motor de alertas: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="alert-engine", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """Detiene el hilo; lo pendiente queda en la bandeja para el próximo arranque"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics["open"] = sum(digest.count for digest in self._open.values())
+            metrics["pending"] = len(self._outbox)
+            return metrics
+
+    # -------------------------
+    # Persistencia
+    # -------------------------
+    def _save(self):
+        """Reescribe la bandeja de forma atómica (archivo temporal + reemplazo)"""
+        if not self.outbox_path:
+            return
+        state = {
+            "open": [digest.to_dict() for digest in self._open.values()],
+            "outbox": [dict(entry, digest=entry["digest"].to_dict()) for entry in self._outbox],
+            "buckets": {recipient: [bucket.tokens, bucket.updated] for recipient, bucket in self._buckets.items()},
+            "next_id": self._next_id,
+        }
+        temporary = self.outbox_path + ".tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(temporary, self.outbox_path)
+        except OSError as e:
+            print(f"✗ Error al guardar la bandeja de alertas: {e}")
+
+    def _load(self):
+        if not self.outbox_path or not os.path.exists(self.outbox_path):
+            return
+        try:
+            with open(self.outbox_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self._open = {data["kind"]: Digest.from_dict(data) for data in state.get("open", [])}
+            self._outbox = [dict(entry, digest=Digest.from_dict(entry["digest"])) for entry in state.get("outbox", [])]
+            self._buckets = {
+                recipient: TokenBucket(self.bucket_capacity, 1.0 / self.bucket_refill, tokens, updated)
+                for recipient, (tokens, updated) in state.get("buckets", {}).items()
+            }
+            self._next_id = state.get("next_id", 1)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠ Bandeja de alertas ilegible, se empieza vacía: {e}")
+        else:
+            pending = sum(entry["digest"].count for entry in self._outbox)
+            if pending:
+                print(f"📨 {pending} eventos pendientes de alertar de la sesión anterior")
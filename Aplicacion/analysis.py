@@ -0,0 +1,310 @@
+"""
+Módulo de análisis de frenado sobre sesiones grabadas
+
+Carga las sesiones de sessions.py (JSON por líneas o .carx de archive.py) en arrays de NumPy y calcula, sin bucles por
+evento en Python:
+
+- distancia de frenado frente a velocidad de aproximación: cuánto se acercó el
+  carrito al obstáculo entre "Frenado gradual iniciado a X cm" y la detención
+  ("DETENCION! Obstaculo a Y cm"), es decir X - Y según el ultrasónico
+- tiempo desde el inicio del frenado gradual hasta la detención
+- tasa de detenciones falsas: detenciones seguidas de "Zona segura" en menos de
+  ANALYSIS_FALSE_STOP_WINDOW sin que el usuario retroceda ni haya reversa de
+  emergencia (el obstáculo "desapareció": lectura espuria del sensor)
+- frecuencia de reversas de emergencia por hora de sesión
+
+Las sesiones se procesan en paralelo con un ProcessPoolExecutor.
+
+Uso:
+    python analysis.py                  # Todas las sesiones de config.SESSIONS_DIR
+    python analysis.py sesiones/ -w 8   # Otro directorio, 8 procesos
+"""
+
+import sys
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from archive import read_records
+from safetylog import SafetyEvent
+from sessions import SessionRecorder, list_sessions
+
+
+# Códigos numéricos para guardar tipos en arrays de enteros
+EVENT_CODES = {kind: code for code, kind in enumerate(SafetyEvent.KINDS)}
+COMMAND_CODES = {
+    command: code for code, command in enumerate((
+        config.CMD_FORWARD, config.CMD_BACKWARD, config.CMD_LEFT, config.CMD_RIGHT, config.CMD_STOP,
+        config.CMD_SPEED_LOW, config.CMD_SPEED_HIGH, config.CMD_SPEED_UP, config.CMD_SPEED_DOWN
+    ))
+}
+_UNKNOWN_CODE = -1
+
+# Arrays por sesión que se concatenan al combinar
+ARRAY_METRICS = ("approach_speed", "stopping_distance", "brake_to_stop", "brake_distance", "stop_distance")
+
+
+class Session:
+    """Una sesión grabada como arrays de NumPy ordenados por tiempo"""
+
+    def __init__(self, path: str, car: str, command_times, command_codes, command_pwm,
+                 speed_times, speeds, event_times, event_codes, event_distances):
+        self.path = path
+        self.car = car
+        self.command_times = command_times
+        self.command_codes = command_codes
+        self.command_pwm = command_pwm
+        self.speed_times = speed_times
+        self.speeds = speeds
+        self.event_times = event_times
+        self.event_codes = event_codes
+        self.event_distances = event_distances
+
+    @property
+    def duration(self) -> float:
+        """Duración en segundos (del primer al último registro)"""
+        times = [t for t in (self.command_times, self.speed_times, self.event_times) if len(t)]
+        if not times:
+            return 0.0
+        return float(max(t[-1] for t in times) - min(t[0] for t in times))
+
+    def events(self, kind: str):
+        """(tiempos, distancias) de un tipo de evento de seguridad"""
+        mask = self.event_codes == EVENT_CODES[kind]
+        return self.event_times[mask], self.event_distances[mask]
+
+    def command_times_of(self, command: str):
+        return self.command_times[self.command_codes == COMMAND_CODES[command]]
+
+
+def load_session(path: str) -> Session:
+    """Lee un archivo de sesión y lo convierte en arrays"""
+    car = ""
+    commands, speeds, events = [], [], []
+    for record in read_records(path):
+        try:
+            kind = record["k"]
+            if kind == SessionRecorder.SPEED:
+                speeds.append((record["t"], record["v"]))
+            elif kind == SessionRecorder.SAFETY:
+                distance = record.get("d")
+                events.append((record["t"], EVENT_CODES.get(record["e"], _UNKNOWN_CODE),
+                               np.nan if distance is None else distance))
+            elif kind == SessionRecorder.COMMAND:
+                commands.append((record["t"], COMMAND_CODES.get(record["c"], _UNKNOWN_CODE),
+                                 record.get("pwm", 0)))
+            elif kind == SessionRecorder.SESSION:
+                car = record.get("car", "")
+        except (ValueError, KeyError, TypeError):
+            continue  # Registro incompleto
+
+    def columns(rows, dtypes):
+        array = np.array(rows, dtype=np.float64).reshape(-1, len(dtypes))
+        array = array[np.argsort(array[:, 0], kind="stable")]
+        return [array[:, i].astype(dtype) for i, dtype in enumerate(dtypes)]
+
+    command_times, command_codes, command_pwm = columns(commands, (np.float64, np.int8, np.int16))
+    speed_times, speed_values = columns(speeds, (np.float64, np.float64))
+    event_times, event_codes, event_distances = columns(events, (np.float64, np.int8, np.float64))
+    return Session(path, car, command_times, command_codes, command_pwm,
+                   speed_times, speed_values, event_times, event_codes, event_distances)
+
+
+def _next_after(times: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """Para cada consulta, el primer tiempo estrictamente posterior (inf si no hay)"""
+    index = np.searchsorted(times, queries, side="right")
+    padded = np.append(times, np.inf)
+    return padded[index]
+
+
+def analyze_session(session: Session) -> Dict:
+    """
+    Métricas de frenado de una sesión
+    Returns:
+        Dict: arrays por episodio de frenado y contadores de la sesión
+    """
+    brake_times, brake_distances = session.events(SafetyEvent.GRADUAL_BRAKE)
+    stop_times, stop_distances = session.events(SafetyEvent.STOP)
+    safe_times, _ = session.events(SafetyEvent.SAFE_ZONE)
+    reverse_times, _ = session.events(SafetyEvent.EMERGENCY_REVERSE)
+    backward_times = session.command_times_of(config.CMD_BACKWARD)
+
+    # Episodios: cada frenado gradual con la primera detención posterior, si llega
+    # antes del siguiente frenado y dentro de la ventana máxima
+    stop_index = np.searchsorted(stop_times, brake_times, side="left")
+    has_stop = stop_index < len(stop_times)
+    stop_index = np.minimum(stop_index, max(len(stop_times) - 1, 0))
+    matched_stop_times = stop_times[stop_index] if len(stop_times) else np.full(len(brake_times), np.inf)
+    next_brake = np.append(brake_times[1:], np.inf)
+    paired = (
+        has_stop
+        & (matched_stop_times < next_brake)
+        & (matched_stop_times - brake_times <= config.ANALYSIS_MAX_BRAKE_SECONDS)
+    )
+    episode_brakes = brake_times[paired]
+    episode_stops = matched_stop_times[paired]
+    episode_brake_distance = brake_distances[paired]
+    episode_stop_distance = stop_distances[stop_index[paired]] if len(stop_times) else np.empty(0)
+
+    # Velocidad real de la última muestra antes de iniciar el frenado
+    sample_index = np.searchsorted(session.speed_times, episode_brakes, side="right") - 1
+    approach_speed = np.full(len(episode_brakes), np.nan)
+    valid = sample_index >= 0
+    approach_speed[valid] = session.speeds[sample_index[valid]]
+
+    # Detenciones falsas: "Zona segura" poco después, sin retroceso ni reversa de por medio
+    next_safe = _next_after(safe_times, stop_times)
+    false_stops = (
+        (next_safe - stop_times <= config.ANALYSIS_FALSE_STOP_WINDOW)
+        & (_next_after(backward_times, stop_times) > next_safe)
+        & (_next_after(reverse_times, stop_times) > next_safe)
+    )
+
+    return {
+        "sessions": 1,
+        "duration": session.duration,
+        "approach_speed": approach_speed,
+        "stopping_distance": episode_brake_distance - episode_stop_distance,
+        "brake_to_stop": episode_stops - episode_brakes,
+        "brake_distance": episode_brake_distance,
+        "stop_distance": episode_stop_distance,
+        "stops": int(len(stop_times)),
+        "false_stops": int(np.count_nonzero(false_stops)),
+        "emergency_reverses": int(len(reverse_times)),
+        "gradual_brakes": int(len(brake_times)),
+    }
+
+
+def analyze_path(path: str) -> Dict:
+    """Carga y analiza una sesión (función de nivel superior para los procesos)"""
+    return analyze_session(load_session(path))
+
+
+def combine(results: List[Dict]) -> Dict:
+    """Une las métricas de varias sesiones"""
+    combined = {
+        name: np.concatenate([r[name] for r in results]) if results else np.empty(0)
+        for name in ARRAY_METRICS
+    }
+    for name in ("sessions", "duration", "stops", "false_stops", "emergency_reverses", "gradual_brakes"):
+        combined[name] = sum(r[name] for r in results)
+    hours = combined["duration"] / 3600
+    combined["false_stop_rate"] = combined["false_stops"] / combined["stops"] if combined["stops"] else 0.0
+    combined["emergency_reverses_per_hour"] = combined["emergency_reverses"] / hours if hours else 0.0
+    return combined
+
+
+def analyze_sessions(paths: List[str], workers: Optional[int] = None) -> Dict:
+    """
+    Analiza varias sesiones en paralelo
+    Args:
+        paths: Archivos de sesión
+        workers: Procesos (None = uno por CPU, 1 = en este proceso)
+    """
+    if workers == 1 or len(paths) <= 1:
+        return combine([analyze_path(path) for path in paths])
+    workers = workers or os.cpu_count() or 1
+    # Lotes para amortizar el envío entre procesos cuando hay miles de sesiones cortas
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return combine(list(executor.map(analyze_path, paths, chunksize=chunksize)))
+
+
+def speed_bins(results: Dict, edges=None) -> List[Dict]:
+    """Distancia de frenado promedio por rango de velocidad de aproximación"""
+    edges = np.asarray(edges if edges is not None else config.ANALYSIS_SPEED_BINS, dtype=np.float64)
+    speed = results["approach_speed"]
+    distance = results["stopping_distance"]
+    valid = ~np.isnan(speed) & ~np.isnan(distance)
+    bins = np.digitize(speed[valid], edges) - 1
+    inside = (bins >= 0) & (bins < len(edges) - 1)
+    bins, values = bins[inside], distance[valid][inside]
+    counts = np.bincount(bins, minlength=len(edges) - 1)
+    sums = np.bincount(bins, weights=values, minlength=len(edges) - 1)
+    maxima = np.full(len(edges) - 1, np.nan)
+    np.fmax.at(maxima, bins, values)
+    return [
+        {"low": edges[i], "high": edges[i + 1], "count": int(counts[i]),
+         "mean": sums[i] / counts[i] if counts[i] else np.nan, "max": maxima[i]}
+        for i in range(len(edges) - 1)
+    ]
+
+
+def summary_table(results: Dict) -> str:
+    """Tabla de texto con las métricas principales"""
+    lines = [
+        f"Sesiones: {results['sessions']}  Duración total: {results['duration'] / 3600:.2f} h",
+        f"Frenados graduales: {results['gradual_brakes']}  Detenciones: {results['stops']}",
+        f"Detenciones falsas: {results['false_stops']} ({results['false_stop_rate'] * 100:.1f}%)",
+        f"Reversas de emergencia: {results['emergency_reverses']} "
+        f"({results['emergency_reverses_per_hour']:.2f} por hora)",
+        "",
+        f"{'Métrica':<26}{'n':>7}{'media':>9}{'p50':>9}{'p95':>9}{'mín':>9}{'máx':>9}",
+    ]
+    for name, label in (("approach_speed", "Vel. aproximación (cm/s)"),
+                        ("stopping_distance", "Dist. de frenado (cm)"),
+                        ("brake_to_stop", "Frenado→detención (s)"),
+                        ("stop_distance", "Distancia final (cm)")):
+        values = results[name][~np.isnan(results[name])]
+        if len(values) == 0:
+            lines.append(f"{label:<26}{0:>7}")
+            continue
+        p50, p95 = np.percentile(values, [50, 95])
+        lines.append(
+            f"{label:<26}{len(values):>7}{values.mean():>9.2f}{p50:>9.2f}{p95:>9.2f}"
+            f"{values.min():>9.2f}{values.max():>9.2f}"
+        )
+    lines += ["", f"{'Vel. aproximación':<22}{'n':>7}{'dist. media':>13}{'dist. máx':>11}"]
+    for row in speed_bins(results):
+        label = f"{row['low']:.0f}-{row['high']:.0f} cm/s"
+        lines.append(f"{label:<22}{row['count']:>7}{row['mean']:>13.2f}{row['max']:>11.2f}")
+    return "\n".join(lines)
+
+
+def histogram(values: np.ndarray, bins: int = 10, width: int = 40, unit: str = "") -> str:
+    """Histograma de texto de un array de métricas"""
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return "(sin datos)"
+    counts, edges = np.histogram(values, bins=bins)
+    scale = width / counts.max() if counts.max() else 0
+    return "\n".join(
+        f"{edges[i]:>8.2f}-{edges[i + 1]:<8.2f}{unit} {'█' * int(round(counts[i] * scale))} {counts[i]}"
+        for i in range(len(counts))
+    )
+
+
+def main():
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Análisis de frenado de las sesiones grabadas")
+    parser.add_argument("directory", nargs="?", default=config.SESSIONS_DIR)
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    paths = list_sessions(args.directory)
+    if not paths:
+        print(f"ℹ No hay sesiones grabadas en {args.directory}")
+        return
+    start = time.perf_counter()
+    results = analyze_sessions(paths, args.workers)
+    elapsed = time.perf_counter() - start
+    print("=" * 70)
+    print(f"ANÁLISIS DE FRENADO ({len(paths)} sesiones en {elapsed:.2f} s)")
+    print("=" * 70)
+    print(summary_table(results))
+    print("\nDistancia de frenado")
+    print(histogram(results["stopping_distance"], unit="cm"))
+    print("\nTiempo de frenado gradual a detención")
+    print(histogram(results["brake_to_stop"], unit="s"))
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
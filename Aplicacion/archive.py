@@ -0,0 +1,282 @@
+"""
+Archivo comprimido por bloques para las sesiones grabadas
+
+Una sesión con telemetría a alta frecuencia en JSON por líneas crece rápido. El
+archivo .carx guarda los mismos registros (el formato de sessions.py) en
+bloques comprimidos por separado (zlib o lzma de la biblioteca estándar, con
+nivel seleccionable) y al final un índice con el rango de horas, la posición y
+el tamaño de cada bloque. Un lector mapea el archivo en memoria, busca en el
+índice los bloques que cubren el rango pedido y solo descomprime esos.
+
+Distribución (little endian, versión 1):
+
+    0   4s  magia b"CARX"
+    4   H   versión
+    6   B   códec (1 zlib, 2 lzma)
+    7   B   nivel
+    8       bloques: registros JSON separados por "\\n", comprimidos
+    ...     índice: por bloque  d hora inicial, d hora final, Q posición,
+            I tamaño comprimido, I tamaño original, I registros
+    fin-16  Q posición del índice, I cantidad de bloques, 4s b"CXIX"
+
+    python archive.py sessions/ -c lzma -l 6    # convierte todas las sesiones
+"""
+
+import os
+import json
+import lzma
+import mmap
+import zlib
+import struct
+from typing import Dict, Iterator, List, NamedTuple, Optional
+import config
+
+MAGIC = b"CARX"
+INDEX_MAGIC = b"CXIX"
+VERSION = 1
+EXTENSION = ".carx"
+
+CODECS = {"zlib": 1, "lzma": 2}
+_CODEC_NAMES = {code: name for name, code in CODECS.items()}
+
+_HEADER = struct.Struct("<4sHBB")
+_ENTRY = struct.Struct("<ddQIII")
+_TRAILER = struct.Struct("<QI4s")
+
+
+class Chunk(NamedTuple):
+    """Entrada del índice"""
+    start: float
+    end: float
+    offset: int
+    size: int
+    raw_size: int
+    records: int
+
+
+def _compress(codec: int, level: int, data: bytes) -> bytes:
+    if codec == CODECS["zlib"]:
+        return zlib.compress(data, level)
+    return lzma.compress(data, preset=level)
+
+
+def _decompress(codec: int, data) -> bytes:
+    if codec == CODECS["zlib"]:
+        return zlib.decompress(data)
+    return lzma.decompress(data)
+
+
+class ArchiveWriter:
+    """Escribe registros en bloques comprimidos y el índice al cerrar"""
+
+    def __init__(self, path: str, codec: str = config.ARCHIVE_CODEC, level: int = config.ARCHIVE_LEVEL,
+                 chunk_records: int = config.ARCHIVE_CHUNK_RECORDS):
+        """
+        Args:
+            path: Archivo de salida (.carx)
+            codec: "zlib" (nivel 0-9) o "lzma" (preset 0-9)
+            level: Nivel de compresión
+            chunk_records: Registros por bloque (bloques chicos: lectura aleatoria más barata)
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Códec desconocido: {codec} (opciones: {', '.join(CODECS)})")
+        if not 0 <= level <= 9:
+            raise ValueError(f"Nivel de compresión fuera de rango: {level}")
+        self.path = path
+        self.codec = CODECS[codec]
+        self.level = level
+        self.chunk_records = chunk_records
+        self.chunks: List[Chunk] = []
+        self.records = 0
+        self._lines: List[bytes] = []
+        self._start = float("inf")
+        self._end = float("-inf")
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, self.codec, level))
+
+    def write(self, record: Dict):
+        """Agrega un registro ({"k": ..., "t": ..., ...})"""
+        t = record["t"]
+        self._start = min(self._start, t)
+        self._end = max(self._end, t)
+        self._lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self.records += 1
+        if len(self._lines) >= self.chunk_records:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        if not self._lines:
+            return
+        raw = b"\n".join(self._lines)
+        data = _compress(self.codec, self.level, raw)
+        self.chunks.append(Chunk(self._start, self._end, self._file.tell(), len(data), len(raw), len(self._lines)))
+        self._file.write(data)
+        self._lines = []
+        self._start = float("inf")
+        self._end = float("-inf")
+
+    def close(self):
+        """Escribe el último bloque y el índice"""
+        if self._file is None:
+            return
+        self._flush_chunk()
+        index_offset = self._file.tell()
+        for chunk in self.chunks:
+            self._file.write(_ENTRY.pack(*chunk))
+        self._file.write(_TRAILER.pack(index_offset, len(self.chunks), INDEX_MAGIC))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader:
+    """Lectura por rango de horas descomprimiendo solo los bloques necesarios"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.chunks_decompressed = 0
+        self._cached: Optional[tuple] = None  # (índice, registros) del último bloque
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Archivo vacío
+            self._file.close()
+            raise ValueError(f"{path} no es un archivo de sesión comprimido")
+        try:
+            self._read_index()
+        except (ValueError, struct.error):
+            self.close()
+            raise
+
+    def _read_index(self):
+        buffer = self._map
+        if len(buffer) < _HEADER.size + _TRAILER.size:
+            raise ValueError(f"{self.path} no es un archivo de sesión comprimido")
+        magic, version, codec, self.level = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} no es un archivo de sesión comprimido")
+        if version != VERSION or codec not in _CODEC_NAMES:
+            raise ValueError(f"{self.path}: versión {version} / códec {codec} no soportados")
+        self.codec = _CODEC_NAMES[codec]
+        self._codec = codec
+        index_offset, count, index_magic = _TRAILER.unpack_from(buffer, len(buffer) - _TRAILER.size)
+        if index_magic != INDEX_MAGIC:
+            raise ValueError(f"{self.path}: sin índice (¿la escritura no terminó?)")
+        self.chunks = [Chunk(*_ENTRY.unpack_from(buffer, index_offset + i * _ENTRY.size)) for i in range(count)]
+
+    @property
+    def records(self) -> int:
+        return sum(chunk.records for chunk in self.chunks)
+
+    @property
+    def start(self) -> Optional[float]:
+        return min((chunk.start for chunk in self.chunks), default=None)
+
+    @property
+    def end(self) -> Optional[float]:
+        return max((chunk.end for chunk in self.chunks), default=None)
+
+    def read_chunk(self, index: int) -> List[Dict]:
+        """Registros de un bloque (el último leído queda en caché)"""
+        if self._cached and self._cached[0] == index:
+            return self._cached[1]
+        chunk = self.chunks[index]
+        raw = _decompress(self._codec, self._map[chunk.offset:chunk.offset + chunk.size])
+        self.chunks_decompressed += 1
+        # json.dumps escapa los saltos de línea: el bloque entero es una lista JSON
+        records = json.loads(b"[" + raw.replace(b"\n", b",") + b"]")
+        self._cached = (index, records)
+        return records
+
+    def read(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Registros con start <= t < end, en el orden en que se grabaron
+        Args:
+            start, end: Rango de horas de la PC (None: sin límite)
+        """
+        for index, chunk in enumerate(self.chunks):
+            if (start is not None and chunk.end < start) or (end is not None and chunk.start >= end):
+                continue
+            for record in self.read_chunk(index):
+                t = record["t"]
+                if (start is None or t >= start) and (end is None or t < end):
+                    yield record
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self.read()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """Registros de una sesión grabada, en JSON por líneas o comprimida"""
+    if path.endswith(EXTENSION):
+        with ArchiveReader(path) as reader:
+            yield from reader
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue  # Línea dañada (p. ej. la app se cerró a mitad de escritura)
+
+
+def convert_session(path: str, output: Optional[str] = None, codec: str = config.ARCHIVE_CODEC,
+                    level: int = config.ARCHIVE_LEVEL,
+                    chunk_records: int = config.ARCHIVE_CHUNK_RECORDS) -> str:
+    """
+    Convierte una sesión en JSON por líneas a un archivo comprimido
+    Returns:
+        Ruta del archivo .carx
+    """
+    output = output or os.path.splitext(path)[0] + EXTENSION
+    with ArchiveWriter(output, codec, level, chunk_records) as writer:
+        for record in read_records(path):
+            if isinstance(record, dict) and isinstance(record.get("t"), (int, float)):
+                writer.write(record)
+    return output
+
+
+def main():
+    import argparse
+    from sessions import list_sessions
+    parser = argparse.ArgumentParser(description="Convierte las sesiones grabadas al formato comprimido por bloques")
+    parser.add_argument("directory", nargs="?", default=config.SESSIONS_DIR)
+    parser.add_argument("-c", "--codec", choices=sorted(CODECS), default=config.ARCHIVE_CODEC)
+    parser.add_argument("-l", "--level", type=int, default=config.ARCHIVE_LEVEL)
+    parser.add_argument("--remove", action="store_true", help="Borra el .jsonl original tras convertir")
+    args = parser.parse_args()
+
+    paths = [path for path in list_sessions(args.directory) if not path.endswith(EXTENSION)]
+    if not paths:
+        print(f"ℹ No hay sesiones grabadas en {args.directory}")
+        return
+    total_in = total_out = 0
+    for path in paths:
+        output = convert_session(path, codec=args.codec, level=args.level)
+        size_in, size_out = os.path.getsize(path), os.path.getsize(output)
+        total_in += size_in
+        total_out += size_out
+        print(f"✓ {os.path.basename(output)}: {size_in / 1024:.0f} KiB -> {size_out / 1024:.0f} KiB")
+        if args.remove:
+            os.remove(path)
+    print(f"Total: {total_in / 1024:.0f} KiB -> {total_out / 1024:.0f} KiB "
+          f"({total_in / max(total_out, 1):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
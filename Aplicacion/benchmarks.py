@@ -0,0 +1,1311 @@
+"""
+Benchmarks de rendimiento de la aplicación de control
+
+Uso:
+    python benchmarks.py            # Ejecuta todos
+    python benchmarks.py ingest     # Ejecuta solo uno
+"""
+
+import sys
+import os
+import time
+import json
+import socket
+import threading
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from protocol import MessageParser
+
+
+def _timeit(function, repeat: int = 5) -> float:
+    """Devuelve el mejor tiempo (s) de varias ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# =========================
+# INGESTA DE MENSAJES
+# =========================
+def _legacy_classify(data: bytes):
+    """Cadena de startswith/upper() usada antes del parser (sin prints ni callbacks)"""
+    message = data.decode().strip()
+    if message:
+        if message.startswith("SPEED:"):
+            return float(message.split(":")[1])
+        elif "COLISION" in message.upper() or "COLLISION" in message.upper():
+            return "collision"
+        elif message.startswith("LOGS:"):
+            json_str = message.split("LOGS:", 1)[1]
+            logs_data = json.loads(json_str)
+            if "logs" in logs_data:
+                return list(logs_data["logs"])
+    return None
+
+
+def _sample_stream(lines: int = 50000):
+    """Mezcla típica de tráfico: velocidad, confirmaciones y algunos lotes de logs"""
+    logs = "LOGS:" + json.dumps({"logs": [f"[{i}s] CMD: AVANZAR" for i in range(10)]})
+    stream = []
+    for i in range(lines):
+        if i % 20 == 0:
+            stream.append(logs)
+        elif i % 4 == 0:
+            stream.append("OK:FORWARD")
+        else:
+            stream.append(f"SPEED:{(i % 200) * 0.37:.2f}")
+    return [(line + "\r\n").encode() for line in stream]
+
+
+def _drain(sock, handle, total_bytes: int):
+    """Lee del socket hasta recibir total_bytes, pasando cada recv a handle"""
+    received = 0
+    while received < total_bytes:
+        data = sock.recv(1024)
+        if not data:
+            break
+        received += len(data)
+        handle(data)
+
+
+def _socket_ingest(chunks, family_type: int, handle) -> float:
+    """Envía los mensajes por un socketpair local y mide cuánto tarda el lector"""
+    reader, writer = socket.socketpair(socket.AF_UNIX, family_type)
+    total = sum(len(chunk) for chunk in chunks)
+
+    def send_all():
+        for chunk in chunks:
+            writer.sendall(chunk)
+
+    sender = threading.Thread(target=send_all)
+    start = time.perf_counter()
+    sender.start()
+    _drain(reader, handle, total)
+    elapsed = time.perf_counter() - start
+    sender.join()
+    reader.close()
+    writer.close()
+    return elapsed
+
+
+def bench_ingest():
+    """Líneas por segundo: cadena anterior vs tabla de despacho"""
+    chunks = _sample_stream()
+    joined = b"".join(chunks)
+    lines = joined.decode().split("\n")[:-1]
+    print(f"   Mensajes: {len(chunks)}")
+
+    # Solo clasificación, líneas ya separadas
+    legacy_time = _timeit(lambda: [_legacy_classify(chunk) for chunk in chunks])
+    parser_time = _timeit(lambda: MessageParser().parse_lines(lines, time.time()))
+    print("   Clasificación (sin E/S)")
+    print(f"      Cadena startswith/upper()   {len(chunks) / legacy_time:>12,.0f} msg/s")
+    print(f"      Tabla de despacho           {len(chunks) / parser_time:>12,.0f} msg/s")
+
+    # De extremo a extremo: el código anterior suponía un mensaje por recv, así que
+    # se le da su mejor caso (SOCK_SEQPACKET conserva los límites de cada envío);
+    # el parser lee el flujo TCP tal cual llega, con varias líneas por recv
+    legacy_time = min(
+        _socket_ingest(chunks, socket.SOCK_SEQPACKET, _legacy_classify) for _ in range(3)
+    )
+    parsers = [MessageParser() for _ in range(3)]
+    parser_time = min(
+        _socket_ingest(chunks, socket.SOCK_STREAM, parser.feed) for parser in parsers
+    )
+    legacy_rate = len(chunks) / legacy_time
+    parser_rate = len(chunks) / parser_time
+    print("   Socket local (recv + clasificación)")
+    print(f"      Un mensaje por recv         {legacy_rate:>12,.0f} msg/s")
+    print(f"      Parser con framing          {parser_rate:>12,.0f} msg/s  ({parser_rate / legacy_rate:.1f}x)")
+    counters = parsers[-1].get_counters()
+    print(f"   Contadores del parser: {counters['parsed']}")
+
+
+# =========================
+# ANÁLISIS DE SESIONES
+# =========================
+def _write_synthetic_sessions(directory: str, sessions: int, episodes: int):
+    """Sesiones de ~1 h con telemetría a 1 Hz y un frenado cada 30 s"""
+    import random
+    rng = random.Random(1)
+    for n in range(sessions):
+        t = 1_700_000_000.0 + n * 86400
+        lines = [json.dumps({"k": "session", "t": t, "car": "192.168.4.1"})]
+        for _ in range(episodes):
+            speed = rng.uniform(20, 80)
+            lines.append(json.dumps({"k": "cmd", "t": t, "c": "FORWARD", "pwm": 200}))
+            lines += [json.dumps({"k": "speed", "t": t + i, "v": speed}) for i in range(28)]
+            lines.append(json.dumps({"k": "safety", "t": t + 28.0, "e": "gradual_brake", "d": 85.0}))
+            lines.append(json.dumps({"k": "safety", "t": t + 29.2, "e": "stop", "d": 85.0 - speed * 0.6}))
+            t += 30.0
+        path = os.path.join(directory, f"session_{n:04d}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def bench_analysis():
+    """Un mes de sesiones: un proceso vs ProcessPoolExecutor"""
+    import tempfile
+    from analysis import analyze_sessions
+    from sessions import list_sessions
+
+    with tempfile.TemporaryDirectory() as directory:
+        _write_synthetic_sessions(directory, sessions=30, episodes=120)
+        paths = list_sessions(directory)
+        records = sum(1 for path in paths for _ in open(path, encoding="utf-8"))
+        print(f"   Sesiones: {len(paths)}  Registros: {records:,}")
+        for name, workers in (("Un proceso", 1), (f"{os.cpu_count()} procesos", None)):
+            start = time.perf_counter()
+            results = analyze_sessions(paths, workers)
+            elapsed = time.perf_counter() - start
+            print(f"   {name:<30} {elapsed:>8.2f} s  ({results['gradual_brakes']} frenados)")
+
+
+# =========================
+# TIEMPO HASTA LA COLISIÓN
+# =========================
+def _approach_trace(rng, speed: float, start: float = 200.0, stop_at=None,
+                    noise: float = 1.0, spikes: float = 0.03, interval: float = 0.1,
+                    duration: float = 8.0):
+    """
+    Lecturas del ultrasónico de un acercamiento a velocidad constante
+    Args:
+        stop_at: Distancia a la que el conductor frena solo (desaceleración
+            constante hasta detenerse ahí); None = no frena
+    Returns:
+        Lista de (hora de medición, distancia medida, distancia real)
+    """
+    brake_start = None
+    if stop_at is not None:
+        brake_length = min(start - stop_at, 40.0)
+        brake_start = (start - stop_at - brake_length) / speed if speed else 0.0
+        decel = speed ** 2 / (2 * brake_length) if brake_length else 0.0
+    trace = []
+    t = 0.0
+    while t < duration:
+        if brake_start is not None and t >= brake_start:
+            dt = min(t - brake_start, speed / decel if decel else 0.0)
+            real = start - speed * brake_start - (speed * dt - decel * dt * dt / 2)
+        else:
+            real = start - speed * t
+        measured = real + rng.gauss(0, noise)
+        if rng.random() < spikes:
+            measured = rng.choice((real * 0.3, real + 80.0, 450.0))  # Ecos espurios o rebotes
+        trace.append((t, measured, real))
+        t += interval
+    return trace
+
+
+def _replay(trace, delay, speed_hint=None):
+    """Pasa una traza por el estimador con retardo de entrega; devuelve las decisiones"""
+    from ttc import TTCEstimator
+    estimator = TTCEstimator()
+    decisions = []
+    for t, measured, _ in trace:
+        received = t + delay()
+        if speed_hint is not None:
+            estimator.update_speed(speed_hint, t)
+        decision = estimator.update(measured, t, rtt=0.04, now=received)
+        if decision:
+            decisions.append(decision)
+    return decisions
+
+
+def bench_ttc():
+    """Latencia de decisión y falsos positivos del estimador de TTC"""
+    import random
+    import config
+    from ttc import TTCEstimator
+    rng = random.Random(3)
+    delay = lambda: 0.02 + rng.expovariate(1 / 0.01)
+    budget = config.TTC_STOP_BUDGET
+    margin = config.TTC_COLLISION_DISTANCE
+    
+    # Acercamientos simulados: STOP respecto al instante en que el TTC real cruza el presupuesto
+    early, late, misses, runs = [], [], 0, 200
+    for _ in range(runs):
+        speed = rng.uniform(20, 100)
+        trace = _approach_trace(rng, speed, duration=(200.0 - margin) / speed + 1.0)
+        stops = [d for d in _replay(trace, delay, speed) if d.action == TTCEstimator.STOP]
+        crossing = (200.0 - margin - budget * speed) / speed
+        if not stops:
+            misses += 1
+            continue
+        offset = stops[0].decided_at - crossing
+        (late if offset > 0 else early).append(offset)
+        # Distancia real al llegar el STOP (medio RTT + actuación)
+        arrival = stops[0].decided_at + 0.02 + config.TTC_ACTUATION_DELAY
+        if 200.0 - speed * arrival <= margin:
+            misses += 1
+    offsets = sorted(early + late)
+    print(f"   Acercamientos simulados: {runs} (20-100 cm/s, ruido 1 cm, 3 % de ecos espurios)")
+    print(f"      STOP antes de cruzar el presupuesto   {len(early):>5}")
+    print(f"      STOP después                          {len(late):>5}  (peor {max(late, default=0) * 1000:.0f} ms)")
+    print(f"      Mediana respecto al cruce             {offsets[len(offsets) // 2] * 1000:>+8.0f} ms")
+    print(f"      Sin STOP a tiempo                     {misses:>5}")
+    
+    # Trazas negativas: nada de esto debería terminar en STOP
+    scenarios = {
+        "Detenido con ecos espurios": lambda: _approach_trace(rng, 0.0, spikes=0.1),
+        "Avance lento (< umbral)": lambda: _approach_trace(rng, 3.0),
+        "El conductor frena a 60 cm": lambda: _approach_trace(rng, rng.uniform(20, 50), stop_at=60.0),
+    }
+    print("   Falsos positivos (200 trazas por escenario)")
+    for name, make in scenarios.items():
+        stops = slows = 0
+        for _ in range(200):
+            decisions = _replay(make(), delay)
+            stops += any(d.action == TTCEstimator.STOP for d in decisions)
+            slows += any(d.action == TTCEstimator.SLOW for d in decisions)
+        print(f"      {name:<32} STOP {stops / 2:>5.1f} %  SLOW {slows / 2:>5.1f} %")
+        
+    # Sesiones grabadas con distancia (si las hay)
+    from sessions import list_sessions
+    recorded = samples = 0
+    stops = 0
+    for path in list_sessions(config.SESSIONS_DIR):
+        trace = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("k") == "dist":
+                    trace.append((record["t"], record["d"], record["d"]))
+        if trace:
+            recorded += 1
+            samples += len(trace)
+            stops += sum(d.action == TTCEstimator.STOP for d in _replay(trace, lambda: 0.0))
+    if recorded:
+        print(f"   Sesiones grabadas: {recorded}  Muestras: {samples:,}  STOP: {stops}")
+    else:
+        print(f"   Sin sesiones grabadas con distancia en {config.SESSIONS_DIR}/")
+        
+    # Costo por muestra en el hilo de escucha
+    trace = _approach_trace(rng, 0.0, duration=1000.0)
+    elapsed = _timeit(lambda: _replay(trace, lambda: 0.0), repeat=3)
+    print(f"   Costo por muestra: {elapsed / len(trace) * 1e6:.1f} µs")
+
+
+# =========================
+# MANIOBRAS
+# =========================
+def bench_maneuver():
+    """Error de temporización por paso: MACRO: en el carrito vs pasos desde la PC"""
+    import contextlib
+    import io
+    from communication import ESP32Communication
+    from events import EventBus
+    from maneuvers import ManeuverExecutor, ManeuverStep
+    from simulator import SimulatedESP32
+    
+    pattern = [
+        ManeuverStep("FORWARD", 200, 0.5), ManeuverStep("LEFT", 200, 0.2),
+        ManeuverStep("FORWARD", 150, 0.5), ManeuverStep("RIGHT", 150, 0.2),
+        ManeuverStep("STOP", 0, 0.0),
+    ]
+    runs = 5
+    # Enlace WiFi típico: 5 ms por sentido más 10 ms de jitter medio
+    simulator = SimulatedESP32(uplink_delay=0.005, downlink_delay=0.005, jitter=0.01, seed=2)
+    port = simulator.start()
+    events = EventBus()
+    comm = ESP32Communication(events=events)
+    comm.ip, comm.port = "127.0.0.1", port
+    executor = ManeuverExecutor(comm, rtt_provider=lambda: comm.clock.rtt)
+    print(f"   {len(pattern)} pasos, {runs} ejecuciones por modo, 5 ms + 10 ms de jitter por sentido")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            comm.connect()
+        for name, start in (("MACRO: en el carrito", executor.run),
+                            ("Pasos desde la PC", executor.run_host_timed)):
+            true_errors, reported_errors, writes = [], [], 0
+            for _ in range(runs):
+                sent = len(simulator.commands)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    run = start(pattern)
+                    run.wait(5.0)
+                    time.sleep(0.1)
+                writes += sum(1 for _, c in simulator.commands[sent:] if not c.startswith(("TIME?", "HB:")))
+                movements = simulator.movements[-len(run.planned):]
+                origin = movements[0][0]
+                true_errors += [
+                    abs((t - origin) - planned) for (t, _, _), planned in zip(movements[1:], run.planned[1:])
+                ]
+                reported_errors += [abs(e) for e in run.step_errors() if e is not None]
+            true_errors.sort()
+            print(f"   {name:<24} |error| medio {sum(true_errors) / len(true_errors) * 1000:>5.1f} ms  "
+                  f"p95 {true_errors[int(len(true_errors) * 0.95)] * 1000:>5.1f} ms  "
+                  f"máx {true_errors[-1] * 1000:>5.1f} ms  "
+                  f"envíos/maniobra {writes / runs:.0f}")
+            print(f"   {'':<24} medido por la app: |error| medio "
+                  f"{sum(reported_errors) / max(1, len(reported_errors)) * 1000:.1f} ms")
+    finally:
+        executor.close()
+        with contextlib.redirect_stdout(io.StringIO()):
+            comm.disconnect()
+        simulator.stop()
+        events.close()
+
+
+def bench_control():
+    """Control proporcional: eventos de entrada vs envíos, jitter y bytes/s"""
+    import contextlib
+    import io
+    import math
+    import config
+    from communication import ESP32Communication
+    from control import ControlStreamer
+    from events import EventBus
+    from simulator import SimulatedESP32
+    
+    duration = 3.0
+    simulator = SimulatedESP32(uplink_delay=0.005, downlink_delay=0.005, jitter=0.005, seed=3)
+    port = simulator.start()
+    events = EventBus()
+    comm = ESP32Communication(events=events)
+    comm.ip, comm.port = "127.0.0.1", port
+    streamer = ControlStreamer(comm.send_control)
+    stop = threading.Event()
+    legacy = {"writes": 0, "bytes": 0, "speed": None}
+    
+    def move_mouse():
+        # Arrastre rápido de la palanca (~2 kHz de eventos)
+        start = time.perf_counter()
+        while not stop.is_set():
+            t = time.perf_counter() - start
+            throttle = 0.6 + 0.4 * math.sin(t * 2)
+            streamer.input.set_axes(throttle, 0.5 * math.sin(t * 3))
+            # Forma anterior: un SPEED_SET por cada escalón de 25 que cruza el mouse
+            speed = round(throttle * config.SPEED_MAX / 25) * 25
+            if speed != legacy["speed"]:
+                legacy["speed"] = speed
+                legacy["writes"] += 1
+                legacy["bytes"] += len(f"SPEED_SET:{speed}\n")
+            time.sleep(0.0005)
+            
+    mouse = threading.Thread(target=move_mouse, daemon=True)
+    print(f"   {duration:.0f} s arrastrando la palanca, {config.CONTROL_RATE_HZ} Hz de control, "
+          f"banda muerta {config.CONTROL_DEADBAND} PWM")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            comm.connect()
+            streamer.start()
+            mouse.start()
+            time.sleep(duration)
+            stop.set()
+            mouse.join()
+            streamer.input.set_axes(0.0, 0.0)
+            time.sleep(0.2)
+            streamer.stop()
+        metrics = streamer.get_metrics()
+    finally:
+        stop.set()
+        streamer.stop()
+        with contextlib.redirect_stdout(io.StringIO()):
+            comm.disconnect()
+        simulator.stop()
+        events.close()
+        
+    events_per_frame = metrics["input_events"] / max(1, metrics["frames_sent"])
+    suppressed = metrics["suppressed"] / max(1, metrics["ticks"])
+    print(f"   Eventos de entrada {metrics['input_events']:>6}  envíos DRIVE: {metrics['frames_sent']:>4}  "
+          f"({events_per_frame:.0f} eventos por envío, {suppressed:.0%} de muestras suprimidas)")
+    print(f"   Frecuencia {metrics['rate_hz']:.2f} Hz  jitter {metrics['jitter_ms']:.2f} ms  "
+          f"desvío máx {metrics['max_deviation_ms']:.2f} ms")
+    print(f"   Conduciendo: {metrics['bytes_per_s']:.0f} B/s "
+          f"(cota {config.CONTROL_RATE_HZ * len('DRIVE:-255:-255') + config.CONTROL_RATE_HZ} B/s)")
+    print(f"   Forma anterior (SPEED_SET por escalón de 25): {legacy['writes']} envíos, "
+          f"{legacy['bytes'] / duration:.0f} B/s, solo velocidad y sin giro proporcional")
+
+
+def bench_heartbeat():
+    """Latidos: latencia de detección de un corte y detención por deadman"""
+    import contextlib
+    import io
+    import config
+    from communication import ESP32Communication
+    from events import EventBus
+    from monitoring import CommunicationMonitor
+    from protocol import LinkStatus
+    from simulator import SimulatedESP32
+    
+    cuts = 8
+    simulator = SimulatedESP32(uplink_delay=0.005, downlink_delay=0.005, jitter=0.01, seed=6)
+    port = simulator.start()
+    events = EventBus()
+    monitor = CommunicationMonitor()
+    comm = ESP32Communication(monitor=monitor, events=events)
+    comm.ip, comm.port = "127.0.0.1", port
+    changes = []
+    events.subscribe(EventBus.LINK, lambda status: changes.append((time.time(), status)), name="bench_link")
+    
+    def wait_state(state, since, timeout=2.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            for at, status in changes:
+                if at >= since and status.state == state:
+                    return at
+            time.sleep(0.002)
+        return None
+        
+    print(f"   {cuts} cortes totales, 5 ms + 10 ms de jitter por sentido, latido cada "
+          f"{config.HEARTBEAT_INTERVAL * 1000:.0f} ms, perdido a {config.HEARTBEAT_LOST_AFTER * 1000:.0f} ms")
+    detection, deadman = [], []
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            comm.connect()
+            # Sin cortes: ¿el jitter solo provoca falsos degradados?
+            quiet_start = time.time()
+            time.sleep(5.0)
+            false_changes = [status.state for at, status in changes if at >= quiet_start]
+            rate = monitor.get_bandwidth()
+            for _ in range(cuts):
+                comm.send_command(config.CMD_FORWARD)
+                time.sleep(0.4)
+                trips = len(simulator.deadman_trips)
+                cut = time.time()
+                simulator.partition()
+                lost_at = wait_state(LinkStatus.LOST, cut)
+                time.sleep(0.3)
+                if lost_at is not None:
+                    detection.append(lost_at - cut)
+                if len(simulator.deadman_trips) > trips:
+                    deadman.append(simulator.host_time_of(simulator.deadman_trips[-1]) - cut)
+                simulator.heal()
+                wait_state(LinkStatus.OK, time.time())
+                comm.send_command(config.CMD_STOP)
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            comm.disconnect()
+        simulator.stop()
+        events.close()
+        
+    link = monitor.get_link_status()
+    for name, values in (("PC: enlace perdido", detection), ("Carrito: deadman", deadman)):
+        values.sort()
+        if values:
+            print(f"   {name:<20} {len(values)}/{cuts}  media {sum(values) / len(values) * 1000:>4.0f} ms  "
+                  f"máx {values[-1] * 1000:>4.0f} ms tras el corte")
+    print(f"   Monitor: detección máx {link['max_detection_ms']:.0f} ms sin latidos, "
+          f"RTT de latidos {link['heartbeat_rtt_ms']:.1f} ms")
+    print(f"   5 s sin cortes: {false_changes.count(LinkStatus.DEGRADED)} degradados, "
+          f"{false_changes.count(LinkStatus.LOST)} perdidos en falso; "
+          f"costo {rate['upload']:.0f} B/s de subida y {rate['download']:.0f} B/s de bajada")
+    print("   Sin latidos: el socket sigue abierto durante el corte y el carrito sigue andando")
+
+
+def bench_discovery():
+    """Descubrimiento: barrido concurrente de una /24 vs conexiones una a una"""
+    import tempfile
+    import config
+    from discovery import DiscoveryCache, ESP32Discovery
+    from simulator import SimulatedESP32
+    
+    simulator = SimulatedESP32(host="127.0.0.200", seed=1)
+    port = simulator.start()
+    # Peor caso: todas las demás direcciones aceptan y nunca responden (cuestan el timeout entero)
+    silent = []
+    for host in range(1, 255):
+        if host == 200:
+            continue
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind((f"127.0.0.{host}", port))
+        server.listen(4)
+        silent.append(server)
+    directory = tempfile.mkdtemp()
+    cache = DiscoveryCache(os.path.join(directory, "cache.json"))
+    discovery = ESP32Discovery(port=port, cache=cache)
+    print(f"   /24 con 253 equipos mudos, timeout {config.DISCOVERY_TIMEOUT * 1000:.0f} ms, "
+          f"{config.DISCOVERY_CONCURRENCY} sondeos simultáneos")
+    try:
+        start = time.perf_counter()
+        found = discovery.scan("127.0.0.0/24")
+        scan_time = time.perf_counter() - start
+        
+        # Forma anterior: un connect bloqueante tras otro (se mide una muestra y se extrapola)
+        sample = 8
+        start = time.perf_counter()
+        for host in range(1, sample + 1):
+            with socket.create_connection((f"127.0.0.{host}", port), timeout=config.DISCOVERY_TIMEOUT) as sock:
+                sock.settimeout(config.DISCOVERY_TIMEOUT)
+                sock.sendall(b"GET_SPEED\n")
+                try:
+                    sock.recv(64)
+                except socket.timeout:
+                    pass
+        sequential = (time.perf_counter() - start) / sample * 254
+        
+        cache.put(found[0].ip, found[0].port)
+        start = time.perf_counter()
+        car = discovery.locate()
+        locate_time = time.perf_counter() - start
+    finally:
+        for server in silent:
+            server.close()
+        simulator.stop()
+        
+    print(f"   Barrido asyncio:        {scan_time * 1000:>7.0f} ms  encontrados: {[c.ip for c in found]}")
+    print(f"   Uno a uno (estimado):   {sequential * 1000:>7.0f} ms")
+    print(f"   Reconexión con caché:   {locate_time * 1000:>7.0f} ms  ({car.source} {car.ip})")
+
+
+# =========================
+# ARRANQUE EN FRÍO
+# =========================
+_FIRST_FRAME_SCRIPT = """
+import time
+start = time.perf_counter()
+import os, sys, json
+import controller
+car = controller.CarController()
+while car.gui.ready_at is None and time.perf_counter() - start < 5:
+    car.gui.root.update()
+print("STARTUP:" + json.dumps({
+    "first_frame": car.gui.first_frame_at - start,
+    "ready": car.gui.ready_at - start,
+    "heavy": sorted(name for name in ("asyncio", "twilio") if name in sys.modules),
+}))
+sys.stdout.flush()
+os._exit(0)
+"""
+
+
+def _import_time_ms(module: str) -> float:
+    """Tiempo acumulado de importar el módulo en un proceso nuevo (-X importtime)"""
+    import subprocess
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    for line in reversed(result.stderr.splitlines()):
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000
+    raise RuntimeError(result.stderr[-500:])
+
+
+def bench_startup():
+    """Arranque en frío: tiempo de import y hasta el primer cuadro, con presupuesto"""
+    import statistics
+    import subprocess
+    import tempfile
+    import config
+    
+    samples = [_import_time_ms("controller") for _ in range(7)]
+    median = statistics.median(samples)
+    print(f"   import controller (mediana de {len(samples)})  {median:>6.1f} ms "
+          f"(mín {min(samples):.1f}, presupuesto {config.STARTUP_IMPORT_BUDGET_MS} ms)")
+    print("   Cada módulo en un proceso aparte (con la biblioteca estándar que arrastra):")
+    for module in ("gui", "communication", "notifications", "dashboard", "discovery"):
+        print(f"      {module:<16} {_import_time_ms(module):>6.1f} ms")
+    ok = median <= config.STARTUP_IMPORT_BUDGET_MS
+    
+    if not os.environ.get("DISPLAY") and sys.platform.startswith("linux"):
+        print("   Primer cuadro: sin pantalla (DISPLAY), no se mide")
+    else:
+        # En un directorio vacío para no leer ni escribir los archivos de la sesión real
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+            result = subprocess.run([sys.executable, "-c", _FIRST_FRAME_SCRIPT],
+                                    cwd=directory, env=env, capture_output=True, text=True, timeout=30)
+        line = next((l for l in result.stdout.splitlines() if l.startswith("STARTUP:")), None)
+        if line is None:
+            print(f"   Primer cuadro: falló ({result.stderr.strip()[-200:]})")
+            return False
+        startup = json.loads(line[8:])
+        print(f"   Primer cuadro                      {startup['first_frame'] * 1000:>6.1f} ms "
+              f"(presupuesto {config.STARTUP_FIRST_FRAME_BUDGET_MS} ms)")
+        print(f"   Panel de monitoreo listo           {startup['ready'] * 1000:>6.1f} ms")
+        print(f"   Módulos pesados ya importados      {startup['heavy'] or 'ninguno'}")
+        ok = ok and startup["first_frame"] * 1000 <= config.STARTUP_FIRST_FRAME_BUDGET_MS
+        
+    print(f"   {'✓ Dentro del presupuesto' if ok else '✗ Excede el presupuesto de arranque'}")
+    return ok
+
+
+# =========================
+# STOP CON LA GUI TRABADA
+# =========================
+def _collision_simulator(connection):
+    """Proceso aparte con el ESP32 simulado: así sus hilos no compiten por el GIL medido"""
+    from simulator import SimulatedESP32
+    simulator = SimulatedESP32(seed=5)
+    connection.send(simulator.start())
+    while True:
+        delay = connection.recv()
+        if delay is None:
+            break
+        time.sleep(delay)
+        already = len(simulator.commands)
+        sent = time.time()
+        simulator.send("COLISION DETECTADA")
+        latency = None
+        # Sondeo cada 0.5 ms: millis() del registro de comandos es demasiado grueso aquí
+        while time.time() < sent + 3.0:
+            if any(command == "STOP" for _, command in simulator.commands[already:]):
+                latency = time.time() - sent
+                break
+            time.sleep(0.0005)
+        connection.send(latency)
+    simulator.stop()
+
+
+def bench_gui_blocked():
+    """STOP ante colisión con la GUI trabada: un proceso vs dos procesos"""
+    import contextlib
+    import io
+    import multiprocessing
+    import random
+    import statistics
+    from communication import ESP32Communication
+    from events import EventBus
+    from monitoring import CommunicationMonitor
+    from worker import RemoteCommunication
+    import config
+    
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe()
+    simulator = context.Process(target=_collision_simulator, args=(child,), daemon=True)
+    simulator.start()
+    port = parent.recv()
+    
+    # Trabajo en el hilo de la GUI: Python puro (cede el GIL cada 5 ms) y una
+    # sola llamada en C que no lo suelta (ordenar una lista grande)
+    numbers = [random.random() for _ in range(400_000)]
+    block = 0.3
+    
+    def busy_python():
+        end = time.perf_counter() + block
+        while time.perf_counter() < end:
+            sum(range(200))
+            
+    def busy_c():
+        end = time.perf_counter() + block
+        while time.perf_counter() < end:
+            sorted(numbers)
+            
+    loads = [("GUI libre", lambda: time.sleep(block)), ("Python 300 ms", busy_python),
+             ("C sin soltar el GIL", busy_c)]
+    rng = random.Random(2)
+    trials = 12
+    sort_ms = _timeit(lambda: sorted(numbers), repeat=3) * 1000
+    print(f"   Colisión a los 50-150 ms de cada bloqueo de {block * 1000:.0f} ms; "
+          f"{trials} por caso (sorted(): {sort_ms:.0f} ms por llamada)")
+    print(f"   {'modo':<22} {'carga':<22} {'mediana':>8} {'p95':>8} {'máx':>8}")
+    
+    def single_process():
+        events = EventBus()
+        comm = ESP32Communication(monitor=CommunicationMonitor(), events=events)
+        events.subscribe(EventBus.COLLISION, lambda alert: comm.send_command(config.CMD_STOP), name="stop")
+        return comm
+        
+    for mode, create in (("un proceso", single_process),
+                         ("dos procesos", lambda: RemoteCommunication(quiet=True))):
+        with contextlib.redirect_stdout(io.StringIO()):
+            comm = create()
+            comm.ip, comm.port = "127.0.0.1", port
+            assert comm.connect()
+            time.sleep(0.3)
+            results = []
+            for load_name, load in loads:
+                latencies = []
+                for _ in range(trials):
+                    parent.send(rng.uniform(0.05, 0.15))
+                    load()
+                    latency = parent.recv()
+                    if latency is not None:
+                        latencies.append(latency * 1000)
+                    time.sleep(0.05)
+                results.append((load_name, sorted(latencies)))
+            comm.disconnect()
+            if isinstance(comm, RemoteCommunication):
+                comm.close()
+            else:
+                comm.events.close()
+        for load_name, latencies in results:
+            if not latencies:
+                print(f"   {mode:<22} {load_name:<22} sin STOP")
+                continue
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(f"   {mode:<22} {load_name:<22} {statistics.median(latencies):>6.1f}ms "
+                  f"{p95:>6.1f}ms {latencies[-1]:>6.1f}ms")
+    parent.send(None)
+    simulator.join(timeout=2.0)
+
+
+# =========================
+# BLOQUE DE ESTADO
+# =========================
+def _state_reader(path: str, seconds: float, connection):
+    """Otro proceso leyendo el bloque sin parar; cuenta lecturas y estados mezclados"""
+    from stateblock import StateBlockReader
+    reads = torn = 0
+    with StateBlockReader(path) as reader:
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            state = reader.read()
+            reads += 1
+            if state.rtt != state.speed / 1000 or state.pwm != int(state.speed) % 256:
+                torn += 1
+        connection.send((reads, torn, reader.retries))
+
+
+def bench_stateblock():
+    """Bloque de estado: costo de escritura y lectura, y lector en otro proceso"""
+    import multiprocessing
+    import tempfile
+    from stateblock import StateBlockReader, StateBlockWriter
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.bin")
+        writer = StateBlockWriter(path)
+        reader = StateBlockReader(path)
+        n = 100000
+        counter = iter(range(1, 10 ** 9))
+        
+        def write_all():
+            for _ in range(n):
+                i = next(counter)
+                writer.update(speed=float(i), rtt=i / 1000, pwm=i % 256)
+                
+        def read_all():
+            for _ in range(n):
+                reader.read()
+                
+        write = _timeit(write_all, repeat=3) / n
+        read = _timeit(read_all, repeat=3) / n
+        print(f"   Escritura (seqlock + 3 campos)     {write * 1e6:>6.2f} µs")
+        print(f"   Lectura consistente                {read * 1e6:>6.2f} µs")
+        print(f"   Escritura sin cambios (se omite)   "
+              f"{_timeit(lambda: [writer.update(pwm=writer._state['pwm']) for _ in range(n)], repeat=3) / n * 1e6:>6.2f} µs")
+              
+        # Lector en otro proceso mientras el controlador escribe sin pausa
+        context = multiprocessing.get_context("spawn")
+        parent, child = context.Pipe()
+        process = context.Process(target=_state_reader, args=(path, 1.0, child))
+        process.start()
+        writes = 0
+        while process.is_alive() and not parent.poll():
+            i = next(counter)
+            writer.update(speed=float(i), rtt=i / 1000, pwm=i % 256)
+            writes += 1
+        reads, torn, retries = parent.recv()
+        process.join()
+        print(f"   Otro proceso: {reads:,} lecturas en 1 s con {writes:,} escrituras a la vez")
+        print(f"      reintentos por el seqlock        {retries:>8,}")
+        print(f"      estados mezclados                {torn:>8}")
+        reader.close()
+        writer.close()
+
+
+# =========================
+# CATÁLOGO DE SESIONES
+# =========================
+def _fill_catalog(catalog, sessions: int, seed: int = 7):
+    """Sesiones sintéticas: 12 resúmenes, 20 eventos de seguridad y alguna colisión o reconexión"""
+    import random
+    from protocol import LinkStatus
+    from safetylog import SafetyEvent
+    
+    rng = random.Random(seed)
+    start = 1_700_000_000.0
+    for n in range(sessions):
+        t = start + n * 600
+        session = catalog.start_session(f"car-{n % 8}", t)
+        latencies = [rng.lognormvariate(3, 0.5) for _ in range(12)]
+        for i, latency in enumerate(latencies):
+            catalog.record_snapshot(session, t + i * 5, {
+                "latency": {"current": latency, "average": latency, "p95": latency * 1.6},
+                "reliability": {"packet_loss": rng.random()}, "bandwidth": {"total_bps": 900.0},
+                "link": {"state": "ok"}
+            })
+        catalog.record_safety_events(session, [
+            SafetyEvent(rng.choice(SafetyEvent.KINDS), t + i * 3, i * 3.0, rng.uniform(5, 80))
+            for i in range(20)
+        ])
+        if n % 5 == 0:
+            catalog.record_collision(session, t + 30, "COLISION DETECTADA")
+        if n % 7 == 0:
+            catalog.record_link_change(session, LinkStatus(LinkStatus.OK, LinkStatus.LOST, 1.2, t + 40))
+        catalog.end_session(session, t + 60, {
+            "latency": {"average": sum(latencies) / 12, "p95": max(latencies) * 1.6, "max": max(latencies)},
+            "reliability": {"commands_sent": 120, "responses_received": 118, "commands_failed": 2,
+                            "packet_loss": 1.7},
+            "bandwidth": {"bytes_sent": 2400, "bytes_received": 9100}
+        })
+
+
+def bench_catalog():
+    """Catálogo SQLite: escritura por lotes vs una transacción por fila, y consultas"""
+    import sqlite3
+    import tempfile
+    from catalog import SessionCatalog
+    
+    sessions = 5000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        catalog = SessionCatalog(path)
+        started = time.perf_counter()
+        _fill_catalog(catalog, sessions)
+        queued = time.perf_counter() - started
+        catalog.flush()
+        elapsed = time.perf_counter() - started
+        metrics = catalog.get_metrics()
+        rows = metrics["rows_written"]
+        print(f"   {sessions:,} sesiones, {rows:,} filas")
+        print(f"   Encolar (lo que paga el llamador)   {queued / rows * 1e6:>7.2f} µs/fila")
+        print(f"   Escritor por lotes                  {rows / elapsed:>9,.0f} filas/s "
+              f"en {metrics['transactions']} transacciones")
+              
+        # Lo mismo sin el escritor: una transacción por fila (como un INSERT por evento)
+        naive = sqlite3.connect(os.path.join(directory, "naive.db"))
+        naive.execute("PRAGMA journal_mode=WAL")
+        naive.execute("CREATE TABLE safety_events (session_id, t, device_time, kind, distance, detail)")
+        n = 2000
+        started = time.perf_counter()
+        for i in range(n):
+            with naive:
+                naive.execute("INSERT INTO safety_events VALUES (?, ?, ?, ?, ?, ?)", (1, i, i, "stop", 10.0, ""))
+        naive_rate = n / (time.perf_counter() - started)
+        naive.close()
+        print(f"   Una transacción por fila            {naive_rate:>9,.0f} filas/s")
+        
+        queries = [
+            ("Sesiones de un carrito (últimas 100)", lambda: catalog.find_sessions(car="car-3")),
+            ("Sesiones con p95 >= 60 ms", lambda: catalog.find_sessions(min_latency_p95=60)),
+            ("Sesiones de un día", lambda: catalog.find_sessions(start=1_700_000_000.0 + 86400 * 10,
+                                                                  end=1_700_000_000.0 + 86400 * 11)),
+            ("Eventos por tipo de un carrito", lambda: catalog.event_counts(car="car-3")),
+            ("Detenciones de una semana", lambda: catalog.events("stop", start=1_700_000_000.0 + 86400 * 7,
+                                                                  end=1_700_000_000.0 + 86400 * 14)),
+            ("Resumen por carrito", catalog.car_summary),
+        ]
+        for name, query in queries:
+            print(f"   {name:<36} {_timeit(query, repeat=5) * 1000:>7.2f} ms")
+        catalog.close()
+
+
+# =========================
+# ARCHIVO COMPRIMIDO POR BLOQUES
+# =========================
+def bench_archive():
+    """Archivo por bloques: compresión, velocidad de escritura y lectura aleatoria"""
+    import random
+    import tempfile
+    from archive import ArchiveReader, convert_session
+    from sessions import SessionRecorder
+    
+    # Una hora de telemetría: velocidad a 50 Hz, distancia a 20 Hz, un comando cada 2 s
+    rng = random.Random(3)
+    start = 1_700_000_000.0
+    seconds = 3600
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = SessionRecorder(directory)
+        recorder.start("192.168.4.1")
+        speed, distance = 0.0, 200.0
+        for i in range(seconds * 100):
+            t = start + i / 100
+            if i % 2 == 0:
+                speed = max(0.0, speed + rng.uniform(-2, 2))
+                recorder.record_speed(round(speed, 2), t)
+            if i % 5 == 0:
+                distance = min(400.0, max(5.0, distance + rng.uniform(-3, 3)))
+                recorder.record_distance(round(distance, 1), t)
+            if i % 200 == 0:
+                recorder.record_command(rng.choice(("FORWARD", "STOP", "LEFT")), 200, t)
+        recorder.stop()
+        source = recorder.path
+        raw_size = os.path.getsize(source)
+        records = recorder.records
+        print(f"   1 h a 50/20 Hz: {records:,} registros, {raw_size / 2 ** 20:.1f} MiB en JSON por líneas")
+        print(f"   {'Códec':<10} {'Tamaño':>9} {'Razón':>6} {'Escritura':>14} {'Lectura 1 s':>12}")
+        
+        queries = [start + rng.uniform(0, seconds - 1) for _ in range(200)]
+        for codec, level in (("zlib", 1), ("zlib", 6), ("zlib", 9), ("lzma", 0), ("lzma", 6)):
+            output = os.path.join(directory, f"{codec}{level}.carx")
+            began = time.perf_counter()
+            convert_session(source, output, codec=codec, level=level)
+            write = time.perf_counter() - began
+            size = os.path.getsize(output)
+            with ArchiveReader(output) as reader:
+                began = time.perf_counter()
+                for t in queries:
+                    reader._cached = None  # Cada consulta paga su descompresión
+                    sum(1 for _ in reader.read(t, t + 1.0))
+                read = (time.perf_counter() - began) / len(queries)
+            print(f"   {codec} {level:<5} {size / 2 ** 20:>7.2f} MiB {raw_size / size:>5.1f}x "
+                  f"{records / write:>9,.0f} reg/s {read * 1000:>9.2f} ms")
+                  
+        # Lo mismo sobre el JSON por líneas: hay que parsear hasta llegar a la hora pedida
+        began = time.perf_counter()
+        for t in queries[:10]:
+            with open(source, "r", encoding="utf-8") as f:
+                next(f)  # Registro de inicio de sesión (hora real)
+                for line in f:
+                    record = json.loads(line)
+                    if record["t"] >= t + 1.0:
+                        break
+        scan = (time.perf_counter() - began) / 10
+        print(f"   {'jsonl':<10} {raw_size / 2 ** 20:>7.2f} MiB {1:>5.1f}x {'':>14} {scan * 1000:>9.2f} ms")
+
+
+# =========================
+# LOGS EMPUJADOS
+# =========================
+def bench_log_push():
+    """Logs del ESP32: latencia de cada entrada empujada (LOG:) frente a la consulta periódica"""
+    import contextlib
+    import io
+    import config
+    from communication import ESP32Communication
+    from events import EventBus
+    from simulator import SimulatedESP32
+    
+    entries = 200
+    print(f"   {entries} entradas a 50 Hz, 5 ms + 10 ms de jitter por sentido")
+    for loss in (0.0, 0.05, 0.2):
+        simulator = SimulatedESP32(uplink_delay=0.005, downlink_delay=0.005, jitter=0.01,
+                                   log_loss=loss, seed=4)
+        port = simulator.start()
+        events = EventBus()
+        comm = ESP32Communication(events=events)
+        comm.ip, comm.port = "127.0.0.1", port
+        first_seen = {}
+        
+        def on_logs(batch):
+            now = time.time()
+            for log in batch.logs:
+                first_seen.setdefault(log.partition("] ")[2], now)
+                
+        events.subscribe(EventBus.ESP32_LOGS, on_logs, name="bench_logs")
+        logged = {}
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                comm.connect()
+                time.sleep(0.2)
+                for i in range(entries):
+                    logged[f"evento {i}"] = time.time()
+                    simulator.add_log(f"evento {i}")
+                    time.sleep(0.02)
+                time.sleep(0.3)
+        finally:
+            with contextlib.redirect_stdout(io.StringIO()):
+                comm.disconnect()
+            simulator.stop()
+            events.close()
+            
+        latencies = sorted(first_seen[text] - at for text, at in logged.items() if text in first_seen)
+        status = comm.get_log_status()
+        print(f"   Pérdida {loss:>4.0%}: {len(latencies)}/{entries} entregadas  "
+              f"p50 {latencies[len(latencies) // 2] * 1000:>5.1f} ms  "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:>5.1f} ms  "
+              f"máx {latencies[-1] * 1000:>5.1f} ms  "
+              f"({status['gaps']} huecos, {status['repairs']} GET_LOGS)")
+    interval = config.LOG_POLL_INTERVAL / 1000
+    print(f"   Consulta cada {interval:.0f} s (antes): {interval / 2 * 1000:.0f} ms en promedio, "
+          f"hasta {interval * 1000:.0f} ms; con más de 10 entradas entre consultas se pierden")
+
+
+# =========================
+# TAREAS PERIÓDICAS
+# =========================
+def bench_task_wheel():
+    """Tareas periódicas del controlador: despertares por minuto y CPU según la actividad"""
+    import config
+    from monitoring import CommunicationMonitor
+    from scheduler import TaskWheel, VirtualClock
+    from telemetry import TelemetryHistory
+    
+    clock = VirtualClock()
+    monitor = CommunicationMonitor(clock=clock)
+    monitor.start_connection()
+    state = {"connected": True}
+    chart_since = {name: 0.0 for name in (TelemetryHistory.LATENCY, TelemetryHistory.SPEED, TelemetryHistory.PWM)}
+    
+    def traffic():  # Un comando con respuesta y una velocidad por segundo
+        monitor.command_sent(config.CMD_FORWARD)
+        clock.after(20, lambda: monitor.response_received("OK:FORWARD"))
+        monitor.history.record(TelemetryHistory.SPEED, 30.0, clock.time())
+        clock.after(1000, traffic)
+        
+    # Lo mismo que hacen los cuerpos de las tareas del controlador, sin Tk
+    def stats():
+        if state["connected"]:
+            monitor.get_statistics_summary()
+            
+    def charts():
+        if state["connected"]:
+            now = clock.time()
+            for name in chart_since:
+                for sample in monitor.history.query(name, chart_since[name], now, resolution=0):
+                    chart_since[name] = sample[0]
+                    
+    def logs():
+        pass
+        
+    def measure(minutes=5):
+        clock.callbacks_run = 0
+        cpu = time.process_time()
+        clock.advance(minutes * 60)
+        return clock.callbacks_run / minutes, (time.process_time() - cpu) * 1000 / minutes
+        
+    traffic()
+    baseline, baseline_cpu = measure(1)  # Solo el tráfico simulado
+    
+    # Antes: un root.after que se rearma por tarea, siempre
+    def periodic(interval_ms, action):
+        def tick():
+            action()
+            clock.after(interval_ms, tick)
+        clock.after(interval_ms, tick)
+        
+    periodic(config.STATS_UPDATE_INTERVAL, stats)
+    periodic(config.CHART_REFRESH_INTERVAL, charts)
+    periodic(config.LOG_POLL_INTERVAL, logs)
+    print(f"   {'':<26} {'despertares/min':>16} {'CPU ms/min':>11}")
+    for label, connected in (("Antes, conectado", True), ("Antes, sin conexión", False)):
+        state["connected"] = connected
+        wakeups, cpu = measure()
+        print(f"   {label:<26} {wakeups - baseline:>16.0f} {max(0.0, cpu - baseline_cpu):>11.1f}")
+        
+    clock = VirtualClock()  # Reloj nuevo: sin los bucles anteriores
+    monitor = CommunicationMonitor(clock=clock)
+    monitor.start_connection()
+    traffic()
+    wheel = TaskWheel(clock)
+    wheel.add("stats", stats, {TaskWheel.ACTIVE: config.STATS_UPDATE_INTERVAL,
+                               TaskWheel.IDLE: config.STATS_IDLE_INTERVAL,
+                               TaskWheel.HIDDEN: config.STATS_HIDDEN_INTERVAL})
+    wheel.add("charts", charts, {TaskWheel.ACTIVE: config.CHART_REFRESH_INTERVAL,
+                                 TaskWheel.IDLE: config.CHART_IDLE_INTERVAL})
+    wheel.add("esp32_logs", logs, lambda activity: None if activity == TaskWheel.OFFLINE else config.LOG_REPAIR_INTERVAL)
+    state["connected"] = True
+    wheel.set_connected(True)
+    
+    def drive():
+        if state["driving"]:
+            wheel.touch()
+            clock.after(1000, drive)
+            
+    per_task = None
+    for label, driving, visible, connected in (("Rueda, conduciendo", True, True, True),
+                                               ("Rueda, en reposo", False, True, True),
+                                               ("Rueda, minimizada", False, False, True),
+                                               ("Rueda, sin conexión", False, True, False)):
+        state.update(driving=driving, connected=connected)
+        drive()
+        wheel.set_visible(visible)
+        wheel.set_connected(connected)
+        clock.advance(config.ACTIVITY_IDLE_AFTER + 1)  # Lo suficiente para pasar a reposo
+        wheel.reset_metrics()
+        _, cpu = measure()
+        metrics = wheel.get_metrics()
+        per_task = per_task or metrics["tasks"]
+        print(f"   {label:<26} {metrics['wakeups_per_min']:>16.0f} {max(0.0, cpu - baseline_cpu):>11.1f}  "
+              f"({metrics['coalesced'] / 5:.0f}/min compartidos)")
+    print("   Por ejecución conduciendo: " + ", ".join(f"{name} {task['mean_ms'] * 1000:.0f} µs"
+                                                       for name, task in per_task.items()))
+    print("   Cada despertar de root.after suma además una vuelta del ciclo de eventos de Tk")
+
+
+# =========================
+# ENTREGA CONFIABLE DE COMANDOS
+# =========================
+def bench_delivery():
+    """Comandos numerados: pérdida real, retransmisiones y duplicados con un enlace con pérdidas"""
+    import contextlib
+    import io
+    from communication import ESP32Communication
+    from events import EventBus
+    from monitoring import CommunicationMonitor
+    from simulator import SimulatedESP32
+    
+    commands = 40
+    print(f"   {commands} SPEED_SET cada 100 ms, 5 ms + 2 ms de jitter por sentido")
+    scenarios = {
+        "sin pérdidas": {},
+        "10 % comandos": {"command_loss": 0.1},
+        "25 % comandos": {"command_loss": 0.25},
+        "25 % OK:<seq>": {"ack_loss": 0.25},
+    }
+    for name, impairments in scenarios.items():
+        simulator = SimulatedESP32(uplink_delay=0.005, downlink_delay=0.005, jitter=0.002, seed=8, **impairments)
+        port = simulator.start()
+        events = EventBus()
+        monitor = CommunicationMonitor()
+        comm = ESP32Communication(monitor=monitor, events=events)
+        comm.ip, comm.port = "127.0.0.1", port
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                comm.connect()
+                time.sleep(0.2)
+                for i in range(commands):
+                    comm.send_command(f"SPEED_SET:{100 + i}")
+                    time.sleep(0.1)
+                time.sleep(1.0)
+        finally:
+            with contextlib.redirect_stdout(io.StringIO()):
+                comm.disconnect()
+            simulator.stop()
+            events.close()
+            
+        executed = sum(1 for _, command in simulator.commands if command.startswith("SPEED_SET:"))
+        summary = monitor.get_statistics_summary()["reliability"]
+        before = summary["commands_failed"] / summary["commands_sent"] * 100
+        metrics = comm.delivery.get_metrics()
+        print(f"   {name:<14} ejecutados {executed:>2}/{commands}  pérdida antes {before:.1f} % "
+              f"ahora {summary['packet_loss']:>4.1f} %  {summary['retransmits']:>2} retransmisiones  "
+              f"{summary['duplicates']:>2} duplicados  {metrics['superseded']} reemplazados")
+
+
+# =========================
+# TRAMAS COMPUESTAS
+# =========================
+def bench_frames():
+    """Escrituras por segundo de un minuto de manejo típico, con y sin tramas compuestas"""
+    import contextlib
+    import io
+    import config
+    from communication import ESP32Communication
+    from events import EventBus
+    from monitoring import CommunicationMonitor
+    from simulator import SimulatedESP32
+    
+    # Un minuto de manejo en ciclos de 5 s: arranque con velocidad nueva, uno o dos giros,
+    # a veces un cambio de velocidad en marcha, STOP y la consulta de estado (GET_SPEED + GET_LOGS)
+    trace, starts = [], set()
+    for cycle in range(12):
+        starts.add(f"SPEED_SET:{150 + cycle * 5}")
+        trace.append([f"SPEED_SET:{150 + cycle * 5}", config.CMD_FORWARD])
+        trace += [[config.CMD_LEFT], [config.CMD_FORWARD]] if cycle % 2 == 0 else [[config.CMD_RIGHT]]
+        if cycle % 2 == 0:
+            trace.append([f"SPEED_SET:{220 + cycle}"])
+        trace += [[config.CMD_STOP], list(config.STATUS_QUERY)]
+    duration, speedup = 60.0, 20.0
+    spacing = duration / speedup / len(trace)
+    print(f"   Traza de {duration:.0f} s: 12 arranques con velocidad, 18 giros, 6 cambios de velocidad "
+          f"en marcha y una consulta de estado cada 5 s ({speedup:.0f}x más rápido)")
+          
+    def car_lines(simulator):
+        """Líneas que leyó el carrito, sin latidos ni TIME? (corren aparte y no cambian)"""
+        streamed = sum(1 for _, command in simulator.commands if command.startswith(("HB:", "TIME?")))
+        return simulator.lines_received - streamed
+        
+    results = {}
+    for label, frames in (("por separado", False), ("tramas", True)):
+        config.COMPOUND_FRAMES = frames
+        simulator = SimulatedESP32(uplink_delay=0.005, downlink_delay=0.005, jitter=0.002, seed=8)
+        port = simulator.start()
+        events = EventBus()
+        comm = ESP32Communication(monitor=CommunicationMonitor(), events=events)
+        comm.ip, comm.port = "127.0.0.1", port
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                comm.connect()
+                time.sleep(0.2)
+                sent = comm.delivery.get_metrics()["sent"]
+                lines = car_lines(simulator)
+                for commands in trace:
+                    comm.send_frame(commands)
+                    time.sleep(spacing)
+                time.sleep(0.5)
+        finally:
+            config.COMPOUND_FRAMES = True
+            with contextlib.redirect_stdout(io.StringIO()):
+                comm.disconnect()
+            simulator.stop()
+            events.close()
+            
+        writes = comm.delivery.get_metrics()["sent"] - sent
+        # Del SPEED_SET de cada arranque a la dirección: el motor con medio comando aplicado
+        executed = [(millis, command) for millis, command in simulator.commands
+                    if not command.startswith(("HB:", "TIME?"))]
+        gaps = [later - millis for (millis, command), (later, _) in zip(executed, executed[1:]) if command in starts]
+        results[label] = writes
+        print(f"   {label:<13} {writes:>3} escrituras ({writes / duration:.2f}/s)  "
+              f"el carrito leyó {car_lines(simulator) - lines:>3} líneas  "
+              f"velocidad→dirección: {sum(gaps) / len(gaps):.1f} ms")
+    saved = results["por separado"] - results["tramas"]
+    print(f"   Ahorro: {saved / duration:.2f} escrituras/s ({saved / results['por separado'] * 100:.0f} %); "
+          f"los latidos ({1 / config.HEARTBEAT_INTERVAL:.0f}/s) no cambian")
+
+
+# =========================
+# ÍNDICE DE EVENTOS DE SEGURIDAD
+# =========================
+def bench_safety_index():
+    """Carga del diario de seguridad y consulta por tipo, tiempo y distancia, con presupuesto"""
+    import random
+    import tempfile
+    from safetylog import SafetyEvent, SafetyJournal
+    
+    budget_ms = 20.0
+    rng = random.Random(5)
+    kinds = (SafetyEvent.GRADUAL_BRAKE, SafetyEvent.STOP, SafetyEvent.EMERGENCY_REVERSE)
+    now = 1_700_000_000.0
+    events = [SafetyEvent(rng.choice(kinds), now - 90 * 86400 + i * 38.0, i * 0.5, rng.uniform(20, 90))
+              for i in range(200_000)]  # Varios meses de sesiones
+    with tempfile.TemporaryDirectory() as directory:
+        journal = SafetyJournal(os.path.join(directory, "safety_events.jsonl"))
+        journal.append(events)
+        start = time.perf_counter()
+        index = journal.load_index()
+        load_ms = (time.perf_counter() - start) * 1000
+        
+    week_start = events[-1].time - 7 * 86400
+    samples = []
+    for _ in range(20):
+        start = time.perf_counter()
+        index.query(SafetyEvent.EMERGENCY_REVERSE, start=week_start, max_distance=40.0)
+        samples.append((time.perf_counter() - start) * 1000)
+    query_ms = sorted(samples)[len(samples) // 2]
+    ok = query_ms <= budget_ms
+    print(f"   Carga de {len(events)} eventos: {load_ms:.0f} ms")
+    print(f"   Consulta de una semana (reversas a ≤ 40 cm): {query_ms:.2f} ms mediana "
+          f"(presupuesto {budget_ms:.0f} ms)")
+    print(f"   {'✓ Dentro del presupuesto' if ok else '✗ Excede el presupuesto de consulta'}")
+    return ok
+
+
+BENCHMARKS = {
+    "ingest": bench_ingest,
+    "analysis": bench_analysis,
+    "ttc": bench_ttc,
+    "maneuver": bench_maneuver,
+    "control": bench_control,
+    "heartbeat": bench_heartbeat,
+    "discovery": bench_discovery,
+    "startup": bench_startup,
+    "gui_blocked": bench_gui_blocked,
+    "stateblock": bench_stateblock,
+    "catalog": bench_catalog,
+    "archive": bench_archive,
+    "log_push": bench_log_push,
+    "task_wheel": bench_task_wheel,
+    "delivery": bench_delivery,
+    "frames": bench_frames,
+    "safety_index": bench_safety_index,
+}
+
+
+def main():
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    print("=" * 60)
+    print("BENCHMARKS")
+    print("=" * 60)
+    failed = []
+    for name in selected:
+        function = BENCHMARKS[name]
+        print(f"\n📊 {name}: {function.__doc__}")
+        if function() is False:  # Solo los que tienen presupuesto devuelven un resultado
+            failed.append(name)
+    print("=" * 60)
+    if failed:
+        sys.exit(f"Fuera de presupuesto: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
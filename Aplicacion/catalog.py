@@ -0,0 +1,351 @@
+"""
+Catálogo de sesiones en SQLite
+
+Al terminar una sesión el resumen del monitor se perdía y solo quedaban los
+últimos 10 logs. El catálogo guarda, por sesión:
+
+    sessions       carrito, inicio/fin y el resumen final del monitor
+                   (comandos, latencia promedio/p95/máx, pérdida, bytes,
+                   colisiones y reconexiones)
+    snapshots      resúmenes periódicos del monitor durante la sesión
+    collisions     avisos de colisión del ESP32
+    link_events    cambios de estado del enlace (reconexión: lost -> ok)
+    safety_events  eventos de seguridad del firmware ya interpretados
+
+Las escrituras no bloquean a quien las pide: se encolan y un hilo escritor las
+agrupa en transacciones (hasta CATALOG_BATCH_SIZE filas o CATALOG_FLUSH_INTERVAL
+segundos) con executemany sobre sentencias fijas, que sqlite3 prepara una vez y
+reutiliza de su caché. La base usa WAL para que las consultas lean mientras el
+escritor escribe, e índices para las consultas comunes (por carrito, fecha,
+tipo de evento y percentil de latencia).
+
+    catalog = SessionCatalog("sessions/sessions.db")
+    session = catalog.start_session("192.168.4.1", time.time())
+    catalog.record_collision(session, time.time(), "COLISION DETECTADA")
+    catalog.end_session(session, time.time(), monitor.get_statistics_summary())
+    catalog.find_sessions(car="192.168.4.1", min_latency_p95=50)
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    car TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    path TEXT,
+    commands_sent INTEGER,
+    responses_received INTEGER,
+    commands_failed INTEGER,
+    latency_avg REAL,
+    latency_p95 REAL,
+    latency_max REAL,
+    packet_loss REAL,
+    bytes_sent INTEGER,
+    bytes_received INTEGER,
+    collisions INTEGER NOT NULL DEFAULT 0,
+    reconnects INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_car ON sessions (car, started_at);
+CREATE INDEX IF NOT EXISTS sessions_started ON sessions (started_at);
+CREATE INDEX IF NOT EXISTS sessions_latency_p95 ON sessions (latency_p95);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    session_id INTEGER NOT NULL,
+    t REAL NOT NULL,
+    latency_current REAL,
+    latency_avg REAL,
+    latency_p95 REAL,
+    packet_loss REAL,
+    total_bps REAL,
+    link TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshots_session ON snapshots (session_id, t);
+
+CREATE TABLE IF NOT EXISTS collisions (
+    session_id INTEGER NOT NULL,
+    t REAL NOT NULL,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS collisions_session ON collisions (session_id, t);
+
+CREATE TABLE IF NOT EXISTS link_events (
+    session_id INTEGER NOT NULL,
+    t REAL NOT NULL,
+    state TEXT NOT NULL,
+    previous TEXT NOT NULL,
+    silence REAL
+);
+CREATE INDEX IF NOT EXISTS link_events_session ON link_events (session_id, state);
+
+CREATE TABLE IF NOT EXISTS safety_events (
+    session_id INTEGER NOT NULL,
+    t REAL,
+    device_time REAL,
+    kind TEXT NOT NULL,
+    distance REAL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS safety_events_kind ON safety_events (kind, t);
+CREATE INDEX IF NOT EXISTS safety_events_session ON safety_events (session_id, kind);
+"""
+
+# Sentencias fijas: el texto idéntico hace que sqlite3 reutilice la sentencia preparada
+_INSERT_SESSION = "INSERT INTO sessions (id, car, started_at, path) VALUES (?, ?, ?, ?)"
+_END_SESSION = """
+UPDATE sessions SET
+    ended_at = ?2, commands_sent = ?3, responses_received = ?4, commands_failed = ?5,
+    latency_avg = ?6, latency_p95 = ?7, latency_max = ?8, packet_loss = ?9,
+    bytes_sent = ?10, bytes_received = ?11,
+    collisions = (SELECT COUNT(*) FROM collisions WHERE session_id = ?1),
+    reconnects = (SELECT COUNT(*) FROM link_events
+                  WHERE session_id = ?1 AND state = 'ok' AND previous = 'lost')
+WHERE id = ?1
+"""
+_INSERT_SNAPSHOT = "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+_INSERT_COLLISION = "INSERT INTO collisions VALUES (?, ?, ?)"
+_INSERT_LINK_EVENT = "INSERT INTO link_events VALUES (?, ?, ?, ?, ?)"
+_INSERT_SAFETY_EVENT = "INSERT INTO safety_events VALUES (?, ?, ?, ?, ?, ?)"
+
+_STOP = object()  # Fin del hilo escritor
+
+
+class SessionCatalog:
+    """Catálogo de sesiones con escritor por lotes en segundo plano"""
+
+    def __init__(self, path: str = config.CATALOG_FILE,
+                 batch_size: int = config.CATALOG_BATCH_SIZE,
+                 flush_interval: float = config.CATALOG_FLUSH_INTERVAL):
+        """
+        Args:
+            path: Archivo de la base (":memory:" no sirve: escritor y lector usan conexiones distintas)
+            batch_size: Filas máximas por transacción
+            flush_interval: Espera máxima (s) para juntar más filas antes de escribir
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.transactions = 0
+        self.errors = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+
+        # Conexión de consultas (la GUI) y la del escritor, que solo usa su hilo
+        self._reader = self._connect(path)
+        self._reader.executescript(_SCHEMA)
+        # Un solo escritor por base: los ids se asignan aquí, sin esperar al hilo
+        self._next_session = (self._reader.execute("SELECT MAX(id) FROM sessions").fetchone()[0] or 0) + 1
+
+        self._writer_connection = self._connect(path)
+        self._writer = threading.Thread(target=self._run, name="catalog-writer", daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        connection = sqlite3.connect(path, check_same_thread=False, cached_statements=64)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")  # Con WAL: sin fsync por transacción
+        return connection
+
+    # -------------------------
+    # Escritura (no bloquea)
+    # -------------------------
+    def start_session(self, car: str, started_at: float, path: Optional[str] = None) -> int:
+        """Registra el inicio de una sesión; devuelve su id"""
+        with self._lock:
+            session_id = self._next_session
+            self._next_session += 1
+        self._queue.put((_INSERT_SESSION, (session_id, car, started_at, path)))
+        return session_id
+
+    def end_session(self, session_id: int, ended_at: float, summary: Dict):
+        """Cierra la sesión con el resumen final del monitor (get_statistics_summary)"""
+        latency = summary.get("latency", {})
+        reliability = summary.get("reliability", {})
+        bandwidth = summary.get("bandwidth", {})
+        self._queue.put((_END_SESSION, (
+            session_id, ended_at,
+            reliability.get("commands_sent"), reliability.get("responses_received"),
+            reliability.get("commands_failed"),
+            latency.get("average"), latency.get("p95"), latency.get("max"),
+            reliability.get("packet_loss"),
+            bandwidth.get("bytes_sent"), bandwidth.get("bytes_received")
+        )))
+
+    def record_snapshot(self, session_id: int, t: float, summary: Dict):
+        """Resumen periódico del monitor"""
+        latency = summary.get("latency", {})
+        self._queue.put((_INSERT_SNAPSHOT, (
+            session_id, t, latency.get("current"), latency.get("average"), latency.get("p95"),
+            summary.get("reliability", {}).get("packet_loss"),
+            summary.get("bandwidth", {}).get("total_bps"),
+            summary.get("link", {}).get("state")
+        )))
+
+    def record_collision(self, session_id: int, t: float, text: str):
+        self._queue.put((_INSERT_COLLISION, (session_id, t, text)))
+
+    def record_link_change(self, session_id: int, status):
+        """Cambio de estado del enlace (LinkStatus)"""
+        self._queue.put((_INSERT_LINK_EVENT, (session_id, status.at, status.state, status.previous, status.silence)))
+
+    def record_safety_events(self, session_id: int, events: Iterable):
+        """Eventos de seguridad ya interpretados (SafetyEvent)"""
+        for event in events:
+            self._queue.put((_INSERT_SAFETY_EVENT, (
+                session_id, event.time, event.device_time, event.kind, event.distance, event.detail
+            )))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que todo lo encolado esté escrito"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Escribe lo pendiente y cierra las conexiones"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+        with self._lock:
+            self._reader.close()
+
+    # -------------------------
+    # Hilo escritor
+    # -------------------------
+    def _run(self):
+        connection = self._writer_connection
+        try:
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                # Juntar más filas hasta llenar el lote, vencer el plazo o recibir una marca
+                while isinstance(batch[-1], tuple) and len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                                     else self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                marker = None if isinstance(batch[-1], tuple) else batch.pop()
+                if batch:
+                    self._write(connection, batch)
+                if marker is _STOP:
+                    return
+                if marker is not None:
+                    marker.set()
+        finally:
+            connection.close()
+
+    def _write(self, connection: sqlite3.Connection, batch: List):
+        """Una transacción; las filas seguidas de la misma sentencia van en un executemany"""
+        try:
+            with connection:
+                start = 0
+                for end in range(1, len(batch) + 1):
+                    if end == len(batch) or batch[end][0] != batch[start][0]:
+                        connection.executemany(batch[start][0], [params for _, params in batch[start:end]])
+                        start = end
+            self.rows_written += len(batch)
+            self.transactions += 1
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"✗ Error al escribir en el catálogo de sesiones: {e}")
+
+    def get_metrics(self) -> Dict:
+        return {
+            "pending": self._queue.qsize(),
+            "rows_written": self.rows_written,
+            "transactions": self.transactions,
+            "errors": self.errors
+        }
+
+    # -------------------------
+    # Consultas
+    # -------------------------
+    def _query(self, sql: str, params: Iterable = ()) -> List[Dict]:
+        with self._lock:
+            cursor = self._reader.execute(sql, tuple(params))
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _range(column: str, start: Optional[float], end: Optional[float], where: List[str], params: List):
+        if start is not None:
+            where.append(f"{column} >= ?")
+            params.append(start)
+        if end is not None:
+            where.append(f"{column} < ?")
+            params.append(end)
+
+    def find_sessions(self, car: Optional[str] = None, start: Optional[float] = None,
+                      end: Optional[float] = None, min_latency_p95: Optional[float] = None,
+                      limit: int = 100) -> List[Dict]:
+        """
+        Sesiones por carrito, fecha de inicio y/o latencia p95 mínima
+        Returns:
+            Las más recientes primero (o las de mayor p95 si se filtra por latencia)
+        """
+        where, params = [], []
+        if car is not None:
+            where.append("car = ?")
+            params.append(car)
+        self._range("started_at", start, end, where, params)
+        order = "started_at DESC"
+        if min_latency_p95 is not None:
+            where.append("latency_p95 >= ?")
+            params.append(min_latency_p95)
+            order = "latency_p95 DESC"
+        sql = "SELECT * FROM sessions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self._query(f"{sql} ORDER BY {order} LIMIT ?", params + [limit])
+
+    def event_counts(self, car: Optional[str] = None, start: Optional[float] = None,
+                     end: Optional[float] = None) -> Dict[str, int]:
+        """Eventos de seguridad por tipo (de un carrito y/o en un rango de horas)"""
+        where, params = [], []
+        if car is not None:
+            where.append("session_id IN (SELECT id FROM sessions WHERE car = ?)")
+            params.append(car)
+        self._range("t", start, end, where, params)
+        sql = "SELECT kind, COUNT(*) AS n FROM safety_events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return {row["kind"]: row["n"] for row in self._query(f"{sql} GROUP BY kind", params)}
+
+    def events(self, kind: str, start: Optional[float] = None, end: Optional[float] = None,
+               limit: int = 1000) -> List[Dict]:
+        """Eventos de un tipo en orden de hora, con el carrito de su sesión"""
+        where, params = ["e.kind = ?"], [kind]
+        self._range("e.t", start, end, where, params)
+        return self._query(
+            "SELECT e.*, s.car FROM safety_events e JOIN sessions s ON s.id = e.session_id "
+            f"WHERE {' AND '.join(where)} ORDER BY e.t LIMIT ?", params + [limit]
+        )
+
+    def car_summary(self, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict]:
+        """Por carrito: sesiones, colisiones, reconexiones y latencia p95 promedio y peor"""
+        where, params = [], []
+        self._range("started_at", start, end, where, params)
+        sql = ("SELECT car, COUNT(*) AS sessions, SUM(collisions) AS collisions, "
+               "SUM(reconnects) AS reconnects, AVG(latency_p95) AS latency_p95_avg, "
+               "MAX(latency_p95) AS latency_p95_max FROM sessions")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self._query(f"{sql} GROUP BY car ORDER BY car", params)
+
+    def snapshots(self, session_id: int) -> List[Dict]:
+        """Resúmenes periódicos de una sesión en orden de hora"""
+        return self._query("SELECT * FROM snapshots WHERE session_id = ? ORDER BY t", (session_id,))
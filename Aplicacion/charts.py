@@ -0,0 +1,197 @@
+"""
+Módulo de gráficas de tira (strip charts) para el panel de monitoreo
+
+Las gráficas se dibujan de forma incremental sobre un Canvas de Tk: en cada
+cuadro se desplazan los elementos existentes con un único `move`, se agregan
+solo las columnas nuevas y los segmentos que salen por la izquierda se
+reciclan. Cada columna de píxeles resume todas sus muestras (mínimo, máximo y
+último valor), así que el costo por cuadro no depende de cuántos puntos haya
+en la ventana de tiempo.
+"""
+
+import time
+import tkinter as tk
+from collections import deque
+from typing import Optional
+import config
+
+
+class StripChart:
+    """Gráfica de tira con renderizado incremental sobre un Canvas"""
+    
+    DATA_TAG = "data"
+    
+    def __init__(self, parent, title: str, unit: str, color: str,
+                 y_min: float, y_max: float, hold: bool = False,
+                 window_seconds: Optional[float] = None,
+                 width: Optional[int] = None, height: Optional[int] = None,
+                 canvas=None):
+        """
+        Args:
+            parent: Widget contenedor
+            title: Título mostrado en la esquina superior izquierda
+            unit: Unidad del valor mostrado
+            color: Color de la línea
+            y_min, y_max: Rango fijo del eje vertical (los valores se recortan)
+            hold: Si es True, repite el último valor cuando no llegan muestras (PWM, velocidad)
+            window_seconds: Segundos visibles en la gráfica
+            canvas: Canvas ya creado en lugar de uno nuevo dentro de parent
+        """
+        self.width = width or config.CHART_WIDTH
+        self.height = height or config.CHART_HEIGHT
+        self.window_seconds = window_seconds or config.CHART_WINDOW_SECONDS
+        self.seconds_per_pixel = self.window_seconds / self.width
+        self.y_min = y_min
+        self.y_max = y_max
+        self.unit = unit
+        self.color = color
+        self.hold = hold
+        
+        if canvas is None:
+            canvas = tk.Canvas(
+                parent, width=self.width, height=self.height,
+                bg="#2c3e50", highlightthickness=0
+            )
+            canvas.pack(pady=2)
+        self.canvas = canvas
+        
+        # Elementos estáticos (no se mueven)
+        mid = self.height // 2
+        self.canvas.create_line(0, mid, self.width, mid, fill="#3d566e", dash=(2, 4))
+        self.canvas.create_text(
+            3, 2, text=title, anchor='nw',
+            font=("Arial", 7), fill="#95a5a6"
+        )
+        self.value_text = self.canvas.create_text(
+            self.width - 3, 2, text="", anchor='ne',
+            font=("Arial", 7, "bold"), fill=color
+        )
+        
+        # Estado del renderizado incremental
+        self._items = deque()  # (columna, id del elemento) de izquierda a derecha
+        self._free_items = []  # Elementos fuera de pantalla listos para reutilizar
+        self._pending = []     # Columnas terminadas aún sin dibujar
+        self._open = None      # [columna, mínimo, máximo, último] en acumulación
+        self._rendered_col = None
+        self._prev_col = None
+        self._prev_y = None
+        self._last_value = None
+        self._shown_text = ""
+        # Hasta dónde se leyó el historial: solo lo avanzan las muestras reales, no las
+        # repeticiones de hold (las muestras llegan con la hora del ESP32, antes que ahora)
+        self.consumed_until = 0.0
+        
+        # Métricas de renderizado
+        self.samples = 0  # Muestras reales tomadas del historial
+        self.frames = 0
+        self.render_time_total = 0.0
+        self.items_created = 0
+        
+    def _y(self, value: float) -> float:
+        """Convierte un valor a coordenada vertical del canvas"""
+        span = self.y_max - self.y_min
+        ratio = (value - self.y_min) / span if span else 0.0
+        ratio = min(1.0, max(0.0, ratio))
+        top = 12  # Espacio para el título
+        return self.height - 2 - ratio * (self.height - 2 - top)
+        
+    def add_sample(self, timestamp: float, value: float):
+        """Acumula una muestra en su columna de píxeles"""
+        col = int(timestamp / self.seconds_per_pixel)
+        opened = self._open
+        if opened is None or col > opened[0]:
+            if opened is not None:
+                self._pending.append(opened)
+            self._open = [col, value, value, value]
+        else:
+            # Muestras tardías se integran en la columna abierta
+            if value < opened[1]:
+                opened[1] = value
+            if value > opened[2]:
+                opened[2] = value
+            opened[3] = value
+        self._last_value = value
+        
+    def update(self, history, series: str, now: Optional[float] = None):
+        """
+        Agrega las muestras nuevas de una serie del historial y dibuja un cuadro
+        Args:
+            history: TelemetryHistory
+            series: Nombre de la serie (latency, speed, pwm)
+            now: Tiempo actual (por defecto, time.time())
+        """
+        if now is None:
+            now = time.time()
+        for sample in history.query(series, self.consumed_until, now, resolution=0):
+            if sample[0] > self.consumed_until:
+                self.add_sample(sample[0], sample[3])
+                self.consumed_until = sample[0]
+                self.samples += 1
+        self.render(now)
+            
+    def render(self, now: Optional[float] = None):
+        """Dibuja el cuadro actual tocando solo lo que cambió"""
+        start = time.perf_counter()
+        if now is None:
+            now = time.time()
+        col_now = int(now / self.seconds_per_pixel)
+        
+        if self.hold and self._last_value is not None and (
+                self._open is None or self._open[0] < col_now):
+            self.add_sample(now, self._last_value)
+            
+        # Cerrar la columna abierta si ya pasó su tiempo
+        if self._open is not None and self._open[0] < col_now:
+            self._pending.append(self._open)
+            self._open = None
+            
+        # Desplazar todo lo ya dibujado con una sola llamada
+        if self._rendered_col is None:
+            self._rendered_col = col_now
+        shift = col_now - self._rendered_col
+        if shift > 0:
+            self.canvas.move(self.DATA_TAG, -shift, 0)
+            self._rendered_col = col_now
+            
+        # Reciclar los segmentos que salieron por la izquierda
+        oldest_visible = col_now - self.width
+        while self._items and self._items[0][0] <= oldest_visible:
+            self._free_items.append(self._items.popleft()[1])
+            
+        # Agregar solo las columnas nuevas
+        for col, v_min, v_max, v_last in self._pending:
+            x = self.width - 1 - (col_now - col)
+            y_last = self._y(v_last)
+            if x < 0:
+                self._prev_col, self._prev_y = col, y_last
+                continue
+            if self._prev_col is not None and col - self._prev_col < self.width:
+                prev_x = self.width - 1 - (col_now - self._prev_col)
+                coords = (prev_x, self._prev_y, x, self._y(v_min), x, self._y(v_max), x, y_last)
+            else:
+                coords = (x, self._y(v_min), x, self._y(v_max), x + 1, y_last)
+            if self._free_items:
+                item = self._free_items.pop()
+                self.canvas.coords(item, *coords)
+            else:
+                item = self.canvas.create_line(*coords, fill=self.color, tags=self.DATA_TAG)
+                self.items_created += 1
+            self._items.append((col, item))
+            self._prev_col, self._prev_y = col, y_last
+        self._pending.clear()
+        
+        # Actualizar el texto solo si cambió
+        if self._last_value is not None:
+            text = f"{self._last_value:.1f} {self.unit}"
+            if text != self._shown_text:
+                self.canvas.itemconfig(self.value_text, text=text)
+                self._shown_text = text
+                
+        self.frames += 1
+        self.render_time_total += time.perf_counter() - start
+        
+    def get_average_render_ms(self) -> float:
+        """Tiempo promedio de renderizado por cuadro en ms"""
+        if self.frames == 0:
+            return 0.0
+        return self.render_time_total / self.frames * 1000
@@ -0,0 +1,264 @@
+"""
+Módulo de sincronización de reloj entre la PC y el ESP32
+
+Estima el desfase y la deriva del reloj del ESP32 (millis()) respecto al reloj
+de pared de la PC con intercambios al estilo NTP: la PC envía `TIME?:<n>` y
+anota la hora de envío (t1) y de llegada de la respuesta `TIME:<n>:<millis>`
+(t4). El número empareja cada respuesta con su solicitud: una respuesta que
+llega después del plazo, con la solicitud siguiente ya enviada, tendría un RTT
+falso y muy corto y el ajuste la preferiría.
+
+- Solo los intercambios con menor RTT entran al ajuste: son los que menos
+  retraso asimétrico pueden esconder.
+- El desfase se ajusta como una recta en el tiempo (mínimos cuadrados), cuya
+  pendiente es la deriva del oscilador del ESP32.
+- La cota de error de cada conversión es medio RTT del mejor intercambio más el
+  peor residuo del ajuste y la resolución de millis().
+
+Con el reloj ajustado, cada marca de tiempo del ESP32 (velocidad, logs) se
+convierte a hora de la PC y la latencia de cada intercambio se separa en
+subida (PC → ESP32) y bajada (ESP32 → PC).
+"""
+
+import re
+import time
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple
+import config
+from events import EventBus
+from protocol import TimeReply
+
+
+# Marca de tiempo de los logs del firmware: "[128.345s] ..." (o "[128s] ...")
+_LOG_STAMP = re.compile(r"\[(\d+(?:\.\d+)?)s\]")
+
+_MILLIS_RANGE = 2 ** 32 / 1000.0  # millis() es un unsigned long de 32 bits
+_MILLIS_RESOLUTION = 0.001  # s
+
+
+class ClockExchange:
+    """Un intercambio TIME?/TIME: con sus tres marcas de tiempo"""
+
+    __slots__ = ("host_send", "device_time", "host_receive")
+
+    def __init__(self, host_send: float, device_time: float, host_receive: float):
+        self.host_send = host_send
+        self.device_time = device_time
+        self.host_receive = host_receive
+
+    @property
+    def rtt(self) -> float:
+        return self.host_receive - self.host_send
+
+    @property
+    def host_mid(self) -> float:
+        return (self.host_send + self.host_receive) / 2
+
+
+class ClockSync:
+    """Estimador de desfase y deriva del reloj del ESP32"""
+
+    def __init__(self, window: int = config.CLOCK_SYNC_WINDOW,
+                 best_fraction: float = config.CLOCK_SYNC_BEST_FRACTION):
+        self.exchanges = deque(maxlen=window)
+        self.best_fraction = best_fraction
+        self._lock = threading.Lock()
+
+        # Modelo: reloj_esp32 = hora_pc + offset + drift * (hora_pc - reference)
+        self.reference = 0.0
+        self.offset = 0.0
+        self.drift = 0.0
+        self.error = float("inf")
+        self.synchronized = False
+
+        # Latencia en un solo sentido de los intercambios recientes (s)
+        self.uplink = deque(maxlen=window)
+        self.downlink = deque(maxlen=window)
+
+        self._last_device_time: Optional[float] = None
+        self._wraps = 0
+
+    def reset(self):
+        """Olvida el ajuste (al reconectar el ESP32 puede haberse reiniciado)"""
+        with self._lock:
+            self.exchanges.clear()
+            self.uplink.clear()
+            self.downlink.clear()
+            self.offset = 0.0
+            self.drift = 0.0
+            self.error = float("inf")
+            self.synchronized = False
+            self._last_device_time = None
+            self._wraps = 0
+
+    def unwrap(self, device_time: float) -> float:
+        """Extiende millis() más allá de su desborde de ~49.7 días"""
+        if self._last_device_time is not None:
+            last = self._last_device_time - self._wraps * _MILLIS_RANGE
+            if device_time < last - _MILLIS_RANGE / 2:
+                self._wraps += 1
+        device_time += self._wraps * _MILLIS_RANGE
+        if self._last_device_time is None or device_time > self._last_device_time:
+            self._last_device_time = device_time
+        return device_time
+
+    def add_exchange(self, host_send: float, device_time: float, host_receive: float) -> ClockExchange:
+        """
+        Registra un intercambio y reajusta el modelo
+        Args:
+            host_send: Hora de la PC al enviar TIME? (s)
+            device_time: Reloj del ESP32 en la respuesta (s)
+            host_receive: Hora de la PC al recibir TIME: (s)
+        """
+        with self._lock:
+            exchange = ClockExchange(host_send, self.unwrap(device_time), host_receive)
+            self.exchanges.append(exchange)
+            self._fit()
+            host_time = self._to_host(exchange.device_time)
+            self.uplink.append(host_time - host_send)
+            self.downlink.append(host_receive - host_time)
+        return exchange
+
+    def _fit(self):
+        """Ajusta desfase y deriva con los intercambios de menor RTT"""
+        ranked = sorted(self.exchanges, key=lambda e: e.rtt)
+        best = ranked[:max(2, int(len(ranked) * self.best_fraction))]
+        xs = [e.host_mid for e in best]
+        ys = [e.device_time - e.host_mid for e in best]
+        self.reference = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        spread = sum((x - self.reference) ** 2 for x in xs)
+        # Con pocos segundos de historia la pendiente es puro ruido
+        if len(best) >= 3 and max(xs) - min(xs) >= config.CLOCK_SYNC_MIN_SPAN:
+            self.drift = sum((x - self.reference) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+        else:
+            self.drift = 0.0
+        self.offset = mean_y
+        residual = max(
+            abs(y - (self.offset + self.drift * (x - self.reference))) for x, y in zip(xs, ys)
+        )
+        self.error = ranked[0].rtt / 2 + residual + _MILLIS_RESOLUTION
+        self.synchronized = True
+
+    def _to_host(self, device_time: float) -> float:
+        """Invierte el modelo: hora de la PC para una marca del ESP32"""
+        return (device_time - self.offset + self.drift * self.reference) / (1 + self.drift)
+
+    def to_host_time(self, device_time: float) -> Tuple[float, float]:
+        """
+        Convierte una marca del reloj del ESP32 a hora de la PC
+        Args:
+            device_time: Segundos desde el arranque del ESP32 (millis() / 1000)
+        Returns:
+            Tuple[float, float]: (hora de la PC, cota de error en s)
+        """
+        with self._lock:
+            if not self.synchronized:
+                raise RuntimeError("Reloj del ESP32 aún no sincronizado")
+            return self._to_host(self.unwrap(device_time)), self.error
+
+    def log_time(self, line: str) -> Optional[Tuple[float, float]]:
+        """Hora de la PC y cota de error de una línea de log "[123.456s] ..." """
+        match = _LOG_STAMP.match(line)
+        if match is None or not self.synchronized:
+            return None
+        return self.to_host_time(float(match.group(1)))
+
+    @property
+    def rtt(self) -> float:
+        """RTT mediano de los intercambios recientes (s), 0 si no hay"""
+        with self._lock:
+            rtts = sorted(e.rtt for e in self.exchanges)
+        return rtts[len(rtts) // 2] if rtts else 0.0
+        
+    def get_status(self) -> Dict:
+        """Estado del ajuste para mostrar o publicar"""
+        with self._lock:
+            uplink = list(self.uplink)
+            downlink = list(self.downlink)
+            return {
+                "synchronized": self.synchronized,
+                "offset_ms": self.offset * 1000,
+                "drift_ppm": self.drift * 1e6,
+                "error_ms": self.error * 1000 if self.synchronized else None,
+                "exchanges": len(self.exchanges),
+                "uplink_ms": sum(uplink) / len(uplink) * 1000 if uplink else 0.0,
+                "downlink_ms": sum(downlink) / len(downlink) * 1000 if downlink else 0.0,
+            }
+
+
+class ClockSynchronizer:
+    """Hilo que repite los intercambios TIME?/TIME: mientras hay conexión"""
+
+    def __init__(self, comm, clock: Optional[ClockSync] = None,
+                 interval: float = config.CLOCK_SYNC_INTERVAL,
+                 burst: int = config.CLOCK_SYNC_BURST,
+                 timeout: float = config.CLOCK_SYNC_TIMEOUT):
+        self.comm = comm
+        self.clock = clock or ClockSync()
+        self.interval = interval
+        self.burst = burst  # Intercambios seguidos al conectar para sincronizar rápido
+        self.timeout = timeout
+        self.lost = 0  # Respuestas que no llegaron a tiempo
+        self.stale = 0  # Respuestas descartadas por responder a una solicitud anterior
+
+        self._nonce = 0  # Número de la última solicitud
+        self._reply: Optional[TimeReply] = None
+        self._reply_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._subscription = comm.events.subscribe(EventBus.TIME, self._on_reply, name="clock_sync")
+
+    def _on_reply(self, reply: TimeReply):
+        if reply.nonce is not None and reply.nonce != self._nonce:
+            self.stale += 1  # Llegó tarde: su solicitud ya se dio por perdida
+            return
+        self._reply = reply
+        self._reply_event.set()
+
+    def start(self):
+        """Inicia los intercambios (se llama al conectar)"""
+        self.stop()
+        self.clock.reset()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="clock-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene los intercambios"""
+        self._stop_event.set()
+        self._reply_event.set()  # Despertar una espera de respuesta en curso
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.timeout + 1)
+        self._thread = None
+
+    def exchange(self) -> Optional[ClockExchange]:
+        """Hace un intercambio TIME?/TIME: y lo agrega al estimador"""
+        self._nonce += 1
+        self._reply_event.clear()
+        command = f"{config.CMD_TIME_SYNC}:{self._nonce}" if config.CLOCK_SYNC_NONCE else config.CMD_TIME_SYNC
+        host_send = time.time()
+        if not self.comm.send_command(command):
+            return None
+        if not self._reply_event.wait(self.timeout):
+            self.lost += 1
+            return None
+        if self._stop_event.is_set():
+            return None
+        reply = self._reply
+        return self.clock.add_exchange(host_send, reply.device_time, reply.received_at)
+
+    def _run(self):
+        count = 0
+        while not self._stop_event.is_set() and self.comm.is_connected():
+            self.exchange()
+            count += 1
+            delay = config.CLOCK_SYNC_BURST_INTERVAL if count < self.burst else self.interval
+            if self._stop_event.wait(delay):
+                break
+
+    def close(self):
+        """Detiene el hilo y cancela la suscripción"""
+        self.stop()
+        self.comm.events.unsubscribe(self._subscription)
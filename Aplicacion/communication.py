@@ -5,16 +5,40 @@ Módulo de comunicación WiFi con el ESP32
 import socket
 import time
 import threading
-import json
-from typing import Optional, Callable
+from typing import Optional, Callable, Sequence
 from collections import deque
 import config
+from events import EventBus
+from protocol import (MessageParser, SpeedSample, DistanceSample, MacroProgress, LogBatch, LogEntry,
+                      CollisionAlert, HeartbeatReply, LinkStatus, Ack)
+from clocksync import ClockSynchronizer
+from delivery import DeliveryTracker, command_name, frame_ops
+from heartbeat import LinkWatchdog
+
+# Comandos que se envían aunque repitan el anterior (también dentro de una trama)
+_REPEATABLE = frozenset((config.CMD_STOP, config.CMD_TIME_SYNC, config.CMD_GET_LOGS))
+
+
+def compose_frame(commands: Sequence[str]) -> str:
+    """
+    Une operaciones en una trama compuesta (<op>|<op>|...)
+    Raises:
+        ValueError: Si hay menos de dos o más de FRAME_MAX_OPS operaciones, o alguna
+            no se admite en una trama (el firmware rechazaría la trama entera)
+    """
+    if not 2 <= len(commands) <= config.FRAME_MAX_OPS:
+        raise ValueError(f"Una trama lleva de 2 a {config.FRAME_MAX_OPS} operaciones: {len(commands)}")
+    for command in commands:
+        if (command_name(command) not in config.FRAME_COMMANDS or "#" in command
+                or config.FRAME_SEPARATOR in command):
+            raise ValueError(f"Operación no admitida en una trama: {command!r}")
+    return config.FRAME_SEPARATOR.join(commands)
 
 
 class ESP32Communication:
     """Clase para manejar la comunicación con el ESP32"""
     
-    def __init__(self, monitor=None, collision_callback: Optional[Callable] = None, speed_callback: Optional[Callable] = None, log_callback: Optional[Callable] = None):
+    def __init__(self, monitor=None, collision_callback: Optional[Callable] = None, speed_callback: Optional[Callable] = None, log_callback: Optional[Callable] = None, events: Optional[EventBus] = None):
         self.ip = config.ESP32_IP
         self.port = config.ESP32_PORT
         self.socket: Optional[socket.socket] = None
@@ -22,12 +46,29 @@ class ESP32Communication:
         self.last_command = ""
         self.retry_delay = 0.1
         self.monitor = monitor  # Monitor de estadísticas
-        self.collision_callback = collision_callback  # Callback para colisiones
-        self.speed_callback = speed_callback  # Callback para actualizaciones de velocidad
-        self.log_callback = log_callback  # Callback para logs del ESP32
+        self.events = events or EventBus()  # Bus de eventos para los mensajes entrantes
+        if collision_callback:
+            self.set_collision_callback(collision_callback)
+        if speed_callback:
+            self.set_speed_callback(speed_callback)
+        if log_callback:
+            self.set_log_callback(log_callback)
         self.listen_thread = None
         self.should_listen = False
+        self._send_lock = threading.Lock()  # Los envíos pueden venir de varios hilos (GUI, bus)
         self.esp32_logs = deque(maxlen=10)  # Buffer circular de 10 logs
+        # Logs empujados (LOG:<seq>:<texto>); GET_LOGS queda para reparar huecos
+        self.logs_pushed = False  # El firmware empuja cada entrada
+        self.last_log_seq: Optional[int] = None  # Número de la última entrada recibida
+        self.log_stats = {"pushed": 0, "gaps": 0, "repairs": 0, "lost": 0}
+        self._log_missing_from: Optional[int] = None  # Primer número faltante aún sin reparar
+        self._log_repair_sent: Optional[float] = None  # GET_LOGS de reparación sin respuesta aún
+        self.parser = MessageParser()  # Tabla de despacho de mensajes entrantes
+        self.clock_sync = ClockSynchronizer(self)  # Reloj del ESP32 -> hora de la PC
+        self.clock = self.clock_sync.clock
+        self.link = LinkWatchdog(self) if config.HEARTBEAT_ENABLED else None  # Latidos HB:
+        # Comandos numerados con plazo de confirmación (OK:<seq>)
+        self.delivery = DeliveryTracker(self) if config.RELIABLE_COMMANDS else None
         
     def connect(self) -> bool:
         """
@@ -48,11 +89,18 @@ class ESP32Communication:
             # Notificar al monitor
             if self.monitor:
                 self.monitor.start_connection()
+                
+            # La numeración se reinicia antes de que el hilo de escucha pueda pedir GET_LOGS
+            if self.delivery:
+                self.delivery.start()
             
             # Iniciar hilo de escucha para mensajes entrantes
             self.should_listen = True
             self.listen_thread = threading.Thread(target=self._listen_for_messages, daemon=True)
             self.listen_thread.start()
+            self.clock_sync.start()
+            if self.link:
+                self.link.start()
             
             return True
         except Exception as e:
@@ -64,6 +112,11 @@ class ESP32Communication:
         """Cierra la conexión con el ESP32"""
         try:
             self.should_listen = False  # Detener hilo de escucha
+            self.clock_sync.stop()
+            if self.link:
+                self.link.stop()
+            if self.delivery:
+                self.delivery.stop()
             if self.socket:
                 self.socket.close()
                 self.socket = None
@@ -75,6 +128,8 @@ class ESP32Communication:
     def send_command(self, command: str) -> bool:
         """
         Envía un comando al ESP32
+        Con entrega confiable sale numerado y DeliveryTracker espera su OK:<seq>;
+        la falta de confirmación se informa después, en el monitor
         Args:
             command: Comando a enviar
         Returns:
@@ -87,31 +142,122 @@ class ESP32Communication:
             return False
         
         # Evitar enviar el mismo comando repetidamente
-        if command == self.last_command and command != config.CMD_STOP:
+        if (command == self.last_command
+                and _REPEATABLE.isdisjoint(command_name(op) for op in frame_ops(command))):
             return True
             
+        message = command
         try:
-            message = f"{command}\n"
+            with self._send_lock:
+                if self.delivery and command_name(command) not in config.UNSEQUENCED_COMMANDS:
+                    message = self.delivery.track(command)
             
-            # Registrar envío en el monitor
-            if self.monitor:
-                self.monitor.command_sent(command)
+                # Registrar envío en el monitor
+                if self.monitor:
+                    self.monitor.command_sent(message)
             
-            self.socket.sendall(message.encode())
-            self.last_command = command
-            print(f"→ Comando enviado: {command}")
+                self.socket.sendall(f"{message}\n".encode())
+                self.last_command = command
+            print(f"→ Comando enviado: {message}")
             
             return True
         except Exception as e:
             print(f"✗ Error al enviar comando: {e}")
             self.connected = False
+            if message != command:
+                self.delivery.discard(message)
+            if self.monitor:
+                self.monitor.command_failed()
+            return False
+            
+    def send_frame(self, commands: Sequence[str]) -> bool:
+        """
+        Envía varias operaciones en una sola escritura (p. ej. SPEED_SET:200 y FORWARD)
+        El firmware las aplica juntas, sin que el motor vea un estado intermedio, y la
+        trama se confirma una vez; con COMPOUND_FRAMES = False salen una por una
+        Args:
+            commands: Operaciones en el orden en que se aplican
+        Returns:
+            bool: True si el envío fue exitoso
+        """
+        if len(commands) == 1:
+            return self.send_command(commands[0])
+        if not config.COMPOUND_FRAMES:
+            return all([self.send_command(command) for command in commands])
+        return self.send_command(compose_frame(commands))
+            
+    def retransmit(self, seq: int, message: str) -> bool:
+        """
+        Reenvía un comando numerado sin confirmar (lo llama DeliveryTracker)
+        Returns:
+            bool: False si ya no hace falta (confirmado o reemplazado) o si el envío falló
+        """
+        if not self.connected:
+            return False
+        try:
+            with self._send_lock:
+                # Con el lock de envío: un comando que lo reemplazó no puede haber salido antes
+                if not self.delivery.should_retransmit(seq):
+                    return False
+                self.socket.sendall(f"{message}\n".encode())
+            if self.monitor:
+                self.monitor.command_retransmitted(message)
+            return True
+        except Exception as e:
+            print(f"✗ Error al retransmitir comando: {e}")
+            self.connected = False
             if self.monitor:
                 self.monitor.command_failed()
             return False
     
+    def send_control(self, command: str) -> bool:
+        """
+        Envía un valor del flujo de control continuo (DRIVE:)
+        Sin deduplicación ni impresión: el flujo ya suprime los valores repetidos
+        y el firmware no responde
+        """
+        if not self.connected:
+            return False
+        try:
+            with self._send_lock:
+                self.socket.sendall(f"{command}\n".encode())
+                self.last_command = command
+            if self.monitor:
+                self.monitor.control_sent(command)
+            return True
+        except Exception as e:
+            print(f"✗ Error al enviar control: {e}")
+            self.connected = False
+            if self.monitor:
+                self.monitor.command_failed()
+            return False
+            
+    def send_heartbeat(self, seq: int) -> bool:
+        """Envía un latido HB:<seq> (sin impresión ni deduplicación)"""
+        if not self.connected:
+            return False
+        command = f"{config.CMD_HEARTBEAT}:{seq}"
+        try:
+            with self._send_lock:
+                self.socket.sendall(f"{command}\n".encode())
+            if self.monitor:
+                self.monitor.heartbeat_sent(command)
+            return True
+        except Exception as e:
+            print(f"✗ Error al enviar latido: {e}")
+            self.connected = False
+            if self.monitor:
+                self.monitor.command_failed()
+            return False
+            
     def is_connected(self) -> bool:
         """Verifica si está conectado"""
         return self.connected
+        
+    @property
+    def link_state(self) -> str:
+        """Estado del enlace según los latidos (ok sin latidos habilitados)"""
+        return self.link.state if self.link else LinkStatus.OK
     
     def set_ip(self, ip: str):
         """Actualiza la IP del ESP32"""
@@ -122,24 +268,32 @@ class ESP32Communication:
         self.monitor = monitor
     
     def set_collision_callback(self, callback: Callable):
-        """Asigna un callback para alertas de colisión"""
-        self.collision_callback = callback
+        """Suscribe un callback (sin argumentos) a las alertas de colisión"""
+        return self.events.subscribe(EventBus.COLLISION, lambda alert: callback(),
+                                     name=getattr(callback, "__name__", "collision_callback"))
     
     def set_speed_callback(self, callback: Callable):
-        """Asigna un callback para actualizaciones de velocidad"""
-        self.speed_callback = callback
+        """Suscribe un callback que recibe la velocidad en cm/s"""
+        return self.events.subscribe(EventBus.SPEED, lambda sample: callback(sample.speed),
+                                     name=getattr(callback, "__name__", "speed_callback"))
     
     def set_log_callback(self, callback: Callable):
-        """Asigna un callback para logs del ESP32"""
-        self.log_callback = callback
+        """Suscribe un callback que recibe la lista de logs del ESP32"""
+        return self.events.subscribe(EventBus.ESP32_LOGS, lambda batch: callback(batch.logs),
+                                     name=getattr(callback, "__name__", "log_callback"))
     
     def request_logs(self):
         """Solicita los logs actuales del ESP32"""
-        return self.send_command("GET_LOGS")
+        return self.send_command(config.CMD_GET_LOGS)
+        
+    def request_status(self):
+        """Solicita velocidad y logs del ESP32 con una sola trama (STATUS_QUERY)"""
+        return self.send_frame(config.STATUS_QUERY)
     
     def _listen_for_messages(self):
         """Hilo que escucha mensajes entrantes del ESP32"""
         print("🎧 Hilo de escucha iniciado")
+        self.parser.reset()
         
         while self.should_listen and self.connected:
             try:
@@ -148,48 +302,9 @@ class ESP32Communication:
                     try:
                         data = self.socket.recv(1024)
                         if data:
-                            message = data.decode().strip()
-                            if message:
-                                print(f"← Mensaje recibido: {message}")
-                                
-                                # Registrar en el monitor
-                                if self.monitor:
-                                    self.monitor.response_received(message)
-                                
-                                # Detectar mensaje de velocidad
-                                if message.startswith("SPEED:"):
-                                    try:
-                                        speed_value = float(message.split(":")[1])
-                                        print(f"📊 Velocidad actual: {speed_value:.2f} cm/s")
-                                        if self.speed_callback:
-                                            self.speed_callback(speed_value)
-                                    except (ValueError, IndexError) as e:
-                                        print(f"Error procesando velocidad: {e}")
-                                
-                                # Detectar alerta de colisión
-                                elif "COLISION" in message.upper() or "COLLISION" in message.upper():
-                                    print("⚠️ ¡Alerta de colisión detectada!")
-                                    if self.collision_callback:
-                                        self.collision_callback()
-                                
-                                # Detectar logs del ESP32
-                                elif message.startswith("LOGS:"):
-                                    try:
-                                        json_str = message.split("LOGS:", 1)[1]
-                                        logs_data = json.loads(json_str)
-                                        if "logs" in logs_data:
-                                            # Actualizar buffer de logs
-                                            self.esp32_logs.clear()
-                                            for log in logs_data["logs"]:
-                                                self.esp32_logs.append(log)
-                                            
-                                            # Notificar al callback
-                                            if self.log_callback:
-                                                self.log_callback(list(self.esp32_logs))
-                                            
-                                            print(f"📋 Recibidos {len(self.esp32_logs)} logs del ESP32")
-                                    except (json.JSONDecodeError, IndexError) as e:
-                                        print(f"Error procesando logs: {e}")
+                            # Un recv puede traer varias líneas o una línea partida
+                            for message, parsed in self.parser.feed(data):
+                                self._handle_message(message, parsed)
                     except socket.timeout:
                         continue  # Timeout normal, seguir escuchando
                     except Exception as e:
@@ -202,3 +317,107 @@ class ESP32Communication:
                 break
         
         print("🎧 Hilo de escucha detenido")
+
+    def _handle_message(self, message: str, parsed):
+        """
+        Registra un mensaje recibido y lo publica en el bus
+        Args:
+            message: Línea recibida
+            parsed: Objeto de mensaje creado por el parser (o None si no se reconoció)
+        """
+        # La distancia y los latidos llegan 10 veces por segundo y los logs empujados no responden
+        # a un comando: no se imprimen ni cuentan como respuesta
+        streamed = isinstance(parsed, (DistanceSample, HeartbeatReply, LogEntry))
+        if not streamed:
+            print(f"← Mensaje recibido: {message}")
+        
+        # Registrar en el monitor
+        if self.monitor:
+            if streamed:
+                self.monitor.telemetry_received(message)
+            else:
+                self.monitor.response_received(message)
+        self.events.publish(EventBus.MESSAGE, message)
+        
+        if parsed is None:
+            return
+        if isinstance(parsed, Ack) and parsed.seq is not None:
+            # OK:<seq> es de la entrega confiable: los demás suscriptores esperan OK:<comando>
+            if self.delivery:
+                self.delivery.acknowledge(parsed)
+            return
+        if isinstance(parsed, LogEntry):
+            parsed = self._handle_log_entry(parsed)
+            
+        if isinstance(parsed, (SpeedSample, DistanceSample, MacroProgress)):
+            if parsed.device_time is not None and self.clock.synchronized:
+                parsed.host_time, parsed.time_error = self.clock.to_host_time(parsed.device_time)
+        if isinstance(parsed, SpeedSample):
+            print(f"📊 Velocidad actual: {parsed.speed:.2f} cm/s")
+        elif isinstance(parsed, CollisionAlert):
+            print("⚠️ ¡Alerta de colisión detectada!")
+        elif isinstance(parsed, LogBatch) and not parsed.pushed:
+            if parsed.seq is not None:
+                self._repair_logs(parsed)
+            # Actualizar buffer de logs
+            self.esp32_logs.clear()
+            self.esp32_logs.extend(parsed.logs)
+            parsed.logs = list(self.esp32_logs)
+            if self.clock.synchronized:
+                parsed.host_times = [self.clock.log_time(log) for log in parsed.logs]
+            print(f"📋 Recibidos {len(self.esp32_logs)} logs del ESP32")
+            
+        self.events.publish(parsed.TOPIC, parsed)
+
+    def _handle_log_entry(self, entry: LogEntry) -> LogBatch:
+        """
+        Agrega una entrada empujada al buffer y detecta huecos en la numeración
+        Returns:
+            LogBatch: El buffer completo, como lo entregaría GET_LOGS, marcado como empujado
+        """
+        self.logs_pushed = True
+        self.log_stats["pushed"] += 1
+        last = self.last_log_seq
+        if entry.seq > (0 if last is None else last) + 1:
+            # Faltan entradas (p. ej. las registradas sin conexión): pedir el buffer
+            self.log_stats["gaps"] += 1
+            if self._log_missing_from is None:
+                self._log_missing_from = 1 if last is None else last + 1
+            self._request_log_repair()
+        self.last_log_seq = entry.seq  # Un número menor es un reinicio del ESP32
+        self.esp32_logs.append(entry.text)
+        batch = LogBatch(list(self.esp32_logs), entry.received_at, entry.seq, pushed=True)
+        if self.clock.synchronized:
+            batch.host_times = [self.clock.log_time(log) for log in batch.logs]
+        return batch
+        
+    def _request_log_repair(self):
+        """Pide GET_LOGS salvo que ya haya uno en camino"""
+        # La respuesta pendiente sale después de la entrada que delató el hueco: también lo cubre
+        now = time.monotonic()
+        if self._log_repair_sent is not None and now - self._log_repair_sent < config.LOG_REPAIR_TIMEOUT:
+            return
+        self._log_repair_sent = now
+        self.log_stats["repairs"] += 1
+        self.request_logs()
+        
+    def _repair_logs(self, batch: LogBatch):
+        """Cierra los huecos con la respuesta de GET_LOGS (trae las últimas entradas)"""
+        last = self.last_log_seq
+        missing_from = self._log_missing_from
+        if last is not None and batch.seq > last:  # Se perdieron las últimas entradas empujadas
+            self.log_stats["gaps"] += 1
+            if missing_from is None:
+                missing_from = last + 1
+        if missing_from is not None:
+            # Lo que ya salió del buffer circular del ESP32 no se puede recuperar
+            oldest = batch.seq - len(batch.logs) + 1
+            self.log_stats["lost"] += max(0, min(oldest, batch.seq + 1) - missing_from)
+        self._log_missing_from = None
+        self._log_repair_sent = None
+        # TCP mantiene el orden: todo lo empujado hasta batch.seq ya llegó
+        self.last_log_seq = batch.seq
+        
+    def get_log_status(self) -> dict:
+        """Estado de los logs empujados y de la reparación de huecos"""
+        return dict(self.log_stats, logs_pushed=self.logs_pushed, last_seq=self.last_log_seq)
@@ -2,14 +2,26 @@
 Configuración del sistema de control remoto
 """
 
+import os
+
 # Configuración de red
 ESP32_IP = "192.168.4.1"  # IP del ESP32 (por defecto en modo AP)
 ESP32_PORT = 80  # Puerto del servidor en el ESP32
 
+# Descubrimiento del ESP32 en una red compartida (router)
+DISCOVERY_ENABLED = os.getenv("DISCOVERY_ENABLED", "1") == "1"
+DISCOVERY_SUBNET = os.getenv("ESP32_SUBNET", "")  # p. ej. "192.168.1.0/24"; vacío = /24 de la PC
+DISCOVERY_CONCURRENCY = 128  # Sondeos TCP simultáneos
+DISCOVERY_TIMEOUT = 0.5  # s - Conexión más respuesta a GET_SPEED por dirección
+DISCOVERY_UDP_PORT = 4210  # Anuncio por broadcast: "CARRITO?" -> "CARRITO:<puerto>:<nombre>"
+DISCOVERY_ANNOUNCE_TIMEOUT = 0.3  # s - Espera de respuestas al broadcast
+DISCOVERY_CACHE_FILE = "discovery_cache.json"  # Última dirección conocida
+DISCOVERY_CACHE_TTL = 24 * 3600  # s - Validez de la dirección guardada
+
 # Configuración de la interfaz
 WINDOW_TITLE = "Control Remoto - Carrito ESP32"
 WINDOW_WIDTH = 700  # Aumentado para el panel de monitoreo
-WINDOW_HEIGHT = 700
+WINDOW_HEIGHT = 800  # Aumentado para las gráficas en tiempo real
 BACKGROUND_COLOR = "#2c3e50"
 
 # Colores de botones
@@ -24,11 +36,37 @@ CMD_LEFT = "LEFT"
 CMD_RIGHT = "RIGHT"
 CMD_STOP = "STOP"
 
+# Sincronización de reloj
+CMD_TIME_SYNC = "TIME?"
+
+# Logs del ESP32: el firmware empuja cada entrada (LOG:<seq>:<texto>) y GET_LOGS repara huecos
+CMD_GET_LOGS = "GET_LOGS"
+LOG_POLL_INTERVAL = 5000  # ms - Consulta periódica con firmware que no empuja logs
+LOG_REPAIR_INTERVAL = 30000  # ms - Consulta de respaldo con logs empujados (pérdidas al final)
+LOG_REPAIR_TIMEOUT = 2.0  # s - Sin respuesta a un GET_LOGS de reparación, se vuelve a pedir
+LOG_SAVE_INTERVAL = 5000  # ms - Guardado de esp32_logs.json si llegaron logs (no uno por cada LOG:)
+
+# Maniobras ejecutadas en el carrito (MACRO:<id>:<cmd>,<pwm>,<ms>;...)
+CMD_MACRO = "MACRO"
+MACRO_COMMANDS = (CMD_FORWARD, CMD_BACKWARD, CMD_LEFT, CMD_RIGHT, CMD_STOP)
+MACRO_MAX_STEPS = 16  # Tamaño del arreglo de pasos en el firmware
+MACRO_MAX_STEP_DURATION = 60.0  # s - Duración máxima de un paso
+
 # Comandos de velocidad
 CMD_SPEED_LOW = "SPEED_LOW"
 CMD_SPEED_HIGH = "SPEED_HIGH"
 CMD_SPEED_UP = "SPEED_UP"
 CMD_SPEED_DOWN = "SPEED_DOWN"
+CMD_GET_SPEED = "GET_SPEED"
+
+# Control proporcional continuo (DRIVE:<acelerador>:<giro>, PWM -255..255)
+CMD_DRIVE = "DRIVE"
+CONTROL_PROPORTIONAL = True  # Palanca y teclado proporcionales en lugar de tres posiciones
+CONTROL_RATE_HZ = 20  # Muestras por segundo del flujo de control
+CONTROL_DEADBAND = 8  # PWM - Cambio mínimo para volver a enviar
+CONTROL_DEADZONE = 0.05  # Fracción del eje que cuenta como centro
+CONTROL_RAMP_RATE = 1.5  # Escala completa por segundo con la tecla presionada
+CONTROL_RETURN_RATE = 4.0  # Escala por segundo con que el giro vuelve al centro
 
 # Velocidades (valores PWM 0-255)
 SPEED_LOW = 150
@@ -39,13 +77,120 @@ SPEED_STEP = 25  # Incremento/decremento por paso
 
 # Configuración de monitoreo
 STATS_UPDATE_INTERVAL = 500  # ms - Intervalo de actualización de estadísticas
+STATS_IDLE_INTERVAL = 2000  # ms - Conectado sin conducir
+STATS_HIDDEN_INTERVAL = 5000  # ms - Ventana minimizada (tablero y catálogo siguen al día)
 LOG_MAX_LINES = 10  # Número máximo de líneas en el log
 LATENCY_WARNING_MS = 100  # ms - Umbral de advertencia de latencia
 PACKET_LOSS_WARNING = 5  # % - Umbral de advertencia de pérdida de paquetes
 
+# Gráficas en tiempo real
+CHART_REFRESH_INTERVAL = 50  # ms - 20 cuadros por segundo
+CHART_IDLE_INTERVAL = 250  # ms - Conectado sin conducir (con la ventana oculta no se dibuja)
+CHART_WINDOW_SECONDS = 30  # s - Tiempo visible en cada gráfica
+CHART_WIDTH = 300  # px
+CHART_HEIGHT = 55  # px
+CHART_LATENCY_MAX_MS = 300  # ms - Tope del eje de RTT
+
+# Tareas periódicas del controlador (rueda de temporización, un solo temporizador)
+TASK_WHEEL_TICK = 50  # ms - Las tareas que vencen en el mismo tick corren en un solo despertar
+TASK_WHEEL_SLOTS = 256  # Ranuras de la rueda (una vuelta = 12.8 s)
+ACTIVITY_IDLE_AFTER = 5.0  # s - Sin conducir este tiempo, las tareas pasan al ritmo de reposo
+
+# Historial de telemetría (memoria acotada)
+TELEMETRY_RAW_SECONDS = 60  # s - Muestras crudas retenidas
+TELEMETRY_RAW_CAPACITY = 4096  # Máximo de muestras crudas por serie
+TELEMETRY_ROLLUP_LEVELS = [  # (resolución en s, cantidad de cubetas)
+    (1, 3600),      # 1 s durante 1 hora
+    (60, 1440),     # 1 min durante 24 horas
+    (3600, 720),    # 1 h durante 30 días
+]
+TELEMETRY_STAGING_CAPACITY = 1024  # Muestras por hilo escritor a la espera de agregarse
+
+# Tablero web en la red local (opcional)
+DASHBOARD_ENABLED = os.getenv("DASHBOARD_ENABLED", "0") == "1"
+DASHBOARD_HOST = "0.0.0.0"  # Escuchar en todas las interfaces de la LAN
+DASHBOARD_PORT = 8080
+DASHBOARD_QUEUE_SIZE = 100  # Mensajes pendientes por visor antes de descartar
+DASHBOARD_SEND_BUFFER = 32768  # bytes - Buffer de envío por visor
+
+# Sincronización de reloj con el ESP32 (intercambios TIME?/TIME:)
+CLOCK_SYNC_INTERVAL = 5.0  # s - Entre intercambios una vez sincronizado
+CLOCK_SYNC_BURST = 8  # Intercambios seguidos al conectar
+CLOCK_SYNC_BURST_INTERVAL = 0.1  # s - Entre intercambios de la ráfaga inicial
+CLOCK_SYNC_TIMEOUT = 1.0  # s - Espera máxima de cada respuesta TIME:
+CLOCK_SYNC_NONCE = True  # TIME?:<n> -> TIME:<n>:<millis>; False con firmware anterior, que solo entiende TIME?
+CLOCK_SYNC_WINDOW = 32  # Intercambios recientes considerados
+CLOCK_SYNC_BEST_FRACTION = 0.5  # Fracción de menor RTT usada en el ajuste
+CLOCK_SYNC_MIN_SPAN = 10.0  # s - Historia mínima para estimar la deriva
+
+# Latidos de la aplicación (HB:<seq>) para detectar un enlace muerto
+HEARTBEAT_ENABLED = True
+CMD_HEARTBEAT = "HB"
+HEARTBEAT_INTERVAL = 0.1  # s - Entre latidos; el ESP32 responde cada uno con HB:<seq>
+HEARTBEAT_DEGRADED_AFTER = 0.25  # s - Sin respuesta: enlace degradado
+HEARTBEAT_LOST_AFTER = 0.5  # s - Sin respuesta: enlace perdido (se neutraliza el control)
+HEARTBEAT_DEADMAN_TIMEOUT = 0.5  # s - El firmware detiene los motores sin latidos de la PC
+
+# Entrega confiable de comandos (<comando>#<seq>; el firmware confirma con OK:<seq>)
+RELIABLE_COMMANDS = True  # False con firmware anterior, que no entiende el número de secuencia
+UNSEQUENCED_COMMANDS = (CMD_TIME_SYNC,)  # TIME? mide su propio RTT con la respuesta TIME:
+ACK_DEADLINES = {  # s - Plazo de confirmación por tipo (nombre antes de ':')
+    CMD_STOP: 0.15,
+    CMD_FORWARD: 0.2, CMD_BACKWARD: 0.2, CMD_LEFT: 0.2, CMD_RIGHT: 0.2,
+    "SPEED_SET": 0.3, CMD_SPEED_LOW: 0.3, CMD_SPEED_HIGH: 0.3,
+    CMD_GET_SPEED: 0.5, CMD_GET_LOGS: 1.0, CMD_MACRO: 0.5,
+}
+ACK_DEADLINE_DEFAULT = 0.3  # s - Comandos sin plazo propio
+ACK_RTT_FACTOR = 3.0  # El plazo nunca es menor que este múltiplo del RTT suavizado de las confirmaciones
+ACK_MAX_RETRIES = 2  # Retransmisiones de un comando idempotente antes de darlo por perdido
+# Repetirlos deja el carrito igual (el firmware además descarta los números ya ejecutados);
+# MACRO: reinicia la maniobra y no se retransmite
+IDEMPOTENT_COMMANDS = (CMD_STOP, CMD_FORWARD, CMD_BACKWARD, CMD_LEFT, CMD_RIGHT,
+                       "SPEED_SET", CMD_SPEED_LOW, CMD_SPEED_HIGH, CMD_GET_SPEED, CMD_GET_LOGS)
+
+# Tramas compuestas (<op>|<op>|...): una sola escritura que el firmware valida entera,
+# aplica en la misma vuelta de loop() y confirma una vez
+COMPOUND_FRAMES = True  # False con firmware anterior: las operaciones salen por separado
+FRAME_SEPARATOR = "|"
+FRAME_MAX_OPS = 4  # MAX_OPS_TRAMA en el firmware
+# Estado y consultas; MACRO:, DRIVE:, HB: y TIME? siguen saliendo solos
+FRAME_COMMANDS = (CMD_FORWARD, CMD_BACKWARD, CMD_LEFT, CMD_RIGHT, CMD_STOP,
+                  "SPEED_SET", CMD_SPEED_LOW, CMD_SPEED_HIGH, CMD_GET_SPEED, CMD_GET_LOGS)
+STATUS_QUERY = (CMD_GET_SPEED, CMD_GET_LOGS)  # Consulta periódica de estado en una sola trama
+
+# Estimador de tiempo hasta la colisión (TTC) con la distancia del ultrasónico
+TTC_GUARD_ENABLED = True
+TTC_WINDOW = 6  # Lecturas recientes en la tendencia (~0.6 s a 10 Hz)
+TTC_MIN_SAMPLES = 3  # Lecturas mínimas para confiar en la tendencia
+TTC_MAX_RANGE = 400.0  # cm - Alcance útil del HC-SR04; más lejos no es confiable
+TTC_OUTLIER_DISTANCE = 25.0  # cm - Lectura fuera de la tendencia (eco espurio o sin eco)
+TTC_OUTLIER_CONFIRM = 3  # Lecturas consecutivas que confirman un cambio real de distancia
+TTC_STOP_BUDGET = 0.6  # s - TTC bajo el cual se envía STOP
+TTC_SLOW_BUDGET = 1.5  # s - TTC bajo el cual se reduce la velocidad
+TTC_SLOW_FACTOR = 0.5  # Fracción del PWM actual al reducir
+TTC_COLLISION_DISTANCE = 15.0  # cm - Distancia considerada colisión
+TTC_ACTUATION_DELAY = 0.03  # s - loop() del firmware + respuesta del puente H
+TTC_MIN_CLOSING_SPEED = 5.0  # cm/s - Por debajo, no hay acercamiento real
+TTC_REARM_SPEED = 2.0  # cm/s - Por debajo, se vuelve a armar tras un STOP
+TTC_SPEED_MAX_AGE = 1.5  # s - Antigüedad máxima de la velocidad del MPU6050
+
+# Grabación de sesiones para análisis de frenado
+SESSIONS_DIR = "sessions"  # Un archivo JSON por líneas por conexión
+SESSION_FLUSH_INTERVAL = 2.0  # s - Cada cuánto se vacía a disco
+ARCHIVE_CODEC = "zlib"  # Archivo comprimido por bloques (archive.py): "zlib" o "lzma"
+ARCHIVE_LEVEL = 6  # Nivel de compresión (0-9)
+ARCHIVE_CHUNK_RECORDS = 2048  # Registros por bloque
+CATALOG_ENABLED = os.getenv("CAR_CATALOG", "1") == "1"  # Catálogo SQLite de sesiones
+CATALOG_FILE = os.getenv("CAR_CATALOG_FILE", os.path.join(SESSIONS_DIR, "sessions.db"))  # Junto a las sesiones
+CATALOG_BATCH_SIZE = 500  # Filas máximas por transacción del escritor
+CATALOG_FLUSH_INTERVAL = 1.0  # s - Espera máxima para juntar filas
+CATALOG_SNAPSHOT_INTERVAL = 5.0  # s - Cada cuánto se guarda el resumen del monitor
+ANALYSIS_MAX_BRAKE_SECONDS = 5.0  # s - Frenado gradual y detención del mismo episodio
+ANALYSIS_FALSE_STOP_WINDOW = 1.0  # s - "Zona segura" tan pronto indica lectura espuria
+ANALYSIS_SPEED_BINS = [0, 10, 20, 40, 60, 80, 120, 200]  # cm/s - Rangos de aproximación
+
 # Configuración de Twilio (SMS)
 # Cargar desde variables de entorno por seguridad
-import os
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID", "")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN", "")
 TWILIO_PHONE_FROM = os.getenv("TWILIO_PHONE_FROM", "")
@@ -53,3 +198,33 @@ TWILIO_PHONE_TO = os.getenv("TWILIO_PHONE_TO", "")
 
 # Configuración de alertas
 COLLISION_COOLDOWN = 10  # Segundos entre notificaciones de colisión
+SAFETY_JOURNAL_MAX_BYTES = 2 * 1024 * 1024  # Al pasarlo, el diario de seguridad rota a <archivo>.1
+
+# Motor de alertas (alerts.py): resúmenes por ventana en lugar de un SMS por evento
+ALERT_OUTBOX_FILE = "alert_outbox.json"  # Bandeja de salida persistente
+ALERT_DIGEST_WINDOW = 30.0  # s - Eventos del mismo tipo que van en un solo SMS
+ALERT_ESCALATE_COUNT = 5  # Eventos en la ventana que vuelven crítico el resumen
+ALERT_ESCALATE_DISTANCE = 5.0  # cm - Distancia que vuelve crítico el resumen
+ALERT_ESCALATION_PHONES = [phone for phone in os.getenv("ALERT_ESCALATION_PHONES", "").split(",") if phone]
+ALERT_BUCKET_CAPACITY = 3  # SMS seguidos por destinatario
+ALERT_BUCKET_REFILL = 120.0  # s - Tiempo para recuperar un SMS
+ALERT_RETRY_INTERVAL = 15.0  # s - Primer reintento tras un envío fallido (luego se duplica)
+ALERT_RETRY_MAX = 300.0  # s - Espera máxima entre reintentos
+ALERT_TICK_INTERVAL = 1.0  # s - Cada cuánto se cierran ventanas y se envía
+
+# Arranque en frío (presupuestos que vigila `python benchmarks.py startup`)
+STARTUP_IMPORT_BUDGET_MS = 80  # Mediana de `import controller` (acumulado de -X importtime)
+STARTUP_FIRST_FRAME_BUDGET_MS = 300  # Desde el inicio del proceso hasta el primer cuadro
+
+# Modo de dos procesos: comunicación, monitor y seguridad fuera del proceso de la GUI
+WORKER_PROCESS_ENABLED = os.getenv("WORKER_PROCESS_ENABLED", "0") == "1"
+WORKER_RING_SLOTS = 512  # Eventos en tránsito hacia la GUI antes de descartar
+WORKER_RING_SLOT_SIZE = 4096  # bytes por evento serializado
+WORKER_POLL_INTERVAL = 0.002  # s - Espera de la GUI con el anillo vacío
+WORKER_STATE_INTERVAL = 0.25  # s - Entre instantáneas de estadísticas del trabajador
+WORKER_CONNECT_TIMEOUT = 8.0  # s - Espera de la respuesta a "connect"
+
+# Bloque de estado en un archivo mapeado en memoria para otras herramientas de la PC
+# (opcional: CAR_STATE_BLOCK=1 lo activa, CAR_STATE_FILE elige la ruta que abrirán los lectores)
+STATE_BLOCK_ENABLED = os.getenv("CAR_STATE_BLOCK", "0") == "1"
+STATE_BLOCK_FILE = os.getenv("CAR_STATE_FILE", "car_state.bin")
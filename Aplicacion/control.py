@@ -0,0 +1,252 @@
+"""
+Módulo de control proporcional continuo
+
+El acelerador y el giro son ejes de -1 a 1 que se mueven con el mouse (posición
+absoluta de la palanca) o con el teclado (rampa mientras la tecla está
+presionada). Los eventos de entrada solo actualizan la posición; un hilo toma
+una muestra a CONTROL_RATE_HZ y envía DRIVE:<acelerador>:<giro> en PWM
+(-255..255) solo si algún eje se movió más que CONTROL_DEADBAND:
+
+- gana el último valor: mil eventos entre dos muestras son un solo envío
+- el ancho de banda queda acotado por la frecuencia, no por la entrada
+- volver a cero (detener o centrar) se envía siempre
+"""
+
+import time
+import threading
+from array import array
+from typing import Callable, Dict, Optional, Tuple
+import config
+
+
+def _clamp(value: float) -> float:
+    return max(-1.0, min(1.0, value))
+
+
+class ControlInput:
+    """Posición de los ejes de control, actualizada por la GUI"""
+
+    THROTTLE = "throttle"
+    STEERING = "steering"
+
+    def __init__(self, ramp_rate: float = config.CONTROL_RAMP_RATE,
+                 return_rate: float = config.CONTROL_RETURN_RATE):
+        """
+        Args:
+            ramp_rate: Escala completa por segundo con una tecla presionada
+            return_rate: Velocidad con que el giro vuelve al centro al soltar
+        """
+        self.ramp_rate = ramp_rate
+        self.return_rate = return_rate
+        self.throttle = 0.0
+        self.steering = 0.0
+        self.events = 0  # Eventos de entrada recibidos
+        self._held: Dict[str, int] = {self.THROTTLE: 0, self.STEERING: 0}
+        self._returning = False  # Giro volviendo al centro tras soltar la tecla
+        self._last_sample: Optional[float] = None
+
+    def set_axes(self, throttle: float, steering: float):
+        """Posición absoluta (palanca con el mouse)"""
+        self.throttle = _clamp(throttle)
+        self.steering = _clamp(steering)
+        self._returning = False
+        self.events += 1
+
+    def hold(self, axis: str, direction: int):
+        """Tecla presionada (+1 / -1) o soltada (0) sobre un eje"""
+        self._held[axis] = direction
+        if axis == self.STEERING:
+            self._returning = direction == 0
+        self.events += 1
+
+    def neutral(self):
+        """Acelerador en cero y giro al centro (freno)"""
+        self._held = {self.THROTTLE: 0, self.STEERING: 0}
+        self.throttle = 0.0
+        self.steering = 0.0
+
+    def sample(self, now: float) -> Tuple[float, float]:
+        """Avanza las rampas del teclado hasta ahora y devuelve (acelerador, giro)"""
+        dt = 0.0 if self._last_sample is None else now - self._last_sample
+        self._last_sample = now
+        held_throttle = self._held[self.THROTTLE]
+        if held_throttle:
+            self.throttle = _clamp(self.throttle + held_throttle * self.ramp_rate * dt)
+        held_steering = self._held[self.STEERING]
+        if held_steering:
+            self.steering = _clamp(self.steering + held_steering * self.ramp_rate * dt)
+        elif self._returning:
+            # El giro vuelve solo al centro; el acelerador se queda donde quedó
+            step = self.return_rate * dt
+            if abs(self.steering) <= step:
+                self.steering = 0.0
+                self._returning = False
+            else:
+                self.steering -= step if self.steering > 0 else -step
+        return self.throttle, self.steering
+
+
+class ControlStreamer:
+    """Envía la posición de los ejes a frecuencia fija con supresión de deltas"""
+
+    INTERVAL_HISTORY = 256
+
+    def __init__(self, send: Callable[[str], bool], control_input: Optional[ControlInput] = None,
+                 rate: float = config.CONTROL_RATE_HZ, deadband: int = config.CONTROL_DEADBAND,
+                 on_frame: Optional[Callable[[int, int], None]] = None):
+        """
+        Args:
+            send: Envía una línea al ESP32 (ESP32Communication.send_control)
+            control_input: Ejes a muestrear (por defecto uno nuevo)
+            rate: Muestras por segundo
+            deadband: Cambio mínimo en PWM para volver a enviar
+            on_frame: Se llama con (acelerador, giro) en PWM después de cada envío
+        """
+        self.send = send
+        self.input = control_input or ControlInput()
+        self.period = 1.0 / rate
+        self.deadband = deadband
+        self.on_frame = on_frame
+
+        self._sent = (0, 0)  # Último valor enviado (PWM)
+        self._lock = threading.Lock()  # Muestra y envío contra neutral() y limit_throttle() de otros hilos
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Métricas
+        self._intervals = array("d", [0.0] * self.INTERVAL_HISTORY)
+        self._interval_count = 0
+        self._last_tick: Optional[float] = None
+        self.ticks = 0
+        self.frames_sent = 0
+        self.suppressed = 0
+        self.bytes_sent = 0
+        self.driving_bytes = 0
+        self.driving_time = 0.0  # s con el carrito en movimiento según lo enviado
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._last_tick = None
+        self._thread = threading.Thread(target=self._run, name="control-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def neutral(self):
+        """El carrito ya recibió STOP: ejes a cero sin volver a enviar"""
+        with self._lock:
+            self.input.neutral()
+            self._sent = (0, 0)
+            
+    def limit_throttle(self, factor: float) -> Optional[int]:
+        """
+        Frenado parcial (TTC): reduce el acelerador y envía el valor reducido ya
+        El eje queda reducido: la próxima muestra sigue desde ahí en lugar de
+        devolverle al carrito el valor anterior
+        Returns:
+            Optional[int]: PWM aplicado, o None si el flujo no estaba acelerando
+        """
+        with self._lock:
+            throttle, steering = self._sent
+            if throttle == 0:
+                return None
+            self.input.throttle = _clamp(self.input.throttle * factor)
+            limited = int(throttle * factor)
+            if not self._transmit((limited, steering)):
+                return None
+            return abs(limited)
+
+    def _run(self):
+        # Plazos absolutos: el error de un ciclo no se acumula en los siguientes
+        deadline = time.perf_counter()
+        while True:
+            deadline += self.period
+            wait = deadline - time.perf_counter()
+            if self._stop.wait(max(0.0, wait)):
+                return
+            now = time.perf_counter()
+            if now - deadline > self.period:
+                deadline = now  # Atrasado más de un ciclo: no enviar en ráfaga para ponerse al día
+            self.tick(now)
+
+    @staticmethod
+    def to_pwm(throttle: float, steering: float) -> Tuple[int, int]:
+        """Ejes (-1..1) a PWM con signo, con zona muerta alrededor del centro"""
+        deadzone = config.CONTROL_DEADZONE
+        pwm_throttle = 0 if abs(throttle) < deadzone else round(throttle * config.SPEED_MAX)
+        pwm_steering = 0 if abs(steering) < deadzone else round(steering * 255)
+        return pwm_throttle, pwm_steering
+
+    def _changed(self, value: Tuple[int, int]) -> bool:
+        sent = self._sent
+        if value == sent:
+            return False
+        for new, old in zip(value, sent):
+            if new != old and (new == 0 or abs(new - old) >= self.deadband):
+                return True  # Volver a cero siempre se envía
+        return False
+
+    def tick(self, now: float):
+        """Una muestra: envía el valor actual si cambió lo suficiente"""
+        if self._last_tick is not None:
+            interval = now - self._last_tick
+            self._intervals[self._interval_count % self.INTERVAL_HISTORY] = interval
+            self._interval_count += 1
+            if self._sent != (0, 0):
+                self.driving_time += interval
+        self._last_tick = now
+        self.ticks += 1
+
+        with self._lock:
+            value = self.to_pwm(*self.input.sample(now))
+            if not self._changed(value):
+                self.suppressed += 1
+                return
+            self._transmit(value)
+            
+    def _transmit(self, value: Tuple[int, int]) -> bool:
+        """Envía DRIVE con el valor y lo anota como el último enviado (con el lock tomado)"""
+        frame = f"{config.CMD_DRIVE}:{value[0]}:{value[1]}"
+        if not self.send(frame):
+            return False
+        size = len(frame) + 1
+        self.frames_sent += 1
+        self.bytes_sent += size
+        if value != (0, 0) or self._sent != (0, 0):
+            self.driving_bytes += size
+        self._sent = value
+        if self.on_frame:
+            self.on_frame(*value)
+        return True
+
+    def get_metrics(self) -> Dict:
+        """Frecuencia real, jitter del ciclo y ancho de banda del flujo"""
+        count = min(self._interval_count, self.INTERVAL_HISTORY)
+        intervals = self._intervals[:count]
+        if count:
+            mean = sum(intervals) / count
+            jitter = (sum((x - mean) ** 2 for x in intervals) / count) ** 0.5
+            worst = max(abs(x - self.period) for x in intervals)
+        else:
+            mean = jitter = worst = 0.0
+        return {
+            "rate_hz": 1.0 / mean if mean else 0.0,
+            "jitter_ms": jitter * 1000,
+            "max_deviation_ms": worst * 1000,
+            "ticks": self.ticks,
+            "frames_sent": self.frames_sent,
+            "suppressed": self.suppressed,
+            "input_events": self.input.events,
+            "bytes_sent": self.bytes_sent,
+            "bytes_per_s": self.driving_bytes / self.driving_time if self.driving_time else 0.0,
+        }
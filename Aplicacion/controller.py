@@ -5,56 +5,224 @@ Módulo controlador principal que coordina la GUI y la comunicación
 import config
 import json
 import os
+import threading
 from datetime import datetime
+from typing import Optional
 from communication import ESP32Communication
 from gui import ControlGUI
 from monitoring import CommunicationMonitor
 from notifications import TwilioNotifier
+from alerts import AlertEngine
+from telemetry import TelemetryHistory
+from events import EventBus, Subscription
+from protocol import SpeedSample, LogBatch, CollisionAlert, MacroProgress, LinkStatus
+from safetylog import SafetyEvent, SafetyJournal, SafetyLogIndex
+from sessions import SessionRecorder
+from catalog import SessionCatalog
+from ttc import CollisionGuard, TTCDecision, TTCEstimator
+from maneuvers import ManeuverExecutor, ManeuverRun, ManeuverStep
+from control import ControlStreamer
+from stateblock import StateBlockWriter
+from scheduler import SYSTEM_CLOCK, TaskWheel, TkScheduler
 
 
 class CarController:
     """Controlador principal del sistema de control remoto"""
     
     LOG_FILE = "esp32_logs.json"  # Archivo donde se guardan los logs
+    SAFETY_JOURNAL_FILE = "safety_events.jsonl"  # Diario de eventos de seguridad
     
-    def __init__(self):
-        self.monitor = CommunicationMonitor()
-        self.comm = ESP32Communication(
-            monitor=self.monitor, 
-            collision_callback=self._handle_collision_alert,
-            speed_callback=self._handle_speed_update,
-            log_callback=self._handle_esp32_logs
-        )
-        self.notifier = TwilioNotifier()  # Sistema de notificaciones
+    def __init__(self, clock=SYSTEM_CLOCK):
+        """
+        Args:
+            clock: Fuente de la hora del monitor, las alertas y el planificador
+        """
+        self.clock = clock
+        self.events = EventBus()  # Mensajes del ESP32 para todos los consumidores
+        if config.WORKER_PROCESS_ENABLED:
+            # Comunicación, monitor y seguridad en otro proceso: una GUI trabada no retrasa el STOP
+            from worker import RemoteCommunication
+            self.comm = RemoteCommunication(events=self.events, on_ttc_decision=self._handle_ttc_decision)
+            self.monitor = self.comm.monitor
+        else:
+            self.monitor = CommunicationMonitor(clock=clock)
+            self.comm = ESP32Communication(monitor=self.monitor, events=self.events)
+        self.discovery = None  # IP en un router compartido (se crea tras la primera pintura)
+        self._connecting = False  # Búsqueda y connect() en curso (en segundo plano)
+        self.notifier = TwilioNotifier(clock=clock)  # Sistema de notificaciones (cliente perezoso)
+        # Resúmenes de alertas por ventana con bandeja persistente (envía en su propio hilo)
+        self.alerts = AlertEngine(self.notifier, clock=clock, on_sent=self._alert_sent)
+        self.alerts.start()
+        self.last_distance: Optional[float] = None  # cm, para la distancia mínima de los resúmenes
+        self.recorder = SessionRecorder()  # Grabación de la sesión para análisis
+        # Resumen del monitor, colisiones, reconexiones y eventos de cada sesión en SQLite
+        self.catalog = SessionCatalog() if config.CATALOG_ENABLED else None
+        self.catalog_session: Optional[int] = None
+        self._last_catalog_snapshot = 0.0
+        self.dashboard = None  # Tablero web opcional para visores en la LAN
+        if config.DASHBOARD_ENABLED:
+            from dashboard import TelemetryDashboard  # asyncio solo si hay tablero
+            self.dashboard = TelemetryDashboard()
+            self.dashboard.start()
+        self.control = None  # Flujo de control proporcional (DRIVE:)
+        if config.CONTROL_PROPORTIONAL:
+            self.control = ControlStreamer(self.comm.send_control, on_frame=self._record_drive)
+        self._drive_direction = config.CMD_STOP
+        self._moving = False  # El último comando de manejo no fue STOP
+        # Último estado en un archivo mapeado para el registrador, la superposición de video...
+        self.state_block = StateBlockWriter(config.STATE_BLOCK_FILE) if config.STATE_BLOCK_ENABLED else None
         self.gui = ControlGUI(
             on_direction_callback=self.handle_direction,
             on_speed_callback=self.handle_speed,
             on_connect_callback=self.handle_connect,
-            on_disconnect_callback=self.handle_disconnect
+            on_disconnect_callback=self.handle_disconnect,
+            on_axes_callback=self.handle_axes if self.control else None,
+            on_ramp_callback=self.handle_ramp if self.control else None,
+            on_ready_callback=self._warm_up,
+            on_visibility_callback=self._handle_visibility
         )
+        self.scheduler = TkScheduler(self.gui.root, clock)  # Tareas periódicas (root.after)
+        # Todas las tareas periódicas en una rueda: un temporizador, ritmo según la actividad
+        self.tasks = TaskWheel(self.scheduler)
         self.current_pwm = config.SPEED_LOW  # PWM que se envía al ESP32 (0-255)
         self.current_speed_real = 0.0  # Velocidad real medida por MPU6050 (cm/s)
         self.esp32_logs_buffer = []  # Buffer local de logs del ESP32
+        self._logs_dirty = False  # Llegaron logs que aún no están en LOG_FILE
         
-        # Cargar logs existentes si hay
-        self._load_logs_from_file()
+        # Eventos de seguridad del firmware, indexados por tipo y tiempo
+        self.safety_journal = SafetyJournal(self.SAFETY_JOURNAL_FILE)
+        self.safety_log = SafetyLogIndex()
+        self._safety_loaded = threading.Event()  # El diario ya está en el índice
+        
+        # Cargar logs y diario existentes, sin retrasar la ventana
+        self._logs_loader = threading.Thread(target=self._load_saved_logs, name="esp32-logs-load", daemon=True)
+        self._logs_loader.start()
+        
+        # Frenado anticipado por tiempo hasta la colisión con la distancia transmitida
+        # (en el modo de dos procesos lo aplica el trabajador)
+        self.collision_guard = None
+        if config.TTC_GUARD_ENABLED and not config.WORKER_PROCESS_ENABLED:
+            self.collision_guard = CollisionGuard(
+                self.comm,
+                rtt_provider=lambda: self.comm.clock.rtt,
+                pwm_provider=lambda: self.current_pwm,
+                on_decision=self._handle_ttc_decision,
+                # Con el flujo proporcional un SPEED_SET dura hasta el próximo DRIVE:
+                slow_down=self.control.limit_throttle if self.control else None
+            )
+            
+        # Maniobras programadas que el carrito ejecuta con su propio reloj
+        self.maneuvers = ManeuverExecutor(self.comm, rtt_provider=lambda: self.comm.clock.rtt)
+        
+        # Suscribir los manejadores a los mensajes del ESP32
+        self._subscribe_handlers()
         
         # Actualizar displays iniciales
         self.gui.update_pwm_display(self.current_pwm)
         self.gui.update_speed_display(self.current_speed_real)
         
-        # Iniciar actualización periódica de estadísticas
-        self._schedule_stats_update()
-        self._schedule_log_request()
+        # Estadísticas, gráficas y consulta de logs (en pausa hasta conectar)
+        self._register_tasks()
+        
+    def _warm_up(self):
+        """
+        Inicializa en segundo plano lo que no hace falta para el primer cuadro:
+        el cliente de Twilio y el descubrimiento (que importa asyncio)
+        """
+        self.notifier.warm_up()
+        if config.DISCOVERY_ENABLED and self.discovery is None:
+            def create():
+                discovery = self._create_discovery()
+                if self.discovery is None:
+                    self.discovery = discovery
+            threading.Thread(target=create, name="discovery-warm-up", daemon=True).start()
+            
+    @staticmethod
+    def _create_discovery():
+        from discovery import ESP32Discovery
+        return ESP32Discovery()
+        
+    def _subscribe_handlers(self):
+        """Suscribe los consumidores del controlador al bus de eventos"""
+        # Detener el carrito en el mismo hilo de escucha, sin esperar a nadie
+        self.events.subscribe(EventBus.COLLISION, self._stop_on_collision, name="stop_on_collision")
+        
+        # Trabajo lento (SMS, GUI, archivo) en hilos propios para no frenar la lectura del socket
+        self.events.subscribe(
+            EventBus.COLLISION, self._handle_collision_alert,
+            mode=Subscription.QUEUED, queue_size=100, name="collision_alert"  # Ráfagas: cada una cuenta
+        )
+        self.events.subscribe(
+            EventBus.SPEED, self._handle_speed_update,
+            mode=Subscription.QUEUED, queue_size=1, name="speed_display"  # Solo importa el último valor
+        )
+        self.events.subscribe(
+            EventBus.ESP32_LOGS, self._handle_esp32_logs,
+            mode=Subscription.QUEUED, queue_size=20, name="esp32_logs"
+        )
+        self.events.subscribe(
+            EventBus.MACRO, self._handle_maneuver_progress,
+            mode=Subscription.QUEUED, queue_size=20, name="maneuver_log"
+        )
+        self.events.subscribe(
+            EventBus.LINK, self._handle_link_status,
+            mode=Subscription.QUEUED, queue_size=10, name="link_status"
+        )
+        # La historia de las gráficas y la grabación necesitan todas las muestras, no solo la última
+        # (hora de la medición en el ESP32 si el reloj está sincronizado, si no la de llegada)
+        self.events.subscribe(
+            EventBus.SPEED,
+            lambda sample: self.monitor.history.record(TelemetryHistory.SPEED, sample.speed, sample.host_time),
+            name="speed_history"
+        )
+        self.events.subscribe(
+            EventBus.SPEED, lambda sample: self.recorder.record_speed(sample.speed, sample.host_time),
+            name="session_speed"
+        )
+        self.events.subscribe(
+            EventBus.DISTANCE, lambda sample: self.recorder.record_distance(sample.distance, sample.host_time),
+            name="session_distance"
+        )
+        self.events.subscribe(
+            EventBus.DISTANCE, lambda sample: setattr(self, "last_distance", sample.distance),
+            name="alert_distance"
+        )
+        
+        # El tablero web es otro consumidor del mismo flujo de eventos
+        if self.dashboard:
+            self.events.subscribe(
+                EventBus.SPEED, lambda sample: self._publish("speed", {"speed": sample.speed}),
+                name="dashboard_speed"
+            )
+            self.events.subscribe(
+                EventBus.COLLISION, lambda alert: self._publish("collision", {"message": alert.text}),
+                name="dashboard_collision"
+            )
+            self.events.subscribe(
+                EventBus.ESP32_LOGS, lambda batch: self._publish("esp32_logs", {"logs": batch.logs}),
+                name="dashboard_logs"
+            )
         
-    def handle_direction(self, command: str):
+    def handle_direction(self, command: str, speed_command: Optional[str] = None):
         """
         Maneja comandos de dirección
         Args:
             command: Comando de dirección (FORWARD, BACKWARD, LEFT, RIGHT, STOP)
+            speed_command: Velocidad que viaja en la misma trama, antes de la dirección (opcional)
         """
         if self.comm.is_connected():
-            self.comm.send_command(command)
+            if command == config.CMD_STOP:
+                self.maneuvers.cancel()  # El firmware aborta su maniobra al recibir STOP
+                self._neutral_control()
+            self._moving = command != config.CMD_STOP
+            self.tasks.touch()
+            if speed_command:
+                # Velocidad y dirección en una trama: el motor arranca ya con el PWM nuevo
+                self.comm.send_frame([speed_command, command])
+            else:
+                self.comm.send_command(command)
+            self.recorder.record_command(command, self.current_pwm)
+            self._update_state(direction=command)
         else:
             print("⚠ No conectado. Conecta primero al ESP32")
             
@@ -87,8 +255,12 @@ class CarController:
             else:
                 print(f"⚠ Velocidad mínima alcanzada: {config.SPEED_MIN}")
         
+        self.tasks.touch()
+        
         # Actualizar display de PWM
         self.gui.update_pwm_display(self.current_pwm)
+        self.monitor.history.record(TelemetryHistory.PWM, self.current_pwm)
+        self._update_state(pwm=self.current_pwm)
         
         # Enviar comando al ESP32
         if self.comm.is_connected():
@@ -96,35 +268,146 @@ class CarController:
             if command in [config.CMD_SPEED_UP, config.CMD_SPEED_DOWN]:
                 # Crear comando con el valor exacto
                 speed_command = f"SPEED_SET:{self.current_pwm}"
-                self.comm.send_command(speed_command)
             else:
-                self.comm.send_command(command)
+                speed_command = command
+            self.comm.send_command(speed_command)
+            self.recorder.record_command(command, self.current_pwm)
+            
+    def handle_drive(self, direction: str, pwm: int):
+        """
+        Cambia velocidad y dirección a la vez, con una sola trama (SPEED_SET:<pwm>|<dirección>)
+        Args:
+            direction: Comando de dirección (FORWARD, BACKWARD, LEFT, RIGHT, STOP)
+            pwm: PWM a aplicar (SPEED_MIN a SPEED_MAX)
+        """
+        self.current_pwm = max(config.SPEED_MIN, min(pwm, config.SPEED_MAX))
+        self.gui.update_pwm_display(self.current_pwm)
+        self.monitor.history.record(TelemetryHistory.PWM, self.current_pwm)
+        self._update_state(pwm=self.current_pwm)
+        self.handle_direction(direction, f"SPEED_SET:{self.current_pwm}")
+            
+    def handle_axes(self, throttle: float, steering: float):
+        """Posición de la palanca proporcional (-1 a 1); el flujo envía la última"""
+        self.control.input.set_axes(throttle, steering)
+        self.tasks.touch()
+        
+    def handle_ramp(self, axis: str, direction: int):
+        """Tecla de rampa presionada (+1 / -1) o soltada (0)"""
+        self.control.input.hold(axis, direction)
+        self.tasks.touch()
+        self.gui.set_throttle_display(self.control.input.throttle)
+        
+    def _neutral_control(self):
+        """El carrito recibió STOP: el flujo proporcional vuelve a cero sin reenviar"""
+        if self.control:
+            self.control.neutral()
+            self._drive_direction = config.CMD_STOP
+        self._moving = False
+        self._update_state(direction=config.CMD_STOP)
+            
+    def _record_drive(self, throttle: int, steering: int):
+        """Graba los cambios de sentido del flujo proporcional como comandos"""
+        direction = (config.CMD_FORWARD if throttle > 0 else
+                     config.CMD_BACKWARD if throttle < 0 else config.CMD_STOP)
+        self._moving = throttle != 0
+        self.current_pwm = abs(throttle)  # Como el firmware: DRIVE: fija la velocidad deseada
+        if direction != self._drive_direction:
+            self._drive_direction = direction
+            self.recorder.record_command(direction, abs(throttle))
+        self._update_state(direction=direction, pwm=throttle)
+        
+    def _update_state(self, **changes):
+        """Refleja un cambio en el bloque de estado (no escribe si nada cambió)"""
+        if self.state_block:
+            self.state_block.update(**changes)
+            
+    def run_maneuver(self, steps, on_device: bool = True) -> Optional[ManeuverRun]:
+        """
+        Ejecuta una maniobra programada
+        Args:
+            steps: Pasos (comando, PWM, segundos), p. ej.
+                [("FORWARD", 200, 1.0), ("LEFT", 200, 0.3), ("FORWARD", 200, 2.0), ("STOP", 0, 0)]
+            on_device: True = una trama MACRO: que ejecuta el carrito;
+                False = cada paso enviado desde la PC (para comparar)
+        Returns:
+            ManeuverRun para seguir el avance, o None si no hay conexión
+        """
+        if not self.comm.is_connected():
+            print("⚠ No conectado. Conecta primero al ESP32")
+            return None
+        maneuver = [ManeuverStep(*step) for step in steps]
+        self.tasks.touch()
+        if on_device:
+            run = self.maneuvers.run(maneuver)
+        else:
+            run = self.maneuvers.run_host_timed(maneuver)
+        self.recorder.record_command(f"{config.CMD_MACRO}:{run.run_id}", self.current_pwm)
+        return run
             
     def handle_connect(self):
-        """Maneja la conexión con el ESP32"""
+        """Maneja la conexión con el ESP32 (la búsqueda y el connect() corren fuera del hilo de Tk)"""
+        if self._connecting:
+            return  # Ya hay un intento en curso
+        self._connecting = True
         print("Intentando conectar al ESP32...")
         
         # Resetear estadísticas
         self.monitor.reset()
         self.gui.clear_log()
+        self.gui.add_log_message("Conectando...")
+        threading.Thread(target=self._locate_and_connect, name="esp32-connect", daemon=True).start()
         
-        success = self.comm.connect()
-        
+    def _locate_and_connect(self):
+        """Busca el carrito y conecta; el resultado se aplica en el hilo de Tk"""
+        try:
+            if config.DISCOVERY_ENABLED and self.discovery is None:
+                discovery = self._create_discovery()
+                if self.discovery is None:
+                    self.discovery = discovery
+            if self.discovery:
+                # Caché y modo AP primero; anuncio UDP y barrido de la subred solo si no responden
+                car = self.discovery.locate()
+                if car:
+                    self.comm.set_ip(car.ip)
+                    self.comm.port = car.port
+                    print(f"🔎 ESP32 encontrado en {car.ip}:{car.port} ({car.source}, {car.rtt * 1000:.0f} ms)")
+            success = self.comm.connect()
+        except Exception as e:
+            print(f"✗ Error al conectar: {e}")
+            success = False
+        if not self.gui.is_closed:  # Cerrada la ventana, no queda mainloop que lo ejecute
+            self.scheduler.after(0, lambda: self._finish_connect(success))
+                
+    def _finish_connect(self, success: bool):
+        """Aplica el resultado de la conexión (hilo de Tk)"""
+        self._connecting = False
         if success:
+            if self.discovery:
+                self.discovery.cache.put(self.comm.ip, self.comm.port)
+            self.recorder.start(self.comm.ip)
+            if self.catalog:
+                self.catalog_session = self.catalog.start_session(self.comm.ip, self.clock.time(), self.recorder.path)
+            if self.collision_guard:
+                self.collision_guard.reset()
+            if self.control:
+                self._neutral_control()
+                self.control.start()
             self.gui.update_connection_status(True)
-            self.gui.show_info("Conexión", f"Conectado exitosamente a {config.ESP32_IP}")
+            self.tasks.touch()
+            self.tasks.set_connected(True)
+            self._update_state(connection="ok", pwm=self.current_pwm)
+            self.gui.show_info("Conexión", f"Conectado exitosamente a {self.comm.ip}")
             self.gui.add_log_message("=== Conexión Establecida ===")
-            self.gui.add_log_message(f"IP: {config.ESP32_IP}:{config.ESP32_PORT}")
+            self.gui.add_log_message(f"IP: {self.comm.ip}:{self.comm.port}")
             
-            # Consultar la velocidad actual del ESP32
-            import time
-            time.sleep(0.5)  # Dar tiempo para establecer la conexión
-            self.comm.send_command("GET_SPEED")
+            # Consultar la velocidad actual del ESP32 (y sus logs, en la misma trama),
+            # dando tiempo a que se establezca la conexión sin trabar la ventana
+            self.scheduler.after(500, self.comm.request_status)
         else:
             self.gui.update_connection_status(False)
             self.gui.show_error(
                 "Error de Conexión",
-                f"No se pudo conectar al ESP32 en {config.ESP32_IP}:{config.ESP32_PORT}\n\n"
+                f"No se pudo conectar al ESP32 en {self.comm.ip}:{self.comm.port}\n\n"
                 "Verifica que:\n"
                 "• El ESP32 esté encendido\n"
                 "• Estés conectado a la red WiFi del ESP32\n"
@@ -134,23 +417,68 @@ class CarController:
             
     def handle_disconnect(self):
         """Maneja la desconexión del ESP32"""
+        if self.control:
+            self.control.stop()
+        if self.catalog and self.catalog_session is not None:
+            self.catalog.end_session(self.catalog_session, self.clock.time(), self.monitor.get_statistics_summary())
+            self.catalog_session = None
         self.comm.disconnect()
+        self.recorder.stop()
+        self._flush_logs_file()  # Sin conexión la rueda pausa el guardado
+        self.tasks.set_connected(False)
         self.gui.update_connection_status(False)
+        self._update_state(connection="disconnected", direction=config.CMD_STOP)
         self.gui.add_log_message("=== Desconectado ===")
         print("Desconectado del ESP32")
     
-    def _schedule_stats_update(self):
-        """Programa la actualización periódica de estadísticas"""
-        if not self.gui.is_closed:
-            self._update_statistics()
-            # Reprogramar para la próxima actualización
-            self.gui.root.after(config.STATS_UPDATE_INTERVAL, self._schedule_stats_update)
+    def _register_tasks(self):
+        """
+        Registra las tareas periódicas en la rueda
+        Rápidas mientras se conduce, lentas en reposo, sin gráficas con la
+        ventana minimizada y todas en pausa sin conexión
+        """
+        self.tasks.add("stats", self._update_statistics, {
+            TaskWheel.ACTIVE: config.STATS_UPDATE_INTERVAL,
+            TaskWheel.IDLE: config.STATS_IDLE_INTERVAL,
+            TaskWheel.HIDDEN: config.STATS_HIDDEN_INTERVAL,
+        })
+        self.tasks.add("charts", self._update_charts, {
+            TaskWheel.ACTIVE: config.CHART_REFRESH_INTERVAL,
+            TaskWheel.IDLE: config.CHART_IDLE_INTERVAL,
+        })
+        self.tasks.add("status", self._request_status, self._status_request_interval)
+        self.tasks.add("logs_file", self._flush_logs_file, {
+            TaskWheel.ACTIVE: config.LOG_SAVE_INTERVAL,
+            TaskWheel.IDLE: config.LOG_SAVE_INTERVAL,
+            TaskWheel.HIDDEN: config.LOG_SAVE_INTERVAL,
+        })
+            
+    def _handle_visibility(self, visible: bool):
+        """Ventana minimizada o restaurada"""
+        self.tasks.set_visible(visible)
+        
+    def _update_charts(self):
+        """Dibuja un cuadro de las gráficas en tiempo real"""
+        if self.comm.is_connected():
+            self.gui.update_charts(self.monitor.history, self.clock.time())
     
     def _update_statistics(self):
         """Actualiza las estadísticas en la GUI"""
         if self.comm.is_connected():
+            if self._moving:
+                self.tasks.touch()  # Manejando con la palanca quieta sigue siendo actividad
             stats = self.monitor.get_statistics_summary()
+            stats["clock"] = self.comm.clock.get_status()
+            stats["tasks"] = self.tasks.get_metrics()
+            self._update_state(rtt=self.comm.clock.rtt)
+            if self.control:
+                stats["control"] = self.control.get_metrics()
             self.gui.update_statistics(stats)
+            self._publish("stats", stats)
+            now = self.clock.time()
+            if self.catalog_session is not None and now - self._last_catalog_snapshot >= config.CATALOG_SNAPSHOT_INTERVAL:
+                self.catalog.record_snapshot(self.catalog_session, now, stats)
+                self._last_catalog_snapshot = now
             
             # Actualizar log con mensajes recientes
             log_messages = self.monitor.get_log_messages()
@@ -158,51 +486,120 @@ class CarController:
             for message in log_messages[-5:]:  # Últimos 5 mensajes
                 pass  # Ya se agregan en tiempo real
     
-    def _handle_collision_alert(self):
+    def _stop_on_collision(self, alert: CollisionAlert):
+        """Detiene el carrito inmediatamente ante una colisión"""
+        if not config.WORKER_PROCESS_ENABLED:  # El trabajador ya envió el STOP
+            self.comm.send_command(config.CMD_STOP)
+        self._neutral_control()  # Que el flujo no vuelva a arrancar el carrito
+        
+    def _handle_ttc_decision(self, decision: TTCDecision):
+        """Refleja en la GUI el frenado anticipado (el comando ya se envió)"""
+        if decision.action == TTCEstimator.STOP:
+            self._neutral_control()
+        if decision.action == TTCEstimator.SLOW:
+            if config.WORKER_PROCESS_ENABLED and self.control:
+                # El trabajador envió SPEED_SET: que el próximo DRIVE: no lo deshaga
+                self.control.limit_throttle(config.TTC_SLOW_FACTOR)
+            self.current_pwm = decision.pwm
+            self.gui.update_pwm_display(self.current_pwm)
+            self._update_state(pwm=self.current_pwm)
+        self.gui.add_log_message(
+            f"🛡️ TTC {decision.ttc:.2f} s a {decision.distance:.0f} cm: {decision.action.upper()}"
+        )
+        
+    def _handle_maneuver_progress(self, progress: MacroProgress):
+        """Muestra el avance de la maniobra y, al terminar, el error de cada paso"""
+        self.tasks.touch()  # El carrito se mueve solo: sigue siendo actividad
+        run = self.maneuvers.get_run(progress.macro_id)
+        if progress.kind == MacroProgress.STEP:
+            command = run.steps[progress.step].command if run else ""
+            self.gui.add_log_message(f"🧭 Maniobra {progress.macro_id}: paso {progress.step + 1} {command}")
+        elif progress.kind == MacroProgress.ABORT:
+            self.gui.add_log_message(f"🧭 Maniobra {progress.macro_id} abortada en el paso {progress.step + 1}")
+        else:
+            errors = [f"{error * 1000:+.0f}" for error in (run.step_errors() if run else []) if error is not None]
+            self.gui.add_log_message(f"🧭 Maniobra {progress.macro_id} completada (error ms: {', '.join(errors)})")
+        
+    def _handle_link_status(self, status: LinkStatus):
+        """Enlace degradado o perdido según los latidos"""
+        if status.state == LinkStatus.LOST:
+            # El firmware ya detuvo los motores (deadman): que el flujo no los
+            # vuelva a arrancar cuando el enlace regrese
+            self.maneuvers.cancel()
+            self._neutral_control()
+            self.gui.add_log_message(f"⚠ Enlace perdido: {status.silence * 1000:.0f} ms sin latidos")
+        elif status.state == LinkStatus.OK and status.previous == LinkStatus.LOST:
+            self.gui.add_log_message(f"✓ Enlace recuperado tras {status.silence * 1000:.0f} ms")
+        if self.catalog_session is not None:
+            self.catalog.record_link_change(self.catalog_session, status)
+        if self.comm.is_connected():
+            self.gui.update_link_status(status.state)
+            self._update_state(connection=status.state)
+            
+    def _handle_collision_alert(self, alert: CollisionAlert):
         """Maneja la alerta de colisión"""
         print("\n⚠️ ¡COLISIÓN DETECTADA!")
         
-        # Detener el carrito inmediatamente
-        self.comm.send_command(config.CMD_STOP)
-        
         # Mostrar alerta en la GUI
         self.gui.add_log_message("⚠️ ¡COLISIÓN DETECTADA!")
+        if self.catalog_session is not None:
+            self.catalog.record_collision(self.catalog_session, alert.received_at, alert.text)
         
-        # Enviar notificación SMS
-        success = self.notifier.send_collision_alert()
+        # Al resumen de la ventana: el motor envía el SMS (uno por ventana, no por colisión)
+        self.alerts.report(AlertEngine.COLLISION, alert.received_at, self.last_distance)
         
-        if success:
-            print("✓ Notificación SMS enviada")
-            self.gui.add_log_message("✓ SMS enviado a +50662494299")
-        else:
-            print("✗ Error al enviar notificación SMS")
-            self.gui.add_log_message("✗ Error al enviar SMS")
+    def _alert_sent(self, recipient: str, message: str):
+        """Un resumen de alertas salió por SMS (hilo del motor)"""
+        print(f"✓ Resumen de alertas enviado a {recipient}")
+        self.gui.add_log_message(f"✓ SMS enviado a {recipient}")
     
-    def _handle_speed_update(self, speed: int):
+    def _handle_speed_update(self, sample: SpeedSample):
         """Maneja la actualización de velocidad real desde el ESP32 (MPU6050)"""
         try:
-            # Convertir a float si viene como entero o string
-            speed_value = float(speed)
+            speed_value = sample.speed
             print(f"📊 Velocidad real MPU6050: {speed_value:.2f} cm/s")
             self.current_speed_real = speed_value
+            self._update_state(speed=speed_value)
             # Actualizar solo el display de velocidad real, no el PWM
             self.gui.update_speed_display(self.current_speed_real)
         except (ValueError, TypeError) as e:
             print(f"Error al procesar velocidad: {e}")
     
-    def _handle_esp32_logs(self, logs: list):
+    def _handle_esp32_logs(self, batch: LogBatch):
         """Maneja los logs recibidos del ESP32"""
+        logs = batch.logs
+        # El diario siembra la deduplicación: sin él, el primer lote volvería a indexarse
+        self._safety_loaded.wait()
+        
         # Actualizar buffer local (mantener solo los últimos 10)
         self.esp32_logs_buffer = logs[-10:] if len(logs) > 10 else logs
         
-        # Guardar en archivo
-        self._save_logs_to_file()
+        # Indexar y guardar solo los eventos nuevos (GET_LOGS repite los anteriores)
+        new_events = self.safety_log.add_batch(logs, batch.host_times, batch.received_at)
+        self.safety_journal.append(new_events)
+        self.recorder.record_safety_events(new_events)
+        if self.catalog_session is not None:
+            self.catalog.record_safety_events(self.catalog_session, new_events)
+        for event in new_events:
+            if event.kind in (SafetyEvent.EMERGENCY_REVERSE, SafetyEvent.DEADMAN):
+                self.alerts.report(event.kind, event.time, event.distance)
+        
+        # Guardar en archivo desde la rueda de tareas (con logs empujados llega uno por entrada)
+        self._logs_dirty = True
         
-        # Mostrar en GUI
+        # Mostrar en GUI (una entrada empujada se muestra sola, al llegar)
+        if batch.pushed:
+            self.gui.add_log_message(f"🔧 {logs[-1]}")
+            return
         self.gui.add_log_message("--- Logs ESP32 ---")
         for log in self.esp32_logs_buffer:
             self.gui.add_log_message(f"🔧 {log}")
         self.gui.add_log_message("------------------")
+        
+    def _publish(self, event_type: str, data: dict):
+        """Envía un evento al tablero web si está habilitado"""
+        if self.dashboard:
+            self.dashboard.publish(event_type, data)
     
     def _save_logs_to_file(self):
         """Guarda los logs en un archivo JSON"""
@@ -219,6 +616,23 @@ class CarController:
             print(f"✓ Logs guardados en {self.LOG_FILE}")
         except Exception as e:
             print(f"✗ Error al guardar logs: {e}")
+            
+    def _flush_logs_file(self):
+        """Guarda los logs si llegaron nuevos desde el último guardado"""
+        if self._logs_dirty:
+            self._logs_dirty = False
+            self._save_logs_to_file()
+            
+    def _load_saved_logs(self):
+        """Carga los logs guardados y el diario de seguridad (hilo de arranque)"""
+        self._load_logs_from_file()
+        try:
+            self.safety_log.extend(self.safety_journal.load())
+            print(f"✓ Cargados {len(self.safety_log)} eventos de seguridad desde {self.SAFETY_JOURNAL_FILE}")
+        except OSError as e:
+            print(f"✗ Error al cargar el diario de seguridad: {e}")
+        finally:
+            self._safety_loaded.set()
     
     def _load_logs_from_file(self):
         """Carga los logs desde el archivo si existe"""
@@ -226,21 +640,30 @@ class CarController:
             if os.path.exists(self.LOG_FILE):
                 with open(self.LOG_FILE, 'r', encoding='utf-8') as f:
                     log_data = json.load(f)
-                    self.esp32_logs_buffer = log_data.get("logs", [])
-                    print(f"✓ Cargados {len(self.esp32_logs_buffer)} logs desde {self.LOG_FILE}")
+                logs = log_data.get("logs", [])
+                # Corre en su propio hilo: si ya llegaron logs del ESP32, mandan ellos
+                if not self.esp32_logs_buffer:
+                    self.esp32_logs_buffer = logs
+                print(f"✓ Cargados {len(logs)} logs desde {self.LOG_FILE}")
             else:
                 print(f"ℹ No se encontró archivo de logs previo")
         except Exception as e:
             print(f"✗ Error al cargar logs: {e}")
-            self.esp32_logs_buffer = []
     
-    def _schedule_log_request(self):
-        """Programa la solicitud periódica de logs del ESP32"""
-        if not self.gui.is_closed:
-            if self.comm.is_connected():
-                self.comm.request_logs()
-            # Reprogramar para la próxima solicitud (cada 5 segundos)
-            self.gui.root.after(5000, self._schedule_log_request)
+    def _request_status(self):
+        """Consulta periódica de velocidad y logs del ESP32, en una sola trama"""
+        if self.comm.is_connected():
+            self.comm.request_status()
+            
+    def _status_request_interval(self, activity: str) -> Optional[int]:
+        """
+        Intervalo de la consulta de estado (ms, None = en pausa)
+        Si el firmware empuja cada entrada (LOG:) la consulta solo repara las
+        pérdidas que ningún número posterior delató, y se espacia
+        """
+        if activity == TaskWheel.OFFLINE:
+            return None
+        return config.LOG_REPAIR_INTERVAL if self.comm.logs_pushed else config.LOG_POLL_INTERVAL
         
     def run(self):
         """Inicia la aplicación"""
@@ -258,8 +681,22 @@ class CarController:
         try:
             self.gui.run()
         finally:
+            self.tasks.close()  # La ventana ya no existe: nada más que programar
             # Guardar logs finales antes de cerrar
-            if self.esp32_logs_buffer:
-                self._save_logs_to_file()
+            self._logs_loader.join(timeout=1.0)
+            self._flush_logs_file()
             self.handle_disconnect()
+            if config.WORKER_PROCESS_ENABLED:
+                self.comm.close()
+            if self.collision_guard:
+                self.collision_guard.close()
+            self.maneuvers.close()
+            self.alerts.stop()
+            self.events.close()
+            if self.state_block:
+                self.state_block.close()
+            if self.catalog:
+                self.catalog.close()
+            if self.dashboard:
+                self.dashboard.stop()
             print("\n¡Hasta luego!")
@@ -0,0 +1,315 @@
+"""
+Módulo de tablero web para la red local
+
+Servidor HTTP/WebSocket opcional (solo biblioteca estándar) que transmite la
+telemetría del carrito a cualquier cantidad de navegadores en la LAN. Corre en
+su propio hilo con un loop de asyncio; publicar un evento solo codifica el
+mensaje una vez y lo encola en el loop, así que nunca frena al hilo de Tk ni al
+hilo de escucha. Cada visor tiene una cola acotada que descarta el mensaje más
+antiguo cuando se llena, por lo que un visor lento no afecta a los demás.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+import config
+
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_CLIENT_FRAME = 125  # bytes - El navegador solo envía frames de control (cierre, ping)
+
+DASHBOARD_HTML = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Carrito ESP32 - Telemetría</title>
+<style>
+  body { background:#2c3e50; color:#ecf0f1; font-family:Arial, sans-serif; margin:20px; }
+  .card { background:#34495e; border-radius:6px; padding:12px; margin-bottom:12px; }
+  .value { font-size:22px; font-weight:bold; color:#3498db; }
+  .alert { color:#e74c3c; font-weight:bold; }
+  #logs { font-family:Consolas, monospace; font-size:12px; white-space:pre-wrap; }
+</style>
+</head>
+<body>
+<h2>🚗 Carrito ESP32 - Telemetría en vivo</h2>
+<div class="card">📊 Velocidad real: <span class="value" id="speed">-</span> cm/s</div>
+<div class="card">⏱️ Latencia: <span class="value" id="latency">-</span> ms
+  &nbsp; ✓ Confiabilidad: <span class="value" id="reliability">-</span> %
+  &nbsp; 📤 Comandos: <span class="value" id="commands">-</span></div>
+<div class="card">⚠️ Última colisión: <span class="alert" id="collision">ninguna</span></div>
+<div class="card">📋 Logs ESP32<div id="logs"></div></div>
+<div id="status">Conectando...</div>
+<script>
+function connect() {
+  const ws = new WebSocket("ws://" + location.host + "/ws");
+  ws.onopen = () => document.getElementById("status").textContent = "● Conectado";
+  ws.onclose = () => { document.getElementById("status").textContent = "● Desconectado"; setTimeout(connect, 1000); };
+  ws.onmessage = (msg) => {
+    const ev = JSON.parse(msg.data);
+    if (ev.type === "speed") document.getElementById("speed").textContent = ev.data.speed.toFixed(2);
+    if (ev.type === "stats") {
+      document.getElementById("latency").textContent = ev.data.latency.average.toFixed(1);
+      document.getElementById("reliability").textContent = ev.data.reliability.success_rate.toFixed(1);
+      document.getElementById("commands").textContent = ev.data.reliability.commands_sent;
+    }
+    if (ev.type === "collision") document.getElementById("collision").textContent = new Date(ev.time * 1000).toLocaleTimeString();
+    if (ev.type === "esp32_logs") document.getElementById("logs").textContent = ev.data.logs.join("\\n");
+  };
+}
+connect();
+</script>
+</body>
+</html>
+"""
+
+
+def encode_text_frame(text: str) -> bytes:
+    """Codifica un frame de texto WebSocket sin máscara (servidor → cliente)"""
+    payload = text.encode()
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x81, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x81, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x81, 127, length)
+    return header + payload
+
+
+class _Viewer:
+    """Un navegador conectado con su cola acotada de mensajes"""
+    
+    __slots__ = ("writer", "queue", "max_size", "wakeup", "dropped", "sent", "closed")
+    
+    def __init__(self, writer: asyncio.StreamWriter, max_size: int):
+        self.writer = writer
+        self.queue = deque()
+        self.max_size = max_size
+        self.wakeup = asyncio.Event()
+        self.dropped = 0
+        self.sent = 0
+        self.closed = False
+        
+    def offer(self, frame: bytes):
+        """Encola un frame descartando el más antiguo si la cola está llena"""
+        if len(self.queue) >= self.max_size:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(frame)
+        self.wakeup.set()
+
+
+class TelemetryDashboard:
+    """Servidor HTTP/WebSocket que reparte la telemetría a los visores de la LAN"""
+    
+    def __init__(self, host: str = None, port: int = None, queue_size: int = None):
+        self.host = host if host is not None else config.DASHBOARD_HOST
+        self.port = port if port is not None else config.DASHBOARD_PORT
+        self.queue_size = queue_size or config.DASHBOARD_QUEUE_SIZE
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server = None
+        self.thread = None
+        self.viewers = set()
+        self._latest: Dict[str, bytes] = {}  # Último frame por tipo, para visores nuevos
+        self._latest_data: Dict[str, dict] = {}
+        self._started = threading.Event()
+        self.events_published = 0
+        self.dropped_total = 0  # Descartes de visores ya desconectados
+        
+    def start(self) -> bool:
+        """
+        Inicia el servidor en un hilo de fondo
+        Returns:
+            bool: True si el servidor quedó escuchando
+        """
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self._started.wait(timeout=5.0)
+        return self.server is not None
+        
+    def _run(self):
+        """Hilo del loop de asyncio"""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle_client, self.host, self.port, backlog=1024)
+            )
+            self.port = self.server.sockets[0].getsockname()[1]
+            print(f"✓ Tablero web en http://{self.host}:{self.port}")
+        except OSError as e:
+            print(f"✗ No se pudo iniciar el tablero web: {e}")
+            self.server = None
+            self._started.set()
+            return
+        self._started.set()
+        self.loop.run_forever()
+        
+        # Cierre ordenado
+        self.server.close()
+        for viewer in list(self.viewers):
+            viewer.writer.close()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
+        
+    def stop(self):
+        """Detiene el servidor y desconecta a todos los visores"""
+        if self.loop and self.server:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            if self.thread:
+                self.thread.join(timeout=5.0)
+            self.server = None
+            
+    def publish(self, event_type: str, data: dict):
+        """
+        Publica un evento para todos los visores (seguro desde cualquier hilo)
+        Args:
+            event_type: stats, speed, collision o esp32_logs
+            data: Contenido serializable a JSON
+        """
+        if self.server is None:
+            return
+        now = time.time()
+        frame = encode_text_frame(json.dumps(
+            {"type": event_type, "time": now, "data": data},
+            ensure_ascii=False
+        ))
+        self.events_published += 1
+        try:
+            self.loop.call_soon_threadsafe(self._fan_out, event_type, data, frame)
+        except RuntimeError:
+            pass  # El loop ya se cerró
+            
+    def _fan_out(self, event_type: str, data: dict, frame: bytes):
+        """Reparte un frame a las colas de todos los visores (en el loop)"""
+        self._latest[event_type] = frame
+        self._latest_data[event_type] = data
+        for viewer in self.viewers:
+            viewer.offer(frame)
+            
+    def get_stats(self) -> Dict:
+        """Estadísticas del tablero (visores, enviados y descartados)"""
+        while True:
+            try:
+                viewers = list(self.viewers)
+                break
+            except RuntimeError:
+                continue  # El loop modificó el conjunto durante la copia
+        return {
+            "viewers": len(viewers),
+            "events_published": self.events_published,
+            "frames_sent": sum(v.sent for v in viewers),
+            "frames_dropped": self.dropped_total + sum(v.dropped for v in viewers)
+        }
+        
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Atiende una conexión HTTP (página, instantánea JSON o WebSocket)"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5.0)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError):
+            writer.close()
+            return
+            
+        lines = head.decode(errors="replace").split("\r\n")
+        parts = lines[0].split(" ")
+        path = parts[1] if len(parts) > 1 else "/"
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+                
+        if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+            await self._serve_websocket(reader, writer, headers)
+        elif path == "/":
+            self._send_http(writer, "200 OK", "text/html; charset=utf-8", DASHBOARD_HTML.encode())
+        elif path == "/snapshot":
+            body = json.dumps(self._latest_data, ensure_ascii=False).encode()
+            self._send_http(writer, "200 OK", "application/json", body)
+        else:
+            self._send_http(writer, "404 Not Found", "text/plain", b"No encontrado")
+            
+    def _send_http(self, writer: asyncio.StreamWriter, status: str, content_type: str, body: bytes):
+        """Envía una respuesta HTTP simple y cierra la conexión"""
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        writer.close()
+        
+    async def _serve_websocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                               headers: Dict[str, str]):
+        """Completa el handshake WebSocket y transmite eventos al visor"""
+        key = headers.get("sec-websocket-key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        
+        # Limitar el buffer por visor para que la contrapresión llegue a su cola
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, config.DASHBOARD_SEND_BUFFER)
+        writer.transport.set_write_buffer_limits(high=config.DASHBOARD_SEND_BUFFER)
+        
+        viewer = _Viewer(writer, self.queue_size)
+        for frame in self._latest.values():
+            viewer.offer(frame)
+        self.viewers.add(viewer)
+        
+        reader_task = asyncio.ensure_future(self._read_frames(reader, viewer))
+        try:
+            while not viewer.closed:
+                await viewer.wakeup.wait()
+                viewer.wakeup.clear()
+                while viewer.queue:
+                    writer.write(viewer.queue.popleft())
+                    viewer.sent += 1
+                await writer.drain()  # Solo este visor espera si su red es lenta
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            viewer.closed = True
+            self.viewers.discard(viewer)
+            self.dropped_total += viewer.dropped
+            reader_task.cancel()
+            writer.close()
+            
+    async def _read_frames(self, reader: asyncio.StreamReader, viewer: _Viewer):
+        """Lee frames del navegador: responde pings y detecta el cierre"""
+        try:
+            while True:
+                header = await reader.readexactly(2)
+                opcode = header[0] & 0x0F
+                length = header[1] & 0x7F
+                if length == 126:
+                    length = struct.unpack("!H", await reader.readexactly(2))[0]
+                elif length == 127:
+                    length = struct.unpack("!Q", await reader.readexactly(8))[0]
+                if length > MAX_CLIENT_FRAME:  # No reservar lo que diga un cliente
+                    viewer.writer.write(struct.pack("!BBH", 0x88, 2, 1009))  # Cierre: mensaje muy grande
+                    break
+                mask = await reader.readexactly(4) if header[1] & 0x80 else b"\x00" * 4
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(await reader.readexactly(length)))
+                if opcode == 0x8:  # Cierre
+                    break
+                if opcode == 0x9:  # Ping → Pong
+                    viewer.writer.write(struct.pack("!BB", 0x8A, len(payload)) + payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        viewer.closed = True
+        viewer.wakeup.set()
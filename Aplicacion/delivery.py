@@ -0,0 +1,252 @@
+"""
+Módulo de entrega confiable de comandos
+
+`sendall` solo dice que los bytes salieron de la PC, no que el carrito ejecutó
+el comando. Cada comando sale numerado (<comando>#<seq>) y el firmware, después
+de ejecutarlo y de su respuesta habitual, confirma con OK:<seq> (ERR:<seq> si
+lo rechaza). Cada tipo de comando tiene un plazo de confirmación
+(ACK_DEADLINES, nunca menor que ACK_RTT_FACTOR veces el RTT suavizado de las
+confirmaciones):
+
+- un comando idempotente sin confirmar se retransmite con el mismo número hasta
+  ACK_MAX_RETRIES veces; el firmware recuerda los últimos números ejecutados y
+  a una retransmisión de algo ya ejecutado solo responde OK:<seq>:DUP
+- agotados los reintentos (o al vencer un comando no idempotente, MACRO:) el
+  comando cuenta como no entregado en el monitor
+- un comando nuevo del mismo grupo (dirección, velocidad) reemplaza al pendiente,
+  que ya no se retransmite (reenviar un FORWARD viejo después de un STOP sería
+  peor que perderlo) pero sigue contando como perdido si su plazo vence
+- una trama compuesta (<op>|<op>|...) es un solo comando: su plazo es el de la
+  operación más lenta, se retransmite solo si todas son idempotentes y reemplaza
+  a los pendientes cuyos grupos cubre por completo
+
+El hilo no revisa a intervalos fijos: duerme hasta el próximo plazo, como el de
+los latidos.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import config
+from protocol import Ack
+
+_MOTION = frozenset((config.CMD_FORWARD, config.CMD_BACKWARD, config.CMD_LEFT, config.CMD_RIGHT, config.CMD_STOP))
+_SPEED = frozenset(("SPEED_SET", config.CMD_SPEED_LOW, config.CMD_SPEED_HIGH))
+
+
+def command_name(command: str) -> str:
+    """Nombre del comando sin argumentos (SPEED_SET:200 -> SPEED_SET)"""
+    return command.partition(":")[0]
+
+
+def frame_ops(command: str) -> List[str]:
+    """Operaciones de una trama compuesta (un comando suelto es una trama de una)"""
+    return command.split(config.FRAME_SEPARATOR)
+
+
+def command_group(command: str) -> str:
+    """Grupo en el que un comando nuevo reemplaza al pendiente"""
+    name = command_name(command)
+    if name in _MOTION:
+        return "motion"
+    if name in _SPEED:
+        return "speed"
+    return name
+
+
+class _Pending:
+    """Comando enviado que espera su OK:<seq>"""
+
+    __slots__ = ("seq", "command", "message", "groups", "deadline", "idempotent", "sent_at", "due", "attempts",
+                 "superseded")
+
+    def __init__(self, seq: int, command: str, deadline: float, sent_at: float):
+        self.seq = seq
+        self.command = command
+        self.message = f"{command}#{seq}"
+        ops = frame_ops(command)
+        self.groups = frozenset(command_group(op) for op in ops)
+        self.deadline = deadline
+        self.idempotent = all(command_name(op) in config.IDEMPOTENT_COMMANDS for op in ops)
+        self.sent_at = sent_at
+        self.due = sent_at + deadline
+        self.attempts = 0  # Retransmisiones hechas
+        self.superseded = False  # Un comando posterior de los mismos grupos lo reemplazó
+
+
+class DeliveryTracker:
+    """Numera los comandos, vigila sus plazos y retransmite los idempotentes"""
+
+    ACKED = "acked"
+    FAILED = "failed"
+    MAX_SETTLED = 256  # Números resueltos recordados para clasificar confirmaciones tardías
+
+    def __init__(self, comm, deadlines: Optional[Dict[str, float]] = None,
+                 default_deadline: float = config.ACK_DEADLINE_DEFAULT,
+                 max_retries: int = config.ACK_MAX_RETRIES, rtt_factor: float = config.ACK_RTT_FACTOR):
+        """
+        Args:
+            comm: ESP32Communication (retransmisión y monitor)
+            deadlines: Plazo de confirmación (s) por nombre de comando
+            default_deadline: Plazo de los comandos que no están en deadlines
+            max_retries: Retransmisiones de un comando idempotente
+            rtt_factor: Múltiplo del RTT suavizado que el plazo nunca baja
+        """
+        self.comm = comm
+        self.deadlines = config.ACK_DEADLINES if deadlines is None else deadlines
+        self.default_deadline = default_deadline
+        self.max_retries = max_retries
+        self.rtt_factor = rtt_factor
+
+        self._seq = 0
+        self._pending: "OrderedDict[int, _Pending]" = OrderedDict()
+        self._settled: "OrderedDict[int, str]" = OrderedDict()  # seq -> ACKED / FAILED
+        self.srtt: Optional[float] = None  # RTT suavizado de las confirmaciones (s)
+        self._reset_metrics()
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _reset_metrics(self):
+        self.metrics = {"sent": 0, "acked": 0, "retransmits": 0, "failed": 0, "duplicates": 0,
+                        "late": 0, "rejected": 0, "superseded": 0}
+
+    def start(self):
+        """Reinicia la numeración e inicia el hilo (se llama al conectar)"""
+        self.stop()
+        with self._cond:
+            self._seq = 0  # El firmware olvida los números con cada cliente nuevo
+            self._pending.clear()
+            self._settled.clear()
+            self.srtt = None
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="delivery-tracker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo; lo pendiente se abandona sin contarlo como perdido"""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def deadline_for(self, command: str) -> float:
+        """Plazo de confirmación (s) de un comando (el de la operación más lenta en una trama)"""
+        deadline = max(self.deadlines.get(command_name(op), self.default_deadline) for op in frame_ops(command))
+        if self.srtt is not None:
+            deadline = max(deadline, self.rtt_factor * self.srtt)
+        return deadline
+
+    def track(self, command: str) -> str:
+        """
+        Numera un comando y empieza a esperar su confirmación
+        Se llama con el lock de envío tomado: el orden de los números es el de la red
+        Returns:
+            str: Línea a enviar (<comando>#<seq>)
+        """
+        now = time.time()
+        with self._cond:
+            self._seq += 1
+            entry = _Pending(self._seq, command, self.deadline_for(command), now)
+            for pending in self._pending.values():
+                if pending.groups <= entry.groups and not pending.superseded:
+                    pending.superseded = True
+                    self.metrics["superseded"] += 1
+            self._pending[entry.seq] = entry
+            self.metrics["sent"] += 1
+            self._cond.notify()
+        return entry.message
+
+    def discard(self, message: str):
+        """Olvida un comando cuyo envío falló (ya se contó como fallido)"""
+        seq = int(message.rpartition("#")[2])
+        with self._cond:
+            self._pending.pop(seq, None)
+
+    def should_retransmit(self, seq: int) -> bool:
+        """True si el comando sigue sin confirmar y nada lo reemplazó"""
+        with self._cond:
+            entry = self._pending.get(seq)
+            return entry is not None and not entry.superseded
+
+    def acknowledge(self, ack: Ack):
+        """Resuelve el comando de un OK:<seq> / ERR:<seq> (hilo de escucha)"""
+        rtt = None
+        with self._cond:
+            entry = self._pending.pop(ack.seq, None)
+            if entry is not None:
+                self._settle(ack.seq, self.ACKED)
+                self.metrics["acked"] += 1
+                if entry.attempts == 0:
+                    # Solo las confirmaciones sin retransmisión miden el RTT (algoritmo de Karn)
+                    rtt = ack.received_at - entry.sent_at
+                    self.srtt = rtt if self.srtt is None else self.srtt + (rtt - self.srtt) / 8
+                if not ack.ok:
+                    self.metrics["rejected"] += 1
+            elif self._settled.get(ack.seq) == self.FAILED:
+                # Llegó después de darlo por perdido: sí se entregó, pero tarde
+                self._settled[ack.seq] = self.ACKED
+                self.metrics["late"] += 1
+            if ack.duplicate:
+                self.metrics["duplicates"] += 1
+        monitor = self.comm.monitor
+        if monitor:
+            if entry is not None:
+                monitor.command_acked(rtt)
+            if ack.duplicate:
+                monitor.duplicate_received()
+        if entry is not None and not ack.ok:
+            print(f"✗ Comando rechazado por el ESP32: {entry.command}")
+
+    def _settle(self, seq: int, state: str):
+        self._settled[seq] = state
+        if len(self._settled) > self.MAX_SETTLED:
+            self._settled.popitem(last=False)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            retransmit, failed = self._expire(time.time())
+            for entry in retransmit:
+                self.comm.retransmit(entry.seq, entry.message)
+            for entry in failed:
+                print(f"✗ Sin confirmación del ESP32: {entry.command}")
+                if self.comm.monitor:
+                    self.comm.monitor.delivery_failed(entry.command)
+            with self._cond:
+                if self._stop_event.is_set():
+                    return
+                wait = self._next_due() - time.time()
+                if wait > 0:
+                    self._cond.wait(min(wait, 1.0))
+
+    def _expire(self, now: float) -> Tuple[List[_Pending], List[_Pending]]:
+        """Comandos vencidos: (a retransmitir, perdidos)"""
+        retransmit, failed = [], []
+        with self._cond:
+            for seq, entry in list(self._pending.items()):
+                if entry.due > now:
+                    continue
+                if entry.idempotent and not entry.superseded and entry.attempts < self.max_retries:
+                    entry.attempts += 1
+                    entry.due = now + entry.deadline
+                    self.metrics["retransmits"] += 1
+                    retransmit.append(entry)
+                else:
+                    del self._pending[seq]
+                    self._settle(seq, self.FAILED)
+                    self.metrics["failed"] += 1
+                    failed.append(entry)
+        return retransmit, failed
+
+    def _next_due(self) -> float:
+        """Hora del próximo plazo (con el lock tomado)"""
+        return min((entry.due for entry in self._pending.values()), default=float("inf"))
+
+    def get_metrics(self) -> Dict:
+        """Contadores de entrega, pendientes y RTT suavizado de las confirmaciones"""
+        with self._cond:
+            return dict(self.metrics, pending=len(self._pending),
+                        srtt_ms=self.srtt * 1000 if self.srtt is not None else None)
@@ -0,0 +1,256 @@
+"""
+Módulo de descubrimiento del ESP32 en la red
+
+Cuando los carritos se unen a un router compartido su IP ya no es la fija del
+modo AP (192.168.4.1). El descubrimiento prueba, en orden, lo más barato primero:
+
+1. la última dirección conocida (caché con TTL) y la de config.ESP32_IP
+2. un anuncio UDP por broadcast: "CARRITO?" -> "CARRITO:<puerto>:<nombre>"
+3. un barrido de la subred con asyncio: muchas conexiones TCP a la vez
+   (acotadas por un semáforo), cada una con un timeout corto que incluye la
+   respuesta a GET_SPEED
+
+Una dirección solo cuenta como carrito si responde GET_SPEED con una línea
+SPEED:; un puerto abierto cualquiera (una impresora, un router) no basta. Con
+DISCOVERY_CONCURRENCY sondeos simultáneos, una /24 en la que ningún equipo
+responde tarda unas pocas veces DISCOVERY_TIMEOUT, no 254.
+"""
+
+import os
+import json
+import time
+import socket
+import asyncio
+import ipaddress
+from typing import List, Optional, Tuple
+import config
+
+
+class DiscoveredCar:
+    """Un ESP32 que respondió como carrito"""
+
+    CACHE = "cache"
+    BROADCAST = "broadcast"
+    SCAN = "scan"
+
+    __slots__ = ("ip", "port", "rtt", "source", "name")
+
+    def __init__(self, ip: str, port: int, rtt: float, source: str, name: str = ""):
+        self.ip = ip
+        self.port = port
+        self.rtt = rtt  # s - Conexión más respuesta a GET_SPEED (o al anuncio)
+        self.source = source
+        self.name = name
+
+    def __repr__(self):
+        return f"DiscoveredCar({self.ip}:{self.port} {self.source} {self.rtt * 1000:.1f} ms)"
+
+
+class DiscoveryCache:
+    """Última dirección conocida del carrito, guardada en disco con un TTL"""
+
+    def __init__(self, path: str = config.DISCOVERY_CACHE_FILE, ttl: float = config.DISCOVERY_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+
+    def get(self, now: Optional[float] = None) -> Optional[Tuple[str, int]]:
+        """(ip, puerto) si hay una dirección vigente"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (now or time.time()) - entry.get("seen_at", 0) > self.ttl:
+            return None
+        return entry["ip"], entry["port"]
+
+    def put(self, ip: str, port: int, now: Optional[float] = None):
+        """Guarda la dirección (se llama al conectar con éxito)"""
+        entry = {"ip": ip, "port": port, "seen_at": now or time.time()}
+        temporary = self.path + ".tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            print(f"⚠ No se pudo guardar la dirección del ESP32: {e}")
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def local_subnet() -> str:
+    """La /24 de la interfaz con la que la PC sale a la red"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        try:
+            # connect() en UDP no envía nada: solo elige la interfaz de salida
+            probe.connect(("10.255.255.255", 1))
+            ip = probe.getsockname()[0]
+        except OSError:
+            ip = "127.0.0.1"
+    return str(ipaddress.ip_network(f"{ip}/24", strict=False))
+
+
+async def _fingerprint(ip: str, port: int) -> Optional[float]:
+    """Conecta, envía GET_SPEED y espera una línea SPEED:; devuelve la velocidad"""
+    reader, writer = await asyncio.open_connection(ip, port)
+    try:
+        writer.write(b"GET_SPEED\n")
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                return None
+            # Antes de la respuesta puede llegar telemetría (DIST:, SPEED: periódico)
+            text = line.decode(errors="replace").strip()
+            if text.startswith("SPEED:"):
+                return float(text[6:].partition(":")[0])
+    finally:
+        writer.close()
+
+
+async def _probe(ip: str, port: int, timeout: float, semaphore: asyncio.Semaphore) -> Optional[DiscoveredCar]:
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            speed = await asyncio.wait_for(_fingerprint(ip, port), timeout)
+        except (OSError, ValueError, asyncio.TimeoutError):
+            return None
+        if speed is None:
+            return None
+        return DiscoveredCar(ip, port, time.perf_counter() - start, DiscoveredCar.SCAN)
+
+
+class _AnnounceProtocol(asyncio.DatagramProtocol):
+    """Junta las respuestas "CARRITO:<puerto>:<nombre>" al anuncio"""
+
+    def __init__(self, sent_at: float):
+        self.sent_at = sent_at
+        self.found: List[DiscoveredCar] = []
+
+    def datagram_received(self, data: bytes, address):
+        text = data.decode(errors="replace").strip()
+        if not text.startswith("CARRITO:"):
+            return
+        port, _, name = text[8:].partition(":")
+        try:
+            car = DiscoveredCar(address[0], int(port), time.perf_counter() - self.sent_at,
+                                DiscoveredCar.BROADCAST, name)
+        except ValueError:
+            return
+        if all(known.ip != car.ip for known in self.found):
+            self.found.append(car)
+
+
+class ESP32Discovery:
+    """Busca carritos en la red: caché, anuncio UDP y barrido de la subred"""
+
+    def __init__(self, port: int = config.ESP32_PORT, cache: Optional[DiscoveryCache] = None,
+                 concurrency: int = config.DISCOVERY_CONCURRENCY,
+                 timeout: float = config.DISCOVERY_TIMEOUT,
+                 announce_port: int = config.DISCOVERY_UDP_PORT,
+                 announce_timeout: float = config.DISCOVERY_ANNOUNCE_TIMEOUT):
+        """
+        Args:
+            port: Puerto TCP del servidor del carrito
+            cache: Última dirección conocida (por defecto la de config)
+            concurrency: Sondeos TCP simultáneos en el barrido
+            timeout: Tiempo máximo por dirección (conexión más GET_SPEED)
+            announce_port / announce_timeout: Puerto UDP y espera del anuncio
+        """
+        self.port = port
+        self.cache = cache or DiscoveryCache()
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.announce_port = announce_port
+        self.announce_timeout = announce_timeout
+
+    # -------------------------
+    # Corrutinas
+    # -------------------------
+    async def probe_async(self, hosts: List[str], port: Optional[int] = None) -> List[DiscoveredCar]:
+        """Sondea las direcciones a la vez; devuelve los carritos por RTT creciente"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(
+            *(_probe(host, port or self.port, self.timeout, semaphore) for host in hosts)
+        )
+        return sorted((car for car in results if car), key=lambda car: car.rtt)
+
+    async def scan_async(self, subnet: Optional[str] = None) -> List[DiscoveredCar]:
+        """Barre todas las direcciones de la subred"""
+        network = ipaddress.ip_network(subnet or config.DISCOVERY_SUBNET or local_subnet(), strict=False)
+        return await self.probe_async([str(host) for host in network.hosts()])
+
+    async def announce_async(self, address: str = "255.255.255.255") -> List[DiscoveredCar]:
+        """Envía el anuncio UDP y junta las respuestas durante announce_timeout"""
+        loop = asyncio.get_running_loop()
+        try:
+            transport, protocol = await loop.create_datagram_endpoint(
+                lambda: _AnnounceProtocol(time.perf_counter()),
+                local_addr=("0.0.0.0", 0), allow_broadcast=True
+            )
+        except OSError:
+            return []
+        try:
+            protocol.sent_at = time.perf_counter()
+            transport.sendto(b"CARRITO?", (address, self.announce_port))
+            await asyncio.sleep(self.announce_timeout)
+        except OSError:
+            pass
+        finally:
+            transport.close()
+        return protocol.found
+
+    # -------------------------
+    # Uso desde código síncrono (GUI, pruebas)
+    # -------------------------
+    def probe(self, ip: str, port: Optional[int] = None) -> Optional[DiscoveredCar]:
+        found = asyncio.run(self.probe_async([ip], port))
+        return found[0] if found else None
+
+    def scan(self, subnet: Optional[str] = None) -> List[DiscoveredCar]:
+        return asyncio.run(self.scan_async(subnet))
+
+    def announce(self, address: str = "255.255.255.255") -> List[DiscoveredCar]:
+        return asyncio.run(self.announce_async(address))
+
+    def locate(self, subnet: Optional[str] = None) -> Optional[DiscoveredCar]:
+        """
+        Encuentra un carrito probando primero lo más barato
+        Returns:
+            El carrito más cercano (menor RTT), o None si no respondió ninguno
+        """
+        return asyncio.run(self._locate(subnet))
+
+    async def _locate(self, subnet: Optional[str]) -> Optional[DiscoveredCar]:
+        # 1. Última dirección conocida y la fija del modo AP, a la vez
+        candidates = []
+        cached = self.cache.get()
+        if cached:
+            candidates.append(cached)
+        if (config.ESP32_IP, self.port) not in candidates:
+            candidates.append((config.ESP32_IP, self.port))
+        semaphore = asyncio.Semaphore(len(candidates))
+        probes = [asyncio.ensure_future(_probe(ip, port, self.timeout, semaphore)) for ip, port in candidates]
+        try:
+            # El primero que responda gana; no se espera el timeout de los demás
+            for finished in asyncio.as_completed(probes):
+                car = await finished
+                if car:
+                    car.source = DiscoveredCar.CACHE
+                    return car
+        finally:
+            for probe in probes:
+                probe.cancel()
+
+        # 2. Anuncio UDP: el firmware responde sin abrir una conexión TCP
+        announced = await self.announce_async()
+        if announced:
+            return min(announced, key=lambda car: car.rtt)
+
+        # 3. Barrido de la subred
+        scanned = await self.scan_async(subnet)
+        return scanned[0] if scanned else None
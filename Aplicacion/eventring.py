@@ -0,0 +1,151 @@
+"""
+Anillo de eventos en memoria compartida entre dos procesos
+
+Un productor (el proceso de comunicación) y un consumidor (la GUI) comparten
+un bloque de `multiprocessing.shared_memory` con ranuras de tamaño fijo. El
+productor escribe la ranura y después avanza el índice de escritura; el
+consumidor lee la ranura y después avanza el de lectura. Cada índice tiene un
+solo escritor, así que no hace falta ningún lock entre procesos; si en el
+proceso productor escriben varios hilos, deben serializar put() entre ellos
+(CommunicationWorker.publish).
+
+Si el anillo está lleno el evento nuevo se descarta y se cuenta: el productor
+nunca espera al consumidor (una GUI trabada no debe frenar la lectura del
+socket ni el STOP de seguridad).
+
+Distribución del bloque (little endian):
+
+    0   4s  magia b"ERNG"
+    4   I   versión
+    8   I   cantidad de ranuras
+    12  I   tamaño de ranura (bytes, incluye la longitud)
+    16  Q   índice de escritura (solo lo avanza el productor)
+    24  Q   índice de lectura (solo lo avanza el consumidor)
+    32  Q   descartados por anillo lleno
+    40  Q   descartados por no caber en una ranura
+    64      ranuras: I longitud + datos (pickle)
+"""
+
+import pickle
+import struct
+from multiprocessing import shared_memory
+from typing import Any, List, Optional
+
+_MAGIC = b"ERNG"
+_VERSION = 1
+_HEADER = struct.Struct("<4sIII")
+_INDEX = struct.Struct("<Q")
+_LENGTH = struct.Struct("<I")
+_WRITE, _READ, _DROPPED, _OVERSIZED = 16, 24, 32, 40
+_SLOTS_OFFSET = 64
+
+
+class EventRing:
+    """Cola SPSC de objetos serializables en memoria compartida"""
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner: bool):
+        self._memory = memory
+        self._buffer = memory.buf
+        self.owner = owner
+        magic, version, self.slots, self.slot_size = _HEADER.unpack_from(self._buffer, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Bloque {memory.name} no es un anillo de eventos v{_VERSION}")
+
+    @classmethod
+    def create(cls, slots: int, slot_size: int, name: Optional[str] = None) -> "EventRing":
+        """Reserva un anillo nuevo (lo llama el proceso que después lo libera)"""
+        memory = shared_memory.SharedMemory(name=name, create=True, size=_SLOTS_OFFSET + slots * slot_size)
+        memory.buf[:_SLOTS_OFFSET] = bytes(_SLOTS_OFFSET)
+        _HEADER.pack_into(memory.buf, 0, _MAGIC, _VERSION, slots, slot_size)
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "EventRing":
+        """Se une a un anillo existente por nombre"""
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    def _get(self, offset: int) -> int:
+        return _INDEX.unpack_from(self._buffer, offset)[0]
+
+    def _set(self, offset: int, value: int):
+        _INDEX.pack_into(self._buffer, offset, value)
+
+    # -------------------------
+    # Productor
+    # -------------------------
+    def put(self, item: Any) -> bool:
+        """Serializa y encola; False si se descartó"""
+        return self.put_bytes(pickle.dumps(item, pickle.HIGHEST_PROTOCOL))
+
+    def put_bytes(self, data: bytes) -> bool:
+        if len(data) > self.slot_size - _LENGTH.size:
+            self._set(_OVERSIZED, self._get(_OVERSIZED) + 1)
+            return False
+        write = self._get(_WRITE)
+        if write - self._get(_READ) >= self.slots:
+            self._set(_DROPPED, self._get(_DROPPED) + 1)
+            return False
+        offset = _SLOTS_OFFSET + (write % self.slots) * self.slot_size
+        _LENGTH.pack_into(self._buffer, offset, len(data))
+        self._buffer[offset + _LENGTH.size:offset + _LENGTH.size + len(data)] = data
+        # Publicar solo con la ranura completa
+        self._set(_WRITE, write + 1)
+        return True
+
+    # -------------------------
+    # Consumidor
+    # -------------------------
+    def get_bytes(self) -> Optional[bytes]:
+        read = self._get(_READ)
+        if read >= self._get(_WRITE):
+            return None
+        offset = _SLOTS_OFFSET + (read % self.slots) * self.slot_size
+        length = _LENGTH.unpack_from(self._buffer, offset)[0]
+        data = bytes(self._buffer[offset + _LENGTH.size:offset + _LENGTH.size + length])
+        self._set(_READ, read + 1)
+        return data
+
+    def get(self) -> Any:
+        """Siguiente objeto, o None si el anillo está vacío"""
+        data = self.get_bytes()
+        return None if data is None else pickle.loads(data)
+
+    def drain(self, limit: int = 256) -> List[Any]:
+        """Hasta `limit` objetos pendientes, en orden"""
+        items = []
+        while len(items) < limit:
+            data = self.get_bytes()
+            if data is None:
+                break
+            items.append(pickle.loads(data))
+        return items
+
+    # -------------------------
+    # Métricas y cierre
+    # -------------------------
+    @property
+    def pending(self) -> int:
+        return self._get(_WRITE) - self._get(_READ)
+
+    def get_metrics(self) -> dict:
+        return {
+            "written": self._get(_WRITE),
+            "read": self._get(_READ),
+            "pending": self.pending,
+            "dropped": self._get(_DROPPED),
+            "oversized": self._get(_OVERSIZED),
+        }
+
+    def close(self):
+        """Suelta la vista del bloque; el dueño además lo elimina"""
+        self._buffer.release()
+        self._memory.close()
+        if self.owner:
+            try:
+                self._memory.unlink()
+            except FileNotFoundError:
+                pass
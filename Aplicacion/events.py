@@ -0,0 +1,243 @@
+"""
+Módulo de bus de eventos publicar/suscribir
+
+Reemplaza los callbacks únicos de ESP32Communication. Cada tipo de mensaje es un
+tópico con un tipo de contenido esperado; cada tópico acepta varios suscriptores
+y cada suscriptor elige su entrega:
+
+- inline: se ejecuta en el hilo que publica (para reacciones de microsegundos)
+- queued: se encola y lo ejecuta un hilo propio del suscriptor, con una cola
+  acotada y una política de descarte, así un consumidor lento nunca frena la
+  lectura del socket
+
+Cada suscriptor lleva métricas de entregas, descartes, errores y tiempo de
+despacho.
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from protocol import (SpeedSample, DistanceSample, Ack, LogBatch, CollisionAlert, TimeReply, MacroProgress,
+                      HeartbeatReply, LinkStatus)
+
+
+class Subscription:
+    """Un suscriptor de un tópico con su modo de entrega y sus métricas"""
+    
+    INLINE = "inline"
+    QUEUED = "queued"
+    
+    DROP_OLDEST = "drop_oldest"  # Conservar lo más reciente (telemetría)
+    DROP_NEWEST = "drop_newest"  # Conservar lo más antiguo (no perder el inicio de un evento)
+    
+    def __init__(self, bus: "EventBus", topic: str, callback: Callable, mode: str,
+                 queue_size: int, drop_policy: str, name: str):
+        self.bus = bus
+        self.topic = topic
+        self.callback = callback
+        self.mode = mode
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.name = name
+        self.active = True
+        
+        # Métricas
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.dispatch_time_total = 0.0
+        self.dispatch_time_max = 0.0
+        
+        self._queue = deque()
+        self._condition = threading.Condition(threading.Lock())
+        self._thread = None
+        if mode == self.QUEUED:
+            self._thread = threading.Thread(
+                target=self._worker, name=f"bus-{topic}-{name}", daemon=True
+            )
+            self._thread.start()
+            
+    def offer(self, payload):
+        """Entrega el evento según el modo (nunca bloquea en modo queued)"""
+        if self.mode == self.INLINE:
+            self._dispatch(payload)
+            return
+        with self._condition:
+            if len(self._queue) >= self.queue_size:
+                self.dropped += 1
+                if self.drop_policy == self.DROP_NEWEST:
+                    return
+                self._queue.popleft()
+            self._queue.append(payload)
+            self._condition.notify()
+            
+    def _dispatch(self, payload):
+        """Ejecuta el callback midiendo su duración"""
+        start = time.perf_counter()
+        try:
+            self.callback(payload)
+        except Exception as e:
+            self.errors += 1
+            print(f"✗ Error en suscriptor '{self.name}' de '{self.topic}': {e}")
+        elapsed = time.perf_counter() - start
+        self.delivered += 1
+        self.dispatch_time_total += elapsed
+        if elapsed > self.dispatch_time_max:
+            self.dispatch_time_max = elapsed
+            
+    def _worker(self):
+        """Hilo que vacía la cola del suscriptor"""
+        while True:
+            with self._condition:
+                while self.active and not self._queue:
+                    self._condition.wait()
+                if not self._queue:
+                    return  # Cancelado y sin pendientes
+                payload = self._queue.popleft()
+            self._dispatch(payload)
+            
+    def cancel(self):
+        """Detiene la entrega (los eventos ya encolados se procesan)"""
+        with self._condition:
+            self.active = False
+            self._condition.notify()
+            
+    def wait_idle(self, timeout: float = 1.0) -> bool:
+        """Espera a que la cola se vacíe (útil en pruebas)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if not self._queue:
+                return True
+            time.sleep(0.001)
+        return False
+        
+    def get_metrics(self) -> Dict:
+        """Métricas de despacho del suscriptor"""
+        delivered = self.delivered
+        return {
+            "topic": self.topic,
+            "name": self.name,
+            "mode": self.mode,
+            "delivered": delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queue_depth": len(self._queue),
+            "avg_dispatch_ms": (self.dispatch_time_total / delivered * 1000) if delivered else 0.0,
+            "max_dispatch_ms": self.dispatch_time_max * 1000
+        }
+
+
+class EventBus:
+    """Bus de eventos tipado con tópicos por tipo de mensaje del ESP32"""
+    
+    # Tópicos y tipo de contenido esperado
+    SPEED = SpeedSample.TOPIC          # SpeedSample (SPEED:)
+    DISTANCE = DistanceSample.TOPIC    # DistanceSample (DIST:)
+    COLLISION = CollisionAlert.TOPIC   # CollisionAlert
+    ESP32_LOGS = LogBatch.TOPIC        # LogBatch (LOGS:)
+    ACK = Ack.TOPIC                    # Ack (OK: / ERR:)
+    TIME = TimeReply.TOPIC             # TimeReply (TIME:)
+    MACRO = MacroProgress.TOPIC        # MacroProgress (MACRO:)
+    HEARTBEAT = HeartbeatReply.TOPIC   # HeartbeatReply (HB:)
+    LINK = LinkStatus.TOPIC            # LinkStatus (estado del enlace según los latidos)
+    MESSAGE = "message"                # str: cualquier línea recibida
+    
+    TOPIC_TYPES = {
+        SPEED: SpeedSample,
+        DISTANCE: DistanceSample,
+        COLLISION: CollisionAlert,
+        ESP32_LOGS: LogBatch,
+        ACK: Ack,
+        TIME: TimeReply,
+        MACRO: MacroProgress,
+        HEARTBEAT: HeartbeatReply,
+        LINK: LinkStatus,
+        MESSAGE: str,
+    }
+    
+    def __init__(self):
+        self._subscribers: Dict[str, List[Subscription]] = {
+            topic: [] for topic in self.TOPIC_TYPES
+        }
+        self._lock = threading.Lock()  # Solo para suscribir/desuscribir
+        self.published = 0
+        
+    def register_topic(self, topic: str, payload_type: type):
+        """Registra un tópico nuevo (p. ej. un tipo de mensaje futuro)"""
+        with self._lock:
+            self.TOPIC_TYPES = dict(self.TOPIC_TYPES, **{topic: payload_type})
+            self._subscribers.setdefault(topic, [])
+            
+    def subscribe(self, topic: str, callback: Callable, mode: str = Subscription.INLINE,
+                  queue_size: int = 100, drop_policy: str = Subscription.DROP_OLDEST,
+                  name: Optional[str] = None) -> Subscription:
+        """
+        Suscribe un callback a un tópico
+        Args:
+            topic: Tópico (EventBus.SPEED, DISTANCE, COLLISION, ESP32_LOGS, ACK, TIME, MACRO, MESSAGE...)
+            callback: Función que recibe el contenido del evento
+            mode: Subscription.INLINE o Subscription.QUEUED
+            queue_size: Tamaño máximo de la cola (solo queued)
+            drop_policy: DROP_OLDEST o DROP_NEWEST cuando la cola está llena
+            name: Nombre para las métricas
+        Returns:
+            Subscription: Manejador para cancelar la suscripción
+        """
+        if topic not in self.TOPIC_TYPES:
+            raise ValueError(f"Tópico desconocido: {topic}")
+        if mode not in (Subscription.INLINE, Subscription.QUEUED):
+            raise ValueError(f"Modo de entrega inválido: {mode}")
+        subscription = Subscription(
+            self, topic, callback, mode, max(1, queue_size), drop_policy,
+            name or getattr(callback, "__name__", "suscriptor")
+        )
+        with self._lock:
+            # Copia al escribir: publish() itera sin tomar el lock
+            self._subscribers[topic] = self._subscribers[topic] + [subscription]
+        return subscription
+        
+    def unsubscribe(self, subscription: Subscription):
+        """Cancela una suscripción"""
+        with self._lock:
+            self._subscribers[subscription.topic] = [
+                s for s in self._subscribers[subscription.topic] if s is not subscription
+            ]
+        subscription.cancel()
+        
+    def publish(self, topic: str, payload=None):
+        """
+        Publica un evento a todos los suscriptores del tópico
+        Args:
+            topic: Tópico del evento
+            payload: Contenido (debe coincidir con el tipo del tópico)
+        """
+        expected = self.TOPIC_TYPES.get(topic)
+        if expected is None:
+            raise ValueError(f"Tópico desconocido: {topic}")
+        if payload is not None and not isinstance(payload, expected):
+            raise TypeError(f"El tópico '{topic}' espera {expected.__name__}, no {type(payload).__name__}")
+        self.published += 1
+        for subscription in self._subscribers[topic]:
+            subscription.offer(payload)
+            
+    def subscribers(self, topic: str) -> List[Subscription]:
+        """Suscriptores actuales de un tópico"""
+        return list(self._subscribers.get(topic, []))
+        
+    def get_metrics(self) -> List[Dict]:
+        """Métricas de todos los suscriptores"""
+        return [
+            subscription.get_metrics()
+            for subscriptions in self._subscribers.values()
+            for subscription in subscriptions
+        ]
+        
+    def close(self):
+        """Cancela todas las suscripciones"""
+        with self._lock:
+            subscriptions = [s for subs in self._subscribers.values() for s in subs]
+            for topic in self._subscribers:
+                self._subscribers[topic] = []
+        for subscription in subscriptions:
+            subscription.cancel()
@@ -2,22 +2,44 @@
 Módulo de interfaz gráfica con panel de monitoreo
 """
 
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-from typing import Callable
+from typing import Callable, Optional
 import config
+from charts import StripChart
 
 
 class ControlGUI:
     """Clase para la interfaz gráfica del control remoto con monitoreo"""
     
     def __init__(self, on_direction_callback: Callable, on_speed_callback: Callable,
-                 on_connect_callback: Callable, on_disconnect_callback: Callable):
+                 on_connect_callback: Callable, on_disconnect_callback: Callable,
+                 on_axes_callback: Optional[Callable] = None,
+                 on_ramp_callback: Optional[Callable] = None,
+                 on_ready_callback: Optional[Callable] = None,
+                 on_visibility_callback: Optional[Callable] = None):
+        """
+        Args:
+            on_axes_callback: (acelerador, giro) de -1 a 1 al arrastrar la palanca;
+                si se da, la palanca es proporcional en lugar de tres posiciones
+            on_ramp_callback: (eje, -1/0/+1) al presionar o soltar W/S/Q/E en
+                modo proporcional
+            on_ready_callback: Se llama sin argumentos cuando la ventana ya se
+                pintó y el panel de monitoreo está construido
+            on_visibility_callback: Recibe False al minimizar la ventana y True
+                al restaurarla
+        """
         self.on_direction = on_direction_callback
         self.on_speed = on_speed_callback
         self.on_connect = on_connect_callback
         self.on_disconnect = on_disconnect_callback
+        self.on_axes = on_axes_callback
+        self.on_ramp = on_ramp_callback
+        self.on_ready = on_ready_callback
+        self.on_visibility = on_visibility_callback
         
+        self.created_at = time.perf_counter()
         self.root = tk.Tk()
         self.root.title(config.WINDOW_TITLE)
         self.root.geometry(f"{config.WINDOW_WIDTH}x{config.WINDOW_HEIGHT}")
@@ -33,14 +55,24 @@ class ControlGUI:
         # Referencias para monitoreo
         self.stats_labels = {}
         self.log_text = None
+        self.charts = {}  # Gráficas de tira por nombre de serie de telemetría
+        self._monitoring_frame = None
+        self._early_log = []  # Mensajes que llegan antes de que exista el log
+        self.first_frame_at = None  # perf_counter() del primer cuadro pintado
+        self.ready_at = None  # perf_counter() con el panel de monitoreo listo
         
         # Estado de la palanca (0=neutral, 1=avanzar, -1=retroceder)
         self.joystick_position = 0
         self.joystick_canvas = None
         self.joystick_handle = None
+        self._drag_origin_x = 40  # X donde empezó el arrastre (giro proporcional)
+        self._throttle = 0.0
         
         # Manejar el cierre de la ventana
         self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
+        # Minimizar o restaurar la ventana principal
+        self.root.bind("<Unmap>", lambda event: self._on_visibility(event, False), add="+")
+        self.root.bind("<Map>", lambda event: self._on_visibility(event, True), add="+")
         
         self._setup_ui()
         self._setup_key_bindings()
@@ -56,12 +88,37 @@ class ControlGUI:
         left_frame.pack(side='left', fill='y', padx=(0, 10))
         left_frame.pack_propagate(False)
         
-        # Columna derecha: Monitoreo
-        right_frame = tk.Frame(container, bg="#34495e", relief='solid', borderwidth=2)
-        right_frame.pack(side='right', fill='both', expand=True)
+        # Columna derecha: Monitoreo (se llena después del primer cuadro)
+        self._monitoring_frame = tk.Frame(container, bg="#34495e", relief='solid', borderwidth=2)
+        self._monitoring_frame.pack(side='right', fill='both', expand=True)
         
         self._setup_control_panel(left_frame)
-        self._setup_monitoring_panel(right_frame)
+        # Los controles se pintan primero; las gráficas y el log esperan al
+        # primer Expose para no retrasar la aparición de la ventana
+        left_frame.bind('<Expose>', self._on_first_expose)
+        
+    def _on_first_expose(self, event):
+        event.widget.unbind('<Expose>')
+        if self.first_frame_at is None:
+            self.first_frame_at = time.perf_counter()
+        # El repintado de Tk también corre en idle: esto queda detrás de él
+        self.root.after_idle(self.build_monitoring_panel)
+        
+    def build_monitoring_panel(self):
+        """Construye el panel de monitoreo si aún no existe (idempotente)"""
+        if self.is_closed or self.log_text is not None:
+            return
+        try:
+            self._setup_monitoring_panel(self._monitoring_frame)
+        except tk.TclError:
+            self.is_closed = True
+            return
+        self.ready_at = time.perf_counter()
+        early, self._early_log = self._early_log, []
+        for message in early:
+            self.add_log_message(message)
+        if self.on_ready:
+            self.on_ready()
         
     def _setup_control_panel(self, parent):
         """Configura el panel de controles"""
@@ -233,7 +290,7 @@ class ControlGUI:
     
     def _on_joystick_click(self, event):
         """Maneja el click en la palanca"""
-        pass
+        self._drag_origin_x = event.x
     
     def _on_joystick_drag(self, event):
         """Maneja el arrastre de la palanca"""
@@ -246,8 +303,20 @@ class ControlGUI:
         # Mover la manija
         self.joystick_canvas.coords(self.joystick_handle, 20, y-15, 60, y+15)
         
+        # Modo proporcional: la altura es el acelerador y el desplazamiento lateral el giro
+        if self.on_axes:
+            self._throttle = (100 - y) / 65
+            steering = max(-1.0, min(1.0, (event.x - self._drag_origin_x) / 60))
+            self.on_axes(self._throttle, steering)
+            
     def _on_joystick_release(self, event):
         """Maneja cuando se suelta la palanca - se queda en posición"""
+        if self.on_axes:
+            # El acelerador se queda donde quedó; el giro vuelve al centro
+            self.on_axes(self._throttle, 0.0)
+            self._color_joystick(self._throttle)
+            return
+            
         # Obtener la posición Y actual
         coords = self.joystick_canvas.coords(self.joystick_handle)
         y_center = (coords[1] + coords[3]) / 2
@@ -286,6 +355,24 @@ class ControlGUI:
         self.joystick_canvas.coords(self.joystick_handle, 20, 85, 60, 115)
         self.joystick_canvas.itemconfig(self.joystick_handle, fill="#95a5a6", outline="#7f8c8d")
         self.joystick_position = 0
+        self._throttle = 0.0
+        
+    def _color_joystick(self, throttle: float):
+        """Color de la manija según el sentido del acelerador"""
+        if throttle > config.CONTROL_DEADZONE:
+            self.joystick_canvas.itemconfig(self.joystick_handle, fill="#27ae60", outline="#229954")
+        elif throttle < -config.CONTROL_DEADZONE:
+            self.joystick_canvas.itemconfig(self.joystick_handle, fill="#e74c3c", outline="#c0392b")
+        else:
+            self.joystick_canvas.itemconfig(self.joystick_handle, fill="#95a5a6", outline="#7f8c8d")
+        self.joystick_position = (throttle > config.CONTROL_DEADZONE) - (throttle < -config.CONTROL_DEADZONE)
+        
+    def set_throttle_display(self, throttle: float):
+        """Mueve la manija a la posición del acelerador (p. ej. con la rampa del teclado)"""
+        self._throttle = throttle
+        y = 100 - throttle * 65
+        self.joystick_canvas.coords(self.joystick_handle, 20, y-15, 60, y+15)
+        self._color_joystick(throttle)
         
     def _create_dpad(self, parent):
         """DEPRECATED - Reemplazado por _create_direction_controls"""
@@ -394,6 +481,26 @@ class ControlGUI:
         # Paquetes perdidos
         self._create_stat_row(stats_frame, "❌ Pérdida de Paquetes:", "packet_loss", "0%")
         
+        # Retransmisiones y duplicados de la entrega confiable
+        self._create_stat_row(stats_frame, "🔁 Retransmisiones:", "retransmits", "0")
+        
+        # Gráficas en tiempo real
+        charts_frame = tk.Frame(parent, bg="#34495e")
+        charts_frame.pack(fill='x', padx=10, pady=(5, 0))
+        
+        self.charts["latency"] = StripChart(
+            charts_frame, "RTT", "ms", "#3498db",
+            0, config.CHART_LATENCY_MAX_MS
+        )
+        self.charts["speed"] = StripChart(
+            charts_frame, "Velocidad real", "cm/s", "#27ae60",
+            0, 200, hold=True
+        )
+        self.charts["pwm"] = StripChart(
+            charts_frame, "PWM", "", "#f39c12",
+            config.SPEED_MIN, config.SPEED_MAX, hold=True
+        )
+        
         # Separador
         tk.Frame(parent, height=2, bg="#2c3e50").pack(fill='x', pady=8)
         
@@ -410,7 +517,7 @@ class ControlGUI:
         
         self.log_text = scrolledtext.ScrolledText(
             log_frame,
-            height=15,
+            height=8,
             width=30,
             bg="#2c3e50",
             fg="#ecf0f1",
@@ -445,6 +552,28 @@ class ControlGUI:
         
     def _setup_key_bindings(self):
         """Configura los atajos de teclado"""
+        if self.on_ramp:
+            # Modo proporcional: mantener la tecla mueve el eje en rampa
+            for key, axis, direction in (("w", "throttle", 1), ("s", "throttle", -1),
+                                         ("q", "steering", -1), ("e", "steering", 1)):
+                for name in (key, key.upper()):
+                    self.root.bind(f'<KeyPress-{name}>', lambda e, a=axis, d=direction: self.on_ramp(a, d))
+                    self.root.bind(f'<KeyRelease-{name}>', lambda e, a=axis: self.on_ramp(a, 0))
+        else:
+            self._setup_direction_keys()
+            
+        # Freno con espacio
+        self.root.bind('<space>', lambda e: self._handle_brake())
+        
+        # Velocidad
+        self.root.bind('1', lambda e: self._handle_speed_change(config.CMD_SPEED_LOW))
+        self.root.bind('2', lambda e: self._handle_speed_change(config.CMD_SPEED_HIGH))
+        self.root.bind('+', lambda e: self._handle_speed_change(config.CMD_SPEED_UP))
+        self.root.bind('=', lambda e: self._handle_speed_change(config.CMD_SPEED_UP))
+        self.root.bind('-', lambda e: self._handle_speed_change(config.CMD_SPEED_DOWN))
+        
+    def _setup_direction_keys(self):
+        """Palanca de tres posiciones y giros con el teclado"""
         # Palanca con W/S
         self.root.bind('<w>', lambda e: self._set_joystick_position(1))
         self.root.bind('<W>', lambda e: self._set_joystick_position(1))
@@ -456,16 +585,6 @@ class ControlGUI:
         self.root.bind('<Q>', lambda e: self.on_direction(config.CMD_LEFT))
         self.root.bind('<e>', lambda e: self.on_direction(config.CMD_RIGHT))
         self.root.bind('<E>', lambda e: self.on_direction(config.CMD_RIGHT))
-        
-        # Freno con espacio
-        self.root.bind('<space>', lambda e: self._handle_brake())
-        
-        # Velocidad
-        self.root.bind('1', lambda e: self._handle_speed_change(config.CMD_SPEED_LOW))
-        self.root.bind('2', lambda e: self._handle_speed_change(config.CMD_SPEED_HIGH))
-        self.root.bind('+', lambda e: self._handle_speed_change(config.CMD_SPEED_UP))
-        self.root.bind('=', lambda e: self._handle_speed_change(config.CMD_SPEED_UP))
-        self.root.bind('-', lambda e: self._handle_speed_change(config.CMD_SPEED_DOWN))
     
     def _set_joystick_position(self, position):
         """Establece la posición de la palanca mediante teclado"""
@@ -502,6 +621,11 @@ class ControlGUI:
         
         self.on_speed(speed_cmd)
     
+    def _on_visibility(self, event, visible: bool):
+        # Los enlaces de la ventana principal también reciben los eventos de sus widgets
+        if event.widget is self.root and self.on_visibility:
+            self.on_visibility(visible)
+            
     def _on_closing(self):
         """Maneja el cierre de la ventana"""
         self.is_closed = True
@@ -526,6 +650,22 @@ class ControlGUI:
         except tk.TclError:
             self.is_closed = True
             
+    def update_link_status(self, state: str):
+        """Refleja en el indicador de conexión el estado del enlace según los latidos"""
+        if self.is_closed:
+            return
+            
+        texts = {
+            "ok": ("● Conectado", "#27ae60"),
+            "degraded": ("● Enlace degradado", "#f39c12"),
+            "lost": ("● Enlace perdido", "#e74c3c"),
+        }
+        text, color = texts.get(state, texts["ok"])
+        try:
+            self.connection_status_label.config(text=text, fg=color)
+        except tk.TclError:
+            self.is_closed = True
+            
     def update_speed_display(self, current_speed: float, max_speed: float = 200.0):
         """Actualiza el display de velocidad real del MPU6050 (en cm/s)"""
         if self.is_closed or self.speed_display_label is None:
@@ -574,7 +714,7 @@ class ControlGUI:
     
     def update_statistics(self, stats: dict):
         """Actualiza todas las estadísticas de monitoreo"""
-        if self.is_closed:
+        if self.is_closed or not self.stats_labels:
             return
         
         try:
@@ -601,6 +741,11 @@ class ControlGUI:
             packet_loss = reliability.get("packet_loss", 0)
             self.stats_labels["packet_loss"].config(text=f"{packet_loss:.1f}%")
             
+            # Retransmisiones (y cuántas llegaron repetidas al carrito)
+            retransmits = reliability.get("retransmits", 0)
+            duplicates = reliability.get("duplicates", 0)
+            self.stats_labels["retransmits"].config(text=f"{retransmits} ({duplicates} dup.)")
+            
             # Cambiar colores según umbrales
             if avg_lat > config.LATENCY_WARNING_MS:
                 self.stats_labels["latency"].config(fg="#e74c3c")
@@ -615,9 +760,28 @@ class ControlGUI:
         except tk.TclError:
             self.is_closed = True
     
+    def update_charts(self, history, now: float = None):
+        """
+        Agrega a las gráficas las muestras nuevas del historial y dibuja un cuadro
+        Args:
+            history: TelemetryHistory con las series latency, speed y pwm
+            now: Tiempo actual (por defecto, time.time())
+        """
+        if self.is_closed:
+            return
+            
+        try:
+            for name, chart in self.charts.items():
+                chart.update(history, name, now)
+        except tk.TclError:
+            self.is_closed = True
+            
     def add_log_message(self, message: str):
         """Agrega un mensaje al log"""
-        if self.is_closed or self.log_text is None:
+        if self.is_closed:
+            return
+        if self.log_text is None:
+            self._early_log.append(message)
             return
             
         try:
@@ -630,6 +794,7 @@ class ControlGUI:
             
     def clear_log(self):
         """Limpia el log de comunicación"""
+        self._early_log.clear()
         if self.is_closed or self.log_text is None:
             return
             
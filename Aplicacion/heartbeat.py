@@ -0,0 +1,176 @@
+"""
+Módulo de latidos de la aplicación para detectar un enlace muerto
+
+Con WiFi, un enlace caído puede tardar muchos segundos en hacer fallar
+`sendall` o `recv` mientras el carrito sigue con el último comando. La PC envía
+HB:<seq> cada HEARTBEAT_INTERVAL y el firmware responde cada uno con el mismo
+HB:<seq>; el tiempo desde la última respuesta da el estado del enlace:
+
+- ok: las respuestas llegan
+- degraded: más de HEARTBEAT_DEGRADED_AFTER sin respuesta
+- lost: más de HEARTBEAT_LOST_AFTER sin respuesta (el control se neutraliza)
+
+El hilo no revisa a intervalos fijos: duerme hasta el próximo latido o hasta el
+próximo plazo de cambio de estado, lo que ocurra primero, así la detección no
+depende del periodo de los latidos. Del lado del carrito, el firmware detiene
+los motores si deja de recibir latidos (deadman) aunque la PC nunca se entere.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+import config
+from events import EventBus
+from protocol import HeartbeatReply, LinkStatus
+
+
+class LinkWatchdog:
+    """Hilo que envía latidos y clasifica el enlace según sus respuestas"""
+
+    MAX_PENDING = 64  # Latidos sin respuesta recordados para medir el RTT
+
+    def __init__(self, comm, interval: float = config.HEARTBEAT_INTERVAL,
+                 degraded_after: float = config.HEARTBEAT_DEGRADED_AFTER,
+                 lost_after: float = config.HEARTBEAT_LOST_AFTER):
+        """
+        Args:
+            comm: ESP32Communication (bus de eventos, envío y monitor)
+            interval: Segundos entre latidos
+            degraded_after: Silencio (s) a partir del cual el enlace está degradado
+            lost_after: Silencio (s) a partir del cual el enlace está perdido
+        """
+        self.comm = comm
+        self.interval = interval
+        self.degraded_after = degraded_after
+        self.lost_after = lost_after
+
+        self.state = LinkStatus.OK
+        self.last_reply = 0.0  # Hora de la PC de la última respuesta
+        self.beats_sent = 0
+        self.replies = 0
+        self.missed = 0  # Latidos sin respuesta dentro de lost_after
+
+        self._seq = 0
+        self._pending: "OrderedDict[int, float]" = OrderedDict()  # seq -> hora de envío
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._subscription = comm.events.subscribe(EventBus.HEARTBEAT, self._on_reply, name="link_watchdog")
+
+    def start(self):
+        """Inicia los latidos (se llama al conectar)"""
+        self.stop()
+        with self._lock:
+            self.state = LinkStatus.OK
+            self.last_reply = time.time()  # La conexión recién abierta cuenta como respuesta
+            self._pending.clear()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="link-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene los latidos"""
+        self._stop_event.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def _run(self):
+        next_beat = time.time()
+        while not self._stop_event.is_set():
+            now = time.time()
+            if not self.comm.is_connected():
+                self._set_state(LinkStatus.LOST, now)
+                return
+            if now >= next_beat:
+                self._beat(now)
+                next_beat = max(next_beat + self.interval, now)
+            self._evaluate(now)
+            if self._stop_event.wait(max(0.0, min(next_beat, self._next_deadline()) - time.time())):
+                return
+
+    def _beat(self, now: float):
+        with self._lock:
+            self._seq = self._seq % 0xFFFF + 1
+            seq = self._seq
+            self._pending[seq] = now
+            if len(self._pending) > self.MAX_PENDING:
+                self._pending.popitem(last=False)
+            self.beats_sent += 1
+        self.comm.send_heartbeat(seq)
+
+    def _next_deadline(self) -> float:
+        """Hora del próximo cambio de estado posible si no llega ninguna respuesta"""
+        if self.state == LinkStatus.OK:
+            return self.last_reply + self.degraded_after
+        if self.state == LinkStatus.DEGRADED:
+            return self.last_reply + self.lost_after
+        return float("inf")
+
+    def _evaluate(self, now: float):
+        """Clasifica el enlace según el silencio y descarta los latidos vencidos"""
+        with self._lock:
+            while self._pending:
+                sent = next(iter(self._pending.values()))
+                if now - sent < self.lost_after:
+                    break
+                self._pending.popitem(last=False)
+                self.missed += 1
+            silence = now - self.last_reply
+            if silence >= self.lost_after:
+                status = self._transition(LinkStatus.LOST, now)
+            elif silence >= self.degraded_after:
+                status = self._transition(LinkStatus.DEGRADED, now)
+            else:
+                status = None
+        self._announce(status)
+
+    def _on_reply(self, reply: HeartbeatReply):
+        with self._lock:
+            sent = self._pending.pop(reply.seq, None)
+            # Un eco tardío de un latido ya vencido también prueba que el enlace volvió
+            status = self._transition(LinkStatus.OK, reply.received_at)
+            if status is not None:
+                self._pending.clear()  # Los ecos retenidos durante el corte no miden el RTT
+            self.last_reply = max(self.last_reply, reply.received_at)
+            self.replies += 1
+        if sent is not None and status is None and self.comm.monitor:
+            self.comm.monitor.heartbeat_received(reply.received_at - sent)
+        self._announce(status)
+
+    def _set_state(self, state: str, now: float):
+        with self._lock:
+            status = self._transition(state, now)
+        self._announce(status)
+
+    def _transition(self, state: str, now: float) -> Optional[LinkStatus]:
+        """Cambia de estado (con el lock tomado); None si ya estaba en ese estado"""
+        previous = self.state
+        if state == previous:
+            return None
+        self.state = state
+        return LinkStatus(state, previous, now - self.last_reply, now)
+
+    def _announce(self, status: Optional[LinkStatus]):
+        if status is None:
+            return
+        if self.comm.monitor:
+            self.comm.monitor.link_state_changed(status)
+        self.comm.events.publish(EventBus.LINK, status)
+
+    def get_status(self) -> Dict:
+        """Estado del enlace y contadores de latidos"""
+        with self._lock:
+            return {
+                "state": self.state,
+                "silence_ms": (time.time() - self.last_reply) * 1000 if self.last_reply else 0.0,
+                "beats_sent": self.beats_sent,
+                "replies": self.replies,
+                "missed": self.missed,
+            }
+
+    def close(self):
+        """Detiene el hilo y cancela la suscripción"""
+        self.stop()
+        self.comm.events.unsubscribe(self._subscription)
@@ -0,0 +1,262 @@
+"""
+Módulo de maniobras programadas
+
+Una maniobra es una secuencia de pasos (comando, PWM, duración) como
+"adelante 1 s, izquierda 300 ms, adelante 2 s, detener". Hay dos formas de
+ejecutarla:
+
+- en el carrito: se compila en una sola trama MACRO:<id>:<cmd>,<pwm>,<ms>;...
+  que el firmware ejecuta con su propio reloj y reporta con
+  MACRO:STEP / MACRO:DONE / MACRO:ABORT
+- desde la PC: cada paso es un send_command temporizado aquí, con un viaje por
+  WiFi por paso (la forma anterior, para comparar)
+
+Cualquier STOP (del usuario, del guardián de TTC o por colisión) aborta la
+maniobra en el carrito; al terminar el último paso el carrito se detiene.
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+import config
+from events import EventBus
+from protocol import Ack, MacroProgress
+
+
+class ManeuverStep:
+    """Un paso de maniobra: comando de movimiento, PWM y duración"""
+
+    __slots__ = ("command", "pwm", "duration")
+
+    def __init__(self, command: str, pwm: int, duration: float):
+        """
+        Args:
+            command: FORWARD, BACKWARD, LEFT, RIGHT o STOP
+            pwm: Velocidad del paso (0-255)
+            duration: Segundos hasta el paso siguiente
+        """
+        if command not in config.MACRO_COMMANDS:
+            raise ValueError(f"Comando no válido en una maniobra: {command}")
+        if not config.SPEED_MIN <= pwm <= config.SPEED_MAX:
+            raise ValueError(f"PWM fuera de rango: {pwm}")
+        if not 0 <= duration <= config.MACRO_MAX_STEP_DURATION:
+            raise ValueError(f"Duración fuera de rango: {duration}")
+        self.command = command
+        self.pwm = int(pwm)
+        self.duration = duration
+
+    def __repr__(self):
+        return f"ManeuverStep({self.command}, {self.pwm}, {self.duration:.3f}s)"
+
+
+def compile_maneuver(macro_id: int, steps: List[ManeuverStep]) -> str:
+    """Trama MACRO: con los pasos de la maniobra (duraciones en ms)"""
+    if not steps:
+        raise ValueError("La maniobra no tiene pasos")
+    if len(steps) > config.MACRO_MAX_STEPS:
+        raise ValueError(f"La maniobra excede {config.MACRO_MAX_STEPS} pasos")
+    body = ";".join(f"{step.command},{step.pwm},{round(step.duration * 1000)}" for step in steps)
+    return f"{config.CMD_MACRO}:{macro_id}:{body}"
+
+
+class ManeuverRun:
+    """Una ejecución de maniobra con el momento real de cada paso"""
+
+    ON_DEVICE = "device"
+    HOST_TIMED = "host"
+
+    RUNNING = "running"
+    DONE = "done"
+    ABORTED = "aborted"
+    FAILED = "failed"
+
+    def __init__(self, run_id: int, steps: List[ManeuverStep], mode: str):
+        self.run_id = run_id
+        self.steps = steps
+        self.mode = mode
+        self.state = self.RUNNING
+        self.aborted_step: Optional[int] = None
+
+        # Inicio planificado de cada paso y del final, relativo al primero (s)
+        self.planned = []
+        offset = 0.0
+        for step in steps:
+            self.planned.append(offset)
+            offset += step.duration
+        self.planned.append(offset)
+
+        # Inicio real de cada paso y del final. En el carrito es su reloj (el que
+        # ejecuta); desde la PC se estima con la confirmación menos medio RTT
+        self.times: List[Optional[float]] = [None] * (len(steps) + 1)
+        self._finished = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    def mark(self, index: int, timestamp: float):
+        if 0 <= index < len(self.times):
+            self.times[index] = timestamp
+
+    def finish(self, state: str, timestamp: Optional[float] = None, step: Optional[int] = None):
+        if self.finished:
+            return
+        self.state = state
+        if state == self.DONE and timestamp is not None:
+            self.mark(len(self.steps), timestamp)
+        elif state == self.ABORTED:
+            self.aborted_step = step
+        self._finished.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que termine; devuelve False si se agotó el tiempo"""
+        return self._finished.wait(timeout)
+
+    def step_errors(self) -> List[Optional[float]]:
+        """
+        Error de temporización de cada paso después del primero y del final
+        Returns:
+            (inicio real - inicio planificado) en s, relativo al primer paso;
+            None donde no se conoce el momento real
+        """
+        start = self.times[0]
+        if start is None:
+            return [None] * len(self.steps)
+        return [
+            None if actual is None else (actual - start) - planned
+            for actual, planned in zip(self.times[1:], self.planned[1:])
+        ]
+
+    def __repr__(self):
+        return f"ManeuverRun(#{self.run_id} {self.mode} {self.state})"
+
+
+class ManeuverExecutor:
+    """Envía maniobras al carrito y sigue su avance con el bus de eventos"""
+
+    def __init__(self, comm, rtt_provider: Optional[Callable[[], float]] = None,
+                 on_progress: Optional[Callable[[ManeuverRun, MacroProgress], None]] = None):
+        """
+        Args:
+            comm: ESP32Communication (bus de eventos y envío de comandos)
+            rtt_provider: Devuelve el RTT medido en segundos (para el modo PC)
+            on_progress: Se llama con cada evento MACRO: de una maniobra conocida
+        """
+        self.comm = comm
+        self.rtt_provider = rtt_provider or (lambda: 0.0)
+        self.on_progress = on_progress
+        self.runs: Dict[int, ManeuverRun] = {}
+        self.current: Optional[ManeuverRun] = None
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+        # Modo PC: hilo temporizador y confirmaciones esperadas (ejecución, índice, comando)
+        self._cancel = threading.Event()
+        self._host_thread: Optional[threading.Thread] = None
+        self._pending_acks = deque()
+
+        self._subscriptions = [
+            comm.events.subscribe(EventBus.MACRO, self._on_progress, name="maneuver_progress"),
+            comm.events.subscribe(EventBus.ACK, self._on_ack, name="maneuver_ack"),
+        ]
+
+    def _new_run(self, steps: List[ManeuverStep], mode: str) -> ManeuverRun:
+        with self._lock:
+            run = ManeuverRun(self._next_id, steps, mode)
+            self._next_id = self._next_id % 0xFFFF + 1
+            self.runs[run.run_id] = run
+            if len(self.runs) > 50:
+                self.runs.pop(next(iter(self.runs)))
+            self.current = run
+        return run
+
+    def run(self, steps: List[ManeuverStep]) -> ManeuverRun:
+        """Ejecuta la maniobra en el carrito con una sola trama MACRO:"""
+        self.cancel()
+        run = self._new_run(steps, ManeuverRun.ON_DEVICE)
+        if not self.comm.send_command(compile_maneuver(run.run_id, steps)):
+            run.finish(ManeuverRun.FAILED)
+        return run
+
+    def run_host_timed(self, steps: List[ManeuverStep]) -> ManeuverRun:
+        """Ejecuta la maniobra enviando cada paso desde la PC (un viaje por paso)"""
+        self.cancel()
+        run = self._new_run(steps, ManeuverRun.HOST_TIMED)
+        self._cancel.clear()
+        self._host_thread = threading.Thread(target=self._run_host, args=(run,), daemon=True)
+        self._host_thread.start()
+        return run
+
+    def _run_host(self, run: ManeuverRun):
+        start = time.perf_counter()
+        pwm = None
+        for index, step in enumerate(run.steps):
+            if self._cancel.wait(max(0.0, start + run.planned[index] - time.perf_counter())):
+                run.finish(ManeuverRun.ABORTED, step=index)
+                return
+            if step.command != config.CMD_STOP and step.pwm != pwm:
+                self.comm.send_command(f"SPEED_SET:{step.pwm}")
+                pwm = step.pwm
+            self._pending_acks.append((run, index, step.command))
+            if not self.comm.send_command(step.command):
+                run.finish(ManeuverRun.FAILED)
+                return
+        if self._cancel.wait(max(0.0, start + run.planned[-1] - time.perf_counter())):
+            run.finish(ManeuverRun.ABORTED, step=len(run.steps) - 1)
+            return
+        # Igual que el firmware: el carrito queda detenido al terminar
+        self._pending_acks.append((run, len(run.steps), config.CMD_STOP))
+        self.comm.send_command(config.CMD_STOP)
+
+    def _on_ack(self, ack: Ack):
+        if ack.detail.startswith(config.CMD_MACRO):
+            # OK:MACRO:<id> (aceptada) o ERR:MACRO:<id> (trama rechazada)
+            run = self.runs.get(int(ack.detail.rpartition(":")[2] or 0))
+            if run is not None and not ack.ok:
+                run.finish(ManeuverRun.FAILED)
+            return
+        pending = self._pending_acks
+        while pending:
+            run, index, command = pending.popleft()
+            if command != ack.detail:
+                continue  # Confirmación perdida o paso repetido que no se envió
+            run.mark(index, ack.received_at - self.rtt_provider() / 2)
+            if index == len(run.steps):
+                run.finish(ManeuverRun.DONE)
+            break
+
+    def _on_progress(self, progress: MacroProgress):
+        run = self.runs.get(progress.macro_id)
+        if run is None or run.mode != ManeuverRun.ON_DEVICE:
+            return
+        if progress.kind == MacroProgress.STEP:
+            run.mark(progress.step, progress.device_time)
+        elif progress.kind == MacroProgress.DONE:
+            run.finish(ManeuverRun.DONE, progress.device_time)
+        else:
+            run.finish(ManeuverRun.ABORTED, step=progress.step)
+        if self.on_progress:
+            self.on_progress(run, progress)
+
+    def cancel(self):
+        """Detiene el temporizador del modo PC (el firmware aborta solo con STOP)"""
+        self._cancel.set()
+        thread = self._host_thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+        self._host_thread = None
+        self._pending_acks.clear()
+
+    def abort(self):
+        """Aborta la maniobra en curso en cualquiera de los dos modos"""
+        self.cancel()
+        self.comm.send_command(config.CMD_STOP)
+
+    def get_run(self, run_id: int) -> Optional[ManeuverRun]:
+        return self.runs.get(run_id)
+
+    def close(self):
+        self.cancel()
+        for subscription in self._subscriptions:
+            self.comm.events.unsubscribe(subscription)
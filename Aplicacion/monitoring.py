@@ -1,174 +1,516 @@
 """
 Módulo de monitoreo y estadísticas de comunicación
+
+Los contadores se escriben desde dos hilos (el hilo de Tk envía comandos y el
+hilo de escucha recibe respuestas). Cada hilo escritor tiene su propio shard de
+contadores protegido por un seqlock: el escritor nunca se bloquea y los lectores
+obtienen una instantánea consistente reintentando si coinciden con una escritura.
 """
 
 import time
+import threading
 from collections import deque
-from typing import List, Dict
+from typing import List, Dict, Optional
 import config
+from protocol import LinkStatus
+from telemetry import TelemetryHistory
+from scheduler import SYSTEM_CLOCK
+
+
+class _CounterShard:
+    """Contadores de un único hilo escritor protegidos por un seqlock"""
+    
+    # Contadores que se suman entre shards
+    COUNTERS = (
+        "commands_sent", "responses_received", "commands_failed",
+        "bytes_sent", "bytes_received",
+        "heartbeats_sent", "link_degraded", "link_lost",
+        "commands_acked", "retransmits", "delivery_failures", "duplicates"
+    )
+    # Historiales acotados (deque) que se concatenan entre shards
+    SERIES = ("heartbeat_rtts", "detection_latencies", "outages", "ack_rtts")
+    # Valores puntuales: en la instantánea gana el shard más reciente
+    SCALARS = ("last_command_time", "last_response_time", "link_state", "link_change_time")
+    
+    __slots__ = (
+        ("generation", "seq", "latencies", "latency_index", "latency_count")
+        + COUNTERS + SERIES + SCALARS
+    )
+    
+    def __init__(self, generation: int, history_size: int):
+        self.generation = generation
+        self.seq = 0  # Impar = escritura en curso
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        for name in self.SERIES:
+            setattr(self, name, deque(maxlen=history_size))
+        self.last_command_time = 0.0
+        self.last_response_time = 0.0
+        self.link_state = LinkStatus.OK
+        self.link_change_time = 0.0
+        # Buffer circular de latencias respaldado por una lista fija
+        self.latencies = [0.0] * history_size
+        self.latency_index = 0
+        self.latency_count = 0
+        
+    def read(self) -> Dict:
+        """
+        Lee una copia consistente del shard
+        Returns:
+            Dict: Contadores, valores puntuales, historiales y latencias en orden cronológico
+        """
+        while True:
+            start = self.seq
+            if start & 1:
+                time.sleep(0)  # Ceder el GIL para que el escritor termine
+                continue
+            values = {name: getattr(self, name) for name in self.COUNTERS + self.SCALARS}
+            for name in self.SERIES:
+                values[name] = list(getattr(self, name))
+            latencies, index, count = self.latencies[:], self.latency_index, self.latency_count
+            if self.seq == start:
+                break
+            time.sleep(0)
+            
+        if count < len(latencies):
+            values["latencies"] = latencies[:count]
+        else:
+            values["latencies"] = latencies[index:] + latencies[:index]
+        return values
 
 
 class CommunicationMonitor:
     """Clase para monitorear estadísticas de comunicación"""
     
-    def __init__(self):
-        # Estadísticas de latencia
-        self.latency_history = deque(maxlen=100)  # Últimas 100 mediciones
-        self.last_command_time = 0
-        self.last_response_time = 0
+    LATENCY_HISTORY_SIZE = 100  # Últimas 100 mediciones por hilo
+    
+    def __init__(self, clock=SYSTEM_CLOCK):
+        """
+        Args:
+            clock: Fuente de la hora (SystemClock, o VirtualClock en simulaciones)
+        """
+        self.clock = clock
+        
+        # Shards de contadores (uno por hilo escritor)
+        self._local = threading.local()
+        self._registry_lock = threading.Lock()  # Solo para registrar shards y reiniciar
+        self._generation = 0
+        self._shards: List[_CounterShard] = []
         
-        # Estadísticas de comandos
-        self.commands_sent = 0
-        self.responses_received = 0
-        self.commands_failed = 0
+        # Último envío de cualquier hilo, usado para calcular la latencia
+        self._last_command_time = 0.0
         
         # Estadísticas de ancho de banda
-        self.bytes_sent = 0
-        self.bytes_received = 0
         self.connection_start_time = None
         
         # Log de comunicación
         self.communication_log = deque(maxlen=config.LOG_MAX_LINES)
         
+        # Historial multi-resolución (se conserva entre reconexiones)
+        self.history = TelemetryHistory()
+        
     def reset(self):
         """Reinicia todas las estadísticas"""
-        self.latency_history.clear()
-        self.last_command_time = 0
-        self.last_response_time = 0
-        self.commands_sent = 0
-        self.responses_received = 0
-        self.commands_failed = 0
-        self.bytes_sent = 0
-        self.bytes_received = 0
+        with self._registry_lock:
+            # Los shards viejos quedan huérfanos; cada hilo crea uno nuevo en su próxima escritura
+            self._generation += 1
+            self._shards = []
+        self._last_command_time = 0.0
         self.connection_start_time = None
         self.communication_log.clear()
         
+    def _shard(self) -> _CounterShard:
+        """Obtiene el shard del hilo actual, registrándolo si es necesario"""
+        shard = getattr(self._local, "shard", None)
+        if shard is None or shard.generation != self._generation:
+            with self._registry_lock:
+                shard = _CounterShard(self._generation, self.LATENCY_HISTORY_SIZE)
+                self._shards = self._shards + [shard]  # Publicación atómica de la lista
+            self._local.shard = shard
+        return shard
+        
     def start_connection(self):
         """Marca el inicio de una conexión"""
-        self.connection_start_time = time.time()
+        self.connection_start_time = self.clock.time()
         self.add_log("✓ Conexión establecida")
         
     def command_sent(self, command: str):
         """Registra el envío de un comando"""
-        self.last_command_time = time.time()
-        self.commands_sent += 1
-        self.bytes_sent += len(command.encode()) + 1  # +1 por el \n
-        timestamp = time.strftime("%H:%M:%S")
+        now = self.clock.time()
+        shard = self._shard()
+        shard.seq += 1
+        shard.commands_sent += 1
+        shard.bytes_sent += len(command.encode()) + 1  # +1 por el \n
+        shard.last_command_time = now
+        shard.seq += 1
+        self._last_command_time = now
+        self.history.record_event(TelemetryHistory.MESSAGES_OUT, now)
+        timestamp = self._timestamp(now)
         self.add_log(f"[{timestamp}] → {command}")
         
     def response_received(self, response: str):
         """Registra la recepción de una respuesta"""
-        self.last_response_time = time.time()
-        self.responses_received += 1
-        self.bytes_received += len(response.encode())
+        now = self.clock.time()
+        last_command_time = self._last_command_time
+        shard = self._shard()
+        shard.seq += 1
+        shard.responses_received += 1
+        shard.bytes_received += len(response.encode())
+        shard.last_response_time = now
         
         # Calcular latencia
-        if self.last_command_time > 0:
-            latency = (self.last_response_time - self.last_command_time) * 1000  # en ms
-            self.latency_history.append(latency)
+        latency = None
+        if last_command_time > 0:
+            latency = (now - last_command_time) * 1000  # en ms
+            shard.latencies[shard.latency_index] = latency
+            shard.latency_index = (shard.latency_index + 1) % len(shard.latencies)
+            if shard.latency_count < len(shard.latencies):
+                shard.latency_count += 1
+        shard.seq += 1
         
-        timestamp = time.strftime("%H:%M:%S")
+        self.history.record_event(TelemetryHistory.MESSAGES_IN, now)
+        if latency is not None:
+            self.history.record(TelemetryHistory.LATENCY, latency, now)
+            
+        timestamp = self._timestamp(now)
         self.add_log(f"[{timestamp}] ← {response}")
         
+    def telemetry_received(self, message: str):
+        """Registra telemetría periódica (no es respuesta a un comando: sin latencia ni log)"""
+        now = self.clock.time()
+        shard = self._shard()
+        shard.seq += 1
+        shard.bytes_received += len(message.encode())
+        shard.last_response_time = now
+        shard.seq += 1
+        self.history.record_event(TelemetryHistory.MESSAGES_IN, now)
+        
+    def control_sent(self, command: str):
+        """Registra un valor del flujo de control (no espera respuesta: sin latencia ni log)"""
+        now = self.clock.time()
+        shard = self._shard()
+        shard.seq += 1
+        shard.bytes_sent += len(command.encode()) + 1  # +1 por el \n
+        shard.seq += 1
+        self.history.record_event(TelemetryHistory.MESSAGES_OUT, now)
+        
+    def heartbeat_sent(self, command: str):
+        """Registra un latido enviado (sin log: son 10 por segundo)"""
+        now = self.clock.time()
+        shard = self._shard()
+        shard.seq += 1
+        shard.bytes_sent += len(command.encode()) + 1  # +1 por el \n
+        shard.heartbeats_sent += 1
+        shard.seq += 1
+        self.history.record_event(TelemetryHistory.MESSAGES_OUT, now)
+            
+    def heartbeat_received(self, rtt: float):
+        """Registra el RTT (s) de un latido respondido"""
+        shard = self._shard()
+        shard.seq += 1
+        shard.heartbeat_rtts.append(rtt)
+        shard.seq += 1
+            
+    def link_state_changed(self, status):
+        """
+        Registra un cambio de estado del enlace
+        Args:
+            status: LinkStatus; al pasar a perdido, su silencio es la latencia de
+                detección (cota superior: el corte ocurrió después de la última respuesta)
+        """
+        now = self.clock.time()
+        shard = self._shard()
+        shard.seq += 1
+        shard.link_state = status.state
+        shard.link_change_time = now
+        if status.state == LinkStatus.DEGRADED:
+            shard.link_degraded += 1  # Veces que el enlace pasó a degradado
+        elif status.state == LinkStatus.LOST:
+            shard.link_lost += 1  # Veces que el enlace se dio por perdido
+            shard.detection_latencies.append(status.silence)  # Silencio al darlo por perdido (s)
+        elif status.previous == LinkStatus.LOST:
+            shard.outages.append(status.silence)  # Duración del corte al recuperarse (s)
+        shard.seq += 1
+        timestamp = self._timestamp(now)
+        self.add_log(f"[{timestamp}] Enlace {status.previous} → {status.state} "
+                     f"({status.silence * 1000:.0f} ms sin latidos)")
+                     
+    def get_link_status(self, snapshot: Optional[Dict] = None) -> Dict:
+        """Estado del enlace, RTT de los latidos y latencia de detección en ms"""
+        snapshot = snapshot or self.snapshot()
+        rtts = snapshot["heartbeat_rtts"]
+        detections = snapshot["detection_latencies"]
+        outages = snapshot["outages"]
+        return {
+            "state": snapshot["link_state"],
+            "heartbeats_sent": snapshot["heartbeats_sent"],
+            "heartbeat_rtt_ms": sum(rtts) / len(rtts) * 1000 if rtts else 0.0,
+            "degraded_events": snapshot["link_degraded"],
+            "lost_events": snapshot["link_lost"],
+            "detection_ms": detections[-1] * 1000 if detections else None,
+            "max_detection_ms": max(detections) * 1000 if detections else None,
+            "last_outage_ms": outages[-1] * 1000 if outages else None,
+        }
+        
+    def command_acked(self, rtt: Optional[float]):
+        """Registra la confirmación OK:<seq> de un comando (rtt en s, None si hubo retransmisión)"""
+        shard = self._shard()
+        shard.seq += 1
+        shard.commands_acked += 1
+        if rtt is not None:
+            shard.ack_rtts.append(rtt)
+        shard.seq += 1
+                
+    def command_retransmitted(self, command: str):
+        """Registra la retransmisión de un comando sin confirmar"""
+        now = self.clock.time()
+        shard = self._shard()
+        shard.seq += 1
+        shard.bytes_sent += len(command.encode()) + 1  # +1 por el \n
+        shard.retransmits += 1
+        shard.seq += 1
+        self.history.record_event(TelemetryHistory.MESSAGES_OUT, now)
+        self.add_log(f"[{self._timestamp(now)}] ↻ {command}")
+        
+    def delivery_failed(self, command: str):
+        """Registra un comando que el ESP32 nunca confirmó"""
+        shard = self._shard()
+        shard.seq += 1
+        shard.delivery_failures += 1  # Sin OK:<seq> tras agotar plazo y reintentos
+        shard.seq += 1
+        self.add_log(f"[{self._timestamp(self.clock.time())}] ✗ Sin confirmación: {command}")
+        
+    def duplicate_received(self):
+        """Registra un comando que llegó repetido al ESP32 (no se ejecutó otra vez)"""
+        shard = self._shard()
+        shard.seq += 1
+        shard.duplicates += 1  # El firmware respondió OK:<seq>:DUP
+        shard.seq += 1
+            
+    def get_delivery_status(self, snapshot: Optional[Dict] = None) -> Dict:
+        """Confirmaciones, retransmisiones, pérdidas y duplicados de los comandos numerados"""
+        snapshot = snapshot or self.snapshot()
+        rtts = snapshot["ack_rtts"]
+        return {
+            "acked": snapshot["commands_acked"],
+            "retransmits": snapshot["retransmits"],
+            "delivery_failed": snapshot["delivery_failures"],
+            "duplicates": snapshot["duplicates"],
+            "ack_rtt_ms": sum(rtts) / len(rtts) * 1000 if rtts else 0.0,
+        }
+            
     def command_failed(self):
         """Registra un comando fallido"""
-        self.commands_failed += 1
-        timestamp = time.strftime("%H:%M:%S")
+        shard = self._shard()
+        shard.seq += 1
+        shard.commands_failed += 1
+        shard.seq += 1
+        timestamp = self._timestamp(self.clock.time())
         self.add_log(f"[{timestamp}] ✗ Comando fallido")
         
     def add_log(self, message: str):
         """Agrega un mensaje al log"""
         self.communication_log.append(message)
         
-    def get_average_latency(self) -> float:
+    @staticmethod
+    def _timestamp(now: float) -> str:
+        """Hora del log según el reloj del monitor (no la del sistema)"""
+        return time.strftime("%H:%M:%S", time.localtime(now))
+        
+    def snapshot(self) -> Dict:
+        """
+        Obtiene una instantánea consistente de los contadores de todos los hilos
+        Returns:
+            Dict: Contadores agregados, estado del enlace y latencias recientes (la última al final)
+        """
+        totals = dict.fromkeys(_CounterShard.COUNTERS, 0)
+        series: Dict[str, List[float]] = {name: [] for name in _CounterShard.SERIES}
+        last_command_time = 0.0
+        last_response_time = 0.0
+        latencies: List[float] = []
+        newest_latency_time = 0.0
+        current_latency = 0.0
+        shards = [shard.read() for shard in self._shards]
+        
+        for values in shards:
+            for name in totals:
+                totals[name] += values[name]
+            last_command_time = max(last_command_time, values["last_command_time"])
+            last_response_time = max(last_response_time, values["last_response_time"])
+            shard_latencies = values["latencies"]
+            latencies.extend(shard_latencies)
+            if shard_latencies and values["last_response_time"] >= newest_latency_time:
+                newest_latency_time = values["last_response_time"]
+                current_latency = shard_latencies[-1]
+                
+        # Los historiales del último cambio de enlace van al final: su último valor es el vigente
+        shards.sort(key=lambda values: values["link_change_time"])
+        for values in shards:
+            for name in series:
+                series[name].extend(values[name])
+        link = shards[-1] if shards and shards[-1]["link_change_time"] else None
+        
+        snapshot = {
+            "last_command_time": last_command_time,
+            "last_response_time": last_response_time,
+            "latencies": latencies,
+            "current_latency": current_latency,
+            "link_state": link["link_state"] if link is not None else LinkStatus.OK
+        }
+        snapshot.update(totals)
+        snapshot.update(series)
+        return snapshot
+        
+    # Acceso de solo lectura a los contadores agregados
+    @property
+    def commands_sent(self) -> int:
+        return self.snapshot()["commands_sent"]
+        
+    @property
+    def responses_received(self) -> int:
+        return self.snapshot()["responses_received"]
+        
+    @property
+    def commands_failed(self) -> int:
+        return self.snapshot()["commands_failed"]
+        
+    @property
+    def bytes_sent(self) -> int:
+        return self.snapshot()["bytes_sent"]
+        
+    @property
+    def bytes_received(self) -> int:
+        return self.snapshot()["bytes_received"]
+        
+    @property
+    def last_command_time(self) -> float:
+        return self.snapshot()["last_command_time"]
+        
+    @property
+    def last_response_time(self) -> float:
+        return self.snapshot()["last_response_time"]
+        
+    @property
+    def latency_history(self) -> List[float]:
+        return self.snapshot()["latencies"]
+        
+    def get_average_latency(self, snapshot: Optional[Dict] = None) -> float:
         """Obtiene la latencia promedio en ms"""
-        if not self.latency_history:
+        latencies = (snapshot or self.snapshot())["latencies"]
+        if not latencies:
             return 0.0
-        return sum(self.latency_history) / len(self.latency_history)
-    
-    def get_min_latency(self) -> float:
+        return sum(latencies) / len(latencies)
+        
+    def get_min_latency(self, snapshot: Optional[Dict] = None) -> float:
         """Obtiene la latencia mínima en ms"""
-        if not self.latency_history:
+        latencies = (snapshot or self.snapshot())["latencies"]
+        if not latencies:
             return 0.0
-        return min(self.latency_history)
-    
-    def get_max_latency(self) -> float:
+        return min(latencies)
+        
+    def get_max_latency(self, snapshot: Optional[Dict] = None) -> float:
         """Obtiene la latencia máxima en ms"""
-        if not self.latency_history:
+        latencies = (snapshot or self.snapshot())["latencies"]
+        if not latencies:
             return 0.0
-        return max(self.latency_history)
-    
-    def get_current_latency(self) -> float:
-        """Obtiene la última latencia medida en ms"""
-        if not self.latency_history:
+        return max(latencies)
+        
+    def get_latency_percentile(self, percentile: float, snapshot: Optional[Dict] = None) -> float:
+        """Obtiene el percentil de latencia en ms (rango más cercano)"""
+        latencies = sorted((snapshot or self.snapshot())["latencies"])
+        if not latencies:
             return 0.0
-        return self.latency_history[-1]
-    
-    def get_packet_loss_rate(self) -> float:
-        """Calcula la tasa de pérdida de paquetes en %"""
-        total = self.commands_sent
+        rank = max(1, -(-len(latencies) * percentile // 100))
+        return latencies[min(int(rank), len(latencies)) - 1]
+        
+    def get_current_latency(self, snapshot: Optional[Dict] = None) -> float:
+        """Obtiene la última latencia medida en ms"""
+        return (snapshot or self.snapshot())["current_latency"]
+        
+    def get_packet_loss_rate(self, snapshot: Optional[Dict] = None) -> float:
+        """Calcula la tasa de pérdida de paquetes en % (fallos locales y comandos sin confirmar)"""
+        snapshot = snapshot or self.snapshot()
+        total = snapshot["commands_sent"]
         if total == 0:
             return 0.0
-        return (self.commands_failed / total) * 100
-    
-    def get_reliability(self) -> float:
+        undelivered = snapshot["delivery_failures"]
+        return min(100.0, (snapshot["commands_failed"] + undelivered) / total * 100)
+        
+    def get_reliability(self, snapshot: Optional[Dict] = None) -> float:
         """Calcula la confiabilidad en %"""
-        return 100 - self.get_packet_loss_rate()
-    
-    def get_bandwidth(self) -> Dict[str, float]:
+        return 100 - self.get_packet_loss_rate(snapshot)
+        
+    def get_bandwidth(self, snapshot: Optional[Dict] = None) -> Dict[str, float]:
         """Calcula el ancho de banda en bytes/segundo"""
-        if self.connection_start_time is None:
+        start_time = self.connection_start_time
+        if start_time is None:
             return {"upload": 0.0, "download": 0.0, "total": 0.0}
-        
-        elapsed_time = time.time() - self.connection_start_time
+            
+        elapsed_time = self.clock.time() - start_time
         if elapsed_time == 0:
             return {"upload": 0.0, "download": 0.0, "total": 0.0}
-        
-        upload_bps = self.bytes_sent / elapsed_time
-        download_bps = self.bytes_received / elapsed_time
+            
+        snapshot = snapshot or self.snapshot()
+        upload_bps = snapshot["bytes_sent"] / elapsed_time
+        download_bps = snapshot["bytes_received"] / elapsed_time
         
         return {
             "upload": upload_bps,
             "download": download_bps,
             "total": upload_bps + download_bps
         }
-    
+        
     def get_connection_time(self) -> float:
         """Obtiene el tiempo de conexión en segundos"""
-        if self.connection_start_time is None:
+        start_time = self.connection_start_time
+        if start_time is None:
             return 0.0
-        return time.time() - self.connection_start_time
-    
+        return self.clock.time() - start_time
+        
     def get_log_messages(self) -> List[str]:
         """Obtiene la lista de mensajes del log"""
-        return list(self.communication_log)
-    
+        while True:
+            try:
+                return list(self.communication_log)
+            except RuntimeError:
+                # El deque cambió durante la copia (append desde otro hilo); reintentar
+                continue
+                
     def get_statistics_summary(self) -> Dict:
         """Obtiene un resumen completo de estadísticas"""
-        bandwidth = self.get_bandwidth()
+        snapshot = self.snapshot()
+        bandwidth = self.get_bandwidth(snapshot)
+        delivery = self.get_delivery_status(snapshot)
         
         return {
             "latency": {
-                "current": self.get_current_latency(),
-                "average": self.get_average_latency(),
-                "min": self.get_min_latency(),
-                "max": self.get_max_latency()
+                "current": self.get_current_latency(snapshot),
+                "average": self.get_average_latency(snapshot),
+                "min": self.get_min_latency(snapshot),
+                "max": self.get_max_latency(snapshot),
+                "p95": self.get_latency_percentile(95, snapshot)
             },
             "reliability": {
-                "success_rate": self.get_reliability(),
-                "packet_loss": self.get_packet_loss_rate(),
-                "commands_sent": self.commands_sent,
-                "responses_received": self.responses_received,
-                "commands_failed": self.commands_failed
+                "success_rate": self.get_reliability(snapshot),
+                "packet_loss": self.get_packet_loss_rate(snapshot),
+                "commands_sent": snapshot["commands_sent"],
+                "responses_received": snapshot["responses_received"],
+                "commands_failed": snapshot["commands_failed"],
+                "acked": delivery["acked"],
+                "delivery_failed": delivery["delivery_failed"],
+                "retransmits": delivery["retransmits"],
+                "duplicates": delivery["duplicates"],
+                "ack_rtt_ms": delivery["ack_rtt_ms"]
             },
             "bandwidth": {
                 "upload_bps": bandwidth["upload"],
                 "download_bps": bandwidth["download"],
                 "total_bps": bandwidth["total"],
-                "bytes_sent": self.bytes_sent,
-                "bytes_received": self.bytes_received
+                "bytes_sent": snapshot["bytes_sent"],
+                "bytes_received": snapshot["bytes_received"]
             },
             "connection": {
                 "duration": self.get_connection_time()
-            }
+            },
+            "link": self.get_link_status(snapshot)
         }
@@ -1,34 +1,66 @@
 """
 Módulo de notificaciones por SMS usando Twilio
+
+`twilio.rest` arrastra la pila de `requests` y tarda más en importarse que el
+resto de la aplicación junta, así que el cliente se crea la primera vez que se
+necesita (la primera alerta) o en un hilo de calentamiento que el controlador
+lanza después de mostrar la ventana.
 """
 
 import time
+import threading
 from typing import Optional
 import config
+from scheduler import SYSTEM_CLOCK
 
 
 class TwilioNotifier:
     """Clase para enviar notificaciones SMS usando Twilio"""
     
-    def __init__(self):
+    def __init__(self, clock=SYSTEM_CLOCK, client=None):
+        """
+        Args:
+            clock: Fuente de la hora para el enfriamiento entre alertas
+            client: Cliente ya creado con la interfaz de twilio.rest.Client
+                (messages.create); si se da, no se importa twilio
+        """
+        self.clock = clock
         self.last_notification_time = 0
-        self.twilio_client = None
-        self._initialize_twilio()
+        self._client = client
+        self._initialized = client is not None  # El cliente se crea una sola vez, al primer uso
+        self._init_lock = threading.Lock()
+        
+    @property
+    def twilio_client(self):
+        """Cliente de Twilio; se inicializa en el primer acceso"""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._initialize_twilio()
+                    self._initialized = True
+        return self._client
+        
+    def warm_up(self) -> threading.Thread:
+        """Inicializa el cliente en segundo plano para que la primera alerta no espere el import"""
+        thread = threading.Thread(target=lambda: self.twilio_client, name="twilio-warm-up", daemon=True)
+        thread.start()
+        return thread
     
     def _initialize_twilio(self):
         """Inicializa el cliente de Twilio"""
+        # Sin credenciales no vale la pena importar twilio
+        if (not config.TWILIO_ACCOUNT_SID or not config.TWILIO_AUTH_TOKEN or
+                config.TWILIO_ACCOUNT_SID == "tu_account_sid_aqui" or
+                config.TWILIO_AUTH_TOKEN == "tu_auth_token_aqui"):
+            print("⚠ Credenciales de Twilio no configuradas en config.py")
+            print("  Edita config.py y agrega tus credenciales de Twilio")
+            self._client = None
+            return
+            
         try:
             from twilio.rest import Client
             
-            # Verificar que las credenciales estén configuradas
-            if (config.TWILIO_ACCOUNT_SID == "tu_account_sid_aqui" or 
-                config.TWILIO_AUTH_TOKEN == "tu_auth_token_aqui"):
-                print("⚠ Credenciales de Twilio no configuradas en config.py")
-                print("  Edita config.py y agrega tus credenciales de Twilio")
-                self.twilio_client = None
-                return
-            
-            self.twilio_client = Client(
+            self._client = Client(
                 config.TWILIO_ACCOUNT_SID,
                 config.TWILIO_AUTH_TOKEN
             )
@@ -36,10 +68,10 @@ class TwilioNotifier:
             
         except ImportError:
             print("⚠ Twilio no está instalado. Ejecuta: pip install twilio")
-            self.twilio_client = None
+            self._client = None
         except Exception as e:
             print(f"✗ Error al inicializar Twilio: {e}")
-            self.twilio_client = None
+            self._client = None
     
     def send_collision_alert(self) -> bool:
         """
@@ -48,7 +80,7 @@ class TwilioNotifier:
             bool: True si el SMS se envió exitosamente
         """
         # Verificar cooldown para evitar spam
-        current_time = time.time()
+        current_time = self.clock.time()
         if current_time - self.last_notification_time < config.COLLISION_COOLDOWN:
             print(f"⏳ Esperando cooldown ({config.COLLISION_COOLDOWN}s entre notificaciones)")
             return False
@@ -63,8 +95,8 @@ class TwilioNotifier:
                 "🚨 ALERTA DE COLISIÓN 🚨\n\n"
                 "El carrito ESP32 ha detectado una colisión.\n"
                 "El sistema se ha detenido automáticamente.\n\n"
-                f"Hora: {time.strftime('%H:%M:%S')}\n"
-                f"Fecha: {time.strftime('%d/%m/%Y')}"
+                f"Hora: {time.strftime('%H:%M:%S', time.localtime(current_time))}\n"
+                f"Fecha: {time.strftime('%d/%m/%Y', time.localtime(current_time))}"
             )
             
             # Enviar SMS
@@ -0,0 +1,355 @@
+"""
+Módulo de análisis del protocolo de mensajes del ESP32
+
+Convierte el flujo de bytes del socket en líneas completas y cada línea en un
+objeto de mensaje tipado. La clasificación es una búsqueda en una tabla de
+despacho indexada por prefijo (`SPEED:`, `DIST:`, `OK:`, `ERR:`, `LOGS:`, `LOG:`,
+`TIME:`, `MACRO:`, `HB:`...), así que cada línea se examina una sola vez y se pueden registrar
+manejadores para tipos de mensaje nuevos sin tocar el hilo de escucha.
+"""
+
+import re
+import time
+import json
+import codecs
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class SpeedSample:
+    """Velocidad real medida por el MPU6050 (SPEED:<cm/s>[:<millis>])"""
+
+    __slots__ = ("speed", "received_at", "device_time", "host_time", "time_error")
+    TOPIC = "speed"
+
+    def __init__(self, speed: float, received_at: float, device_time: Optional[float] = None):
+        self.speed = speed
+        self.received_at = received_at
+        self.device_time = device_time  # Reloj del ESP32 al medir (s), si viene
+        self.host_time = received_at  # Hora de la medición en el reloj de la PC
+        self.time_error = None  # Cota de error de host_time (None = hora de llegada)
+
+    def __repr__(self):
+        return f"SpeedSample({self.speed:.2f} cm/s)"
+
+
+class DistanceSample:
+    """Distancia del ultrasónico HC-SR04 (DIST:<cm>:<millis>)"""
+    
+    __slots__ = ("distance", "received_at", "device_time", "host_time", "time_error")
+    TOPIC = "distance"
+    
+    def __init__(self, distance: float, received_at: float, device_time: Optional[float] = None):
+        self.distance = distance
+        self.received_at = received_at
+        self.device_time = device_time  # Reloj del ESP32 al medir (s), si viene
+        self.host_time = received_at  # Hora de la medición en el reloj de la PC
+        self.time_error = None  # Cota de error de host_time (None = hora de llegada)
+        
+    def __repr__(self):
+        return f"DistanceSample({self.distance:.1f} cm)"
+
+
+class Ack:
+    """
+    Confirmación (OK:<detalle>) o rechazo (ERR:<detalle>) de un comando
+
+    Con entrega confiable el detalle es el número de secuencia (OK:<seq>), con
+    ":DUP" si el firmware ya había ejecutado ese número (retransmisión)
+    """
+    
+    __slots__ = ("ok", "detail", "received_at", "seq", "duplicate")
+    TOPIC = "ack"
+
+    def __init__(self, ok: bool, detail: str, received_at: float):
+        self.ok = ok
+        self.detail = detail
+        self.received_at = received_at
+        seq, _, flag = detail.partition(":")
+        self.seq = int(seq) if seq.isdigit() else None  # None: confirmación sin numerar (OK:FORWARD)
+        self.duplicate = self.seq is not None and flag == "DUP"
+
+    def __repr__(self):
+        return f"Ack({'OK' if self.ok else 'ERR'}:{self.detail})"
+
+
+class LogBatch:
+    """Lote de logs del ESP32 (LOGS:{"logs": [...], "seq": <n>})"""
+
+    __slots__ = ("logs", "received_at", "host_times", "seq", "pushed")
+    TOPIC = "esp32_logs"
+
+    def __init__(self, logs: list, received_at: float, seq: Optional[int] = None, pushed: bool = False):
+        self.logs = logs
+        self.received_at = received_at
+        self.host_times = None  # (hora de la PC, cota de error) por log, si hay sincronía
+        self.seq = seq  # Número del último log (None con firmware que no los numera)
+        self.pushed = pushed  # True si lo generó una entrada empujada (LOG:) y no GET_LOGS
+
+    def __repr__(self):
+        return f"LogBatch({len(self.logs)} logs)"
+
+
+class LogEntry:
+    """Entrada de log empujada por el ESP32 al registrarla (LOG:<seq>:<texto>)"""
+    
+    __slots__ = ("seq", "text", "received_at")
+    
+    def __init__(self, seq: int, text: str, received_at: float):
+        self.seq = seq
+        self.text = text
+        self.received_at = received_at
+        
+    def __repr__(self):
+        return f"LogEntry({self.seq}, {self.text!r})"
+
+
+class TimeReply:
+    """Reloj del ESP32 en respuesta a TIME?:<n> (TIME:<n>:<millis>; TIME:<millis> sin número)"""
+    
+    __slots__ = ("device_time", "received_at", "nonce")
+    TOPIC = "time"
+    
+    def __init__(self, device_time: float, received_at: float, nonce: Optional[int] = None):
+        self.device_time = device_time
+        self.received_at = received_at
+        self.nonce = nonce  # Número de la solicitud que responde (None: firmware anterior)
+        
+    def __repr__(self):
+        return f"TimeReply({self.device_time:.3f} s, #{self.nonce})"
+
+
+class MacroProgress:
+    """Avance de una maniobra ejecutada en el carrito (MACRO:<STEP|DONE|ABORT>:...)"""
+    
+    STEP = "STEP"
+    DONE = "DONE"
+    ABORT = "ABORT"
+    
+    __slots__ = ("kind", "macro_id", "step", "device_time", "received_at", "host_time", "time_error")
+    TOPIC = "macro"
+    
+    def __init__(self, kind: str, macro_id: int, step: Optional[int], device_time: float,
+                 received_at: float):
+        self.kind = kind
+        self.macro_id = macro_id
+        self.step = step  # Paso que empezó (STEP) o que se interrumpió (ABORT)
+        self.device_time = device_time  # Reloj del ESP32 al ocurrir (s)
+        self.host_time = received_at  # Hora del evento en el reloj de la PC
+        self.received_at = received_at
+        self.time_error = None  # Cota de error de host_time (None = hora de llegada)
+        
+    def __repr__(self):
+        return f"MacroProgress({self.kind} #{self.macro_id} paso {self.step})"
+
+
+class HeartbeatReply:
+    """Eco de un latido de la PC (HB:<seq>)"""
+    
+    __slots__ = ("seq", "received_at")
+    TOPIC = "heartbeat"
+    
+    def __init__(self, seq: int, received_at: float):
+        self.seq = seq
+        self.received_at = received_at
+        
+    def __repr__(self):
+        return f"HeartbeatReply(#{self.seq})"
+
+
+class LinkStatus:
+    """Cambio de estado del enlace según los latidos (lo publica la PC, no el ESP32)"""
+    
+    OK = "ok"
+    DEGRADED = "degraded"
+    LOST = "lost"
+    
+    __slots__ = ("state", "previous", "silence", "at")
+    TOPIC = "link"
+    
+    def __init__(self, state: str, previous: str, silence: float, at: float):
+        self.state = state
+        self.previous = previous
+        self.silence = silence  # s desde la última respuesta a un latido
+        self.at = at  # Hora de la PC del cambio
+        
+    def __repr__(self):
+        return f"LinkStatus({self.previous} -> {self.state}, {self.silence * 1000:.0f} ms)"
+
+
+class CollisionAlert:
+    """Aviso de colisión enviado por el ESP32"""
+
+    __slots__ = ("text", "received_at")
+    TOPIC = "collision"
+
+    def __init__(self, text: str, received_at: float):
+        self.text = text
+        self.received_at = received_at
+
+    def __repr__(self):
+        return f"CollisionAlert({self.text!r})"
+
+
+# Detecta "COLISION", "COLISIÓN" o "COLLISION" sin crear copias en mayúsculas
+_COLLISION_PATTERN = re.compile(r"COLL?ISI[OÓ]N", re.IGNORECASE)
+
+
+def _parse_speed(payload: str, now: float) -> SpeedSample:
+    speed, separator, millis = payload.partition(":")
+    if separator:
+        return SpeedSample(float(speed), now, int(millis) / 1000.0)
+    return SpeedSample(float(payload), now)
+
+
+def _parse_distance(payload: str, now: float) -> DistanceSample:
+    distance, separator, millis = payload.partition(":")
+    if separator:
+        return DistanceSample(float(distance), now, int(millis) / 1000.0)
+    return DistanceSample(float(payload), now)
+
+
+def _parse_macro(payload: str, now: float) -> MacroProgress:
+    # STEP:<id>:<paso>:<millis> | DONE:<id>:<millis> | ABORT:<id>:<paso>:<millis>
+    kind, _, rest = payload.partition(":")
+    fields = rest.split(":")
+    if kind == MacroProgress.DONE:
+        return MacroProgress(kind, int(fields[0]), None, int(fields[1]) / 1000.0, now)
+    if kind not in (MacroProgress.STEP, MacroProgress.ABORT):
+        raise ValueError(f"Evento de maniobra desconocido: {kind}")
+    return MacroProgress(kind, int(fields[0]), int(fields[1]), int(fields[2]) / 1000.0, now)
+
+
+def _parse_time(payload: str, now: float) -> TimeReply:
+    # <n>:<millis> o, con firmware anterior, <millis>
+    nonce, _, millis = payload.rpartition(":")
+    return TimeReply(int(millis) / 1000.0, now, int(nonce) if nonce else None)
+
+
+def _parse_heartbeat(payload: str, now: float) -> HeartbeatReply:
+    return HeartbeatReply(int(payload), now)
+
+
+def _parse_ok(payload: str, now: float) -> Ack:
+    return Ack(True, payload, now)
+
+
+def _parse_err(payload: str, now: float) -> Ack:
+    return Ack(False, payload, now)
+
+
+def _parse_logs(payload: str, now: float) -> Optional[LogBatch]:
+    logs_data = json.loads(payload)
+    if "logs" not in logs_data:
+        return None
+    return LogBatch(logs_data["logs"], now, logs_data.get("seq"))
+
+
+def _parse_log(payload: str, now: float) -> LogEntry:
+    seq, separator, text = payload.partition(":")
+    if not separator:
+        raise ValueError("Entrada de log sin número")
+    return LogEntry(int(seq), text, now)
+
+
+class MessageParser:
+    """Separa líneas y las despacha por prefijo a manejadores registrados"""
+
+    UNKNOWN = "unknown"
+    COLLISION = "collision"
+
+    def __init__(self):
+        self._handlers: Dict[str, Tuple[str, Callable]] = {}
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""  # Línea incompleta del recv anterior
+
+        # Contadores por tipo de mensaje
+        self.counters: Dict[str, int] = {self.UNKNOWN: 0, self.COLLISION: 0}
+        self.errors: Dict[str, int] = {}
+
+        self.register("SPEED:", _parse_speed, "speed")
+        self.register("OK:", _parse_ok, "ok")
+        self.register("ERR:", _parse_err, "err")
+        self.register("LOGS:", _parse_logs, "logs")
+        self.register("LOG:", _parse_log, "log")
+        self.register("TIME:", _parse_time, "time")
+        self.register("DIST:", _parse_distance, "distance")
+        self.register("MACRO:", _parse_macro, "macro")
+        self.register("HB:", _parse_heartbeat, "heartbeat")
+
+    def register(self, prefix: str, handler: Callable, name: Optional[str] = None):
+        """
+        Registra un manejador para un prefijo de mensaje
+        Args:
+            prefix: Prefijo terminado en ':' (p. ej. "TELEM:")
+            handler: Función (contenido_tras_el_prefijo, hora) -> mensaje o None
+            name: Nombre para los contadores (por defecto, el prefijo sin ':')
+        """
+        if not prefix.endswith(":"):
+            raise ValueError("El prefijo debe terminar en ':'")
+        name = name or prefix[:-1].lower()
+        self._handlers[prefix[:-1]] = (name, handler)
+        self.counters.setdefault(name, 0)
+        self.errors.setdefault(name, 0)
+
+    def feed(self, data: bytes) -> List[Tuple[str, object]]:
+        """
+        Procesa un bloque recibido del socket
+        Args:
+            data: Bytes tal como los entregó recv()
+        Returns:
+            List[Tuple[str, object]]: (línea, mensaje o None) por cada línea completa
+        """
+        text = self._pending + self._decoder.decode(data)
+        lines = text.split("\n")
+        self._pending = lines.pop()  # Lo que queda después del último \n
+        return self.parse_lines(lines, time.time())
+
+    def parse_lines(self, lines: List[str], now: float) -> List[Tuple[str, object]]:
+        """Clasifica un lote de líneas ya separadas en un solo recorrido"""
+        handlers = self._handlers
+        counters = self.counters
+        result = []
+        append = result.append
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            prefix, separator, payload = line.partition(":")
+            entry = handlers.get(prefix) if separator else None
+            if entry is None:
+                append((line, self._parse_unregistered(line, now)))
+                continue
+            name, handler = entry
+            try:
+                message = handler(payload, now)
+            except (ValueError, KeyError, IndexError, TypeError):
+                self.errors[name] += 1
+                message = None
+            else:
+                counters[name] += 1
+            append((line, message))
+        return result
+
+    def parse_line(self, line: str, now: Optional[float] = None):
+        """Clasifica una línea completa y crea su objeto de mensaje"""
+        if now is None:
+            now = time.time()
+        result = self.parse_lines([line], now)
+        return result[0][1] if result else None
+
+    def _parse_unregistered(self, line: str, now: float):
+        """Líneas sin prefijo registrado: alertas de colisión o desconocidas"""
+        if _COLLISION_PATTERN.search(line):
+            self.counters[self.COLLISION] += 1
+            return CollisionAlert(line, now)
+        self.counters[self.UNKNOWN] += 1
+        return None
+
+    def reset(self):
+        """Descarta cualquier línea parcial (al reconectar)"""
+        self._decoder.reset()
+        self._pending = ""
+
+    def get_counters(self) -> Dict[str, Dict[str, int]]:
+        """Contadores de mensajes analizados y errores por tipo"""
+        return {"parsed": dict(self.counters), "errors": dict(self.errors)}
@@ -0,0 +1,301 @@
+"""
+Módulo de eventos de seguridad del ESP32
+
+Convierte las líneas de log del firmware en eventos tipados con patrones
+compilados una sola vez:
+
+    [128.345s] Frenado gradual iniciado a 81.2cm     -> gradual_brake, 81.2
+    [129.010s] DETENCION! Obstaculo a 42.1cm         -> stop, 42.1
+    [129.110s] EMERGENCIA! Reversa automatica a 37.2cm -> emergency_reverse, 37.2
+    [131.200s] Sin lectura de sensor - restaurando control -> sensor_timeout
+    [127.002s] CMD: AVANZAR                          -> command, "AVANZAR"
+    [133.540s] DEADMAN! Sin latidos de la PC (500 ms) -> deadman
+
+Los eventos se guardan en un diario JSON por líneas (solo se agrega al final,
+rotando a <archivo>.1 al pasar SAFETY_JOURNAL_MAX_BYTES) y en un índice en memoria por tipo y tiempo: cada tipo tiene sus marcas de tiempo
+y distancias en arrays ordenados, así que una consulta por rango de tiempo es
+una búsqueda binaria y el filtro de distancia recorre solo ese rango.
+"""
+
+import re
+import json
+import math
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+import config
+
+
+class SafetyEvent:
+    """Evento del firmware con su hora en el reloj de la PC"""
+
+    __slots__ = ("kind", "time", "device_time", "distance", "detail", "text")
+
+    COMMAND = "command"
+    GRADUAL_BRAKE = "gradual_brake"
+    STOP = "stop"
+    EMERGENCY_REVERSE = "emergency_reverse"
+    SENSOR_TIMEOUT = "sensor_timeout"
+    SAFE_ZONE = "safe_zone"
+    DEADMAN = "deadman"
+
+    KINDS = (COMMAND, GRADUAL_BRAKE, STOP, EMERGENCY_REVERSE, SENSOR_TIMEOUT, SAFE_ZONE, DEADMAN)
+
+    def __init__(self, kind: str, time: float, device_time: Optional[float],
+                 distance: Optional[float] = None, detail: str = "", text: str = ""):
+        self.kind = kind
+        self.time = time  # Hora de la PC (s desde epoch)
+        self.device_time = device_time  # Reloj del ESP32 (s desde su arranque)
+        self.distance = distance  # cm, en los eventos de obstáculo
+        self.detail = detail  # Comando o valor, en los eventos de comando
+        self.text = text  # Línea original
+
+    def to_dict(self) -> Dict:
+        return {
+            "kind": self.kind, "time": self.time, "device_time": self.device_time,
+            "distance": self.distance, "detail": self.detail, "text": self.text
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SafetyEvent":
+        return cls(data["kind"], data["time"], data.get("device_time"),
+                   data.get("distance"), data.get("detail", ""), data.get("text", ""))
+
+    def __repr__(self):
+        distance = f" {self.distance:.1f}cm" if self.distance is not None else ""
+        return f"SafetyEvent({self.kind}{distance} @ {self.time:.3f})"
+
+
+# Marca de tiempo del firmware al inicio de cada línea
+_STAMP = re.compile(r"\[(\d+(?:\.\d+)?)s\]\s*")
+
+# (tipo, patrón) en orden de prueba; el grupo 1 es la distancia o el detalle
+_PATTERNS = [
+    (SafetyEvent.GRADUAL_BRAKE, re.compile(r"Frenado gradual iniciado a (-?\d+(?:\.\d+)?)\s*cm")),
+    (SafetyEvent.STOP, re.compile(r"DETENCION! Obstaculo a (-?\d+(?:\.\d+)?)\s*cm")),
+    (SafetyEvent.EMERGENCY_REVERSE, re.compile(r"EMERGENCIA! Reversa automatica a (-?\d+(?:\.\d+)?)\s*cm")),
+    (SafetyEvent.SENSOR_TIMEOUT, re.compile(r"Sin lectura de sensor")),
+    (SafetyEvent.SAFE_ZONE, re.compile(r"Zona segura")),
+    (SafetyEvent.DEADMAN, re.compile(r"DEADMAN! Sin latidos")),
+    # Los cambios de velocidad se registran sin el prefijo "CMD: "
+    (SafetyEvent.COMMAND, re.compile(r"CMD: (.+)|(Velocidad .+)")),
+]
+
+
+def parse_log_line(line: str, host_time: Optional[float] = None) -> Optional[SafetyEvent]:
+    """
+    Convierte una línea de log del ESP32 en un evento
+    Args:
+        line: Línea tal como la envía el firmware ("[12.345s] ...")
+        host_time: Hora de la PC de la línea (si el reloj está sincronizado)
+    Returns:
+        SafetyEvent o None si la línea no es un evento conocido
+    """
+    match = _STAMP.match(line)
+    device_time = float(match.group(1)) if match else None
+    start = match.end() if match else 0
+    body = line[start:]
+    for kind, pattern in _PATTERNS:
+        found = pattern.match(body)
+        if found is None:
+            continue
+        if kind == SafetyEvent.COMMAND:
+            detail = found.group(1) or found.group(2)
+            return SafetyEvent(kind, host_time, device_time, detail=detail, text=line)
+        distance = float(found.group(1)) if pattern.groups else None
+        return SafetyEvent(kind, host_time, device_time, distance=distance, text=line)
+    return None
+
+
+class _KindIndex:
+    """Eventos de un tipo ordenados por tiempo, con arrays paralelos"""
+
+    def __init__(self):
+        self.times = array('d')
+        self.distances = array('d')  # NaN si el evento no tiene distancia
+        self.events: List[SafetyEvent] = []
+
+    def add(self, event: SafetyEvent):
+        distance = math.nan if event.distance is None else event.distance
+        if not self.times or event.time >= self.times[-1]:
+            self.times.append(event.time)
+            self.distances.append(distance)
+            self.events.append(event)
+            return
+        # Llegó fuera de orden (p. ej. un diario viejo cargado después)
+        i = bisect_right(self.times, event.time)
+        self.times.insert(i, event.time)
+        self.distances.insert(i, distance)
+        self.events.insert(i, event)
+
+    def range(self, start: Optional[float], end: Optional[float]) -> Tuple[int, int]:
+        lo = 0 if start is None else bisect_left(self.times, start)
+        hi = len(self.times) if end is None else bisect_right(self.times, end)
+        return lo, hi
+
+
+class SafetyLogIndex:
+    """Índice en memoria de eventos de seguridad por tipo y tiempo"""
+
+    DEDUP_WINDOW = 50  # Líneas recientes recordadas (GET_LOGS repite las últimas 10)
+
+    def __init__(self):
+        self._kinds: Dict[str, _KindIndex] = {kind: _KindIndex() for kind in SafetyEvent.KINDS}
+        self._recent = deque(maxlen=self.DEDUP_WINDOW)
+        self._recent_keys = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(index.times) for index in self._kinds.values())
+
+    def add(self, event: SafetyEvent) -> bool:
+        """Agrega un evento; devuelve False si ya estaba (línea repetida)"""
+        with self._lock:
+            if event.device_time is not None and not self._remember(event):
+                return False
+            self._kind(event.kind).add(event)
+        return True
+
+    def _remember(self, event: SafetyEvent) -> bool:
+        """Anota la línea en la ventana de deduplicación; False si ya estaba (con el lock tomado)"""
+        key = (event.device_time, event.text)
+        if key in self._recent_keys:
+            return False
+        if len(self._recent) == self._recent.maxlen:
+            self._recent_keys.discard(self._recent[0])
+        self._recent.append(key)
+        self._recent_keys.add(key)
+        return True
+        
+    def extend(self, events: Iterable[SafetyEvent]):
+        """
+        Agrega eventos ya deduplicados (p. ej. los del diario)
+        Los últimos quedan en la ventana de deduplicación: si el ESP32 siguió
+        encendido, el primer lote tras reiniciar la aplicación repite sus líneas
+        """
+        events = list(events)
+        with self._lock:
+            for event in sorted(events, key=lambda event: event.time):
+                self._kind(event.kind).add(event)
+            for event in events[-self.DEDUP_WINDOW:]:
+                if event.device_time is not None:
+                    self._remember(event)
+
+    def _kind(self, kind: str) -> _KindIndex:
+        index = self._kinds.get(kind)
+        if index is None:
+            index = self._kinds[kind] = _KindIndex()
+        return index
+
+    def add_batch(self, logs: List[str], host_times: Optional[List], received_at: float) -> List[SafetyEvent]:
+        """
+        Analiza un lote de logs del ESP32 y agrega los eventos nuevos
+        Args:
+            logs: Líneas del lote
+            host_times: (hora de la PC, cota de error) por línea, o None sin sincronía
+            received_at: Hora de llegada del lote (se usa si no hay sincronía)
+        Returns:
+            List[SafetyEvent]: Eventos que no estaban en el índice
+        """
+        added = []
+        for i, line in enumerate(logs):
+            mapped = host_times[i] if host_times else None
+            event = parse_log_line(line, mapped[0] if mapped else received_at)
+            if event is not None and self.add(event):
+                added.append(event)
+        return added
+
+    def query(self, kind: Optional[str] = None, start: Optional[float] = None,
+              end: Optional[float] = None, min_distance: Optional[float] = None,
+              max_distance: Optional[float] = None) -> List[SafetyEvent]:
+        """
+        Eventos de un tipo (o de todos) en un rango de tiempo y de distancia
+        Args:
+            kind: Tipo de evento (SafetyEvent.STOP, ...) o None para todos
+            start / end: Rango de hora de la PC (inclusive)
+            min_distance / max_distance: Rango de distancia en cm (inclusive)
+        Returns:
+            List[SafetyEvent]: Eventos ordenados por tiempo
+        """
+        kinds = [kind] if kind else list(self._kinds)
+        result = []
+        with self._lock:
+            for name in kinds:
+                index = self._kind(name)
+                lo, hi = index.range(start, end)
+                if min_distance is None and max_distance is None:
+                    result.extend(index.events[lo:hi])
+                    continue
+                low = -math.inf if min_distance is None else min_distance
+                high = math.inf if max_distance is None else max_distance
+                distances = index.distances
+                events = index.events
+                # NaN falla ambas comparaciones: los eventos sin distancia quedan fuera
+                result.extend(events[i] for i in range(lo, hi) if low <= distances[i] <= high)
+        if len(kinds) > 1:
+            result.sort(key=lambda event: event.time)
+        return result
+
+    def count(self, kind: str, start: Optional[float] = None, end: Optional[float] = None) -> int:
+        """Cantidad de eventos de un tipo en un rango de tiempo"""
+        with self._lock:
+            lo, hi = self._kind(kind).range(start, end)
+        return hi - lo
+
+    def counts(self) -> Dict[str, int]:
+        """Cantidad de eventos por tipo"""
+        return {kind: len(index.times) for kind, index in self._kinds.items()}
+
+
+class SafetyJournal:
+    """Diario de eventos de seguridad en disco (JSON por líneas, solo agregar)"""
+
+    def __init__(self, path: str, max_bytes: Optional[int] = config.SAFETY_JOURNAL_MAX_BYTES):
+        """
+        Args:
+            path: Archivo del diario
+            max_bytes: Al pasarlo, el archivo reemplaza a <path>.1 y se empieza otro
+                (None = sin rotar); así cargarlo al arrancar tiene un costo acotado
+        """
+        self.path = path
+        self.rotated_path = path + ".1"
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None  # Bytes del archivo actual (se mide una vez)
+        self._lock = threading.Lock()
+
+    def append(self, events: Iterable[SafetyEvent]):
+        """Agrega eventos al final del diario"""
+        lines = "".join(json.dumps(event.to_dict(), ensure_ascii=False) + "\n" for event in events)
+        if not lines:
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            if self.max_bytes and self._size and self._size + len(lines.encode("utf-8")) > self.max_bytes:
+                os.replace(self.path, self.rotated_path)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                self._size = f.tell()
+
+    def load(self) -> List[SafetyEvent]:
+        """Lee los eventos del archivo rotado y del actual (ignora líneas dañadas)"""
+        events = []
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        events.append(SafetyEvent.from_dict(json.loads(line)))
+                    except (ValueError, KeyError):
+                        continue
+        return events
+
+    def load_index(self) -> SafetyLogIndex:
+        """Construye el índice con el diario retenido"""
+        index = SafetyLogIndex()
+        index.extend(self.load())
+        return index
@@ -0,0 +1,387 @@
+"""
+Reloj y planificador intercambiables
+
+El monitor, el enfriamiento de las alertas SMS y las tareas periódicas del
+controlador piden la hora y programan llamadas a través de esta interfaz en
+lugar de usar time.time() y root.after directamente:
+
+- SystemClock: la hora real (por defecto en toda la aplicación)
+- TkScheduler: root.after / after_cancel del mainloop de Tk
+- VirtualClock: reloj y planificador de tiempo virtual que avanza al instante;
+  una sesión simulada de una hora corre en segundos y siempre igual
+- TaskWheel: rueda de temporización sobre cualquiera de los dos planificadores
+  que reúne las tareas periódicas del controlador en un solo temporizador, con
+  el ritmo de cada una según la actividad (conduciendo, en reposo, ventana
+  oculta, sin conexión)
+
+La interfaz es mínima a propósito: `clock.time()`, `clock.sleep(s)` y
+`scheduler.after(ms, callback)` / `scheduler.cancel(handle)`, con el retardo en
+milisegundos como root.after, para que los intervalos de config sirvan tal cual.
+"""
+
+import time
+import heapq
+import threading
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import config
+
+
+class SystemClock:
+    """Hora real de la PC"""
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class TkScheduler:
+    """Planificador sobre el mainloop de Tk"""
+
+    def __init__(self, root, clock: SystemClock = SYSTEM_CLOCK):
+        self.root = root
+        self.clock = clock
+
+    def after(self, delay_ms: int, callback: Callable):
+        return self.root.after(delay_ms, callback)
+
+    def cancel(self, handle):
+        import tkinter  # Ya cargado: solo hay TkScheduler con una ventana
+        try:
+            self.root.after_cancel(handle)
+        except tkinter.TclError:
+            pass  # La ventana ya se cerró: no queda nada que cancelar
+
+
+class VirtualClock:
+    """
+    Reloj y planificador en tiempo virtual
+
+    El tiempo solo avanza con advance()/run_until()/sleep(): las llamadas
+    programadas se ejecutan en orden de vencimiento (y de programación si
+    vencen juntas) con la hora puesta exactamente en su vencimiento.
+    """
+
+    def __init__(self, start: float = 1_700_000_000.0):
+        self._now = start
+        self._timers: List[Tuple[float, int, Callable]] = []
+        self._cancelled = set()
+        self._sequence = 0
+        self._lock = threading.RLock()
+        self.clock = self  # Para usarlo donde se espera un planificador con .clock
+        self.callbacks_run = 0
+
+    # -------------------------
+    # Reloj
+    # -------------------------
+    def time(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float):
+        """Dormir en tiempo virtual es avanzar (ejecutando lo que venza)"""
+        self.advance(seconds)
+
+    # -------------------------
+    # Planificador
+    # -------------------------
+    def after(self, delay_ms: int, callback: Callable) -> int:
+        with self._lock:
+            self._sequence += 1
+            heapq.heappush(self._timers, (self._now + max(0, delay_ms) / 1000, self._sequence, callback))
+            return self._sequence
+
+    def cancel(self, handle: int):
+        with self._lock:
+            self._cancelled.add(handle)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._timers) - len(self._cancelled)
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            return self._timers[0][0] if self._timers else None
+
+    def run_until(self, deadline: float):
+        """Ejecuta en orden todo lo que vence hasta `deadline` y deja la hora ahí"""
+        while True:
+            with self._lock:
+                if not self._timers or self._timers[0][0] > deadline:
+                    self._now = max(self._now, deadline)
+                    return
+                due, handle, callback = heapq.heappop(self._timers)
+                self._now = max(self._now, due)
+                if handle in self._cancelled:
+                    self._cancelled.discard(handle)
+                    continue
+            callback()
+            self.callbacks_run += 1
+
+    def advance(self, seconds: float):
+        self.run_until(self._now + seconds)
+
+
+class _Task:
+    """Tarea periódica de la rueda y sus métricas"""
+    
+    __slots__ = ("name", "callback", "intervals", "due", "runs", "run_time", "max_run_time", "late")
+    
+    def __init__(self, name: str, callback: Callable, intervals):
+        self.name = name
+        self.callback = callback
+        self.intervals = intervals
+        self.due: Optional[int] = None  # Tick de vencimiento (None = en pausa)
+        self.runs = 0
+        self.run_time = 0.0  # s de ejecución acumulados
+        self.max_run_time = 0.0
+        self.late = 0.0  # s de atraso acumulados respecto del vencimiento
+
+
+class TaskWheel:
+    """
+    Rueda de temporización para las tareas periódicas
+    
+    El tiempo se divide en ticks de `tick_ms`; cada tarea vence en un tick
+    múltiplo de su intervalo (contado desde el mismo origen), así que las
+    tareas con intervalos múltiplos entre sí vencen juntas y corren en un solo
+    despertar. Las ranuras se indexan por tick módulo la cantidad de ranuras y
+    hay un único temporizador del planificador subyacente, armado en la
+    próxima ranura ocupada; sin tareas activas no se despierta.
+    
+    El intervalo de cada tarea depende de la actividad. touch() puede llamarse
+    desde cualquier hilo y solo anota la hora: el cambio de ritmo se aplica en
+    el próximo despertar. El resto corre en el hilo del planificador.
+    """
+    
+    ACTIVE = "active"    # Conectado y conduciendo (o el carrito se mueve)
+    IDLE = "idle"        # Conectado, sin actividad desde hace idle_after
+    HIDDEN = "hidden"    # Conectado con la ventana minimizada
+    OFFLINE = "offline"  # Sin conexión
+    
+    def __init__(self, scheduler, tick_ms: int = config.TASK_WHEEL_TICK, slots: int = config.TASK_WHEEL_SLOTS,
+                 idle_after: float = config.ACTIVITY_IDLE_AFTER):
+        """
+        Args:
+            scheduler: TkScheduler o VirtualClock (after/cancel y .clock)
+            tick_ms: Resolución de la rueda; las tareas que vencen en el mismo tick corren juntas
+            slots: Ranuras de la rueda (una vuelta = slots * tick_ms)
+            idle_after: Segundos sin touch() para pasar de activo a reposo
+        """
+        self.scheduler = scheduler
+        self.clock = scheduler.clock
+        self.tick_ms = tick_ms
+        self.idle_after = idle_after
+        self._slots: List[List[_Task]] = [[] for _ in range(slots)]
+        self._tasks: Dict[str, _Task] = {}
+        self._epoch = self.clock.time()
+        self._cursor = 0  # Último tick procesado
+        self._handle = None
+        self._armed_tick: Optional[int] = None
+        self._closed = False
+        self._connected = False
+        self._visible = True
+        self._last_touch = float("-inf")
+        self.activity = self.OFFLINE
+        self.wakeups = 0
+        self.coalesced = 0  # Ejecuciones que compartieron despertar con otra tarea
+        self._since = self._epoch
+        
+    # -------------------------
+    # Tareas
+    # -------------------------
+    def add(self, name: str, callback: Callable,
+            intervals: Union[Dict[str, int], Callable[[str], Optional[int]]]):
+        """
+        Registra una tarea periódica
+        Args:
+            name: Nombre para las métricas
+            callback: Función sin argumentos
+            intervals: ms por actividad ({TaskWheel.ACTIVE: 50, ...}; sin entrada =
+                en pausa) o función (actividad) -> ms o None
+        """
+        task = _Task(name, callback, intervals)
+        self._tasks[name] = task
+        self._place(task, self._next_due(task, self._now_tick()))
+        self._arm()
+        
+    def remove(self, name: str):
+        task = self._tasks.pop(name, None)
+        if task:
+            self._place(task, None)
+            self._arm()
+            
+    def _interval(self, task: _Task) -> Optional[int]:
+        """Ticks entre ejecuciones con la actividad actual (None = en pausa)"""
+        if callable(task.intervals):
+            interval = task.intervals(self.activity)
+        else:
+            interval = task.intervals.get(self.activity)
+        if interval is None:
+            return None
+        return max(1, round(interval / self.tick_ms))
+        
+    def _next_due(self, task: _Task, now_tick: int) -> Optional[int]:
+        """Próximo múltiplo del intervalo: así coinciden las tareas con intervalos múltiplos"""
+        ticks = self._interval(task)
+        if ticks is None:
+            return None
+        return (now_tick // ticks + 1) * ticks
+        
+    def _place(self, task: _Task, due: Optional[int]):
+        if task.due is not None:
+            self._slots[task.due % len(self._slots)].remove(task)
+        task.due = due
+        if due is not None:
+            self._slots[due % len(self._slots)].append(task)
+            
+    # -------------------------
+    # Actividad
+    # -------------------------
+    def touch(self):
+        """Marca actividad del usuario o del carrito (desde cualquier hilo)"""
+        self._last_touch = self.clock.time()
+        
+    def set_connected(self, connected: bool):
+        self._connected = connected
+        self._update_activity()
+        
+    def set_visible(self, visible: bool):
+        self._visible = visible
+        self._update_activity()
+        
+    def _current_activity(self) -> str:
+        if not self._connected:
+            return self.OFFLINE
+        if not self._visible:
+            return self.HIDDEN
+        if self.clock.time() - self._last_touch < self.idle_after:
+            return self.ACTIVE
+        return self.IDLE
+        
+    def _update_activity(self):
+        """Reprograma las tareas si cambió la actividad"""
+        activity = self._current_activity()
+        if activity == self.activity:
+            return
+        self.activity = activity
+        now_tick = self._now_tick()
+        for task in self._tasks.values():
+            due = self._next_due(task, now_tick)
+            if due is not None and task.due is not None:
+                due = min(due, task.due)  # Al frenar, la ejecución ya programada se respeta
+            self._place(task, due)
+        self._arm()
+        
+    # -------------------------
+    # Rueda
+    # -------------------------
+    def _now_tick(self) -> int:
+        # after() redondea al ms: medio ms antes del vencimiento ya cuenta como ese tick
+        return int(((self.clock.time() - self._epoch) * 1000 + 0.5) / self.tick_ms)
+        
+    def _tick_time(self, tick: int) -> float:
+        return self._epoch + tick * self.tick_ms / 1000
+        
+    def _earliest(self) -> Optional[int]:
+        """Próximo tick con tareas: recorre una vuelta desde el cursor"""
+        slots = self._slots
+        size = len(slots)
+        for tick in range(self._cursor + 1, self._cursor + 1 + size):
+            due = [task.due for task in slots[tick % size] if task.due < tick + size]
+            if due:
+                return min(due)
+        # Todo vence en vueltas posteriores (o ya venció)
+        return min((task.due for task in self._tasks.values() if task.due is not None), default=None)
+        
+    def _arm(self):
+        if self._closed:
+            return
+        due = self._earliest()
+        if due == self._armed_tick:
+            return
+        if self._handle is not None:
+            self.scheduler.cancel(self._handle)
+            self._handle = None
+        self._armed_tick = due
+        if due is not None:
+            delay = self._tick_time(due) - self.clock.time()
+            self._handle = self.scheduler.after(max(0, round(delay * 1000)), self._wake)
+            
+    def _wake(self):
+        self._handle = None
+        self._armed_tick = None
+        if self._closed:
+            return
+        self.wakeups += 1
+        self._update_activity()
+        now_tick = max(self._now_tick(), self._cursor + 1)
+        size = len(self._slots)
+        # Lo vencido desde el último despertar (todas las ranuras si pasó más de una vuelta)
+        ticks = range(self._cursor + 1, now_tick + 1) if now_tick - self._cursor <= size else range(size)
+        due = []
+        for tick in ticks:
+            due.extend(task for task in self._slots[tick % size] if task.due <= now_tick)
+        self._cursor = now_tick
+        if len(due) > 1:
+            due.sort(key=lambda task: task.due)
+            self.coalesced += len(due) - 1
+        now = self.clock.time()
+        for task in due:
+            task.late += max(0.0, now - self._tick_time(task.due))
+            self._place(task, self._next_due(task, now_tick))
+            started = time.perf_counter()
+            try:
+                task.callback()
+            except Exception as e:
+                print(f"✗ Error en la tarea periódica {task.name}: {e}")
+            elapsed = time.perf_counter() - started
+            task.runs += 1
+            task.run_time += elapsed
+            task.max_run_time = max(task.max_run_time, elapsed)
+        self._arm()
+        
+    def close(self):
+        """Cancela el temporizador; las tareas no vuelven a correr"""
+        self._closed = True
+        if self._handle is not None:
+            self.scheduler.cancel(self._handle)
+            self._handle = None
+            
+    # -------------------------
+    # Métricas
+    # -------------------------
+    def get_metrics(self) -> Dict:
+        """Despertares, coincidencias y tiempo de ejecución por tarea"""
+        minutes = max(self.clock.time() - self._since, 1e-9) / 60
+        tasks = {}
+        for name, task in self._tasks.items():
+            interval = self._interval(task)
+            tasks[name] = {
+                "runs": task.runs,
+                "interval_ms": None if interval is None else interval * self.tick_ms,
+                "mean_ms": task.run_time / task.runs * 1000 if task.runs else 0.0,
+                "max_ms": task.max_run_time * 1000,
+                "total_ms": task.run_time * 1000,
+                "late_ms": task.late / task.runs * 1000 if task.runs else 0.0,
+            }
+        return {
+            "activity": self.activity,
+            "wakeups": self.wakeups,
+            "wakeups_per_min": self.wakeups / minutes,
+            "coalesced": self.coalesced,
+            "tasks": tasks,
+        }
+        
+    def reset_metrics(self):
+        """Empieza a contar de nuevo (p. ej. al medir un modo de actividad)"""
+        self.wakeups = 0
+        self.coalesced = 0
+        self._since = self.clock.time()
+        for task in self._tasks.values():
+            task.runs = 0
+            task.run_time = task.max_run_time = task.late = 0.0
@@ -0,0 +1,112 @@
+"""
+Módulo de grabación de sesiones de manejo
+
+Cada conexión con el ESP32 se graba en un archivo JSON por líneas dentro de
+config.SESSIONS_DIR, con la hora de la PC de cada registro:
+
+    {"k": "session", "t": 1700000000.0, "car": "192.168.4.1"}
+    {"k": "cmd", "t": ..., "c": "FORWARD", "pwm": 200}
+    {"k": "speed", "t": ..., "v": 12.35}
+    {"k": "safety", "t": ..., "e": "stop", "d": 42.1}
+    {"k": "dist", "t": ..., "d": 87.4}
+
+Es el formato de entrada del análisis de frenado (analysis.py).
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+import config
+
+
+class SessionRecorder:
+    """Graba los comandos, la velocidad y los eventos de seguridad de una sesión"""
+
+    # Tipos de registro
+    SESSION = "session"
+    COMMAND = "cmd"
+    SPEED = "speed"
+    SAFETY = "safety"
+    DISTANCE = "dist"
+
+    def __init__(self, directory: str = config.SESSIONS_DIR):
+        self.directory = directory
+        self.path: Optional[str] = None
+        self.records = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self._file is not None
+
+    def start(self, car: str) -> Optional[str]:
+        """Abre un archivo de sesión nuevo; devuelve su ruta"""
+        self.stop()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            name = datetime.now().strftime("session_%Y%m%d_%H%M%S.jsonl")
+            path = os.path.join(self.directory, name)
+            with self._lock:
+                self._file = open(path, "a", encoding="utf-8")
+                self.path = path
+                self.records = 0
+            self._write({"k": self.SESSION, "t": time.time(), "car": car})
+            return path
+        except OSError as e:
+            print(f"✗ Error al iniciar la grabación de la sesión: {e}")
+            return None
+
+    def stop(self):
+        """Cierra el archivo de la sesión"""
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self.records += 1
+            # Vaciar a disco cada tanto para no perder la sesión si la app se cierra mal
+            now = time.monotonic()
+            if now - self._last_flush >= config.SESSION_FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = now
+
+    def record_command(self, command: str, pwm: int, timestamp: Optional[float] = None):
+        self._write({"k": self.COMMAND, "t": timestamp or time.time(), "c": command, "pwm": pwm})
+
+    def record_speed(self, speed: float, timestamp: Optional[float] = None):
+        self._write({"k": self.SPEED, "t": timestamp or time.time(), "v": speed})
+
+    def record_distance(self, distance: float, timestamp: Optional[float] = None):
+        self._write({"k": self.DISTANCE, "t": timestamp or time.time(), "d": distance})
+        
+    def record_safety_events(self, events: List):
+        """Graba eventos de seguridad (SafetyEvent) con su hora de la PC"""
+        for event in events:
+            self._write({"k": self.SAFETY, "t": event.time, "e": event.kind, "d": event.distance})
+
+
+def list_sessions(directory: str = config.SESSIONS_DIR) -> List[str]:
+    """
+    Rutas de las sesiones grabadas, de la más antigua a la más reciente
+    Una sesión ya convertida a .carx (archive.py) aparece una sola vez, comprimida.
+    """
+    if not os.path.isdir(directory):
+        return []
+    sessions = {}
+    for name in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(name)
+        if name.startswith("session_") and extension in (".jsonl", ".carx"):
+            if extension == ".carx" or stem not in sessions:
+                sessions[stem] = os.path.join(directory, name)
+    return [sessions[stem] for stem in sorted(sessions)]
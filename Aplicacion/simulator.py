@@ -0,0 +1,583 @@
+"""
+Simulador del ESP32 para pruebas sin el carrito
+
+Servidor TCP que habla el mismo protocolo de texto que el firmware
+(SPEED_SET:, FORWARD, STOP, GET_SPEED, GET_LOGS, TIME?, MACRO:, DRIVE:, HB:...) con:
+
+- un reloj propio que arranca en otro instante y deriva respecto al de la PC
+  (como el cristal del ESP32)
+- retardo de subida y de bajada configurables por separado, más jitter
+  aleatorio, respetando el orden de TCP en cada sentido
+- un obstáculo opcional al frente cuya distancia se transmite con DIST:
+- ejecución local de maniobras (MACRO:) en un ciclo de 10 ms como loop()
+- deadman: sin latidos HB: de la PC durante deadman_timeout detiene los motores
+- cortes del enlace (partition/heal): lo enviado queda retenido, como TCP
+  retransmitiendo, y se entrega en orden cuando el enlace vuelve
+- respuesta opcional al anuncio UDP de descubrimiento ("CARRITO?")
+- cada log empujado al momento como LOG:<seq>:<texto>, con pérdida opcional
+  para probar la reparación de huecos con GET_LOGS
+- comandos numerados (<comando>#<seq>) confirmados con OK:<seq> y
+  deduplicados como en el firmware, con pérdida opcional de comandos y de
+  confirmaciones para probar las retransmisiones
+- tramas compuestas (<op>|<op>|...) validadas enteras y aplicadas en la misma
+  vuelta de loop(), con una sola confirmación
+
+Uso:
+    python simulator.py                       # Escucha en 127.0.0.1:8080
+    python simulator.py --drift-ppm 150       # Con un reloj que adelanta
+"""
+
+import sys
+import os
+import heapq
+import random
+import socket
+import threading
+import time
+import json
+from collections import deque
+from typing import Optional
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class SimulatedESP32:
+    """Carrito simulado que atiende un cliente a la vez, como el firmware"""
+
+    MAX_LOGS = 10
+    MAX_MACRO_STEPS = 16
+    LOOP_INTERVAL = 0.01  # delay(10) del loop() del firmware
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 boot_time: float = 12.0, drift_ppm: float = 0.0,
+                 uplink_delay: float = 0.0, downlink_delay: float = 0.0,
+                 jitter: float = 0.0, uplink_jitter: Optional[float] = None,
+                 speed_interval: float = 1.0, obstacle_distance: Optional[float] = None,
+                 sensor_interval: float = 0.1, deadman_timeout: float = 0.5,
+                 announce_port: Optional[int] = None, push_logs: bool = True,
+                 log_loss: float = 0.0, command_loss: float = 0.0, ack_loss: float = 0.0,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            boot_time: Segundos que lleva encendido el ESP32 al iniciar el simulador
+            drift_ppm: Deriva del reloj del ESP32 (positivo = adelanta)
+            uplink_delay / downlink_delay: Retardo base PC → ESP32 y ESP32 → PC (s)
+            jitter: Media del retardo extra aleatorio (exponencial) en cada sentido (s)
+            uplink_jitter: Jitter solo de subida (por defecto igual a jitter)
+            speed_interval: Periodo de los mensajes SPEED: (s)
+            obstacle_distance: Distancia inicial a un obstáculo al frente (cm);
+                None = sin obstáculo y sin mensajes DIST:
+            sensor_interval: Periodo de la física y de los mensajes DIST: (s)
+            deadman_timeout: Silencio de latidos (s) que detiene los motores;
+                se arma con el primer HB: de cada conexión
+            announce_port: Puerto UDP del anuncio de descubrimiento (0 = libre,
+                None = sin anuncio)
+            push_logs: Empuja cada log (LOG:<seq>:<texto>); False = firmware
+                anterior, que solo responde GET_LOGS sin numerar
+            log_loss: Probabilidad de que un LOG: empujado no salga (println
+                fallido); la entrada sigue en el buffer de GET_LOGS
+            command_loss: Probabilidad de que un comando recibido se pierda sin
+                ejecutarse (línea dañada o readStringUntil vencido)
+            ack_loss: Probabilidad de que una confirmación OK:<seq> no salga
+        """
+        self.host = host
+        self.port = port
+        self.boot_time = boot_time
+        self.drift = drift_ppm * 1e-6
+        self.uplink_delay = uplink_delay
+        self.downlink_delay = downlink_delay
+        self.jitter = jitter
+        self.uplink_jitter = jitter if uplink_jitter is None else uplink_jitter
+        self.speed_interval = speed_interval
+        self.sensor_interval = sensor_interval
+        self.obstacle_distance = obstacle_distance
+        self.deadman_timeout = deadman_timeout
+        self.announce_port = announce_port
+        self.push_logs = push_logs
+        self.log_loss = log_loss
+        self.command_loss = command_loss
+        self.ack_loss = ack_loss
+        self._announce: Optional[socket.socket] = None
+        self.min_distance = obstacle_distance  # Lo más cerca que llegó al obstáculo
+        self.random = random.Random(seed)
+
+        # Estado del carrito
+        self.pwm = 200
+        self.direction = "STOP"
+        self.speed = 0.0
+        self.steering = 0  # PWM con signo del motor de dirección (DRIVE:)
+        self.logs = deque(maxlen=self.MAX_LOGS)
+        self.log_seq = 0  # Número de la última entrada
+        self.commands = []  # (millis del ESP32, comando) en orden de ejecución
+        self.movements = []  # (reloj del ESP32 en s, dirección, PWM) al aplicarse al motor
+        self.deadman_trips = []  # Reloj del ESP32 (s) de cada detención por falta de latidos
+        self.duplicates = 0  # Comandos numerados recibidos de nuevo (no se ejecutan otra vez)
+        self.lines_received = 0  # Líneas leídas del socket (escrituras de la PC, latidos incluidos)
+        self._in_frame = False  # Aplicando una trama compuesta: sin OK:<comando> por operación
+        self._last_command_seq = 0  # Mayor número de comando ejecutado
+        self._seq_window = 0  # Bit i: se ejecutó _last_command_seq - i
+        self._last_heartbeat: Optional[float] = None  # Reloj del ESP32 del último HB:
+        self._deadman_tripped = False
+        
+        # Maniobra en curso: (id, pasos [(comando, pwm, s)], paso actual, inicio planificado)
+        self._macro = None
+        self._state_lock = threading.RLock()
+
+        self._server: Optional[socket.socket] = None
+        self._client: Optional[socket.socket] = None
+        self._running = False
+        self._start = 0.0
+        self._threads = []
+
+        # Mensajes en tránsito: (hora de entrega, orden, acción)
+        self._pending = []
+        self._pending_lock = threading.Condition()
+        self._sequence = 0
+        self._last_uplink = 0.0
+        self._last_downlink = 0.0
+        
+        # Enlace cortado por sentido (True = subida) y lo retenido mientras tanto
+        self._blocked = {True: False, False: False}
+        self._held = {True: [], False: []}
+
+    # -------------------------
+    # Reloj del ESP32
+    # -------------------------
+    def device_time(self, now: Optional[float] = None) -> float:
+        """Segundos desde el arranque del ESP32 según su propio reloj"""
+        if now is None:
+            now = time.time()
+        return self.boot_time + (now - self._start) * (1 + self.drift)
+
+    def millis(self, now: Optional[float] = None) -> int:
+        return int(self.device_time(now) * 1000) & 0xFFFFFFFF
+
+    def host_time_of(self, device_time: float) -> float:
+        """Hora real de la PC para una marca del reloj del ESP32 (para validar)"""
+        return self._start + (device_time - self.boot_time) / (1 + self.drift)
+
+    def add_log(self, message: str):
+        ms = self.millis()
+        line = f"[{ms // 1000}.{ms % 1000:03d}s] {message}"
+        with self._state_lock:
+            self.logs.append(line)
+            self.log_seq += 1
+            if not (self.push_logs and self._client):
+                return
+            if self.log_loss and self.random.random() < self.log_loss:
+                return
+            self.send(f"LOG:{self.log_seq}:{line}")
+
+    # -------------------------
+    # Servidor
+    # -------------------------
+    def start(self) -> int:
+        """Inicia el servidor y devuelve el puerto"""
+        self._start = time.time()
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen(1)
+        self.port = self._server.getsockname()[1]
+        self._running = True
+        self.add_log("Sistema iniciado correctamente")
+        targets = [self._accept_loop, self._delivery_loop, self._telemetry_loop,
+                   self._physics_loop, self._firmware_loop]
+        if self.announce_port is not None:
+            self._announce = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._announce.bind((self.host, self.announce_port))
+            self.announce_port = self._announce.getsockname()[1]
+            targets.append(self._announce_loop)
+        for target in targets:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self.port
+
+    def stop(self):
+        """Detiene el servidor y cierra el cliente"""
+        self._running = False
+        with self._pending_lock:
+            self._pending_lock.notify_all()
+        for sock in (self._client, self._server, self._announce):
+            if sock:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+        self._client = None
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._client = client
+            with self._state_lock:
+                self._last_command_seq = 0  # La PC numera desde 1 en cada conexión
+                self._seq_window = 0
+            self.add_log("Cliente conectado")
+            self._read_commands(client)
+            self._client = None
+            self.add_log("Cliente desconectado")
+            with self._state_lock:
+                self._last_heartbeat = None  # El deadman se vuelve a armar con la próxima conexión
+                if self._macro:
+                    self._macro = None
+                    self._move("STOP", self.pwm)
+                    
+    def _announce_loop(self):
+        """Responde el anuncio de descubrimiento con el puerto TCP, como el firmware"""
+        while self._running:
+            try:
+                data, address = self._announce.recvfrom(64)
+            except OSError:
+                return
+            if data.strip() == b"CARRITO?":
+                self._announce.sendto(f"CARRITO:{self.port}:ESP32_Carrito".encode(), address)
+
+    def _read_commands(self, client: socket.socket):
+        buffer = b""
+        while self._running:
+            try:
+                data = client.recv(1024)
+            except OSError:
+                return
+            if not data:
+                return
+            buffer += data
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                command = line.decode(errors="replace").strip()
+                if command:
+                    self.lines_received += 1
+                    self._schedule_uplink(command)
+
+    # -------------------------
+    # Retardo de red simulado
+    # -------------------------
+    def _schedule(self, action, base: float, jitter: float, uplink: bool):
+        """Programa una entrega respetando el orden de TCP en cada sentido"""
+        with self._pending_lock:
+            if self._blocked[uplink]:
+                self._held[uplink].append((action, base, jitter))
+                return
+            delay = base + (self.random.expovariate(1 / jitter) if jitter else 0.0)
+            due = time.time() + delay
+            if uplink:
+                due = self._last_uplink = max(due, self._last_uplink)
+            else:
+                due = self._last_downlink = max(due, self._last_downlink)
+            self._sequence += 1
+            heapq.heappush(self._pending, (due, self._sequence, action))
+            self._pending_lock.notify()
+            
+    def partition(self, duration: Optional[float] = None, uplink: bool = True, downlink: bool = True):
+        """
+        Corta el enlace sin cerrar el socket (WiFi fuera de alcance)
+        Args:
+            duration: Segundos hasta que vuelve solo; None = hasta heal()
+            uplink / downlink: Sentidos cortados
+        """
+        with self._pending_lock:
+            self._blocked[True] = self._blocked[True] or uplink
+            self._blocked[False] = self._blocked[False] or downlink
+        if duration is not None:
+            timer = threading.Timer(duration, self.heal)
+            timer.daemon = True
+            timer.start()
+            
+    def heal(self):
+        """Restablece el enlace y entrega en orden lo retenido durante el corte"""
+        with self._pending_lock:
+            held = self._held
+            self._held = {True: [], False: []}
+            self._blocked = {True: False, False: False}
+            for uplink, items in held.items():
+                for action, base, jitter in items:
+                    self._schedule(action, base, jitter, uplink)
+
+    def _schedule_uplink(self, command: str):
+        self._schedule(lambda: self._execute(command), self.uplink_delay, self.uplink_jitter, uplink=True)
+
+    def send(self, line: str):
+        """Envía una línea a la PC pasando por el retardo de bajada"""
+        # El contenido se genera ya: las marcas de tiempo son las del envío
+        data = (line + "\r\n").encode()
+        self._schedule(lambda: self._write(data), self.downlink_delay, self.jitter, uplink=False)
+
+    def _write(self, data: bytes):
+        client = self._client
+        if client:
+            try:
+                client.sendall(data)
+            except OSError:
+                pass
+
+    def _delivery_loop(self):
+        while self._running:
+            with self._pending_lock:
+                while self._running and not self._pending:
+                    self._pending_lock.wait()
+                if not self._running:
+                    return
+                due, _, action = self._pending[0]
+                wait = due - time.time()
+                if wait > 0:
+                    self._pending_lock.wait(wait)
+                    continue
+                heapq.heappop(self._pending)
+            action()
+
+    def _telemetry_loop(self):
+        while self._running:
+            time.sleep(self.speed_interval)
+            if self._client:
+                self.send(f"SPEED:{self.speed:.2f}:{self.millis()}")
+                
+    def _physics_loop(self):
+        """Mueve el carrito y, si hay obstáculo, lo mide como el HC-SR04"""
+        while self._running:
+            time.sleep(self.sensor_interval)
+            self._update_speed(self.sensor_interval)
+            if self.obstacle_distance is None:
+                continue
+            if self.direction == "FORWARD":
+                self.obstacle_distance -= self.speed * self.sensor_interval
+            elif self.direction == "BACKWARD":
+                self.obstacle_distance += self.speed * self.sensor_interval
+            self.min_distance = min(self.min_distance, self.obstacle_distance)
+            if self._client:
+                self.send(f"DIST:{self.obstacle_distance:.1f}:{self.millis()}")
+
+    def _firmware_loop(self):
+        """Avanza la maniobra en curso y vigila los latidos con el reloj del ESP32"""
+        while self._running:
+            time.sleep(self.LOOP_INTERVAL)
+            with self._state_lock:
+                self._advance_macro()
+                self._check_deadman()
+                
+    def _check_deadman(self):
+        if self._last_heartbeat is None or self._deadman_tripped:
+            return
+        if self.device_time() - self._last_heartbeat < self.deadman_timeout:
+            return
+        self._deadman_tripped = True
+        self._abort_macro("deadman")
+        self.steering = 0
+        self._move("STOP", self.pwm)
+        self.deadman_trips.append(self.device_time())
+        self.add_log(f"DEADMAN! Sin latidos de la PC ({round(self.deadman_timeout * 1000)} ms)")
+                
+    # -------------------------
+    # Firmware simulado
+    # -------------------------
+    def _move(self, direction: str, pwm: int):
+        self.pwm = pwm
+        self.direction = direction
+        if direction == "STOP":
+            self.speed = 0.0
+        self.movements.append((self.device_time(), direction, pwm))
+        
+    def _load_macro(self, definition: str):
+        """<id>:<cmd>,<pwm>,<ms>;... → (id, pasos); ValueError si no es válida"""
+        macro_id, _, body = definition.partition(":")
+        steps = []
+        for item in body.split(";"):
+            command, pwm, ms = item.split(",")
+            if command not in ("FORWARD", "BACKWARD", "LEFT", "RIGHT", "STOP") or not 0 <= int(pwm) <= 255:
+                raise ValueError(item)
+            steps.append((command, int(pwm), int(ms) / 1000.0))
+        if not steps or len(steps) > self.MAX_MACRO_STEPS:
+            raise ValueError(definition)
+        return int(macro_id), steps
+        
+    def _start_macro_step(self, index: int, planned_start: float):
+        macro_id, steps, _, _ = self._macro
+        command, pwm, _ = steps[index]
+        self._macro = (macro_id, steps, index, planned_start)
+        self._move(command, pwm if command != "STOP" else self.pwm)
+        self.send(f"MACRO:STEP:{macro_id}:{index}:{self.millis()}")
+        
+    def _advance_macro(self):
+        if not self._macro:
+            return
+        macro_id, steps, index, started = self._macro
+        end = started + steps[index][2]
+        if self.device_time() < end:
+            return
+        if index + 1 < len(steps):
+            self._start_macro_step(index + 1, end)  # Inicio planificado: el error no se acumula
+        else:
+            self._macro = None
+            self._move("STOP", self.pwm)
+            self.add_log("Maniobra completada")
+            self.send(f"MACRO:DONE:{macro_id}:{self.millis()}")
+            
+    def _abort_macro(self, reason: str):
+        if self._macro:
+            macro_id, _, index, _ = self._macro
+            self._macro = None
+            self.add_log(f"Maniobra abortada: {reason}")
+            self.send(f"MACRO:ABORT:{macro_id}:{index}:{self.millis()}")
+            
+    def _update_speed(self, dt: float):
+        """Respuesta de primer orden del motor (constante de tiempo de 0.2 s)"""
+        target = self.pwm * 0.4 if self.direction in ("FORWARD", "BACKWARD") else 0.0
+        self.speed += (target - self.speed) * min(1.0, dt / 0.2)
+
+    SEQ_WINDOW = 32  # Números recientes recordados (ventanaSeqComandos en el firmware)
+    
+    def _execute(self, line: str):
+        """Ejecuta un comando como lo haría loop() en el firmware"""
+        command, _, seq = line.rpartition("#")
+        if not command or not seq.isdigit():
+            command, seq = line, None
+        else:
+            seq = int(seq)
+        with self._state_lock:
+            if self.command_loss and self.random.random() < self.command_loss:
+                return
+            repeated = seq is not None and self._command_repeated(seq)
+            if repeated:
+                self.duplicates += 1  # Retransmisión de algo ya ejecutado: solo se confirma
+                accepted = True
+            elif "|" in command:
+                accepted = self._execute_frame(command)
+            else:
+                accepted = self._execute_locked(command) is not False
+            if seq is None or (self.ack_loss and self.random.random() < self.ack_loss):
+                return
+            self.send(f"{'OK' if accepted else 'ERR'}:{seq}{':DUP' if repeated else ''}")
+            
+    MAX_FRAME_OPS = 4  # MAX_OPS_TRAMA en el firmware
+    FRAME_OPS = ("FORWARD", "BACKWARD", "LEFT", "RIGHT", "STOP", "SPEED_LOW", "SPEED_HIGH", "GET_SPEED", "GET_LOGS")
+    
+    def _frame_op_valid(self, op: str) -> bool:
+        """operacionValida() del firmware: estado y consultas, sin MACRO: ni HB:"""
+        if op.startswith("SPEED_SET:"):
+            value = op[10:]
+            return value.isdigit() and 0 <= int(value) <= 255
+        return op in self.FRAME_OPS
+        
+    def _execute_frame(self, frame: str) -> bool:
+        """Trama compuesta: se valida entera y se aplica sin estados intermedios"""
+        ops = frame.split("|")
+        if len(ops) > self.MAX_FRAME_OPS or not all(self._frame_op_valid(op) for op in ops):
+            self.commands.append((self.millis(), frame))
+            return False
+        self._in_frame = True
+        try:
+            for op in ops:
+                self._execute_locked(op)
+        finally:
+            self._in_frame = False
+        return True
+            
+    def _command_repeated(self, seq: int) -> bool:
+        """Registra un número de comando; True si ya se había ejecutado"""
+        if seq > self._last_command_seq:
+            shift = seq - self._last_command_seq
+            self._seq_window = ((self._seq_window << shift) | 1) & ((1 << self.SEQ_WINDOW) - 1)
+            self._last_command_seq = seq
+            return False
+        back = self._last_command_seq - seq
+        if back >= self.SEQ_WINDOW:
+            return True  # Demasiado viejo: la PC ya lo dio por perdido
+        bit = 1 << back
+        if self._seq_window & bit:
+            return True
+        self._seq_window |= bit
+        return False
+        
+    def _execute_locked(self, command: str) -> Optional[bool]:
+        """False si el firmware rechaza el comando (ERR:<seq> si venía numerado)"""
+        self.commands.append((self.millis(), command))
+        if command == "TIME?":
+            self.send(f"TIME:{self.millis()}")
+        elif command.startswith("TIME?:"):
+            self.send(f"TIME:{command[6:]}:{self.millis()}")
+        elif command.startswith("HB:"):
+            # Latido: eco inmediato y el deadman se rearma
+            self._last_heartbeat = self.device_time()
+            self._deadman_tripped = False
+            self.send(command)
+        elif command.startswith("SPEED_SET:"):
+            value = int(command[10:])
+            if 0 <= value <= 255:
+                self.pwm = value
+                self.add_log(f"Velocidad PWM={value}")
+                self.send(f"SPEED:{self.speed:.2f}:{self.millis()}")
+            else:
+                return False
+        elif command in ("SPEED_LOW", "SPEED_HIGH"):
+            self.pwm = 150 if command == "SPEED_LOW" else 255
+            self.add_log("Velocidad BAJA" if command == "SPEED_LOW" else "Velocidad ALTA")
+            self.send(f"SPEED:{self.speed:.2f}:{self.millis()}")
+        elif command in ("FORWARD", "BACKWARD", "LEFT", "RIGHT", "STOP"):
+            # El control manual (y cualquier STOP) aborta la maniobra en curso
+            self._abort_macro(command)
+            self._move(command, self.pwm)
+            self.add_log(f"CMD: {command}")
+            if not self._in_frame:
+                self.send(f"OK:{command}")
+        elif command.startswith("DRIVE:"):
+            # Flujo continuo: sin respuesta, como el firmware
+            self._abort_macro("comando manual")
+            throttle, steering = (int(value) for value in command[6:].split(":"))
+            direction = "FORWARD" if throttle > 0 else "BACKWARD" if throttle < 0 else "STOP"
+            self.steering = steering
+            self._move(direction, min(abs(throttle), 255))
+        elif command.startswith("MACRO:"):
+            self._abort_macro("reemplazada")
+            try:
+                macro_id, steps = self._load_macro(command[6:])
+            except ValueError:
+                self.send(f"ERR:MACRO:{command[6:].partition(':')[0]}")
+                return False
+            self.add_log(f"Maniobra {macro_id}: {len(steps)} pasos")
+            self.send(f"OK:MACRO:{macro_id}")
+            self._macro = (macro_id, steps, 0, 0.0)
+            self._start_macro_step(0, self.device_time())
+        elif command == "GET_SPEED":
+            self.send(f"SPEED:{self.speed:.2f}:{self.millis()}")
+        elif command == "GET_LOGS":
+            logs = {"logs": list(self.logs)}
+            if self.push_logs:
+                logs["seq"] = self.log_seq
+            self.send("LOGS:" + json.dumps(logs))
+        else:
+            return False
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Simulador del ESP32")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--drift-ppm", type=float, default=50.0)
+    parser.add_argument("--uplink-ms", type=float, default=5.0)
+    parser.add_argument("--downlink-ms", type=float, default=5.0)
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    simulator = SimulatedESP32(
+        host=args.host, port=args.port, drift_ppm=args.drift_ppm,
+        uplink_delay=args.uplink_ms / 1000, downlink_delay=args.downlink_ms / 1000,
+        jitter=args.jitter_ms / 1000
+    )
+    port = simulator.start()
+    print(f"🤖 ESP32 simulado en {args.host}:{port} (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Bloque de estado del carrito en un archivo mapeado en memoria
+
+Otras herramientas de la misma PC (el registrador de datos, la superposición
+de video) leen el último estado sin sockets ni parseo: el controlador escribe
+un bloque de 64 bytes con distribución fija en un archivo y cualquier proceso
+lo mapea y lo lee en microsegundos.
+
+Distribución (little endian, versión 1):
+
+    0   4s  magia b"CARS"
+    4   H   versión
+    6   H   tamaño del bloque
+    8   Q   secuencia (seqlock: impar mientras se escribe)
+    16  d   hora de la última actualización (time.time())
+    24  d   velocidad real (cm/s, MPU6050)
+    32  d   RTT (s)
+    40  i   PWM (0-255, con signo en el flujo proporcional)
+    44  B   dirección (DIRECTIONS)
+    45  B   conexión (CONNECTIONS)
+    46      reservado hasta 64
+
+El escritor incrementa la secuencia (queda impar), escribe los campos y la
+vuelve a incrementar (par). El lector copia los campos entre dos lecturas de
+la secuencia y reintenta si cambió o era impar, así nunca ve un estado mezclado.
+
+El controlador solo lo escribe con CAR_STATE_BLOCK=1 (ruta en CAR_STATE_FILE).
+Este módulo solo usa la biblioteca estándar para que las otras herramientas
+puedan copiarlo tal cual:
+
+    from stateblock import StateBlockReader
+    with StateBlockReader("car_state.bin") as reader:
+        state = reader.read()
+        print(state.speed, state.pwm, state.direction, state.connection, state.rtt)
+"""
+
+import os
+import mmap
+import time
+import struct
+import threading
+from collections import namedtuple
+from typing import Optional
+
+MAGIC = b"CARS"
+VERSION = 1
+SIZE = 64
+
+_HEADER = struct.Struct("<4sHH")
+_SEQ = struct.Struct("<Q")
+_FIELDS = struct.Struct("<dddiBB")
+_SEQ_OFFSET = 8
+_FIELDS_OFFSET = 16
+
+DIRECTIONS = ("STOP", "FORWARD", "BACKWARD", "LEFT", "RIGHT")
+CONNECTIONS = ("disconnected", "ok", "degraded", "lost")
+
+CarState = namedtuple("CarState", "seq updated_at speed rtt pwm direction connection")
+
+
+class StateBlockWriter:
+    """Lado del controlador: un solo escritor (serializado con un lock)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._state = {"updated_at": 0.0, "speed": 0.0, "rtt": 0.0, "pwm": 0,
+                       "direction": "STOP", "connection": "disconnected"}
+        self._file = open(path, "w+b")
+        self._file.write(bytes(SIZE))
+        self._file.flush()
+        self._map = mmap.mmap(self._file.fileno(), SIZE)
+        _HEADER.pack_into(self._map, 0, MAGIC, VERSION, SIZE)
+        self._seq = 0
+        self._write()
+
+    def update(self, **changes) -> bool:
+        """
+        Cambia uno o más campos (speed, rtt, pwm, direction, connection)
+        Returns:
+            True si algo cambió y se escribió el bloque
+        """
+        with self._lock:
+            if self._map is None:
+                return False
+            if all(self._state.get(name) == value for name, value in changes.items()):
+                return False
+            for name in changes:
+                if name not in self._state or name == "updated_at":
+                    raise KeyError(f"Campo desconocido del bloque de estado: {name}")
+            # Validar antes de empezar la escritura: la secuencia no debe quedar impar
+            if changes.get("direction", "STOP") not in DIRECTIONS:
+                raise ValueError(f"Dirección desconocida: {changes['direction']}")
+            if changes.get("connection", "ok") not in CONNECTIONS:
+                raise ValueError(f"Estado de conexión desconocido: {changes['connection']}")
+            self._state.update(changes)
+            self._state["updated_at"] = time.time()
+            self._write()
+            return True
+
+    def _write(self):
+        state = self._state
+        self._seq += 1  # Impar: escritura en curso
+        _SEQ.pack_into(self._map, _SEQ_OFFSET, self._seq)
+        _FIELDS.pack_into(
+            self._map, _FIELDS_OFFSET, state["updated_at"], float(state["speed"]), float(state["rtt"]),
+            int(state["pwm"]), DIRECTIONS.index(state["direction"]), CONNECTIONS.index(state["connection"])
+        )
+        self._seq += 1  # Par: bloque consistente
+        _SEQ.pack_into(self._map, _SEQ_OFFSET, self._seq)
+        self.writes += 1
+
+    def close(self, remove: bool = False):
+        """Marca el carrito como desconectado y suelta el mapeo"""
+        self.update(connection="disconnected")
+        with self._lock:
+            self._map.close()
+            self._map = None
+            self._file.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class StateBlockReader:
+    """Lado de las otras herramientas: lecturas consistentes sin lock"""
+
+    SPIN = 16  # Reintentos seguidos antes de ceder el procesador al escritor
+
+    def __init__(self, path: str, max_retries: int = 100000):
+        self.path = path
+        self.max_retries = max_retries
+        self.retries = 0  # Lecturas repetidas por coincidir con una escritura
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), SIZE, access=mmap.ACCESS_READ)
+        magic, version, size = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} no es un bloque de estado del carrito")
+        if version != VERSION or size != SIZE:
+            self.close()
+            raise ValueError(f"{path}: versión {version} del bloque de estado (se esperaba {VERSION})")
+
+    def read(self) -> CarState:
+        """Último estado consistente"""
+        buffer = self._map
+        for attempt in range(self.max_retries):
+            if attempt >= self.SPIN:
+                time.sleep(0)
+            before = _SEQ.unpack_from(buffer, _SEQ_OFFSET)[0]
+            if before & 1 == 0:
+                fields = _FIELDS.unpack_from(buffer, _FIELDS_OFFSET)
+                if _SEQ.unpack_from(buffer, _SEQ_OFFSET)[0] == before:
+                    updated_at, speed, rtt, pwm, direction, connection = fields
+                    return CarState(before, updated_at, speed, rtt, pwm,
+                                    DIRECTIONS[direction], CONNECTIONS[connection])
+            self.retries += 1
+        raise TimeoutError(f"{self.path}: el escritor no terminó tras {self.max_retries} intentos")
+
+    @property
+    def seq(self) -> int:
+        """Secuencia actual (cambia con cada escritura)"""
+        return _SEQ.unpack_from(self._map, _SEQ_OFFSET)[0]
+
+    def wait_for_change(self, seq: int, timeout: Optional[float] = None, poll: float = 0.001) -> Optional[CarState]:
+        """Espera a que la secuencia pase de `seq`; None si vence el timeout"""
+        deadline = None if timeout is None else time.time() + timeout
+        while self.seq == seq:
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(poll)
+        return self.read()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,313 @@
+"""
+Módulo de historial de telemetría multi-resolución
+
+Guarda las muestras crudas de los últimos segundos y las agrega automáticamente
+en cubetas de 1 s, 1 min y 1 h (mínimo, máximo, promedio y cantidad). Todas las
+estructuras son buffers circulares respaldados por arrays de tamaño fijo, por lo
+que la memoria no crece durante pruebas de resistencia de varias horas.
+
+Los escritores (hilo de Tk, hilo de escucha) nunca esperan a un lector: cada
+hilo deja sus muestras en su propio anillo de un productor y un consumidor, y
+quien consulta las agrega bajo el lock antes de leer. Un escritor solo agrega
+por su cuenta si su anillo se está llenando, y solo si el lock está libre.
+"""
+
+import time
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+import config
+
+
+# (inicio, mínimo, máximo, promedio, cantidad)
+Bucket = Tuple[float, float, float, float, int]
+
+
+class _RawRing:
+    """Muestras crudas recientes en un buffer circular"""
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = array('d', [0.0]) * capacity
+        self.values = array('d', [0.0]) * capacity
+        self.index = 0
+        self.count = 0
+        
+    def add(self, timestamp: float, value: float):
+        """Agrega una muestra sobrescribiendo la más antigua si está lleno"""
+        self.times[self.index] = timestamp
+        self.values[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+            
+    def ordered(self) -> Tuple[array, array]:
+        """Devuelve tiempos y valores en orden cronológico"""
+        if self.count < self.capacity:
+            return self.times[:self.count], self.values[:self.count]
+        i = self.index
+        return self.times[i:] + self.times[:i], self.values[i:] + self.values[:i]
+        
+    def oldest(self) -> Optional[float]:
+        """Marca de tiempo de la muestra más antigua retenida"""
+        if self.count == 0:
+            return None
+        return self.times[0] if self.count < self.capacity else self.times[self.index]
+
+
+class _StagingRing:
+    """Muestras de un único hilo escritor pendientes de agregar (sin locks)"""
+    
+    __slots__ = ("owner", "times", "values", "capacity", "head", "tail", "dropped")
+    
+    def __init__(self, capacity: int):
+        self.owner = threading.current_thread()
+        self.times = array('d', [0.0]) * capacity
+        self.values = array('d', [0.0]) * capacity
+        self.capacity = capacity
+        self.head = 0  # Muestras escritas (solo lo avanza el escritor)
+        self.tail = 0  # Muestras agregadas (solo lo avanza quien tiene el lock de la serie)
+        self.dropped = 0  # Anillo lleno con el lock ocupado
+        
+    def put(self, timestamp: float, value: float) -> bool:
+        """Deja una muestra; False si el anillo está lleno"""
+        head = self.head
+        if head - self.tail >= self.capacity:
+            return False
+        slot = head % self.capacity
+        self.times[slot] = timestamp
+        self.values[slot] = value
+        self.head = head + 1  # Publicar recién después de escribir la posición
+        return True
+        
+    def pending(self) -> int:
+        return self.head - self.tail
+        
+    def take(self) -> List[Tuple[float, float]]:
+        """Saca las muestras pendientes (el llamador tiene el lock de la serie)"""
+        head = self.head
+        samples = [
+            (self.times[i % self.capacity], self.values[i % self.capacity])
+            for i in range(self.tail, head)
+        ]
+        self.tail = head
+        return samples
+
+
+class _RollupLevel:
+    """Cubetas agregadas de una resolución fija en un buffer circular"""
+    
+    def __init__(self, resolution: float, capacity: int):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.bucket_ids = array('q', [-1]) * capacity
+        self.mins = array('d', [0.0]) * capacity
+        self.maxs = array('d', [0.0]) * capacity
+        self.sums = array('d', [0.0]) * capacity
+        self.counts = array('q', [0]) * capacity
+        
+    @property
+    def retention(self) -> float:
+        """Segundos de historia que cubre el nivel"""
+        return self.resolution * self.capacity
+        
+    def add(self, timestamp: float, value: float):
+        """Acumula una muestra en la cubeta correspondiente"""
+        bucket = int(timestamp // self.resolution)
+        slot = bucket % self.capacity
+        if self.bucket_ids[slot] != bucket:
+            # Cubeta nueva: reutilizar la posición de la más antigua
+            self.bucket_ids[slot] = bucket
+            self.mins[slot] = value
+            self.maxs[slot] = value
+            self.sums[slot] = value
+            self.counts[slot] = 1
+        else:
+            if value < self.mins[slot]:
+                self.mins[slot] = value
+            if value > self.maxs[slot]:
+                self.maxs[slot] = value
+            self.sums[slot] += value
+            self.counts[slot] += 1
+            
+    def query(self, start: float, end: float) -> List[Bucket]:
+        """Devuelve las cubetas con datos dentro de [start, end]"""
+        first = int(start // self.resolution)
+        last = int(end // self.resolution)
+        first = max(first, last - self.capacity + 1)
+        result = []
+        for bucket in range(first, last + 1):
+            slot = bucket % self.capacity
+            if self.bucket_ids[slot] == bucket:
+                count = self.counts[slot]
+                result.append((
+                    bucket * self.resolution,
+                    self.mins[slot],
+                    self.maxs[slot],
+                    self.sums[slot] / count,
+                    count
+                ))
+        return result
+
+
+class TelemetrySeries:
+    """Serie de telemetría con muestras crudas y agregados de 1 s, 1 min y 1 h"""
+    
+    def __init__(self, raw_seconds: float = None, raw_capacity: int = None,
+                 levels: Optional[List[Tuple[float, int]]] = None,
+                 staging_capacity: int = config.TELEMETRY_STAGING_CAPACITY):
+        self.raw_seconds = raw_seconds if raw_seconds is not None else config.TELEMETRY_RAW_SECONDS
+        self._raw = _RawRing(raw_capacity or config.TELEMETRY_RAW_CAPACITY)
+        self._levels = [
+            _RollupLevel(resolution, capacity)
+            for resolution, capacity in (levels or config.TELEMETRY_ROLLUP_LEVELS)
+        ]
+        self._lock = threading.Lock()  # Lo toman los lectores; un escritor nunca lo espera
+        self._registry_lock = threading.Lock()  # Solo para registrar y retirar anillos
+        self._local = threading.local()
+        self._staging: List[_StagingRing] = []
+        self._staging_capacity = staging_capacity
+        self.last_value = 0.0
+        self.last_time = 0.0
+        
+    @property
+    def resolutions(self) -> List[float]:
+        """Resoluciones disponibles (0 = muestras crudas)"""
+        return [0] + [level.resolution for level in self._levels]
+        
+    def add(self, value: float, timestamp: Optional[float] = None):
+        """Registra una muestra"""
+        if timestamp is None:
+            timestamp = time.time()
+        value = float(value)
+        ring = getattr(self._local, "ring", None)
+        if ring is None:
+            ring = self._register()
+        if not ring.put(timestamp, value):
+            ring.dropped += 1
+        self.last_value = value
+        self.last_time = timestamp
+        # Anillo a medio llenar (nadie consulta): agregar solo si nadie tiene el lock
+        if ring.pending() * 2 >= ring.capacity and self._lock.acquire(blocking=False):
+            try:
+                self._fold()
+            finally:
+                self._lock.release()
+                
+    def _register(self) -> _StagingRing:
+        """Crea el anillo del hilo actual (una vez por hilo)"""
+        ring = _StagingRing(self._staging_capacity)
+        with self._registry_lock:
+            self._staging = self._staging + [ring]  # Publicación atómica de la lista
+        self._local.ring = ring
+        return ring
+        
+    def _fold(self):
+        """Agrega las muestras pendientes de todos los escritores (con el lock tomado)"""
+        samples = []
+        for ring in self._staging:
+            samples.extend(ring.take())
+        # Hilos terminados sin nada pendiente: su anillo ya no recibirá muestras
+        if any(not ring.owner.is_alive() for ring in self._staging):
+            with self._registry_lock:
+                self._staging = [ring for ring in self._staging if ring.owner.is_alive() or ring.pending()]
+        samples.sort(key=lambda sample: sample[0])  # Los de distintos hilos, en orden cronológico
+        for timestamp, value in samples:
+            self._raw.add(timestamp, value)
+            for level in self._levels:
+                level.add(timestamp, value)
+                
+    @property
+    def dropped(self) -> int:
+        """Muestras descartadas porque el anillo de un escritor se llenó con el lock ocupado"""
+        return sum(ring.dropped for ring in self._staging)
+            
+    def _pick_resolution(self, start: float, now: float) -> float:
+        """Elige la resolución más fina que aún cubre el inicio del rango"""
+        oldest_raw = self._raw.oldest()
+        if (start >= now - self.raw_seconds and oldest_raw is not None
+                and (oldest_raw <= start or self._raw.count < self._raw.capacity)):
+            return 0
+        for level in self._levels:
+            if start >= now - level.retention:
+                return level.resolution
+        return self._levels[-1].resolution
+        
+    def query(self, start: float, end: Optional[float] = None,
+              resolution: Optional[float] = None) -> List[Bucket]:
+        """
+        Consulta la serie en un rango de tiempo
+        Args:
+            start: Inicio del rango (epoch en segundos)
+            end: Fin del rango (por defecto, ahora)
+            resolution: 0 para muestras crudas, 1/60/3600 para agregados, None = automática
+        Returns:
+            List[Bucket]: Tuplas (inicio, mínimo, máximo, promedio, cantidad)
+        """
+        if end is None:
+            end = time.time()
+        with self._lock:
+            self._fold()
+            # Las ventanas se miden desde la muestra más reciente, no desde el reloj
+            now = self.last_time or end
+            if resolution is None:
+                resolution = self._pick_resolution(start, now)
+            if resolution == 0:
+                times, values = self._raw.ordered()
+                lo = bisect_left(times, max(start, now - self.raw_seconds))
+                hi = bisect_right(times, end)
+                return [(times[i], values[i], values[i], values[i], 1) for i in range(lo, hi)]
+            for level in self._levels:
+                if level.resolution == resolution:
+                    return level.query(start, end)
+        raise ValueError(f"Resolución no disponible: {resolution}")
+
+
+class TelemetryHistory:
+    """Conjunto de series de telemetría (latencia, velocidad real, PWM y tasas de mensajes)"""
+    
+    LATENCY = "latency"          # ms
+    SPEED = "speed"              # cm/s medidos por el MPU6050 (SPEED:)
+    PWM = "pwm"                  # 0-255 enviado al motor
+    MESSAGES_IN = "messages_in"  # Un evento por mensaje recibido
+    MESSAGES_OUT = "messages_out"  # Un evento por comando enviado
+    
+    def __init__(self):
+        self.series: Dict[str, TelemetrySeries] = {
+            name: TelemetrySeries()
+            for name in (self.LATENCY, self.SPEED, self.PWM, self.MESSAGES_IN, self.MESSAGES_OUT)
+        }
+        
+    def record(self, name: str, value: float, timestamp: Optional[float] = None):
+        """Registra una muestra en la serie indicada"""
+        self.series[name].add(value, timestamp)
+        
+    def record_event(self, name: str, timestamp: Optional[float] = None):
+        """Registra un evento contable (p. ej. un mensaje) para calcular tasas"""
+        self.series[name].add(1.0, timestamp)
+        
+    def query(self, name: str, start: float, end: Optional[float] = None,
+              resolution: Optional[float] = None) -> List[Bucket]:
+        """Consulta una serie (ver TelemetrySeries.query)"""
+        return self.series[name].query(start, end, resolution)
+        
+    def rate(self, name: str, start: float, end: Optional[float] = None,
+             resolution: float = 1) -> List[Tuple[float, float]]:
+        """
+        Calcula la tasa de eventos por segundo de una serie de eventos
+        Returns:
+            List[Tuple[float, float]]: (inicio de cubeta, eventos/segundo)
+        """
+        return [
+            (bucket[0], bucket[4] / resolution)
+            for bucket in self.series[name].query(start, end, resolution)
+        ]
+        
+    def latest(self, name: str) -> float:
+        """Último valor registrado en una serie"""
+        return self.series[name].last_value
+        
+    def names(self) -> List[str]:
+        """Nombres de las series disponibles"""
+        return list(self.series.keys())
@@ -0,0 +1,188 @@
+"""
+Pruebas del motor de alertas
+
+Los SMS salen por HTTP a un endpoint local que imita la API de mensajes de
+Twilio (POST .../Messages.json con From, To y Body); el motor corre con el
+reloj virtual, así que minutos de ráfaga se prueban en milisegundos.
+"""
+
+import sys
+import os
+import io
+import re
+import json
+import tempfile
+import threading
+import contextlib
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from alerts import AlertEngine
+from notifications import TwilioNotifier
+from scheduler import VirtualClock
+
+WARNING_PHONE = "+50600000001"
+ESCALATION_PHONE = "+50600000002"
+RECIPIENTS = {AlertEngine.WARNING: [WARNING_PHONE], AlertEngine.CRITICAL: [WARNING_PHONE, ESCALATION_PHONE]}
+
+
+class _FakeSmsEndpoint:
+    """Servidor HTTP local con la forma de la API de Twilio; puede fallar a pedido"""
+
+    def __init__(self):
+        self.messages = []  # (To, Body) aceptados
+        self.fail_next = 0  # Responder 500 a las próximas N solicitudes
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                form = urllib.parse.parse_qs(self.rfile.read(length).decode("utf-8"))
+                if endpoint.fail_next:
+                    endpoint.fail_next -= 1
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                endpoint.messages.append((form["To"][0], form["Body"][0]))
+                body = json.dumps({"sid": f"SM{len(endpoint.messages):032d}"}).encode()
+                self.send_response(201)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/2010-04-01/Accounts/AC0/Messages.json"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _HttpSmsClient:
+    """Lo que TwilioNotifier usa de twilio.rest.Client, sobre HTTP contra el endpoint falso"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.messages = self
+
+    def create(self, body, from_, to):
+        data = urllib.parse.urlencode({"From": from_, "To": to, "Body": body}).encode("utf-8")
+        with urllib.request.urlopen(self.url, data=data, timeout=5) as response:  # HTTPError si no es 2xx
+            return type("Message", (), json.loads(response.read()))()
+
+
+def _engine(endpoint, clock, path, **kwargs):
+    notifier = TwilioNotifier(clock=clock, client=_HttpSmsClient(endpoint.url))
+    return AlertEngine(notifier, clock=clock, outbox_path=path, recipients=RECIPIENTS, **kwargs)
+
+
+def _counted(messages, phone=None):
+    """Colisiones informadas sumando los resúmenes de los SMS"""
+    return sum(int(count) for to, body in messages if phone in (None, to)
+               for count in re.findall(r"Colisiones: (\d+)", body))
+
+
+def test_digest_window():
+    """Las colisiones de una ventana salen en un solo SMS con cantidad, horas y distancia mínima"""
+    clock = VirtualClock()
+    endpoint = _FakeSmsEndpoint()
+    try:
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+            engine = _engine(endpoint, clock, os.path.join(directory, "outbox.json"), window=30.0)
+            for distance in (20.0, 12.0, 15.0):
+                engine.report(AlertEngine.COLLISION, distance=distance)
+                clock.advance(5)
+                engine.tick()
+            assert endpoint.messages == []  # La ventana sigue abierta
+            clock.advance(15)
+            assert engine.tick() == 1
+    finally:
+        endpoint.close()
+    (to, body), = endpoint.messages
+    assert to == WARNING_PHONE
+    assert "Colisiones: 3" in body and "mín. 12.0 cm" in body and "CRÍTICA" not in body
+
+
+def test_burst_is_rate_limited_and_lossless():
+    """Una ráfaga de 1000 colisiones: pocos SMS, escalamiento y todas contadas"""
+    clock = VirtualClock()
+    endpoint = _FakeSmsEndpoint()
+    endpoint.fail_next = 2  # El proveedor falla al principio
+    try:
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+            engine = _engine(endpoint, clock, os.path.join(directory, "outbox.json"),
+                             window=30.0, bucket_capacity=3, bucket_refill=60.0)
+            for i in range(1000):  # 10 por segundo durante 100 s
+                engine.report(AlertEngine.COLLISION, distance=40.0 - (i % 30))
+                clock.advance(0.1)
+                if i % 10 == 0:
+                    engine.tick()
+            for _ in range(60):  # Diez minutos más para vaciar la bandeja
+                clock.advance(10)
+                engine.tick()
+            metrics = engine.get_metrics()
+    finally:
+        endpoint.close()
+
+    print(f"   1000 colisiones en 100 s -> {len(endpoint.messages)} SMS ({metrics['merged']} fusiones)")
+    # Cada destinatario: 3 seguidos y luego uno por minuto como mucho
+    for phone in (WARNING_PHONE, ESCALATION_PHONE):
+        sent = [body for to, body in endpoint.messages if to == phone]
+        assert 1 <= len(sent) <= 3 + 700 // 60 + 1
+        assert _counted(endpoint.messages, phone) == 1000  # Ninguna colisión se pierde
+    assert metrics["failed"] == 2 and metrics["pending"] == 0 and metrics["open"] == 0
+    assert metrics["escalations"] >= 1 and metrics["merged"] > 0
+    assert all("CRÍTICA" in body for _, body in endpoint.messages)  # 5+ en la ventana
+    assert len(endpoint.messages) < 30  # Antes: un SMS por colisión fuera del enfriamiento
+
+
+def test_outbox_survives_restart():
+    """Lo pendiente y la ventana abierta se envían tras reiniciar la aplicación"""
+    clock = VirtualClock()
+    endpoint = _FakeSmsEndpoint()
+    try:
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+            path = os.path.join(directory, "outbox.json")
+            engine = _engine(endpoint, clock, path, window=10.0)
+            endpoint.fail_next = 10 ** 6  # Sin servicio
+            engine.report(AlertEngine.COLLISION, distance=30.0)
+            engine.report(AlertEngine.COLLISION, distance=25.0)
+            clock.advance(10)
+            engine.tick()
+            engine.report(AlertEngine.COLLISION, distance=28.0)  # Ventana nueva, abierta al "cerrar"
+            assert engine.get_metrics()["failed"] == 1
+            del engine  # La aplicación se cierra sin enviar
+
+            endpoint.fail_next = 0
+            restarted = _engine(endpoint, clock, path, window=10.0)
+            assert restarted.get_metrics()["open"] == 1 and restarted.get_metrics()["pending"] == 1
+            clock.advance(600)
+            restarted.tick()
+            assert restarted.get_metrics()["pending"] == 0
+    finally:
+        endpoint.close()
+    assert _counted(endpoint.messages) == 3
+    assert len(endpoint.messages) == 1  # Las dos ventanas se fusionaron en un SMS
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DEL MOTOR DE ALERTAS")
+    print("=" * 60)
+    for test in (test_digest_window, test_burst_is_rate_limited_and_lossless, test_outbox_survives_restart):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Pruebas del análisis de frenado sobre sesiones sintéticas
+"""
+
+import sys
+import os
+import random
+import tempfile
+
+import pytest
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+np = pytest.importorskip("numpy")
+
+import config
+from analysis import analyze_sessions, load_session, analyze_session, summary_table
+from safetylog import SafetyEvent
+from sessions import SessionRecorder, list_sessions
+
+
+def _record_session(directory: str, name: str, seed: int, episodes: int = 20):
+    """Graba una sesión con frenados de desaceleración constante y resultado conocido"""
+    rng = random.Random(seed)
+    recorder = SessionRecorder(directory)
+    recorder.start("127.0.0.1")
+    os.rename(recorder.path, os.path.join(directory, name))  # Nombres únicos en la prueba
+    t = 1_700_000_000.0 + seed * 10_000
+    expected = []
+    for _ in range(episodes):
+        speed = rng.uniform(20, 80)
+        brake_distance = rng.uniform(82, 89)
+        brake_time = rng.uniform(0.8, 2.0)
+        recorder.record_command(config.CMD_FORWARD, 200, t)
+        recorder.record_speed(speed, t + 0.5)
+        t_brake = t + 1.0
+        stop_distance = brake_distance - speed * brake_time / 2  # Desaceleración constante
+        recorder.record_safety_events([
+            SafetyEvent(SafetyEvent.GRADUAL_BRAKE, t_brake, None, brake_distance),
+            SafetyEvent(SafetyEvent.STOP, t_brake + brake_time, None, stop_distance),
+        ])
+        recorder.record_speed(0.0, t_brake + brake_time + 0.1)
+        recorder.record_command(config.CMD_BACKWARD, 200, t_brake + brake_time + 1.0)
+        recorder.record_safety_events([
+            SafetyEvent(SafetyEvent.SAFE_ZONE, t_brake + brake_time + 2.0, None)
+        ])
+        expected.append((speed, speed * brake_time / 2, brake_time))
+        t += 10.0
+    # Una detención falsa (lectura espuria) y una reversa de emergencia
+    recorder.record_safety_events([
+        SafetyEvent(SafetyEvent.STOP, t, None, 43.0),
+        SafetyEvent(SafetyEvent.SAFE_ZONE, t + 0.3, None),
+        SafetyEvent(SafetyEvent.EMERGENCY_REVERSE, t + 5.0, None, 35.0),
+        SafetyEvent(SafetyEvent.SAFE_ZONE, t + 5.5, None),
+    ])
+    recorder.stop()
+    return expected
+
+
+def test_braking_metrics_match_known_physics():
+    """Distancia y tiempo de frenado, detenciones falsas y reversas por sesión"""
+    with tempfile.TemporaryDirectory() as directory:
+        expected = _record_session(directory, "session_a.jsonl", seed=1)
+        session = load_session(os.path.join(directory, "session_a.jsonl"))
+        results = analyze_session(session)
+    speeds, distances, times = (np.array(column) for column in zip(*expected))
+    assert np.allclose(results["approach_speed"], speeds)
+    assert np.allclose(results["stopping_distance"], distances)
+    assert np.allclose(results["brake_to_stop"], times)
+    assert results["stops"] == len(expected) + 1
+    assert results["false_stops"] == 1  # Retroceder o la reversa no cuentan como falsas
+    assert results["emergency_reverses"] == 1
+
+
+def test_parallel_analysis_matches_serial():
+    """El análisis en varios procesos da el mismo resultado que en uno"""
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(6):
+            _record_session(directory, f"session_{i:02d}.jsonl", seed=i)
+        paths = list_sessions(directory)
+        serial = analyze_sessions(paths, workers=1)
+        parallel = analyze_sessions(paths, workers=3)
+    assert serial["sessions"] == parallel["sessions"] == 6
+    assert np.allclose(serial["stopping_distance"], parallel["stopping_distance"])
+    assert parallel["false_stop_rate"] == pytest.approx(6 / (6 * 21))
+    table = summary_table(parallel)
+    print(table)
+    assert "Dist. de frenado" in table
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DEL ANÁLISIS DE FRENADO")
+    print("=" * 60)
+    for test in (test_braking_metrics_match_known_physics, test_parallel_analysis_matches_serial):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Pruebas del archivo comprimido por bloques
+"""
+
+import sys
+import os
+import tempfile
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from archive import ArchiveReader, ArchiveWriter, convert_session, read_records
+from safetylog import SafetyEvent
+from sessions import SessionRecorder, list_sessions
+
+
+def _records(n: int, start: float = 1_700_000_000.0):
+    """Velocidad a 50 Hz con algún comando intercalado"""
+    for i in range(n):
+        t = start + i * 0.02
+        if i % 100 == 0:
+            yield {"k": "cmd", "t": t, "c": config.CMD_FORWARD, "pwm": 200}
+        else:
+            yield {"k": "speed", "t": t, "v": round(20 + (i % 50) * 0.37, 2)}
+
+
+def test_roundtrip_both_codecs():
+    """zlib y lzma devuelven exactamente los registros escritos, en orden"""
+    records = list(_records(5000))
+    with tempfile.TemporaryDirectory() as directory:
+        for codec, level in (("zlib", 1), ("zlib", 9), ("lzma", 6)):
+            path = os.path.join(directory, f"s_{codec}_{level}.carx")
+            with ArchiveWriter(path, codec=codec, level=level, chunk_records=512) as writer:
+                for record in records:
+                    writer.write(record)
+            with ArchiveReader(path) as reader:
+                assert (reader.codec, reader.level) == (codec, level)
+                assert len(reader.chunks) == 10 and reader.records == 5000
+                assert list(reader) == records
+            assert os.path.getsize(path) < sum(chunk.raw_size for chunk in writer.chunks) / 3
+
+
+def test_range_reads_only_needed_chunks():
+    """Leer un rango de horas descomprime solo los bloques que lo cubren"""
+    records = list(_records(10000))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "s.carx")
+        with ArchiveWriter(path, chunk_records=1000) as writer:
+            for record in records:
+                writer.write(record)
+        with ArchiveReader(path) as reader:
+            start, end = records[4500]["t"], records[5500]["t"]
+            window = list(reader.read(start, end))
+            assert window == records[4500:5500]
+            assert reader.chunks_decompressed == 2
+            # El mismo bloque otra vez sale de la caché
+            assert next(reader.read(records[5600]["t"]))["t"] == records[5600]["t"]
+            assert reader.chunks_decompressed == 2
+            assert list(reader.read(records[-1]["t"] + 1)) == []
+
+
+def test_convert_recorded_session():
+    """Una sesión grabada se convierte sin perder registros y list_sessions prefiere el .carx"""
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = SessionRecorder(directory)
+        recorder.start("127.0.0.1")
+        for i in range(300):
+            recorder.record_speed(i * 0.5, 1_700_000_000.0 + i * 0.02)
+        recorder.record_safety_events([SafetyEvent(SafetyEvent.STOP, 1_700_000_010.0, None, 12.0)])
+        recorder.stop()
+        with open(recorder.path, "a", encoding="utf-8") as f:
+            f.write('{"k": "speed", "t": 17')  # La app se cerró a mitad de línea
+        original = list(read_records(recorder.path))
+        output = convert_session(recorder.path, codec="lzma", chunk_records=64)
+        assert output.endswith(".carx") and list(read_records(output)) == original
+        assert list_sessions(directory) == [output]
+
+        broken = os.path.join(directory, "broken.carx")
+        with open(output, "rb") as source, open(broken, "wb") as f:
+            f.write(source.read()[:-4])  # Sin el final del índice
+        for path in (broken, recorder.path):
+            try:
+                ArchiveReader(path)
+                assert False, path
+            except ValueError:
+                pass
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DEL ARCHIVO COMPRIMIDO POR BLOQUES")
+    print("=" * 60)
+    for test in (test_roundtrip_both_codecs, test_range_reads_only_needed_chunks, test_convert_recorded_session):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
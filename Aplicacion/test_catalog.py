@@ -0,0 +1,115 @@
+"""
+Pruebas del catálogo de sesiones en SQLite
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from catalog import SessionCatalog
+from monitoring import CommunicationMonitor
+from protocol import LinkStatus
+from safetylog import parse_log_line
+from scheduler import VirtualClock
+
+
+def _session_summary(clock):
+    monitor = CommunicationMonitor(clock=clock)
+    monitor.start_connection()
+    for latency in range(1, 21):  # 1..20 ms
+        monitor.command_sent("FORWARD")
+        clock.advance(latency / 1000)
+        monitor.response_received("OK:FORWARD")
+    return monitor.get_statistics_summary()
+
+
+def test_session_roundtrip():
+    """Resumen final, colisiones, reconexiones y eventos de seguridad quedan en la base"""
+    clock = VirtualClock()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        catalog = SessionCatalog(path, flush_interval=0.01)
+        start = clock.time()
+        session = catalog.start_session("192.168.4.1", start, "sessions/a.jsonl")
+        summary = _session_summary(clock)
+        assert abs(summary["latency"]["p95"] - 19.0) < 1e-3
+        catalog.record_snapshot(session, clock.time(), summary)
+        catalog.record_collision(session, clock.time(), "COLISION DETECTADA")
+        catalog.record_link_change(session, LinkStatus(LinkStatus.LOST, LinkStatus.OK, 1.1, clock.time()))
+        catalog.record_link_change(session, LinkStatus(LinkStatus.OK, LinkStatus.LOST, 1.6, clock.time()))
+        catalog.record_safety_events(session, [
+            parse_log_line("[1.000s] DETENCION! Obstaculo a 12.5 cm", start + 1),
+            parse_log_line("[2.000s] Zona segura", start + 2),
+        ])
+        catalog.end_session(session, clock.time(), summary)
+        assert catalog.flush(timeout=5.0)
+
+        row = catalog.find_sessions(car="192.168.4.1")[0]
+        assert (row["id"], row["path"], row["commands_sent"]) == (session, "sessions/a.jsonl", 20)
+        assert (row["collisions"], row["reconnects"]) == (1, 1)
+        assert row["latency_p95"] == summary["latency"]["p95"] and row["latency_max"] == summary["latency"]["max"]
+        assert catalog.event_counts(car="192.168.4.1") == {"stop": 1, "safe_zone": 1}
+        assert catalog.events("stop")[0]["distance"] == 12.5
+        assert len(catalog.snapshots(session)) == 1
+        assert catalog.find_sessions(min_latency_p95=50) == []
+        catalog.close()
+
+        # Al reabrir, los ids siguen y lo escrito sigue ahí
+        reopened = SessionCatalog(path)
+        assert reopened.start_session("192.168.4.1", clock.time()) == session + 1
+        assert reopened.car_summary()[0]["collisions"] == 1
+        reopened.close()
+
+
+def test_batched_writes():
+    """Miles de filas en pocas transacciones, y el lector consulta mientras tanto"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        catalog = SessionCatalog(path, batch_size=500, flush_interval=0.05)
+        session = catalog.start_session("car", 0.0)
+        for i in range(5000):
+            catalog.record_collision(session, float(i), "COLISION")
+        catalog.find_sessions()  # WAL: no espera al escritor
+        assert catalog.flush(timeout=5.0)
+        metrics = catalog.get_metrics()
+        assert metrics["rows_written"] == 5001 and metrics["errors"] == 0
+        assert metrics["transactions"] <= 5001 // 100
+        catalog.close()
+        with sqlite3.connect(path) as connection:
+            assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert connection.execute("SELECT COUNT(*) FROM collisions").fetchone()[0] == 5000
+
+
+def test_queries_use_indexes():
+    """Las consultas por carrito, fecha, tipo de evento y latencia no recorren la tabla entera"""
+    with tempfile.TemporaryDirectory() as directory:
+        catalog = SessionCatalog(os.path.join(directory, "sessions.db"))
+        plans = {
+            "SELECT * FROM sessions WHERE car = ? AND started_at >= ?": ("car", 0.0),
+            "SELECT * FROM sessions WHERE started_at >= ? AND started_at < ?": (0.0, 1.0),
+            "SELECT * FROM sessions WHERE latency_p95 >= ? ORDER BY latency_p95 DESC": (50.0,),
+            "SELECT * FROM safety_events WHERE kind = ? AND t >= ?": ("stop", 0.0),
+            "SELECT * FROM snapshots WHERE session_id = ? ORDER BY t": (1,),
+        }
+        for sql, params in plans.items():
+            plan = " ".join(str(row[-1]) for row in catalog._reader.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+            assert "USING INDEX" in plan or "USING COVERING INDEX" in plan, (sql, plan)
+        catalog.close()
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DEL CATÁLOGO DE SESIONES")
+    print("=" * 60)
+    for test in (test_session_roundtrip, test_batched_writes, test_queries_use_indexes):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
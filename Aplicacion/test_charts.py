@@ -0,0 +1,117 @@
+"""
+Pruebas de las gráficas de tira
+
+Se dibuja sobre un canvas que solo registra las llamadas (sin pantalla): se
+comprueba que los segmentos se reciclan, que el trabajo por cuadro no depende
+de cuántas muestras haya y que las repeticiones de hold no tapan muestras
+reales que llegan con la hora del ESP32.
+"""
+
+import sys
+import os
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from charts import StripChart
+from telemetry import TelemetryHistory
+
+WIDTH = 100
+WINDOW = 10.0  # s - 0.1 s por columna
+FRAME = 1 / 30  # s - Un cuadro cada ~33 ms
+
+
+class _RecordingCanvas:
+    """Lo que StripChart usa de tk.Canvas, contando las llamadas"""
+
+    def __init__(self):
+        self.items = {}
+        self.calls = 0
+
+    def _new(self, coords):
+        self.calls += 1
+        item = len(self.items) + 1
+        self.items[item] = list(coords)
+        return item
+
+    def create_line(self, *coords, **options):
+        return self._new(coords)
+
+    def create_text(self, *coords, **options):
+        return self._new(coords)
+
+    def coords(self, item, *coords):
+        self.calls += 1
+        self.items[item] = list(coords)
+
+    def move(self, tag, dx, dy):
+        self.calls += 1
+
+    def itemconfig(self, item, **options):
+        self.calls += 1
+
+
+def _chart(hold=False):
+    canvas = _RecordingCanvas()
+    chart = StripChart(None, "prueba", "", "#fff", 0, 100, hold=hold, window_seconds=WINDOW,
+                       width=WIDTH, height=40, canvas=canvas)
+    return chart, canvas
+
+
+def _drive(chart, history, seconds, per_frame, start=1000.0, lag=0.0):
+    """Cuadros durante `seconds`; en cada uno llegan `per_frame` muestras con `lag` s de atraso"""
+    now, recorded, calls = start, 0, []
+    for _ in range(int(seconds / FRAME)):
+        now += FRAME
+        for i in range(per_frame):
+            timestamp = now - lag - FRAME * (per_frame - 1 - i) / per_frame
+            history.record(TelemetryHistory.SPEED, 50 + recorded % 20, timestamp)
+            recorded += 1
+        before = chart.canvas.calls
+        chart.update(history, TelemetryHistory.SPEED, now)
+        calls.append(chart.canvas.calls - before)
+    return recorded, calls
+
+
+def test_items_recycled():
+    """Con la ventana llena no se crean elementos nuevos: los que salen por la izquierda se reutilizan"""
+    chart, canvas = _chart()
+    _drive(chart, TelemetryHistory(), 3 * WINDOW, per_frame=1)
+    created = chart.items_created
+    _drive(chart, TelemetryHistory(), 3 * WINDOW, per_frame=1, start=1000.0 + 3 * WINDOW)
+    assert created <= WIDTH + 2 and chart.items_created == created
+    assert len(chart._items) <= WIDTH + 1
+
+
+def test_constant_cost_per_frame():
+    """El trabajo por cuadro sobre el canvas es el mismo con 1 o con 50 muestras por cuadro"""
+    costs = {}
+    for per_frame in (1, 50):
+        chart, canvas = _chart()
+        _, calls = _drive(chart, TelemetryHistory(), 2 * WINDOW, per_frame)
+        steady = calls[len(calls) // 2:]  # Ventana ya llena
+        costs[per_frame] = sum(steady) / len(steady)
+    assert costs[50] <= costs[1] * 1.1
+
+
+def test_hold_keeps_late_samples():
+    """En hold, las muestras con la hora del ESP32 (anteriores a ahora) no se pierden"""
+    chart, _ = _chart(hold=True)
+    history = TelemetryHistory()
+    recorded, _ = _drive(chart, history, 5.0, per_frame=3, lag=0.05)
+    chart.update(history, TelemetryHistory.SPEED, 1000.0 + 6.0)  # Recoge las atrasadas del final
+    assert chart.samples == recorded
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DE LAS GRÁFICAS DE TIRA")
+    print("=" * 60)
+    for test in (test_items_recycled, test_constant_cost_per_frame, test_hold_keeps_late_samples):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Pruebas de la sincronización de reloj con el ESP32
+
+Valida el estimador contra un reloj con desfase y deriva conocidos, primero con
+intercambios sintéticos y luego contra el ESP32 simulado por TCP.
+"""
+
+import sys
+import os
+import random
+import time
+import threading
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from clocksync import ClockSync, ClockSynchronizer
+from communication import ESP32Communication
+from events import EventBus
+from protocol import MessageParser, TimeReply
+from simulator import SimulatedESP32
+
+
+def test_offset_and_drift_from_synthetic_exchanges():
+    """Desfase y deriva recuperados dentro de la cota de error"""
+    rng = random.Random(7)
+    boot, drift = 1000.0, 120e-6  # El ESP32 arrancó 1000 s antes y adelanta 120 ppm
+    device_clock = lambda host: (host - boot) * (1 + drift)
+    clock = ClockSync()
+    host = boot + 3600.0
+    for _ in range(40):
+        uplink = 0.004 + rng.expovariate(1 / 0.003)
+        downlink = 0.004 + rng.expovariate(1 / 0.003)
+        device = round(device_clock(host + uplink), 3)  # Resolución de millis()
+        clock.add_exchange(host, device, host + uplink + downlink)
+        host += 5.0
+
+    status = clock.get_status()
+    print(f"   Deriva estimada: {status['drift_ppm']:.1f} ppm  Error: {status['error_ms']:.2f} ms")
+    assert abs(status["drift_ppm"] - 120) < 20
+    for probe in (host - 100, host, host + 10):
+        estimated, error = clock.to_host_time(device_clock(probe))
+        assert abs(estimated - probe) <= error
+    assert clock.to_host_time(device_clock(host))[1] < 0.010
+
+    # Los logs del firmware llevan su propia marca de tiempo
+    stamp = device_clock(host)
+    estimated, error = clock.log_time(f"[{stamp:.3f}s] DETENCION! Obstaculo a 42.1cm")
+    assert abs(estimated - host) <= error
+
+
+def test_against_simulated_esp32_with_asymmetric_jitter():
+    """ESP32 simulado: mapeo de SPEED: a la hora de la PC y latencia por sentido"""
+    simulator = SimulatedESP32(
+        drift_ppm=400.0, uplink_delay=0.003, downlink_delay=0.003,
+        jitter=0.001, uplink_jitter=0.015, speed_interval=0.1, seed=3
+    )
+    port = simulator.start()
+    events = EventBus()
+    comm = ESP32Communication(events=events)
+    comm.ip, comm.port = "127.0.0.1", port
+    comm.clock_sync = ClockSynchronizer(comm, burst=0, interval=0.05)
+    comm.clock = comm.clock_sync.clock
+    samples = []
+    events.subscribe(EventBus.SPEED, samples.append)
+    try:
+        assert comm.connect()
+        time.sleep(2.5)
+        status = comm.clock.get_status()
+        print(f"   Intercambios: {status['exchanges']}  Error: {status['error_ms']:.2f} ms")
+        print(f"   Subida: {status['uplink_ms']:.1f} ms  Bajada: {status['downlink_ms']:.1f} ms")
+        assert status["synchronized"]
+        # El jitter de subida es mucho mayor y el estimador lo atribuye al sentido correcto
+        assert status["uplink_ms"] > status["downlink_ms"] + 5
+
+        stamped = [s for s in samples if s.time_error is not None]
+        assert stamped
+        for sample in stamped:
+            true_time = simulator.host_time_of(sample.device_time)
+            # Resolución de millis() en la marca enviada
+            assert abs(sample.host_time - true_time) <= sample.time_error + 0.001
+            assert sample.host_time < sample.received_at
+    finally:
+        comm.disconnect()
+        simulator.stop()
+        events.close()
+
+
+class _ManualLink:
+    """Lo que ClockSynchronizer usa de ESP32Communication; las respuestas las publica la prueba"""
+    
+    def __init__(self):
+        self.events = EventBus()
+        self.sent = []
+        
+    def send_command(self, command):
+        self.sent.append(command)
+        return True
+        
+    def is_connected(self):
+        return True
+
+
+def test_late_reply_is_not_paired():
+    """Una respuesta TIME: que llega después del plazo no se empareja con la solicitud siguiente"""
+    (_, numbered), (_, legacy) = MessageParser().parse_lines(["TIME:5:12345", "TIME:12345"], 1.0)
+    assert (numbered.nonce, numbered.device_time) == (5, 12.345)
+    assert (legacy.nonce, legacy.device_time) == (None, 12.345)
+    
+    link = _ManualLink()
+    sync = ClockSynchronizer(link, timeout=0.05)
+    assert sync.exchange() is None and sync.lost == 1  # La respuesta a TIME?:1 se demora
+    
+    def reply():
+        while len(link.sent) < 2:
+            time.sleep(0.001)
+        now = time.time()
+        link.events.publish(EventBus.TIME, TimeReply(100.0, now, nonce=1))  # La demorada, recién ahora
+        link.events.publish(EventBus.TIME, TimeReply(100.5, now + 0.001, nonce=2))
+        
+    replier = threading.Thread(target=reply)
+    replier.start()
+    exchange = sync.exchange()
+    replier.join()
+    link.events.close()
+    assert link.sent == ["TIME?:1", "TIME?:2"]
+    assert sync.stale == 1 and exchange.device_time == 100.5
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DE SINCRONIZACIÓN DE RELOJ")
+    print("=" * 60)
+    for test in (test_offset_and_drift_from_synthetic_exchanges,
+                 test_against_simulated_esp32_with_asymmetric_jitter, test_late_reply_is_not_paired):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Pruebas del control proporcional continuo
+
+Supresión de deltas y rampas del teclado con muestras manuales, y el flujo a
+frecuencia fija contra el ESP32 simulado con una entrada mucho más rápida.
+"""
+
+import sys
+import os
+import math
+import threading
+import time
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from communication import ESP32Communication
+from control import ControlInput, ControlStreamer
+from events import EventBus
+from simulator import SimulatedESP32
+
+
+def test_latest_wins_and_delta_suppression():
+    """Muchos eventos por muestra: un envío con el último valor; cambios chicos suprimidos"""
+    sent = []
+    streamer = ControlStreamer(lambda frame: sent.append(frame) or True)
+    for i in range(1000):
+        streamer.input.set_axes(i / 1000, 0.0)
+    streamer.tick(0.0)
+    assert sent == [f"DRIVE:{round(0.999 * config.SPEED_MAX)}:0"]
+
+    # Un cambio menor que la banda muerta no se envía; uno mayor sí
+    streamer.input.set_axes(0.999 - 4 / 255, 0.0)
+    streamer.tick(0.05)
+    assert len(sent) == 1 and streamer.suppressed == 1
+    streamer.input.set_axes(0.5, 0.3)
+    streamer.tick(0.10)
+    assert sent[-1] == f"DRIVE:{round(0.5 * config.SPEED_MAX)}:{round(0.3 * 255)}"
+
+    # Volver a cero siempre se envía, aunque el cambio sea pequeño
+    streamer.input.set_axes(0.03, 0.3)
+    streamer.tick(0.15)
+    assert sent[-1].startswith("DRIVE:0:")
+    metrics = streamer.get_metrics()
+    assert metrics["frames_sent"] == 3 and metrics["input_events"] == 1003
+
+
+def test_keyboard_ramp():
+    """La tecla mantenida acelera en rampa; el giro vuelve solo al centro"""
+    control = ControlInput(ramp_rate=1.5, return_rate=4.0)
+    control.sample(0.0)
+    control.hold(ControlInput.THROTTLE, 1)
+    control.hold(ControlInput.STEERING, -1)
+    for i in range(1, 11):
+        throttle, steering = control.sample(i * 0.05)
+    assert abs(throttle - 0.75) < 1e-9 and abs(steering + 0.75) < 1e-9
+    control.hold(ControlInput.THROTTLE, 0)
+    control.hold(ControlInput.STEERING, 0)
+    throttle, steering = control.sample(0.6)
+    assert abs(throttle - 0.75) < 1e-9  # El acelerador se queda
+    assert abs(steering + 0.35) < 1e-9
+    throttle, steering = control.sample(1.0)
+    assert abs(throttle - 0.75) < 1e-9 and steering == 0.0
+
+
+def test_stream_rate_is_bounded_by_control_rate():
+    """ESP32 simulado: entrada a ~2 kHz, envío acotado a la frecuencia de control"""
+    simulator = SimulatedESP32(uplink_delay=0.002, downlink_delay=0.002, seed=4)
+    port = simulator.start()
+    events = EventBus()
+    comm = ESP32Communication(events=events)
+    comm.ip, comm.port = "127.0.0.1", port
+    streamer = ControlStreamer(comm.send_control, rate=20)
+    stop = threading.Event()
+
+    def move_mouse():
+        start = time.perf_counter()
+        while not stop.is_set():
+            t = time.perf_counter() - start
+            streamer.input.set_axes(0.6 + 0.4 * math.sin(t * 3), 0.5 * math.sin(t * 5))
+            time.sleep(0.0005)
+
+    mouse = threading.Thread(target=move_mouse, daemon=True)
+    try:
+        assert comm.connect()
+        streamer.start()
+        mouse.start()
+        time.sleep(1.5)
+        stop.set()
+        mouse.join()
+        streamer.input.set_axes(0.0, 0.0)
+        time.sleep(0.2)
+        streamer.stop()
+        time.sleep(0.1)
+
+        metrics = streamer.get_metrics()
+        drives = [command for _, command in simulator.commands if command.startswith("DRIVE:")]
+        print(f"   Eventos: {metrics['input_events']}  Envíos: {metrics['frames_sent']}  "
+              f"{metrics['rate_hz']:.1f} Hz  jitter {metrics['jitter_ms']:.2f} ms  "
+              f"{metrics['bytes_per_s']:.0f} B/s")
+        assert metrics["input_events"] > 500
+        assert len(drives) == metrics["frames_sent"] <= metrics["ticks"]
+        assert metrics["bytes_per_s"] <= 20 * len("DRIVE:-255:-255\n")
+        assert abs(metrics["rate_hz"] - 20) < 3
+        assert simulator.direction == "STOP" and simulator.steering == 0
+    finally:
+        stop.set()
+        streamer.stop()
+        comm.disconnect()
+        simulator.stop()
+        events.close()
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DEL CONTROL PROPORCIONAL")
+    print("=" * 60)
+    for test in (test_latest_wins_and_delta_suppression, test_keyboard_ramp,
+                 test_stream_rate_is_bounded_by_control_rate):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
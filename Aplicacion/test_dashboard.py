@@ -0,0 +1,198 @@
+"""
+Prueba de carga del tablero web
+
+Conecta cientos de visores WebSocket simulados (algunos que nunca leen) y
+verifica que publicar eventos no se frena, que los visores rápidos reciben el
+último evento y que los lentos solo pierden sus propios mensajes.
+"""
+
+import sys
+import os
+import asyncio
+import base64
+import json
+import socket
+import struct
+import threading
+import time
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dashboard import TelemetryDashboard
+
+
+FAST_VIEWERS = 290
+SLOW_VIEWERS = 10
+EVENTS = 300
+
+
+async def _open_viewer(port: int, slow: bool):
+    """Abre una conexión WebSocket; los visores lentos usan un buffer mínimo"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if slow:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", port))
+    reader, writer = await asyncio.open_connection(sock=sock)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write(
+        "GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+        f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n\r\n".encode()
+    )
+    response = await reader.readuntil(b"\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 101")
+    return reader, writer
+
+
+async def _read_until_last(reader: asyncio.StreamReader, last_seq: int, received: list):
+    """Lee frames hasta ver el último evento publicado"""
+    previous = -1
+    while True:
+        header = await reader.readexactly(2)
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        event = json.loads(await reader.readexactly(length))
+        seq = event["data"]["seq"]
+        assert seq > previous, "eventos fuera de orden"
+        previous = seq
+        received.append(seq)
+        if seq == last_seq:
+            return
+
+
+async def _gather(*coroutines, timeout: float = 30):
+    """Ejecuta corrutinas concurrentes con un tiempo límite"""
+    return await asyncio.wait_for(asyncio.gather(*coroutines), timeout=timeout)
+
+
+def test_hundreds_of_viewers_with_slow_clients():
+    """Cientos de visores: publicar no se bloquea y los lentos no afectan al resto"""
+    dashboard = TelemetryDashboard(host="127.0.0.1", port=0, queue_size=50)
+    assert dashboard.start()
+    loop = asyncio.new_event_loop()
+    try:
+        viewers = loop.run_until_complete(_gather(
+            *[_open_viewer(dashboard.port, slow=False) for _ in range(FAST_VIEWERS)],
+            *[_open_viewer(dashboard.port, slow=True) for _ in range(SLOW_VIEWERS)]
+        ))
+        deadline = time.time() + 5
+        while dashboard.get_stats()["viewers"] < FAST_VIEWERS + SLOW_VIEWERS and time.time() < deadline:
+            time.sleep(0.01)
+        assert dashboard.get_stats()["viewers"] == FAST_VIEWERS + SLOW_VIEWERS
+        
+        publish_times = []
+        
+        def publisher():
+            padding = "x" * 1024  # Mensajes grandes para llenar los buffers de los lentos
+            for seq in range(EVENTS):
+                start = time.perf_counter()
+                dashboard.publish("speed", {"seq": seq, "speed": 42.0, "pad": padding})
+                publish_times.append(time.perf_counter() - start)
+                time.sleep(0.01)  # ~100 eventos/s, varias veces la tasa real de telemetría
+                
+        received = [[] for _ in range(FAST_VIEWERS)]
+        readers = [
+            _read_until_last(viewers[i][0], EVENTS - 1, received[i])
+            for i in range(FAST_VIEWERS)
+        ]
+        thread = threading.Thread(target=publisher)
+        start = time.perf_counter()
+        thread.start()
+        loop.run_until_complete(_gather(*readers))
+        elapsed = time.perf_counter() - start
+        thread.join()
+        
+        publish_times.sort()
+        p99_ms = publish_times[int(len(publish_times) * 0.99)] * 1000
+        stats = dashboard.get_stats()
+        print(f"   Visores: {stats['viewers']}  Entrega completa en {elapsed:.2f} s")
+        delivered = min(len(r) for r in received) / EVENTS * 100
+        print(f"   publish() p99: {p99_ms:.3f} ms  Descartados: {stats['frames_dropped']}")
+        print(f"   Entrega mínima a visores rápidos: {delivered:.1f}%")
+        
+        assert p99_ms < 20.0  # Incluye la contención del GIL con los 300 clientes simulados
+        assert all(r[-1] == EVENTS - 1 for r in received)
+        assert delivered > 90.0
+        assert stats["frames_dropped"] > 0  # Los visores lentos descartaron lo más antiguo
+        
+        for _, writer in viewers:
+            writer.close()
+    finally:
+        dashboard.stop()
+        loop.close()
+
+
+def test_http_page_and_snapshot():
+    """La página y la instantánea JSON se sirven por HTTP"""
+    dashboard = TelemetryDashboard(host="127.0.0.1", port=0)
+    assert dashboard.start()
+    try:
+        dashboard.publish("stats", {"latency": {"average": 12.5}})
+        time.sleep(0.05)
+        for path, expected in (("/", b"<!DOCTYPE html>"), ("/snapshot", b'"average": 12.5')):
+            with socket.create_connection(("127.0.0.1", dashboard.port), timeout=2) as sock:
+                sock.sendall(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+                data = b""
+                while True:
+                    chunk = sock.recv(4096)
+                    if not chunk:
+                        break
+                    data += chunk
+            assert data.startswith(b"HTTP/1.1 200")
+            assert expected in data
+    finally:
+        dashboard.stop()
+
+
+def test_oversized_frame_closes_connection():
+    """Un frame del navegador más largo que uno de control cierra la conexión sin leerlo"""
+    dashboard = TelemetryDashboard(host="127.0.0.1", port=0)
+    assert dashboard.start()
+    loop = asyncio.new_event_loop()
+    
+    async def oversized():
+        reader, writer = await _open_viewer(dashboard.port, slow=False)
+        # Frame binario enmascarado que anuncia 1 TiB
+        writer.write(struct.pack("!BBQ", 0x82, 0x80 | 127, 1 << 40) + os.urandom(4))
+        await writer.drain()
+        while True:  # Saltar eventos pendientes hasta el cierre
+            header = await reader.readexactly(2)
+            length = header[1] & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", await reader.readexactly(8))[0]
+            payload = await reader.readexactly(length)
+            if header[0] & 0x0F == 0x8:
+                return struct.unpack("!H", payload)[0], await reader.read()
+                
+    try:
+        (code, rest), = loop.run_until_complete(_gather(oversized(), timeout=5))
+        assert code == 1009 and rest == b""
+        deadline = time.time() + 2
+        while dashboard.get_stats()["viewers"] and time.time() < deadline:
+            time.sleep(0.01)
+        assert dashboard.get_stats()["viewers"] == 0
+    finally:
+        dashboard.stop()
+        loop.close()
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBA DE CARGA DEL TABLERO WEB")
+    print("=" * 60)
+    for test in (test_hundreds_of_viewers_with_slow_clients, test_http_page_and_snapshot,
+                 test_oversized_frame_closes_connection):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
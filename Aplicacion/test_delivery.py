@@ -0,0 +1,183 @@
+"""
+Pruebas de la entrega confiable de comandos
+
+Cada comando sale numerado (<comando>#<seq>) y el ESP32 simulado lo confirma
+con OK:<seq>; con pérdida de comandos, de confirmaciones y cortes del enlace
+se comprueba que las retransmisiones no ejecutan nada dos veces y que el
+monitor cuenta las pérdidas y los duplicados reales.
+"""
+
+import sys
+import os
+import io
+import time
+import contextlib
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from communication import ESP32Communication
+from delivery import command_group
+from events import EventBus
+from monitoring import CommunicationMonitor
+from protocol import MessageParser
+from simulator import SimulatedESP32
+
+FAST_DEADLINE = 0.04  # s - Plazo corto para que las pruebas con pérdidas no tarden
+
+
+def _connect(fast: bool = False, **impairments):
+    simulator = SimulatedESP32(uplink_delay=0.005, downlink_delay=0.005, jitter=0.002, seed=5, **impairments)
+    port = simulator.start()
+    comm = ESP32Communication(monitor=CommunicationMonitor(), events=EventBus())
+    comm.ip, comm.port = "127.0.0.1", port
+    if fast:
+        comm.delivery.deadlines = {name: FAST_DEADLINE for name in config.ACK_DEADLINES}
+    assert comm.connect()
+    time.sleep(0.2)  # Ráfaga de TIME? y reparación de logs del arranque
+    return simulator, comm
+
+
+def _close(simulator, comm):
+    comm.disconnect()
+    simulator.stop()
+    comm.events.close()
+
+
+def _executed(simulator, prefix):
+    return [command for _, command in simulator.commands if command.startswith(prefix)]
+
+
+def _send_speeds(comm, count, spacing):
+    """SPEED_SET con valores distintos, separados lo suficiente para no reemplazarse"""
+    for i in range(count):
+        assert comm.send_command(f"SPEED_SET:{100 + i}")
+        time.sleep(spacing)
+    time.sleep(0.3)
+
+
+def test_parse_and_groups():
+    """OK:<seq>[:DUP] y ERR:<seq> llevan el número; OK:<comando> no"""
+    parser = MessageParser()
+    acks = [parsed for _, parsed in parser.parse_lines(["OK:12", "OK:13:DUP", "ERR:14", "OK:FORWARD",
+                                                        "OK:MACRO:7"], 1.0)]
+    assert [(ack.ok, ack.seq, ack.duplicate) for ack in acks] == [
+        (True, 12, False), (True, 13, True), (False, 14, False), (True, None, False), (True, None, False)]
+    assert command_group("STOP") == command_group("FORWARD") == "motion"
+    assert command_group("SPEED_SET:200") == command_group("SPEED_HIGH") == "speed"
+    assert command_group("MACRO:1:STOP,0,0") == "MACRO"
+
+
+def test_clean_link():
+    """Sin pérdidas: todo se confirma una vez, sin retransmisiones; ERR:<seq> no se reintenta"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator, comm = _connect()
+        try:
+            _send_speeds(comm, 30, 0.03)
+            comm.send_command("SPEED_SET:300")  # Fuera de rango: el firmware lo rechaza
+            time.sleep(0.3)
+        finally:
+            _close(simulator, comm)
+    metrics = comm.delivery.get_metrics()
+    reliability = comm.monitor.get_statistics_summary()["reliability"]
+    assert len(_executed(simulator, "SPEED_SET:")) == 31 and simulator.duplicates == 0
+    assert metrics["rejected"] == 1 and metrics["pending"] == 0
+    assert (metrics["retransmits"], metrics["failed"], metrics["duplicates"]) == (0, 0, 0)
+    assert reliability["acked"] == metrics["acked"] and reliability["packet_loss"] == 0.0
+    assert 0 < reliability["ack_rtt_ms"] < 100
+
+
+def test_command_loss():
+    """Con un 25 % de comandos perdidos: se retransmite y solo cuenta como perdido lo que nunca llegó"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        simulator, comm = _connect(fast=True, command_loss=0.25)
+        try:
+            _send_speeds(comm, 20, 0.25)
+        finally:
+            _close(simulator, comm)
+    executed = _executed(simulator, "SPEED_SET:")
+    failed_speeds = output.getvalue().count("Sin confirmación del ESP32: SPEED_SET")
+    metrics = comm.delivery.get_metrics()
+    reliability = comm.monitor.get_statistics_summary()["reliability"]
+    print(f"   {metrics['sent']} numerados, {reliability['retransmits']} retransmisiones, "
+          f"{metrics['failed']} perdidos ({reliability['packet_loss']:.1f} % de pérdida)")
+    assert len(set(executed)) == len(executed) == 20 - failed_speeds  # Nada se ejecutó dos veces
+    assert metrics["retransmits"] > 0 and metrics["acked"] + metrics["failed"] == metrics["sent"]
+    assert reliability["delivery_failed"] == metrics["failed"]
+    expected_loss = (reliability["commands_failed"] + metrics["failed"]) / reliability["commands_sent"] * 100
+    assert abs(reliability["packet_loss"] - expected_loss) < 1e-9
+
+
+def test_ack_loss_duplicates():
+    """Con un 30 % de confirmaciones perdidas: las retransmisiones llegan repetidas y no se ejecutan"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator, comm = _connect(fast=True, ack_loss=0.3)
+        try:
+            _send_speeds(comm, 20, 0.25)
+        finally:
+            _close(simulator, comm)
+    metrics = comm.delivery.get_metrics()
+    delivery = comm.monitor.get_delivery_status()
+    print(f"   {delivery['retransmits']} retransmisiones, {simulator.duplicates} duplicados en el carrito, "
+          f"{delivery['duplicates']} informados")
+    assert len(_executed(simulator, "SPEED_SET:")) == 20  # Cada valor una sola vez
+    assert simulator.duplicates == delivery["retransmits"] > 0
+    # Los OK:<seq>:DUP también se pierden a veces: lo informado es una cota inferior
+    assert 0 < delivery["duplicates"] == metrics["duplicates"] <= simulator.duplicates
+
+
+def test_partition():
+    """Corte de 0.8 s: STOP agota sus reintentos y MACRO: vence sin reintentar; al volver llegan tarde"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator, comm = _connect()
+        try:
+            simulator.partition(0.8)
+            comm.send_command(config.CMD_STOP)
+            comm.send_command("MACRO:1:FORWARD,100,100")
+            time.sleep(0.7)
+            failed_during_outage = comm.monitor.get_delivery_status()["delivery_failed"]
+            time.sleep(0.6)
+        finally:
+            _close(simulator, comm)
+    metrics = comm.delivery.get_metrics()
+    reliability = comm.monitor.get_statistics_summary()["reliability"]
+    assert failed_during_outage == 2 and reliability["packet_loss"] > 0
+    assert metrics["retransmits"] == config.ACK_MAX_RETRIES  # Solo el STOP
+    assert len(_executed(simulator, "STOP")) == 1 and len(_executed(simulator, "MACRO:")) == 1
+    assert simulator.duplicates == config.ACK_MAX_RETRIES == metrics["duplicates"]
+    assert metrics["late"] == 2
+
+
+def test_firmware_without_sequence():
+    """Firmware anterior (RELIABLE_COMMANDS = False): comandos sin número, como antes"""
+    config.RELIABLE_COMMANDS = False
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulator, comm = _connect()
+            try:
+                assert comm.delivery is None
+                comm.send_command(config.CMD_FORWARD)
+                time.sleep(0.1)
+            finally:
+                _close(simulator, comm)
+    finally:
+        config.RELIABLE_COMMANDS = True
+    assert _executed(simulator, "FORWARD") == ["FORWARD"]
+    assert comm.monitor.get_delivery_status()["acked"] == 0
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DE LA ENTREGA CONFIABLE DE COMANDOS")
+    print("=" * 60)
+    for test in (test_parse_and_groups, test_clean_link, test_command_loss, test_ack_loss_duplicates,
+                 test_partition, test_firmware_without_sequence):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Pruebas del descubrimiento del ESP32
+
+Usa direcciones de 127.0.0.0/24 (todas van a la interfaz local en Linux): el
+ESP32 simulado escucha en una de ellas, otras tienen equipos que aceptan la
+conexión pero no son carritos.
+"""
+
+import sys
+import os
+import socket
+import tempfile
+import threading
+import time
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from discovery import DiscoveredCar, DiscoveryCache, ESP32Discovery
+from simulator import SimulatedESP32
+
+
+def _silent_listener(ip: str, port: int) -> socket.socket:
+    """Acepta conexiones (en el backlog del kernel) y nunca responde"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind((ip, port))
+    server.listen(8)
+    return server
+
+
+def _wrong_device(ip: str, port: int) -> socket.socket:
+    """Responde cualquier cosa que no es SPEED: (p. ej. un servidor HTTP)"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind((ip, port))
+    server.listen(8)
+
+    def serve():
+        while True:
+            try:
+                client, _ = server.accept()
+            except OSError:
+                return
+            client.sendall(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            client.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server
+
+
+def test_scan_finds_only_the_car():
+    """Barrido de una /24: solo el que responde SPEED: es un carrito, en menos de 2 s"""
+    simulator = SimulatedESP32(host="127.0.0.57", seed=1)
+    port = simulator.start()
+    others = [_silent_listener("127.0.0.9", port), _wrong_device("127.0.0.10", port)]
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            discovery = ESP32Discovery(port=port, cache=DiscoveryCache(os.path.join(directory, "cache.json")))
+            start = time.perf_counter()
+            found = discovery.scan("127.0.0.0/24")
+            elapsed = time.perf_counter() - start
+        print(f"   254 direcciones en {elapsed * 1000:.0f} ms: {found}")
+        assert [car.ip for car in found] == ["127.0.0.57"]
+        assert found[0].source == DiscoveredCar.SCAN
+        assert elapsed < 2.0
+    finally:
+        for server in others:
+            server.close()
+        simulator.stop()
+
+
+def test_udp_announce():
+    """El carrito responde el anuncio UDP con su puerto TCP"""
+    simulator = SimulatedESP32(announce_port=0, seed=1)
+    port = simulator.start()
+    try:
+        discovery = ESP32Discovery(announce_port=simulator.announce_port, announce_timeout=0.2)
+        found = discovery.announce("127.0.0.1")
+        assert len(found) == 1
+        car = found[0]
+        assert (car.ip, car.port, car.source, car.name) == ("127.0.0.1", port, DiscoveredCar.BROADCAST, "ESP32_Carrito")
+    finally:
+        simulator.stop()
+
+
+def test_cache_ttl():
+    """La dirección guardada vale hasta que vence su TTL"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = DiscoveryCache(os.path.join(directory, "cache.json"), ttl=60)
+        assert cache.get() is None
+        cache.put("192.168.1.23", 80, now=1000.0)
+        assert cache.get(now=1030.0) == ("192.168.1.23", 80)
+        assert cache.get(now=1061.0) is None
+
+
+def test_locate_goes_straight_to_cached_address():
+    """Con una dirección en la caché, locate() la confirma sin anunciar ni barrer"""
+    simulator = SimulatedESP32(host="127.0.0.58", seed=1)
+    port = simulator.start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiscoveryCache(os.path.join(directory, "cache.json"))
+            cache.put("127.0.0.58", port)
+            discovery = ESP32Discovery(port=port, cache=cache, timeout=0.3)
+            start = time.perf_counter()
+            car = discovery.locate(subnet="127.0.1.0/30")
+            elapsed = time.perf_counter() - start
+        assert car is not None and car.ip == "127.0.0.58" and car.source == DiscoveredCar.CACHE
+        # Solo espera el sondeo de la IP fija del modo AP, que no responde aquí
+        assert elapsed < 0.5
+    finally:
+        simulator.stop()
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DE DESCUBRIMIENTO DEL ESP32")
+    print("=" * 60)
+    for test in (test_scan_finds_only_the_car, test_udp_announce, test_cache_ttl,
+                 test_locate_goes_straight_to_cached_address):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
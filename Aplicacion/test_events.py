@@ -0,0 +1,150 @@
+"""
+Pruebas del bus de eventos
+
+Entrega inline y encolada, políticas de descarte, aislamiento de errores y
+métricas por suscriptor; sobre todo, que un suscriptor encolado lento no
+frena a quien publica (el hilo de escucha del socket).
+"""
+
+import sys
+import os
+import io
+import threading
+import contextlib
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from events import EventBus, Subscription
+from protocol import SpeedSample
+
+
+def _blocked_subscriber(bus, queue_size, drop_policy):
+    """Suscriptor encolado que se traba en el primer evento hasta abrir la compuerta"""
+    entered, gate, received = threading.Event(), threading.Event(), []
+
+    def callback(payload):
+        entered.set()
+        gate.wait(5.0)
+        received.append(payload)
+
+    subscription = bus.subscribe(EventBus.MESSAGE, callback, mode=Subscription.QUEUED,
+                                 queue_size=queue_size, drop_policy=drop_policy, name="lento")
+    return subscription, entered, gate, received
+
+
+def test_inline_and_types():
+    """Inline corre en el hilo que publica, en orden; tópicos, modos y tipos se validan"""
+    bus = EventBus()
+    calls = []
+    bus.subscribe(EventBus.MESSAGE, lambda payload: calls.append((payload, threading.current_thread())))
+    for i in range(5):
+        bus.publish(EventBus.MESSAGE, f"m{i}")
+    assert calls == [(f"m{i}", threading.current_thread()) for i in range(5)]
+    for bad in (lambda: bus.publish("desconocido", "x"),
+                lambda: bus.subscribe("desconocido", print),
+                lambda: bus.subscribe(EventBus.MESSAGE, print, mode="otro")):
+        try:
+            bad()
+        except ValueError:
+            continue
+        raise AssertionError("Se aceptó un tópico o modo inválido")
+    try:
+        bus.publish(EventBus.SPEED, "no es una muestra")
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("Se aceptó un contenido del tipo equivocado")
+    bus.publish(EventBus.SPEED, SpeedSample(10.0, 1.0))
+    assert bus.published == 6
+    bus.close()
+
+
+def test_slow_queued_does_not_stall_publish():
+    """Un suscriptor encolado trabado no frena publish(): los inline siguen recibiendo todo"""
+    bus = EventBus()
+    subscription, entered, gate, received = _blocked_subscriber(bus, 10, Subscription.DROP_OLDEST)
+    inline = []
+    bus.subscribe(EventBus.MESSAGE, inline.append, name="rapido")
+    bus.publish(EventBus.MESSAGE, "primero")
+    assert entered.wait(1.0)
+    for i in range(1000):  # Si publish() esperara al suscriptor lento, esto no terminaría
+        bus.publish(EventBus.MESSAGE, f"m{i}")
+    assert len(inline) == 1001 and not gate.is_set()
+    assert subscription.get_metrics()["queue_depth"] == 10
+    gate.set()
+    assert subscription.wait_idle()
+    bus.close()
+
+
+def test_drop_policies():
+    """Cola llena: DROP_OLDEST conserva lo último y DROP_NEWEST lo primero, contando los descartes"""
+    for policy, expected in ((Subscription.DROP_OLDEST, ["m7", "m8", "m9"]),
+                             (Subscription.DROP_NEWEST, ["m0", "m1", "m2"])):
+        bus = EventBus()
+        subscription, entered, gate, received = _blocked_subscriber(bus, 3, policy)
+        bus.publish(EventBus.MESSAGE, "primero")
+        assert entered.wait(1.0)  # El hilo ya sacó "primero" de la cola
+        for i in range(10):
+            bus.publish(EventBus.MESSAGE, f"m{i}")
+        gate.set()
+        assert subscription.wait_idle()
+        bus.close()
+        subscription._thread.join(1.0)
+        assert received == ["primero"] + expected
+        metrics = subscription.get_metrics()
+        assert (metrics["delivered"], metrics["dropped"], metrics["queue_depth"]) == (4, 7, 0)
+
+
+def test_error_isolation_and_metrics():
+    """Un suscriptor que falla no afecta a los demás; errores y tiempos quedan en las métricas"""
+    bus = EventBus()
+    received, queued = [], []
+
+    def broken(payload):
+        raise RuntimeError("falla")
+
+    bus.subscribe(EventBus.MESSAGE, broken, name="roto")
+    bus.subscribe(EventBus.MESSAGE, received.append, name="sano")
+    broken_queued = bus.subscribe(EventBus.MESSAGE, broken, mode=Subscription.QUEUED, name="roto_encolado")
+    healthy_queued = bus.subscribe(EventBus.MESSAGE, queued.append, mode=Subscription.QUEUED, name="encolado")
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        for i in range(20):
+            bus.publish(EventBus.MESSAGE, f"m{i}")
+        assert broken_queued.wait_idle() and healthy_queued.wait_idle()
+        bus.close()
+        for subscription in (broken_queued, healthy_queued):
+            subscription._thread.join(1.0)
+    assert len(received) == len(queued) == 20
+    metrics = {"roto_encolado": broken_queued.get_metrics(), "encolado": healthy_queued.get_metrics()}
+    assert (metrics["roto_encolado"]["errors"], metrics["roto_encolado"]["delivered"]) == (20, 20)
+    assert (metrics["encolado"]["errors"], metrics["encolado"]["mode"]) == (0, Subscription.QUEUED)
+    assert metrics["encolado"]["max_dispatch_ms"] >= metrics["encolado"]["avg_dispatch_ms"] > 0
+    assert output.getvalue().count("Error en suscriptor 'roto'") == 20
+
+
+def test_unsubscribe():
+    """Tras desuscribirse no llega nada más y las métricas del bus ya no lo incluyen"""
+    bus = EventBus()
+    received = []
+    subscription = bus.subscribe(EventBus.MESSAGE, received.append, name="temporal")
+    bus.publish(EventBus.MESSAGE, "antes")
+    bus.unsubscribe(subscription)
+    bus.publish(EventBus.MESSAGE, "después")
+    assert received == ["antes"] and not subscription.active
+    assert bus.subscribers(EventBus.MESSAGE) == [] and bus.get_metrics() == []
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DEL BUS DE EVENTOS")
+    print("=" * 60)
+    for test in (test_inline_and_types, test_slow_queued_does_not_stall_publish, test_drop_policies,
+                 test_error_isolation_and_metrics, test_unsubscribe):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Pruebas de las tramas compuestas
+
+Varias operaciones en una sola línea (SPEED_SET:90|FORWARD): el ESP32 simulado
+valida la trama entera, la aplica en la misma vuelta de loop() y la confirma
+con un solo OK:<seq>; una operación inválida rechaza la trama sin aplicar nada.
+"""
+
+import sys
+import os
+import io
+import time
+import contextlib
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from communication import ESP32Communication, compose_frame
+from delivery import DeliveryTracker
+from events import EventBus
+from monitoring import CommunicationMonitor
+from simulator import SimulatedESP32
+
+
+def _connect():
+    simulator = SimulatedESP32(uplink_delay=0.005, downlink_delay=0.005, jitter=0.002, seed=11)
+    port = simulator.start()
+    events = EventBus()
+    comm = ESP32Communication(monitor=CommunicationMonitor(), events=events)
+    comm.ip, comm.port = "127.0.0.1", port
+    messages = []
+    events.subscribe(EventBus.MESSAGE, messages.append, name="test_messages")
+    assert comm.connect()
+    time.sleep(0.2)  # Ráfaga de TIME? y reparación de logs del arranque
+    return simulator, comm, messages
+
+
+def _close(simulator, comm):
+    comm.disconnect()
+    simulator.stop()
+    comm.events.close()
+
+
+def _commands_sent(comm):
+    """Escrituras numeradas (sin los TIME? de la sincronización, que corren aparte)"""
+    return comm.delivery.get_metrics()["sent"]
+
+
+def test_compose_frame():
+    """Solo de 2 a FRAME_MAX_OPS operaciones de estado o consulta, sin '|' ni '#' adentro"""
+    assert compose_frame(["SPEED_SET:200", "FORWARD"]) == "SPEED_SET:200|FORWARD"
+    for commands in (["FORWARD"], ["STOP"] * (config.FRAME_MAX_OPS + 1), ["SPEED_SET:90", "MACRO:1:STOP,0,0"],
+                     ["FORWARD", "HB:3"], ["FORWARD#4", "STOP"], ["GET_SPEED", "GET_LOGS|STOP"]):
+        try:
+            compose_frame(commands)
+        except ValueError:
+            continue
+        raise AssertionError(f"Trama aceptada: {commands}")
+    tracker = DeliveryTracker(comm=None)
+    # El plazo es el de la operación más lenta; MACRO: no entra, así que toda trama es idempotente
+    assert tracker.deadline_for("STOP|GET_LOGS") == config.ACK_DEADLINES[config.CMD_GET_LOGS]
+
+
+def test_speed_and_direction_atomic():
+    """SPEED_SET:90|FORWARD: una escritura, aplicada en la misma vuelta de loop() y confirmada una vez"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator, comm, messages = _connect()
+        try:
+            sent = _commands_sent(comm)
+            acked = comm.delivery.get_metrics()["acked"]
+            assert comm.send_frame(["SPEED_SET:90", config.CMD_FORWARD])
+            time.sleep(0.2)
+        finally:
+            _close(simulator, comm)
+    start = [command for _, command in simulator.commands].index("SPEED_SET:90")
+    applied = simulator.commands[start:start + 2]  # Nada se intercala (latidos, TIME?)
+    assert [command for _, command in applied] == ["SPEED_SET:90", "FORWARD"]
+    assert applied[1][0] - applied[0][0] < SimulatedESP32.LOOP_INTERVAL * 1000  # Misma vuelta de loop()
+    assert simulator.movements[-1][1:] == ("FORWARD", 90)  # El motor arrancó con el PWM nuevo
+    assert _commands_sent(comm) == sent + 1
+    assert comm.delivery.get_metrics()["acked"] == acked + 1
+    assert "OK:FORWARD" not in messages  # Sin confirmación por operación
+
+
+def test_invalid_frame_rejected():
+    """Una operación inválida rechaza la trama entera (ERR:<seq>) y el carrito no cambia"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator, comm, _ = _connect()
+        try:
+            pwm, movements = simulator.pwm, len(simulator.movements)
+            comm.send_frame(["SPEED_SET:90", config.CMD_FORWARD, "SPEED_SET:300"])
+            time.sleep(0.2)
+        finally:
+            _close(simulator, comm)
+    assert simulator.pwm == pwm and simulator.direction == config.CMD_STOP
+    assert len(simulator.movements) == movements
+    assert comm.delivery.get_metrics()["rejected"] == 1
+
+
+def test_status_query():
+    """request_status(): velocidad y logs con una sola escritura"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator, comm, messages = _connect()
+        try:
+            sent = _commands_sent(comm)
+            del messages[:]
+            assert comm.request_status()
+            time.sleep(0.2)
+        finally:
+            _close(simulator, comm)
+    assert _commands_sent(comm) == sent + 1
+    assert any(message.startswith("SPEED:") for message in messages)
+    assert any(message.startswith("LOGS:") for message in messages)
+
+
+def test_firmware_without_frames():
+    """Firmware anterior (COMPOUND_FRAMES = False): las operaciones salen por separado"""
+    config.COMPOUND_FRAMES = False
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulator, comm, _ = _connect()
+            try:
+                sent = _commands_sent(comm)
+                assert comm.send_frame(["SPEED_SET:90", config.CMD_FORWARD])
+                time.sleep(0.2)
+            finally:
+                _close(simulator, comm)
+    finally:
+        config.COMPOUND_FRAMES = True
+    assert _commands_sent(comm) == sent + 2
+    assert not any("|" in command for _, command in simulator.commands)
+    assert simulator.movements[-1][1:] == ("FORWARD", 90)
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DE LAS TRAMAS COMPUESTAS")
+    print("=" * 60)
+    for test in (test_compose_frame, test_speed_and_direction_atomic, test_invalid_frame_rejected,
+                 test_status_query, test_firmware_without_frames):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Pruebas de los latidos y del deadman
+
+Corta el enlace del ESP32 simulado sin cerrar el socket (como WiFi fuera de
+alcance) y mide cuánto tarda la PC en darlo por perdido y el carrito en
+detenerse solo.
+"""
+
+import sys
+import os
+import socket
+import time
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from communication import ESP32Communication
+from events import EventBus
+from monitoring import CommunicationMonitor
+from protocol import HeartbeatReply, LinkStatus, MessageParser
+from simulator import SimulatedESP32
+
+
+def _connect():
+    simulator = SimulatedESP32(uplink_delay=0.005, downlink_delay=0.005, seed=8)
+    port = simulator.start()
+    events = EventBus()
+    comm = ESP32Communication(monitor=CommunicationMonitor(), events=events)
+    comm.ip, comm.port = "127.0.0.1", port
+    changes = []
+    events.subscribe(EventBus.LINK, lambda status: changes.append((time.time(), status)), name="test_link")
+    assert comm.connect()
+    return simulator, comm, changes
+
+
+def _close(simulator, comm):
+    comm.disconnect()
+    simulator.stop()
+    comm.events.close()
+
+
+def _wait_for(changes, state, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for at, status in changes:
+            if status.state == state:
+                return at, status
+        time.sleep(0.005)
+    return None, None
+
+
+def test_parse_heartbeat():
+    """El eco HB:<seq> se convierte en HeartbeatReply"""
+    (line, reply), = MessageParser().parse_lines(["HB:42"], 1.5)
+    assert isinstance(reply, HeartbeatReply)
+    assert (reply.seq, reply.received_at) == (42, 1.5)
+
+
+def test_partition_detected_and_deadman_stops():
+    """Corte total: degradado y perdido en menos de 600 ms; el carrito se detiene solo"""
+    simulator, comm, changes = _connect()
+    try:
+        comm.send_command(config.CMD_FORWARD)
+        time.sleep(0.5)
+        assert comm.link_state == LinkStatus.OK and simulator.direction == "FORWARD"
+        assert not simulator.deadman_trips
+
+        cut = time.time()
+        simulator.partition()
+        lost_at, lost = _wait_for(changes, LinkStatus.LOST, 2.0)
+        assert lost is not None
+        states = [status.state for _, status in changes]
+        assert states[:2] == [LinkStatus.DEGRADED, LinkStatus.LOST]
+        print(f"   Detección: {(lost_at - cut) * 1000:.0f} ms tras el corte "
+              f"({lost.silence * 1000:.0f} ms sin latidos)")
+        assert lost_at - cut < 0.6
+        link = comm.monitor.get_link_status()
+        assert link["lost_events"] == 1 and link["state"] == LinkStatus.LOST
+        assert config.HEARTBEAT_LOST_AFTER * 1000 <= link["detection_ms"] < 700
+
+        time.sleep(0.3)
+        assert len(simulator.deadman_trips) == 1 and simulator.direction == "STOP"
+        stopped = simulator.host_time_of(simulator.deadman_trips[0])
+        print(f"   Deadman: motores detenidos {(stopped - cut) * 1000:.0f} ms tras el corte")
+        assert stopped - cut < config.HEARTBEAT_DEADMAN_TIMEOUT + 0.15
+
+        # Al volver el enlace llegan los latidos retenidos y el estado vuelve a ok
+        simulator.heal()
+        recovered_at, recovered = _wait_for(changes, LinkStatus.OK, 1.0)
+        assert recovered is not None and recovered.previous == LinkStatus.LOST
+        assert comm.monitor.get_link_status()["last_outage_ms"] > 500
+        assert simulator.direction == "STOP"
+    finally:
+        _close(simulator, comm)
+
+
+def test_short_stall_only_degrades():
+    """Un corte de 250 ms degrada el enlace pero no lo pierde ni dispara el deadman"""
+    simulator, comm, changes = _connect()
+    try:
+        comm.send_command(config.CMD_FORWARD)
+        time.sleep(0.4)
+        simulator.partition(duration=0.25)
+        time.sleep(0.8)
+        states = [status.state for _, status in changes]
+        assert LinkStatus.DEGRADED in states and LinkStatus.LOST not in states
+        assert comm.link_state == LinkStatus.OK
+        assert not simulator.deadman_trips and simulator.direction == "FORWARD"
+    finally:
+        _close(simulator, comm)
+
+
+def test_downlink_loss_is_host_side_only():
+    """Sin bajada la PC pierde el enlace, pero el carrito sigue recibiendo latidos"""
+    simulator, comm, changes = _connect()
+    try:
+        comm.send_command(config.CMD_FORWARD)
+        time.sleep(0.3)
+        simulator.partition(uplink=False)
+        lost_at, lost = _wait_for(changes, LinkStatus.LOST, 2.0)
+        assert lost is not None
+        time.sleep(0.3)
+        assert not simulator.deadman_trips and simulator.direction == "FORWARD"
+    finally:
+        _close(simulator, comm)
+
+
+def test_deadman_waits_for_first_heartbeat():
+    """Una PC sin latidos no dispara el deadman (se arma con el primer HB:)"""
+    simulator = SimulatedESP32(seed=8)
+    port = simulator.start()
+    try:
+        with socket.create_connection(("127.0.0.1", port)) as client:
+            client.sendall(b"FORWARD\n")
+            time.sleep(simulator.deadman_timeout + 0.3)
+            assert not simulator.deadman_trips and simulator.direction == "FORWARD"
+            client.sendall(b"HB:1\n")
+            time.sleep(simulator.deadman_timeout + 0.2)
+            assert len(simulator.deadman_trips) == 1 and simulator.direction == "STOP"
+            assert any("DEADMAN!" in log for log in simulator.logs)
+    finally:
+        simulator.stop()
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DE LATIDOS Y DEADMAN")
+    print("=" * 60)
+    for test in (test_parse_heartbeat, test_partition_detected_and_deadman_stops,
+                 test_short_stall_only_degrades, test_downlink_loss_is_host_side_only,
+                 test_deadman_waits_for_first_heartbeat):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Pruebas de los logs empujados por el ESP32
+
+El firmware manda cada entrada al registrarla (LOG:<seq>:<texto>); la PC la
+publica al llegar y solo pide GET_LOGS cuando la numeración delata un hueco.
+Se mide contra el ESP32 simulado, con retardo de red y pérdidas.
+"""
+
+import sys
+import os
+import io
+import time
+import contextlib
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from communication import ESP32Communication
+from events import EventBus
+from monitoring import CommunicationMonitor
+from protocol import LogEntry, MessageParser
+from simulator import SimulatedESP32
+
+
+def _connect(**kwargs):
+    simulator = SimulatedESP32(uplink_delay=0.005, downlink_delay=0.005, jitter=0.002, seed=3, **kwargs)
+    port = simulator.start()
+    events = EventBus()
+    comm = ESP32Communication(monitor=CommunicationMonitor(), events=events)
+    comm.ip, comm.port = "127.0.0.1", port
+    batches = []
+    events.subscribe(EventBus.ESP32_LOGS, lambda batch: batches.append((time.time(), batch)), name="test_logs")
+    assert comm.connect()
+    return simulator, comm, batches
+
+
+def _close(simulator, comm):
+    comm.disconnect()
+    simulator.stop()
+    comm.events.close()
+
+
+def _get_logs_sent(simulator):
+    return sum(1 for _, command in simulator.commands if command == config.CMD_GET_LOGS)
+
+
+def test_parse_log_entry():
+    """LOG:<seq>:<texto> conserva los ':' del texto; sin número es un error contado"""
+    parser = MessageParser()
+    (_, entry), (_, broken) = parser.parse_lines(["LOG:7:[1.000s] Maniobra 3: 4 pasos", "LOG:sin numero"], 2.0)
+    assert isinstance(entry, LogEntry)
+    assert (entry.seq, entry.text, entry.received_at) == (7, "[1.000s] Maniobra 3: 4 pasos", 2.0)
+    assert broken is None and parser.errors["log"] == 1
+
+
+def test_pushed_latency():
+    """Cada entrada llega como evento en menos de 100 ms, sin consultar GET_LOGS"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator, comm, batches = _connect()
+        try:
+            time.sleep(0.2)  # "Cliente conectado" delata el hueco del arranque
+            logged = {}
+            for i in range(50):
+                logged[f"evento {i}"] = time.time()
+                simulator.add_log(f"evento {i}")
+                time.sleep(0.02)
+            time.sleep(0.2)
+            last_seq = simulator.log_seq  # Antes de "Cliente desconectado"
+        finally:
+            _close(simulator, comm)
+
+    latencies = []
+    for received, batch in batches:
+        text = batch.logs[-1].partition("] ")[2]
+        if batch.pushed and text in logged:
+            latencies.append(received - logged[text])
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"   Empujado: p95 {p95 * 1000:.1f} ms, máx {latencies[-1] * 1000:.1f} ms "
+          f"(consulta cada {config.LOG_POLL_INTERVAL / 1000:.0f} s: {config.LOG_POLL_INTERVAL / 2:.0f} ms en promedio)")
+    assert len(latencies) == 50
+    assert latencies[-1] < 0.1
+    status = comm.get_log_status()
+    assert status["logs_pushed"] and status["last_seq"] == last_seq
+    # Solo la reparación del arranque ("Sistema iniciado" se registró sin cliente)
+    assert (status["gaps"], status["repairs"], status["lost"]) == (1, 1, 0)
+    assert _get_logs_sent(simulator) == 1
+
+
+def test_gap_repair():
+    """Con un 30 % de LOG: perdidos, GET_LOGS recupera todas las entradas"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator, comm, batches = _connect(log_loss=0.3)
+        try:
+            time.sleep(0.2)
+            for i in range(60):
+                simulator.add_log(f"evento {i}")
+                time.sleep(0.02)
+            comm.request_logs()  # La consulta de respaldo atrapa las pérdidas del final
+            time.sleep(0.3)
+            device_logs = list(simulator.logs)
+        finally:
+            _close(simulator, comm)
+
+    received = {log for _, batch in batches for log in batch.logs}
+    assert all(any(log.endswith(f"] evento {i}") for log in received) for i in range(60))
+    assert list(comm.esp32_logs) == device_logs
+    status = comm.get_log_status()
+    print(f"   {status['gaps']} huecos, {status['repairs']} GET_LOGS de reparación, {status['lost']} perdidos")
+    assert status["gaps"] > 1 and status["lost"] == 0
+    assert status["repairs"] <= status["gaps"]
+    assert _get_logs_sent(simulator) == status["repairs"] + 1
+
+
+def test_firmware_without_push():
+    """Firmware anterior: sin LOG:, los GET_LOGS periódicos siguen funcionando"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator, comm, batches = _connect(push_logs=False)
+        try:
+            simulator.add_log("evento")
+            comm.request_logs()
+            comm.request_logs()  # GET_LOGS no se deduplica
+            time.sleep(0.2)
+        finally:
+            _close(simulator, comm)
+    assert not comm.logs_pushed and _get_logs_sent(simulator) == 2
+    assert len(batches) == 2 and all(batch.seq is None and not batch.pushed for _, batch in batches)
+    assert batches[-1][1].logs[-1].endswith("] evento")
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DE LOS LOGS EMPUJADOS")
+    print("=" * 60)
+    for test in (test_parse_log_entry, test_pushed_latency, test_gap_repair, test_firmware_without_push):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
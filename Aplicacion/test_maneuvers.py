@@ -0,0 +1,139 @@
+"""
+Pruebas de las maniobras programadas
+
+Compila tramas MACRO:, las ejecuta en el ESP32 simulado y compara el momento
+real de cada paso (según el simulador) con el planificado, en el carrito y
+desde la PC.
+"""
+
+import sys
+import os
+import time
+
+import pytest
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from communication import ESP32Communication
+from events import EventBus
+from maneuvers import ManeuverExecutor, ManeuverRun, ManeuverStep, compile_maneuver
+from protocol import MacroProgress, MessageParser
+from simulator import SimulatedESP32
+
+PATTERN = [
+    ManeuverStep("FORWARD", 200, 0.3),
+    ManeuverStep("LEFT", 200, 0.1),
+    ManeuverStep("FORWARD", 150, 0.3),
+    ManeuverStep("STOP", 0, 0.0),
+]
+
+
+def _connect(**impairments):
+    simulator = SimulatedESP32(seed=11, **impairments)
+    port = simulator.start()
+    events = EventBus()
+    comm = ESP32Communication(events=events)
+    comm.ip, comm.port = "127.0.0.1", port
+    assert comm.connect()
+    executor = ManeuverExecutor(comm, rtt_provider=lambda: comm.clock.rtt)
+    return simulator, comm, executor
+
+
+def _close(simulator, comm, executor):
+    executor.close()
+    comm.disconnect()
+    simulator.stop()
+    comm.events.close()
+
+
+def _true_errors(simulator, run):
+    """Error de cada paso según el reloj del simulador (la verdad de la prueba)"""
+    movements = simulator.movements[-len(run.planned):]
+    start = movements[0][0]
+    return [(t - start) - planned for (t, _, _), planned in zip(movements[1:], run.planned[1:])]
+
+
+def test_compile_and_parse():
+    """Trama MACRO:, validación de pasos y eventos de avance"""
+    assert compile_maneuver(7, PATTERN) == "MACRO:7:FORWARD,200,300;LEFT,200,100;FORWARD,150,300;STOP,0,0"
+    with pytest.raises(ValueError):
+        ManeuverStep("JUMP", 200, 1.0)
+    with pytest.raises(ValueError):
+        ManeuverStep("FORWARD", 300, 1.0)
+    with pytest.raises(ValueError):
+        compile_maneuver(1, PATTERN * 5)
+
+    parser = MessageParser()
+    step, done, abort = (parsed for _, parsed in parser.parse_lines(
+        ["MACRO:STEP:7:2:12500", "MACRO:DONE:7:13000", "MACRO:ABORT:8:0:14000"], 0.0
+    ))
+    assert (step.kind, step.macro_id, step.step, step.device_time) == (MacroProgress.STEP, 7, 2, 12.5)
+    assert (done.kind, done.step, done.device_time) == (MacroProgress.DONE, None, 13.0)
+    assert (abort.kind, abort.macro_id, abort.step) == (MacroProgress.ABORT, 8, 0)
+
+
+def test_on_device_maneuver_keeps_timing():
+    """Maniobra en el carrito: pasos a tiempo pese al jitter de la red"""
+    simulator, comm, executor = _connect(uplink_delay=0.005, downlink_delay=0.005, jitter=0.01)
+    try:
+        run = executor.run(PATTERN)
+        assert run.wait(3.0)
+        assert run.state == ManeuverRun.DONE
+        reported = run.step_errors()
+        true = _true_errors(simulator, run)
+        print(f"   Error por paso (ms): {[round(e * 1000, 1) for e in true]}")
+        # Un ciclo de loop() de resolución, sin depender de la red
+        assert all(abs(error) <= 0.03 for error in reported)
+        assert all(abs(error) <= 0.03 for error in true)
+        assert simulator.direction == "STOP"
+        assert len([c for _, c in simulator.commands if c.startswith("MACRO:")]) == 1
+    finally:
+        _close(simulator, comm, executor)
+
+
+def test_stop_aborts_maneuver():
+    """STOP durante la maniobra la aborta en el carrito"""
+    simulator, comm, executor = _connect()
+    try:
+        run = executor.run([ManeuverStep("FORWARD", 200, 5.0), ManeuverStep("LEFT", 200, 1.0)])
+        time.sleep(0.3)
+        comm.send_command(config.CMD_STOP)
+        assert run.wait(2.0)
+        assert run.state == ManeuverRun.ABORTED
+        assert run.aborted_step == 0
+        time.sleep(0.1)
+        assert simulator.direction == "STOP"
+    finally:
+        _close(simulator, comm, executor)
+
+
+def test_host_timed_maneuver_for_comparison():
+    """Maniobra desde la PC: termina y estima el error con las confirmaciones"""
+    simulator, comm, executor = _connect(uplink_delay=0.005, downlink_delay=0.005, jitter=0.01)
+    try:
+        run = executor.run_host_timed(PATTERN)
+        assert run.wait(3.0)
+        assert run.state == ManeuverRun.DONE
+        assert run.step_errors()[-1] is not None
+        true = _true_errors(simulator, run)
+        print(f"   Error por paso (ms): {[round(e * 1000, 1) for e in true]}")
+        assert simulator.direction == "STOP"
+    finally:
+        _close(simulator, comm, executor)
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DE MANIOBRAS PROGRAMADAS")
+    print("=" * 60)
+    for test in (test_compile_and_parse, test_on_device_maneuver_keeps_timing,
+                 test_stop_aborts_maneuver, test_host_timed_maneuver_for_comparison):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
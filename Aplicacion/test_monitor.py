@@ -0,0 +1,267 @@
+"""
+Prueba de estrés del monitor de comunicación
+
+Varios hilos escriben en el monitor (como el hilo de Tk y el hilo de escucha)
+mientras otros leen instantáneas continuamente y verifican sus invariantes.
+"""
+
+import sys
+import os
+import threading
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from monitoring import CommunicationMonitor
+from protocol import LinkStatus
+from telemetry import TelemetrySeries, TelemetryHistory
+
+
+COMMAND = "FORWARD"       # 8 bytes con el \n
+RESPONSE = "OK:FORWARD"   # 10 bytes
+ITERATIONS = 20000
+WRITERS = 3
+
+
+def _hammer(monitor: CommunicationMonitor, readers: int = 2):
+    """Ejecuta escritores y lectores concurrentes; devuelve las violaciones encontradas"""
+    violations = []
+    done = threading.Event()
+    start = threading.Barrier(WRITERS * 2 + readers)
+    
+    def sender():
+        start.wait()
+        for _ in range(ITERATIONS):
+            monitor.command_sent(COMMAND)
+            
+    def receiver():
+        start.wait()
+        for i in range(ITERATIONS):
+            monitor.response_received(RESPONSE)
+            if i % 1000 == 0:
+                monitor.command_failed()
+                
+    def reader():
+        start.wait()
+        previous = None
+        while not done.is_set():
+            snap = monitor.snapshot()
+            if snap["bytes_sent"] != snap["commands_sent"] * (len(COMMAND) + 1):
+                violations.append(("bytes_sent", snap))
+            if snap["bytes_received"] != snap["responses_received"] * len(RESPONSE):
+                violations.append(("bytes_received", snap))
+            if len(snap["latencies"]) > monitor.LATENCY_HISTORY_SIZE * WRITERS:
+                violations.append(("latencies", snap))
+            if previous is not None:
+                for key in ("commands_sent", "responses_received", "commands_failed"):
+                    if snap[key] < previous[key]:
+                        violations.append(("monotonic:" + key, snap))
+            previous = snap
+            
+    threads = [threading.Thread(target=sender) for _ in range(WRITERS)]
+    threads += [threading.Thread(target=receiver) for _ in range(WRITERS)]
+    reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads + reader_threads:
+        t.start()
+    for t in threads:
+        t.join()
+    done.set()
+    for t in reader_threads:
+        t.join()
+    return violations
+
+
+def test_snapshots_are_consistent_under_load():
+    """Las instantáneas nunca muestran una escritura a medias"""
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Forzar cambios de hilo frecuentes
+    try:
+        monitor = CommunicationMonitor()
+        violations = _hammer(monitor)
+    finally:
+        sys.setswitchinterval(old_interval)
+        
+    assert violations == []
+    snap = monitor.snapshot()
+    assert snap["commands_sent"] == WRITERS * ITERATIONS
+    assert snap["responses_received"] == WRITERS * ITERATIONS
+    assert snap["commands_failed"] == WRITERS * (ITERATIONS // 1000)
+    assert len(snap["latencies"]) == WRITERS * monitor.LATENCY_HISTORY_SIZE
+
+
+def test_reset_discards_previous_shards():
+    """Reiniciar durante la carga deja contadores coherentes"""
+    monitor = CommunicationMonitor()
+    worker = threading.Thread(target=lambda: [monitor.command_sent(COMMAND) for _ in range(ITERATIONS)])
+    worker.start()
+    for _ in range(50):
+        monitor.reset()
+        snap = monitor.snapshot()
+        assert snap["bytes_sent"] == snap["commands_sent"] * (len(COMMAND) + 1)
+    worker.join()
+    monitor.reset()
+    assert monitor.commands_sent == 0
+
+
+def test_summary_matches_counters():
+    """El resumen se calcula sobre una sola instantánea"""
+    monitor = CommunicationMonitor()
+    monitor.start_connection()
+    for _ in range(10):
+        monitor.command_sent(COMMAND)
+        monitor.response_received(RESPONSE)
+    monitor.command_failed()
+    summary = monitor.get_statistics_summary()
+    assert summary["reliability"]["commands_sent"] == 10
+    assert summary["reliability"]["packet_loss"] == 10.0
+    assert summary["bandwidth"]["bytes_received"] == 10 * len(RESPONSE)
+    assert summary["latency"]["current"] >= 0.0
+
+
+def test_link_counters_in_snapshot():
+    """Latidos y estado del enlace van en los shards: los bytes y los latidos salen de la misma instantánea"""
+    monitor = CommunicationMonitor()
+    heartbeat = "HB:1"  # 5 bytes con el \n
+    done = threading.Event()
+    violations = []
+    
+    def reader():
+        while not done.is_set():
+            snap = monitor.snapshot()
+            if snap["bytes_sent"] != snap["heartbeats_sent"] * (len(heartbeat) + 1):
+                violations.append(snap)
+                
+    def sender():
+        for _ in range(ITERATIONS):
+            monitor.heartbeat_sent(heartbeat)
+            monitor.heartbeat_received(0.01)
+            
+    threads = [threading.Thread(target=sender) for _ in range(WRITERS)]
+    reader_thread = threading.Thread(target=reader)
+    for t in threads + [reader_thread]:
+        t.start()
+    for t in threads:
+        t.join()
+    done.set()
+    reader_thread.join()
+    assert violations == []
+    
+    # Transiciones desde otro hilo (el del detector): el último cambio define el estado
+    for state, previous, silence in ((LinkStatus.DEGRADED, LinkStatus.OK, 0.2),
+                                     (LinkStatus.LOST, LinkStatus.DEGRADED, 0.4),
+                                     (LinkStatus.OK, LinkStatus.LOST, 1.5)):
+        status = LinkStatus(state, previous, silence, 0.0)
+        detector = threading.Thread(target=monitor.link_state_changed, args=(status,))
+        detector.start()
+        detector.join()
+    link = monitor.get_link_status()
+    assert link["state"] == LinkStatus.OK and link["heartbeats_sent"] == WRITERS * ITERATIONS
+    assert (link["degraded_events"], link["lost_events"]) == (1, 1)
+    assert link["detection_ms"] == 400 and link["last_outage_ms"] == 1500
+    assert abs(link["heartbeat_rtt_ms"] - 10) < 1e-6
+    monitor.reset()
+    assert monitor.get_link_status()["heartbeats_sent"] == 0
+
+
+def test_delivery_counters_in_snapshot():
+    """Confirmaciones y pérdidas van en los shards: la tasa de pérdida usa una sola instantánea"""
+    monitor = CommunicationMonitor()
+    monitor.add_log = lambda message: None  # Sin log: solo interesan los contadores
+    for _ in range(10):
+        monitor.command_sent(COMMAND)
+        
+    def listener():
+        for _ in range(7):
+            monitor.command_acked(0.02)
+        monitor.duplicate_received()
+        
+    def tracker():
+        monitor.command_retransmitted(COMMAND)
+        monitor.delivery_failed(COMMAND)
+        
+    # Confirmaciones y vencimientos llegan desde el hilo de escucha y el del rastreador
+    for t in (threading.Thread(target=listener), threading.Thread(target=tracker)):
+        t.start()
+        t.join()
+    snap = monitor.snapshot()
+    assert monitor.get_packet_loss_rate(snap) == 10.0
+    delivery = monitor.get_delivery_status(snap)
+    assert (delivery["acked"], delivery["retransmits"], delivery["delivery_failed"], delivery["duplicates"]) == (7, 1, 1, 1)
+    assert abs(delivery["ack_rtt_ms"] - 20) < 1e-6
+    assert snap["bytes_sent"] == 11 * (len(COMMAND) + 1)
+    monitor.reset()
+    assert monitor.get_delivery_status()["acked"] == 0
+
+
+def test_writers_never_wait_for_history_readers():
+    """Con todas las series tomadas por un lector, los escritores del monitor terminan igual"""
+    monitor = CommunicationMonitor()
+    monitor.add_log = lambda message: None
+    samples = 1000  # Pasa la mitad del anillo: el escritor intenta agregar y encuentra el lock tomado
+    series = list(monitor.history.series.values())
+    
+    def writer():
+        for _ in range(samples):
+            monitor.command_sent(COMMAND)
+            monitor.response_received(RESPONSE)
+            
+    for locked in series:
+        locked._lock.acquire()  # Un lector a mitad de una consulta larga
+    try:
+        thread = threading.Thread(target=writer)
+        thread.start()
+        thread.join(5.0)
+        assert not thread.is_alive(), "un escritor esperó al lector"
+    finally:
+        for locked in series:
+            locked._lock.release()
+    # Lo que quedó en el anillo del escritor aparece en la próxima consulta
+    for name in (TelemetryHistory.MESSAGES_OUT, TelemetryHistory.MESSAGES_IN, TelemetryHistory.LATENCY):
+        assert sum(bucket[4] for bucket in monitor.history.query(name, 0, resolution=1)) == samples
+    assert all(locked.dropped == 0 for locked in series)
+
+
+def test_history_rollups_are_bounded():
+    """El historial agrega en cubetas de 1 s/1 min/1 h con memoria fija"""
+    series = TelemetrySeries(raw_seconds=10, raw_capacity=64,
+                             levels=[(1, 120), (60, 60), (3600, 24)])
+    start = 3600.0 * 300  # Alineado a la hora
+    for i in range(4 * 3600 * 10):  # 4 horas a 10 Hz
+        series.add(i % 50, start + i * 0.1)
+    end = start + 4 * 3600
+    
+    raw = series.query(end - 5, end)
+    assert 0 < len(raw) <= 64 and all(b[4] == 1 for b in raw)
+    seconds = series.query(end - 60, end)
+    assert seconds[-1][0] - seconds[0][0] <= 60 and seconds[0][4] == 10
+    minutes = series.query(end - 1800, end)
+    assert minutes[0][4] == 600 and minutes[0][1] == 0 and minutes[0][2] == 49
+    hours = series.query(start, end)
+    assert len(hours) == 4 and sum(b[4] for b in hours) == 4 * 3600 * 10
+    assert abs(hours[0][3] - 24.5) < 1e-6
+    
+    monitor = CommunicationMonitor()
+    monitor.command_sent(COMMAND)
+    monitor.response_received(RESPONSE)
+    assert len(monitor.history.query(TelemetryHistory.LATENCY, 0, resolution=0)) == 1
+    assert monitor.history.rate(TelemetryHistory.MESSAGES_OUT, 0)[-1][1] == 1.0
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBA DE ESTRÉS DEL MONITOR")
+    print("=" * 60)
+    for test in (test_snapshots_are_consistent_under_load,
+                 test_reset_discards_previous_shards,
+                 test_summary_matches_counters,
+                 test_link_counters_in_snapshot,
+                 test_delivery_counters_in_snapshot,
+                 test_writers_never_wait_for_history_readers,
+                 test_history_rollups_are_bounded):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
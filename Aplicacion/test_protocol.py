@@ -0,0 +1,57 @@
+"""
+Pruebas del parser de mensajes del ESP32
+"""
+
+import sys
+import os
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from protocol import MessageParser, SpeedSample, Ack, LogBatch, CollisionAlert
+
+
+def test_lines_split_across_recv_calls():
+    """Las líneas partidas o agrupadas entre recv se reconstruyen"""
+    parser = MessageParser()
+    assert parser.feed(b"SPEED:12.") == []
+    result = parser.feed(b"5\r\nOK:FORWARD\r\nLOGS:{\"logs\": [\"[1s] CMD: AVANZAR\"]}\r\nSPE")
+    result += parser.feed(b"ED:3\r\n")
+    messages = [parsed for _, parsed in result]
+    assert isinstance(messages[0], SpeedSample) and messages[0].speed == 12.5
+    assert isinstance(messages[1], Ack) and messages[1].ok and messages[1].detail == "FORWARD"
+    assert isinstance(messages[2], LogBatch) and messages[2].logs == ["[1s] CMD: AVANZAR"]
+    assert messages[3].speed == 3.0
+    # Un carácter UTF-8 partido entre dos recv no se corrompe
+    encoded = "¡COLISIÓN detectada!\n".encode()
+    assert parser.feed(encoded[:13]) == []
+    (line, alert), = parser.feed(encoded[13:])
+    assert isinstance(alert, CollisionAlert) and line == "¡COLISIÓN detectada!"
+
+
+def test_counters_and_registered_handlers():
+    """Contadores por tipo y manejadores registrados para prefijos nuevos"""
+    parser = MessageParser()
+    parser.register("DIST:", lambda payload, now: float(payload))
+    parser.feed(b"SPEED:abc\nSPEED:1\nERR:BAD\nDIST:42.5\nhola\n")
+    counters = parser.get_counters()
+    assert counters["parsed"]["speed"] == 1
+    assert counters["errors"]["speed"] == 1
+    assert counters["parsed"]["err"] == 1
+    assert counters["parsed"]["dist"] == 1
+    assert counters["parsed"]["unknown"] == 1
+    assert parser.parse_line("DIST:7") == 7.0
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DEL PARSER DE MENSAJES")
+    print("=" * 60)
+    for test in (test_lines_split_across_recv_calls, test_counters_and_registered_handlers):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
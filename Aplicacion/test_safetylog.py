@@ -0,0 +1,122 @@
+"""
+Pruebas del parser e índice de eventos de seguridad del ESP32
+"""
+
+import sys
+import os
+import random
+import tempfile
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from safetylog import SafetyEvent, SafetyJournal, SafetyLogIndex, parse_log_line
+
+
+def test_parse_firmware_log_lines():
+    """Cada línea del firmware se convierte en su evento tipado"""
+    cases = [
+        ("[128.345s] Frenado gradual iniciado a 81.2cm", SafetyEvent.GRADUAL_BRAKE, 81.2, ""),
+        ("[129.010s] DETENCION! Obstaculo a 42.1cm", SafetyEvent.STOP, 42.1, ""),
+        ("[129s] EMERGENCIA! Reversa automatica a 37.2cm", SafetyEvent.EMERGENCY_REVERSE, 37.2, ""),
+        ("[131.200s] Sin lectura de sensor - restaurando control", SafetyEvent.SENSOR_TIMEOUT, None, ""),
+        ("[132.000s] Zona segura. Control normal restaurado", SafetyEvent.SAFE_ZONE, None, ""),
+        ("[127.002s] CMD: AVANZAR", SafetyEvent.COMMAND, None, "AVANZAR"),
+        ("[127.500s] Velocidad PWM=175", SafetyEvent.COMMAND, None, "Velocidad PWM=175"),
+    ]
+    for line, kind, distance, detail in cases:
+        event = parse_log_line(line, 1000.0)
+        assert event.kind == kind, line
+        assert event.distance == distance
+        assert event.detail == detail
+        assert event.time == 1000.0
+    assert parse_log_line("[129.010s] DETENCION! Obstaculo a 42.1cm").device_time == 129.01
+    assert parse_log_line("[1.000s] Cliente conectado") is None
+
+
+def test_repeated_log_batches_are_indexed_once():
+    """GET_LOGS repite las últimas líneas: cada evento se indexa una sola vez"""
+    index = SafetyLogIndex()
+    first = ["[10.000s] CMD: AVANZAR", "[11.000s] Frenado gradual iniciado a 80.0cm"]
+    second = first + ["[11.500s] DETENCION! Obstaculo a 44.0cm"]
+    assert len(index.add_batch(first, None, 100.0)) == 2
+    added = index.add_batch(second, [(95.0, 0.01), (96.0, 0.01), (96.5, 0.01)], 105.0)
+    assert [event.kind for event in added] == [SafetyEvent.STOP]
+    assert added[0].time == 96.5
+    assert index.counts()[SafetyEvent.COMMAND] == 1
+
+
+def test_restart_does_not_reindex():
+    """Tras reiniciar la aplicación con el ESP32 encendido, el primer lote no duplica el diario"""
+    logs = ["[10.000s] CMD: AVANZAR", "[11.000s] Frenado gradual iniciado a 80.0cm",
+            "[11.500s] DETENCION! Obstaculo a 44.0cm"]
+    with tempfile.TemporaryDirectory() as directory:
+        journal = SafetyJournal(os.path.join(directory, "safety_events.jsonl"))
+        journal.append(SafetyLogIndex().add_batch(logs, None, 100.0))
+        index = journal.load_index()  # Aplicación reiniciada
+        new_events = index.add_batch(logs + ["[12.000s] CMD: DETENER"], None, 200.0)
+        journal.append(new_events)
+        assert [event.detail for event in new_events] == ["DETENER"]
+        assert len(journal.load()) == 4 and len(index) == 4
+
+
+def test_journal_rotation_bounds_startup():
+    """El diario rota al pasar su tamaño máximo: al arrancar se leen a lo sumo dos archivos"""
+    with tempfile.TemporaryDirectory() as directory:
+        journal = SafetyJournal(os.path.join(directory, "safety_events.jsonl"), max_bytes=4096)
+        index = SafetyLogIndex()
+        for second in range(1000):  # Una línea CMD: por comando, como con los logs empujados
+            journal.append(index.add_batch([f"[{second}.000s] CMD: AVANZAR"], None, 1000.0 + second))
+        sizes = [os.path.getsize(path) for path in (journal.path, journal.rotated_path)]
+        assert all(0 < size <= 4096 for size in sizes)
+        restarted = SafetyJournal(journal.path, max_bytes=4096)
+        events = restarted.load()
+        assert 0 < len(events) < 1000 and events[-1].device_time == 999.0
+        assert [event.time for event in events] == sorted(event.time for event in events)
+        # Lo más reciente sigue sembrando la deduplicación tras reiniciar
+        index = restarted.load_index()
+        assert index.add_batch(["[999.000s] CMD: AVANZAR"], None, 3000.0) == []
+
+
+def test_index_queries_on_large_journal():
+    """Consultas por tipo, tiempo y distancia sobre un diario grande"""
+    rng = random.Random(5)
+    kinds = (SafetyEvent.GRADUAL_BRAKE, SafetyEvent.STOP, SafetyEvent.EMERGENCY_REVERSE)
+    now = 1_700_000_000.0
+    events = []
+    for i in range(200_000):  # Varios meses de sesiones
+        kind = rng.choice(kinds)
+        events.append(SafetyEvent(kind, now - 90 * 86400 + i * 38.0, i * 0.5, rng.uniform(20, 90)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = SafetyJournal(os.path.join(directory, "safety_events.jsonl"))
+        journal.append(events)
+        index = journal.load_index()
+    assert len(index) == len(events)
+
+    week_start = events[-1].time - 7 * 86400
+    result = index.query(SafetyEvent.EMERGENCY_REVERSE, start=week_start, max_distance=40.0)
+    expected = [
+        e for e in events
+        if e.kind == SafetyEvent.EMERGENCY_REVERSE and e.time >= week_start and e.distance <= 40.0
+    ]
+    assert [e.time for e in result] == [e.time for e in expected]
+    assert index.count(SafetyEvent.STOP, start=week_start) == sum(
+        1 for e in events if e.kind == SafetyEvent.STOP and e.time >= week_start
+    )
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DE EVENTOS DE SEGURIDAD")
+    print("=" * 60)
+    for test in (test_parse_firmware_log_lines, test_repeated_log_batches_are_indexed_once,
+                 test_restart_does_not_reindex, test_journal_rotation_bounds_startup,
+                 test_index_queries_on_large_journal):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
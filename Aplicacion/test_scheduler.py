@@ -0,0 +1,225 @@
+"""
+Pruebas del reloj virtual
+
+Una sesión de una hora contra un carrito sustituto (responde cada comando a
+los 20 ms virtuales) corre en segundos y siempre da el mismo resultado.
+"""
+
+import sys
+import os
+import io
+import time
+import contextlib
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from monitoring import CommunicationMonitor
+from notifications import TwilioNotifier
+from scheduler import TaskWheel, VirtualClock
+
+
+class _SmsStandIn:
+    """Lo que TwilioNotifier usa de twilio.rest.Client, guardando los envíos"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.sent = []
+        self.messages = self
+
+    def create(self, body, from_, to):
+        self.sent.append((self.clock.time(), to))
+        return type("Message", (), {"sid": f"SM{len(self.sent)}"})()
+
+
+def _periodic(clock, interval_ms, action):
+    def tick():
+        action()
+        clock.after(interval_ms, tick)
+    clock.after(interval_ms, tick)
+
+
+def _run_session(seconds: float):
+    clock = VirtualClock()
+    start = clock.time()
+    monitor = CommunicationMonitor(clock=clock)
+    sms = _SmsStandIn(clock)
+    notifier = TwilioNotifier(clock=clock, client=sms)
+    summaries = []
+    alerts = []
+
+    def send(command):
+        monitor.command_sent(command)
+        clock.after(20, lambda: monitor.response_received(f"OK:{command}"))
+
+    state = {"forward": False}  # Alterna FORWARD / STOP
+
+    def drive():
+        state["forward"] = not state["forward"]
+        send(config.CMD_FORWARD if state["forward"] else config.CMD_STOP)
+
+    monitor.start_connection()
+    _periodic(clock, 2000, drive)
+    _periodic(clock, 5000, lambda: send("GET_LOGS"))
+    _periodic(clock, config.STATS_UPDATE_INTERVAL, lambda: summaries.append(monitor.get_statistics_summary()))
+    _periodic(clock, 4000, lambda: alerts.append(notifier.send_collision_alert()))
+    with contextlib.redirect_stdout(io.StringIO()):
+        clock.run_until(start + seconds)
+    return monitor.get_statistics_summary(), sms.sent, alerts, len(summaries), clock.callbacks_run
+
+
+def test_virtual_clock_order():
+    """Las llamadas corren en orden de vencimiento, las canceladas no, y la hora es exacta"""
+    clock = VirtualClock(start=100.0)
+    seen = []
+    clock.after(300, lambda: seen.append(("c", clock.time())))
+    clock.after(100, lambda: seen.append(("a", clock.time())))
+    clock.after(100, lambda: seen.append(("b", clock.time())))  # Mismo vencimiento: orden de llegada
+    cancelled = clock.after(200, lambda: seen.append(("x", clock.time())))
+    clock.cancel(cancelled)
+    # Una llamada que programa otra dentro del mismo avance
+    clock.after(150, lambda: clock.after(50, lambda: seen.append(("nested", clock.time()))))
+    clock.advance(0.25)
+    assert seen == [("a", 100.1), ("b", 100.1), ("nested", 100.2)]
+    assert clock.time() == 100.25 and clock.pending == 1
+    clock.sleep(1.0)
+    assert seen[-1] == ("c", 100.3) and clock.time() == 101.25
+
+
+def test_hour_long_session():
+    """Una hora virtual en segundos: enfriamiento de SMS, latencia y ancho de banda exactos"""
+    started = time.perf_counter()
+    summary, sent, alerts, ticks, callbacks = _run_session(3600)
+    elapsed = time.perf_counter() - started
+    print(f"   1 h virtual en {elapsed:.2f} s ({callbacks} llamadas programadas)")
+    assert elapsed < 10
+
+    # Colisión cada 4 s con 10 s de enfriamiento: un SMS cada 12 s
+    assert len(alerts) == 900 and alerts.count(True) == len(sent) == 300
+    assert [round(at - sent[0][0]) for at, _ in sent[:3]] == [0, 12, 24]
+
+    # FORWARD/STOP cada 2 s y GET_LOGS cada 5 s; los dos enviados justo al final no alcanzan respuesta
+    reliability = summary["reliability"]
+    assert reliability["commands_sent"] == 1800 + 720
+    assert reliability["responses_received"] == 1800 + 720 - 2
+    latency = summary["latency"]
+    assert abs(latency["average"] - 20.0) < 1e-3 and abs(latency["max"] - 20.0) < 1e-3
+    assert summary["connection"]["duration"] == 3600
+    assert ticks == 3600 * 1000 // config.STATS_UPDATE_INTERVAL
+
+
+def test_session_is_deterministic():
+    """Dos corridas de la misma sesión dan exactamente las mismas estadísticas"""
+    first = _run_session(600)
+    second = _run_session(600)
+    assert first[0] == second[0] and first[1] == second[1] and first[2] == second[2]
+
+
+def _controller_wheel(clock):
+    """La rueda con las tareas del controlador; devuelve también las ejecuciones por tarea"""
+    wheel = TaskWheel(clock, tick_ms=50, slots=256, idle_after=5.0)
+    runs = {"stats": 0, "charts": 0, "logs": 0}
+    
+    def counter(name):
+        def run():
+            runs[name] += 1
+        return run
+        
+    wheel.add("stats", counter("stats"), {TaskWheel.ACTIVE: 500, TaskWheel.IDLE: 2000, TaskWheel.HIDDEN: 5000})
+    wheel.add("charts", counter("charts"), {TaskWheel.ACTIVE: 50, TaskWheel.IDLE: 250})
+    wheel.add("logs", counter("logs"), lambda activity: None if activity == TaskWheel.OFFLINE else 30000)
+    return wheel, runs
+
+
+def test_task_wheel_coalesces():
+    """Tareas de 50, 500 y 30000 ms: un despertar por tick, las coincidentes corren juntas"""
+    clock = VirtualClock()
+    wheel, runs = _controller_wheel(clock)
+    wheel.touch()
+    wheel.set_connected(True)
+    for _ in range(60):  # Un minuto conduciendo
+        wheel.touch()
+        clock.advance(1.0)
+    clock.advance(0.01)  # El último tick vence a los 60 s (más el redondeo del reloj)
+    assert runs == {"stats": 120, "charts": 1200, "logs": 2}
+    metrics = wheel.get_metrics()
+    # Con un root.after por tarea: 1200 + 120 + 2 despertares
+    assert metrics["wakeups"] == 1200 and metrics["coalesced"] == 122
+    assert metrics["activity"] == TaskWheel.ACTIVE
+    assert metrics["tasks"]["charts"]["late_ms"] < 1 and metrics["tasks"]["stats"]["interval_ms"] == 500
+
+
+def test_task_wheel_follows_activity():
+    """Sin conducir baja el ritmo, oculta no dibuja y sin conexión no despierta nunca"""
+    clock = VirtualClock()
+    wheel, runs = _controller_wheel(clock)
+    assert clock.pending == 0  # Todo en pausa hasta conectar
+    wheel.set_connected(True)
+    wheel.touch()
+    clock.advance(65.0)  # 5 s activos y luego reposo
+    assert wheel.activity == TaskWheel.IDLE
+    wheel.reset_metrics()
+    clock.advance(60.0)
+    assert wheel.get_metrics()["wakeups_per_min"] == 240  # Una por cuadro de 250 ms
+    
+    wheel.set_visible(False)
+    wheel.reset_metrics()
+    before = dict(runs)
+    clock.advance(60.0)
+    # La actualización ya programada se respeta y luego una cada 5 s
+    assert runs["charts"] == before["charts"] and runs["stats"] - before["stats"] == 13
+    assert wheel.get_metrics()["wakeups"] == 13
+    
+    wheel.touch()  # Vuelve a conducir
+    wheel.set_visible(True)
+    clock.advance(1.0)
+    assert wheel.activity == TaskWheel.ACTIVE and runs["charts"] - before["charts"] == 20
+    
+    wheel.set_connected(False)
+    wheel.reset_metrics()
+    clock.advance(600.0)
+    assert clock.pending == 0 and wheel.get_metrics()["wakeups"] == 0
+
+
+def test_task_wheel_metrics_and_errors():
+    """Una tarea que falla no detiene la rueda; cada tarea lleva su tiempo de ejecución"""
+    clock = VirtualClock()
+    wheel = TaskWheel(clock, tick_ms=50, slots=8)  # Vuelta de 400 ms: intervalos de varias vueltas
+    calls = []
+    
+    def failing():
+        calls.append("fail")
+        raise RuntimeError("sin GUI")
+        
+    def busy():
+        calls.append("busy")
+        time.sleep(0.002)
+        
+    wheel.add("failing", failing, {TaskWheel.OFFLINE: 100})
+    wheel.add("busy", busy, {TaskWheel.OFFLINE: 1000})
+    with contextlib.redirect_stdout(io.StringIO()):
+        clock.advance(3.0)
+    assert calls.count("fail") == 30 and calls.count("busy") == 3
+    tasks = wheel.get_metrics()["tasks"]
+    assert tasks["failing"]["runs"] == 30 and tasks["busy"]["runs"] == 3
+    assert tasks["busy"]["mean_ms"] >= 2.0 and tasks["busy"]["max_ms"] >= tasks["busy"]["mean_ms"]
+    wheel.remove("failing")
+    wheel.close()
+    clock.advance(5.0)
+    assert calls.count("fail") == 30 and calls.count("busy") == 3 and clock.pending == 0
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DEL RELOJ VIRTUAL")
+    print("=" * 60)
+    for test in (test_virtual_clock_order, test_hour_long_session, test_session_is_deterministic,
+                 test_task_wheel_coalesces, test_task_wheel_follows_activity, test_task_wheel_metrics_and_errors):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Pruebas del arranque en frío
+
+Lo que no hace falta para mostrar la ventana (twilio, asyncio del tablero y
+del descubrimiento) no debe importarse con el controlador.
+"""
+
+import sys
+import os
+import subprocess
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from notifications import TwilioNotifier
+
+
+def test_controller_import_is_light():
+    """Importar el controlador no carga twilio, asyncio, el tablero ni el descubrimiento"""
+    heavy = ("twilio", "asyncio", "dashboard", "discovery")
+    result = subprocess.run(
+        [sys.executable, "-c",
+         f"import sys, controller; print([m for m in {heavy!r} if m in sys.modules])"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_notifier_initializes_on_first_use():
+    """El cliente de Twilio se crea al primer uso (o en el calentamiento), una sola vez"""
+    notifier = TwilioNotifier()
+    assert not notifier._initialized
+    calls = []
+    original = notifier._initialize_twilio
+    notifier._initialize_twilio = lambda: (calls.append(1), original())
+    notifier.warm_up().join(timeout=5)
+    assert notifier._initialized and calls == [1]
+    # Sin credenciales no hay cliente, y no se reintenta en cada alerta
+    if not config.TWILIO_ACCOUNT_SID:
+        assert not notifier.is_configured()
+        assert not notifier.send_custom_message("prueba")
+    assert calls == [1]
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DE ARRANQUE EN FRÍO")
+    print("=" * 60)
+    for test in (test_controller_import_is_light, test_notifier_initializes_on_first_use):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Pruebas del bloque de estado mapeado en memoria
+"""
+
+import sys
+import os
+import tempfile
+import threading
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stateblock import StateBlockReader, StateBlockWriter
+
+
+def test_roundtrip():
+    """Lo que escribe el controlador se lee igual; sin cambios no se reescribe"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.bin")
+        writer = StateBlockWriter(path)
+        with StateBlockReader(path) as reader:
+            assert reader.read().connection == "disconnected"
+            assert writer.update(connection="ok", pwm=200, direction="FORWARD")
+            writer.update(speed=42.5, rtt=0.012)
+            state = reader.read()
+            assert (state.connection, state.pwm, state.direction) == ("ok", 200, "FORWARD")
+            assert (state.speed, state.rtt) == (42.5, 0.012)
+            assert state.seq % 2 == 0 and state.updated_at > 0
+
+            seq = reader.seq
+            assert not writer.update(pwm=200)
+            assert reader.seq == seq
+            assert reader.wait_for_change(seq, timeout=0.01) is None
+
+            writer.close()
+            assert reader.read().connection == "disconnected"
+
+
+def test_rejects_bad_input():
+    """Campos desconocidos no dejan el bloque a medio escribir; otro archivo no se acepta"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.bin")
+        writer = StateBlockWriter(path)
+        for bad in ({"direction": "UP"}, {"connection": "maybe"}, {"altitude": 3}):
+            try:
+                writer.update(**bad)
+                assert False, bad
+            except (KeyError, ValueError):
+                pass
+        with StateBlockReader(path) as reader:
+            assert reader.seq % 2 == 0
+        writer.close()
+
+        other = os.path.join(directory, "other.bin")
+        with open(other, "wb") as f:
+            f.write(b"NOPE" + bytes(60))
+        try:
+            StateBlockReader(other)
+            assert False
+        except ValueError:
+            pass
+
+
+def test_no_torn_reads():
+    """Con escrituras continuas en otro hilo, cada lectura es un estado completo"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.bin")
+        writer = StateBlockWriter(path)
+        done = threading.Event()
+
+        def write():
+            n = 0
+            while not done.is_set():
+                n += 1
+                # Los tres campos derivan del mismo n: una mezcla se nota
+                writer.update(speed=float(n), rtt=n / 1000, pwm=n % 256)
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        try:
+            with StateBlockReader(path) as reader:
+                for _ in range(20000):
+                    state = reader.read()
+                    assert state.rtt == state.speed / 1000 and state.pwm == int(state.speed) % 256
+        finally:
+            done.set()
+            thread.join()
+            writer.close()
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DEL BLOQUE DE ESTADO")
+    print("=" * 60)
+    for test in (test_roundtrip, test_rejects_bad_input, test_no_torn_reads):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
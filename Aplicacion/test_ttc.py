@@ -0,0 +1,155 @@
+"""
+Pruebas del estimador de tiempo hasta la colisión y del frenado anticipado
+
+Primero con lecturas sintéticas de distancia y después contra el ESP32
+simulado acercándose a un obstáculo por TCP.
+"""
+
+import sys
+import os
+import random
+import time
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from communication import ESP32Communication
+from control import ControlStreamer
+from events import EventBus
+from simulator import SimulatedESP32
+from ttc import CollisionGuard, TTCEstimator
+
+
+def _approach(estimator: TTCEstimator, speed: float, start: float = 200.0,
+              spikes=(), seconds: float = 5.0):
+    """Acercamiento a velocidad constante a 10 Hz; devuelve las decisiones"""
+    rng = random.Random(1)
+    decisions = []
+    for i in range(int(seconds * 10)):
+        t = i * 0.1
+        distance = start - speed * t + rng.gauss(0, 1.0)
+        if i in spikes:
+            distance = 60.0  # Eco espurio
+        decision = estimator.update(distance, t, rtt=0.04, now=t + 0.02)
+        if decision:
+            decisions.append((t, start - speed * t, decision))
+    return decisions
+
+
+def test_constant_approach_stops_within_budget():
+    """Acercamiento constante: SLOW y luego STOP antes de agotar el presupuesto"""
+    decisions = _approach(TTCEstimator(), speed=50.0)
+    actions = [decision.action for _, _, decision in decisions]
+    assert actions == [TTCEstimator.SLOW, TTCEstimator.STOP]
+    t, real, stop = decisions[-1]
+    true_ttc = (real - config.TTC_COLLISION_DISTANCE) / 50.0
+    print(f"   STOP con TTC estimado {stop.ttc:.2f} s (real {true_ttc:.2f} s)")
+    assert config.TTC_STOP_BUDGET - 0.15 <= true_ttc <= config.TTC_STOP_BUDGET + 0.15
+    assert abs(stop.closing_speed - 50.0) < 5.0
+
+
+def test_spurious_echoes_do_not_trigger():
+    """Carrito detenido con ecos espurios: ninguna acción"""
+    assert _approach(TTCEstimator(), speed=0.0, spikes=(10, 11, 25, 30, 31)) == []
+    estimator = TTCEstimator()
+    assert _approach(estimator, speed=40.0, seconds=2.0, spikes=(5, 12)) == []
+    assert estimator.outliers == 2
+
+
+def test_rearms_after_stopping():
+    """Tras detenerse, un nuevo acercamiento vuelve a decidir"""
+    estimator = TTCEstimator()
+    _approach(estimator, speed=50.0)
+    assert estimator.state == TTCEstimator.STOP
+    for i in range(10):
+        estimator.update(40.0, 10.0 + i * 0.1, now=10.0 + i * 0.1)
+    assert estimator.state == TTCEstimator.NONE
+
+
+def test_guard_stops_simulated_car():
+    """ESP32 simulado: el guardián detiene el carrito antes del obstáculo"""
+    simulator = SimulatedESP32(
+        uplink_delay=0.01, downlink_delay=0.01, jitter=0.002,
+        obstacle_distance=200.0, sensor_interval=0.05, seed=5
+    )
+    port = simulator.start()
+    events = EventBus()
+    comm = ESP32Communication(events=events)
+    comm.ip, comm.port = "127.0.0.1", port
+    guard = CollisionGuard(comm, rtt_provider=lambda: comm.clock.rtt, pwm_provider=lambda: 200)
+    try:
+        assert comm.connect()
+        comm.send_command(config.CMD_FORWARD)
+        deadline = time.time() + 10
+        while not guard.stops and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.2)  # Que el STOP llegue al carrito
+        metrics = guard.get_metrics()
+        print(f"   Mínima distancia: {simulator.min_distance:.1f} cm  "
+              f"Decisión: {metrics['avg_decision_ms']:.2f} ms")
+        assert simulator.direction == "STOP"
+        assert metrics["stops"] == 1
+        assert simulator.min_distance > config.TTC_COLLISION_DISTANCE
+        assert metrics["slowdowns"] == 1
+        assert "SPEED_SET:100" in [command for _, command in simulator.commands]
+    finally:
+        guard.close()
+        comm.disconnect()
+        simulator.stop()
+        events.close()
+
+
+def test_slow_with_proportional_drive():
+    """Con DRIVE: el frenado parcial reduce el acelerador del flujo, no un SPEED_SET que el flujo pisaría"""
+    simulator = SimulatedESP32(
+        uplink_delay=0.01, downlink_delay=0.01, jitter=0.002,
+        obstacle_distance=100.0, sensor_interval=0.05, seed=5
+    )
+    port = simulator.start()
+    events = EventBus()
+    comm = ESP32Communication(events=events)
+    comm.ip, comm.port = "127.0.0.1", port
+    streamer = ControlStreamer(comm.send_control)
+    # PWM de los botones desactualizado: con él, SPEED_SET:75 aceleraría al carrito
+    guard = CollisionGuard(comm, rtt_provider=lambda: comm.clock.rtt, pwm_provider=lambda: 150,
+                           slow_down=streamer.limit_throttle)
+    try:
+        assert comm.connect()
+        streamer.input.set_axes(60 / config.SPEED_MAX, 0.0)
+        streamer.start()
+        deadline = time.time() + 10
+        while not guard.slowdowns and time.time() < deadline:
+            time.sleep(0.01)
+        slowed_at = len(simulator.commands)
+        time.sleep(0.3)  # Varias muestras del flujo después del frenado
+    finally:
+        streamer.stop()
+        guard.close()
+        comm.disconnect()
+        simulator.stop()
+        events.close()
+    assert guard.slowdowns == 1 and guard.decisions[0].pwm == 30
+    commands = [command for _, command in simulator.commands]
+    assert not any(command.startswith("SPEED_SET:") for command in commands)
+    assert "DRIVE:30:0" in commands
+    # El flujo sigue desde el acelerador reducido: ningún DRIVE: posterior vuelve a 60
+    after = [command for command in commands[slowed_at:] if command.startswith("DRIVE:")]
+    assert all(int(command.split(":")[1]) <= 30 for command in after)
+    assert simulator.pwm <= 30
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DEL TIEMPO HASTA LA COLISIÓN")
+    print("=" * 60)
+    for test in (test_constant_approach_stops_within_budget, test_spurious_echoes_do_not_trigger,
+                 test_rearms_after_stopping, test_guard_stops_simulated_car,
+                 test_slow_with_proportional_drive):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
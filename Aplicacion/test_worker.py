@@ -0,0 +1,122 @@
+"""
+Pruebas del modo de dos procesos
+
+El anillo de eventos se prueba en el mismo proceso (dos vistas del mismo bloque
+de memoria compartida); RemoteCommunication, con un proceso de comunicación
+real contra el ESP32 simulado.
+"""
+
+import sys
+import os
+import time
+import queue
+import threading
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from eventring import EventRing
+from events import EventBus
+from protocol import SpeedSample
+from simulator import SimulatedESP32
+from worker import CommunicationWorker, RemoteCommunication
+
+
+def test_ring_order_and_overflow():
+    """El anillo entrega en orden y, lleno, descarta lo nuevo sin bloquear"""
+    producer = EventRing.create(slots=4, slot_size=64)
+    consumer = EventRing.attach(producer.name)
+    try:
+        assert [producer.put(("n", i)) for i in range(6)] == [True] * 4 + [False] * 2
+        assert not producer.put("x" * 100)  # No cabe en una ranura
+        assert consumer.drain() == [("n", i) for i in range(4)]
+        assert consumer.get() is None
+        # Los índices siguen avanzando al dar la vuelta
+        for i in range(10):
+            assert producer.put(i) and consumer.get() == i
+        metrics = consumer.get_metrics()
+        assert (metrics["dropped"], metrics["oversized"], metrics["pending"]) == (2, 1, 0)
+    finally:
+        consumer.close()
+        producer.close()
+
+
+def test_concurrent_producers():
+    """Tres hilos del trabajador publicando a la vez: ningún evento se pisa ni se pierde"""
+    threads, per_thread = 3, 10000
+    ring = EventRing.create(slots=threads * per_thread, slot_size=64)
+    consumer = EventRing.attach(ring.name)
+    worker = CommunicationWorker(ring, queue.Queue())
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Cambios de hilo en medio de put()
+    try:
+        producers = [threading.Thread(target=lambda t=t: [worker.publish((t, i)) for i in range(per_thread)])
+                     for t in range(threads)]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        received = []
+        while True:
+            batch = consumer.drain(limit=4096)
+            if not batch:
+                break
+            received += batch
+    finally:
+        sys.setswitchinterval(interval)
+        worker.events.close()
+        consumer.close()
+        ring.close()
+    assert len(received) == threads * per_thread
+    assert set(received) == {(t, i) for t in range(threads) for i in range(per_thread)}
+    for t in range(threads):  # Cada productor conserva su orden
+        assert [i for thread, i in received if thread == t] == list(range(per_thread))
+
+
+def test_remote_communication():
+    """Comandos por la cola, eventos por el anillo y STOP ante colisión en el trabajador"""
+    simulator = SimulatedESP32(speed_interval=0.1, seed=4)
+    port = simulator.start()
+    comm = RemoteCommunication(quiet=True)
+    speeds = []
+    comm.events.subscribe(EventBus.SPEED, speeds.append, name="test_speed")
+    try:
+        assert not comm.send_command(config.CMD_FORWARD)  # Sin conexión
+        comm.ip, comm.port = "127.0.0.1", port
+        assert comm.connect() and comm.is_connected()
+        comm.send_command(config.CMD_FORWARD)
+        time.sleep(0.5)
+        assert simulator.direction == "FORWARD"
+        assert speeds and isinstance(speeds[-1], SpeedSample)
+
+        # La GUI no hace nada: el trabajador detiene el carrito por su cuenta
+        simulator.send("COLISION DETECTADA")
+        time.sleep(0.2)
+        assert simulator.direction == "STOP"
+
+        time.sleep(config.WORKER_STATE_INTERVAL * 2)
+        summary = comm.monitor.get_statistics_summary()
+        assert summary["reliability"]["commands_sent"] >= 2
+        assert comm.clock.rtt > 0
+        comm.disconnect()
+        time.sleep(config.WORKER_STATE_INTERVAL * 2)
+        assert not comm.is_connected()
+    finally:
+        comm.close()
+        simulator.stop()
+    assert not comm.process.is_alive()
+
+
+def main():
+    print("=" * 60)
+    print("PRUEBAS DEL MODO DE DOS PROCESOS")
+    print("=" * 60)
+    for test in (test_ring_order_and_overflow, test_concurrent_producers, test_remote_communication):
+        test()
+        print(f"✅ {test.__doc__}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Módulo de estimación de tiempo hasta la colisión (TTC)
+
+El firmware transmite la distancia del ultrasónico (DIST:<cm>:<millis>) en cada
+lectura. Con cada muestra el estimador:
+
+1. Descarta las lecturas que se alejan de la tendencia más de
+   TTC_OUTLIER_DISTANCE salvo que las siguientes las confirmen, y ajusta la
+   tendencia con Theil-Sen (mediana de las pendientes entre pares) sobre las
+   últimas muestras, así los ecos espurios no cambian la velocidad estimada.
+2. Si todavía no hay suficientes muestras usa la velocidad real del MPU6050.
+3. Proyecta la distancia al instante en que un comando llegaría al carrito:
+   antigüedad de la muestra + medio RTT medido + retardo de actuación.
+4. TTC = (distancia proyectada - margen de colisión) / velocidad de acercamiento.
+
+Si el TTC cae bajo TTC_SLOW_BUDGET se reduce la velocidad con SPEED_SET; si
+cae bajo TTC_STOP_BUDGET se envía STOP en el mismo hilo de escucha, sin pasar
+por ninguna cola.
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional
+import config
+from events import EventBus
+from protocol import DistanceSample, SpeedSample
+
+
+class TTCDecision:
+    """Acción decidida por el estimador y el estado que la justificó"""
+
+    __slots__ = ("action", "ttc", "distance", "closing_speed", "sample_time", "decided_at", "pwm")
+
+    def __init__(self, action: str, ttc: float, distance: float, closing_speed: float,
+                 sample_time: float, decided_at: float):
+        self.action = action
+        self.ttc = ttc  # s
+        self.distance = distance  # cm, proyectada al llegar el comando
+        self.closing_speed = closing_speed  # cm/s
+        self.sample_time = sample_time  # Hora de la PC de la última muestra
+        self.decided_at = decided_at
+        self.pwm: Optional[int] = None  # PWM que quedó aplicado al reducir (SLOW)
+
+    def __repr__(self):
+        return f"TTCDecision({self.action}, ttc={self.ttc:.2f}s, {self.distance:.1f}cm)"
+
+
+class TTCEstimator:
+    """Estimador en línea de TTC con histéresis entre acciones"""
+
+    NONE = "none"
+    SLOW = "slow"
+    STOP = "stop"
+
+    def __init__(self, window: int = config.TTC_WINDOW,
+                 stop_budget: float = config.TTC_STOP_BUDGET,
+                 slow_budget: float = config.TTC_SLOW_BUDGET,
+                 collision_distance: float = config.TTC_COLLISION_DISTANCE,
+                 actuation_delay: float = config.TTC_ACTUATION_DELAY):
+        self.samples = deque(maxlen=window)  # (hora, distancia)
+        self.stop_budget = stop_budget
+        self.slow_budget = slow_budget
+        self.collision_distance = collision_distance
+        self.actuation_delay = actuation_delay
+        self.state = self.NONE  # Última acción tomada
+        self.rejected = []  # Lecturas fuera de la tendencia a la espera de confirmarse
+        self.outliers = 0
+
+        self.real_speed = 0.0
+        self.real_speed_time = 0.0
+
+    def reset(self):
+        self.samples.clear()
+        self.rejected.clear()
+        self.state = self.NONE
+
+    def update_speed(self, speed: float, timestamp: float):
+        """Velocidad real del MPU6050 (respaldo mientras no hay tendencia)"""
+        self.real_speed = speed
+        self.real_speed_time = timestamp
+
+    def _trend(self):
+        """(distancia en la última muestra, velocidad de acercamiento) robustos"""
+        samples = self.samples
+        n = len(samples)
+        slopes = []
+        for i in range(n):
+            t_i, d_i = samples[i]
+            for j in range(i + 1, n):
+                t_j, d_j = samples[j]
+                if t_j > t_i:
+                    slopes.append((d_j - d_i) / (t_j - t_i))
+        if not slopes:
+            return samples[-1][1], None
+        slopes.sort()
+        slope = slopes[len(slopes) // 2]
+        t_last = samples[-1][0]
+        intercepts = sorted(d - slope * (t - t_last) for t, d in samples)
+        return intercepts[n // 2], -slope
+
+    def _accept(self, distance: float, timestamp: float) -> bool:
+        """
+        Descarta ecos espurios: una lectura lejos de la tendencia solo se acepta
+        si las siguientes la confirman (p. ej. apareció un obstáculo nuevo)
+        """
+        if self.samples:
+            if len(self.samples) >= config.TTC_MIN_SAMPLES:
+                level, closing = self._trend()
+                predicted = level - (closing or 0.0) * (timestamp - self.samples[-1][0])
+            else:
+                predicted = self.samples[-1][1]  # Sin tendencia todavía: la última lectura
+            if abs(distance - predicted) > config.TTC_OUTLIER_DISTANCE:
+                rejected = self.rejected
+                if rejected and abs(distance - rejected[-1][1]) > config.TTC_OUTLIER_DISTANCE:
+                    rejected.clear()  # Tampoco coincide con las anteriores
+                rejected.append((timestamp, distance))
+                self.outliers += 1
+                if len(rejected) < config.TTC_OUTLIER_CONFIRM:
+                    return False
+                # Cambio real de nivel: empezar la tendencia desde las confirmadas
+                self.samples.clear()
+                self.samples.extend(rejected)
+                rejected.clear()
+                return True
+        self.rejected.clear()
+        self.samples.append((timestamp, distance))
+        return True
+
+    def estimate(self, rtt: float = 0.0, now: Optional[float] = None):
+        """
+        Estado actual proyectado
+        Args:
+            rtt: RTT medido del enlace (s)
+            now: Hora actual de la PC
+        Returns:
+            (distancia proyectada en cm, velocidad de acercamiento en cm/s, TTC en s)
+        """
+        if not self.samples:
+            return None, 0.0, float("inf")
+        if now is None:
+            now = time.time()
+        distance, closing = self._trend()
+        if closing is None or len(self.samples) < config.TTC_MIN_SAMPLES:
+            # Sin tendencia todavía: la velocidad del MPU6050 si es reciente
+            fresh = now - self.real_speed_time <= config.TTC_SPEED_MAX_AGE
+            closing = self.real_speed if fresh else 0.0
+        lead = max(0.0, now - self.samples[-1][0]) + rtt / 2 + self.actuation_delay
+        projected = distance - closing * lead
+        if closing <= config.TTC_MIN_CLOSING_SPEED:
+            return projected, closing, float("inf")
+        return projected, closing, max(0.0, projected - self.collision_distance) / closing
+
+    def update(self, distance: float, timestamp: float, rtt: float = 0.0,
+               now: Optional[float] = None) -> Optional[TTCDecision]:
+        """
+        Agrega una lectura del ultrasónico y decide
+        Args:
+            distance: Distancia medida (cm)
+            timestamp: Hora de la PC de la medición
+            rtt: RTT medido del enlace (s)
+        Returns:
+            TTCDecision si hay que actuar (solo al escalar: nada → SLOW → STOP)
+        """
+        if now is None:
+            now = time.time()
+        if self.samples and timestamp <= self.samples[-1][0]:
+            return None  # Muestra repetida o fuera de orden
+        if distance > config.TTC_MAX_RANGE:
+            return None  # Fuera del alcance del sensor: nada al frente que medir
+        if not self._accept(distance, timestamp):
+            return None
+        projected, closing, ttc = self.estimate(rtt, now)
+
+        # Volver a armar cuando el carrito ya no se acerca (p. ej. quedó detenido)
+        if closing <= config.TTC_REARM_SPEED:
+            self.state = self.NONE
+            return None
+
+        if ttc <= self.stop_budget:
+            action = self.STOP
+        elif ttc <= self.slow_budget:
+            action = self.SLOW
+        else:
+            return None
+        if action == self.state or (action == self.SLOW and self.state == self.STOP):
+            return None
+        self.state = action
+        return TTCDecision(action, ttc, projected, closing, timestamp, now)
+
+
+class CollisionGuard:
+    """Conecta el estimador al bus de eventos y envía STOP o SPEED_SET"""
+
+    def __init__(self, comm, estimator: Optional[TTCEstimator] = None,
+                 rtt_provider: Optional[Callable[[], float]] = None,
+                 pwm_provider: Optional[Callable[[], int]] = None,
+                 on_decision: Optional[Callable[[TTCDecision], None]] = None,
+                 slow_down: Optional[Callable[[float], Optional[int]]] = None):
+        """
+        Args:
+            comm: ESP32Communication (bus de eventos y envío de comandos)
+            rtt_provider: Devuelve el RTT medido en segundos
+            pwm_provider: Devuelve el PWM actual (para calcular el reducido)
+            on_decision: Se llama después de actuar (p. ej. para avisar en la GUI)
+            slow_down: Reduce la velocidad por otra vía (el flujo DRIVE: pisaría un
+                SPEED_SET); recibe el factor y devuelve el PWM aplicado, o None para usar SPEED_SET
+        """
+        self.comm = comm
+        self.estimator = estimator or TTCEstimator()
+        self.rtt_provider = rtt_provider or (lambda: 0.0)
+        self.pwm_provider = pwm_provider or (lambda: config.SPEED_HIGH)
+        self.on_decision = on_decision
+        self.slow_down = slow_down
+        self.enabled = True
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.decisions = deque(maxlen=100)
+        self.decision_latencies = deque(maxlen=100)  # s, desde la llegada de la muestra al envío
+        self.stops = 0
+        self.slowdowns = 0
+
+        self._subscriptions = [
+            comm.events.subscribe(EventBus.DISTANCE, self._on_distance, name="ttc_guard"),
+            comm.events.subscribe(EventBus.SPEED, self._on_speed, name="ttc_speed"),
+        ]
+
+    def _on_speed(self, sample: SpeedSample):
+        self.estimator.update_speed(sample.speed, sample.host_time)
+
+    def _on_distance(self, sample: DistanceSample):
+        if not self.enabled:
+            return
+        with self._lock:
+            decision = self.estimator.update(
+                sample.distance, sample.host_time, self.rtt_provider(), sample.received_at
+            )
+        if decision is None:
+            return
+        if decision.action == TTCEstimator.STOP:
+            self.comm.send_command(config.CMD_STOP)
+            self.stops += 1
+        else:
+            pwm = self.slow_down(config.TTC_SLOW_FACTOR) if self.slow_down else None
+            if pwm is None:
+                pwm = int(self.pwm_provider() * config.TTC_SLOW_FACTOR)
+                self.comm.send_command(f"SPEED_SET:{pwm}")
+            decision.pwm = pwm
+            self.slowdowns += 1
+        self.decisions.append(decision)
+        self.decision_latencies.append(time.time() - sample.received_at)
+        print(f"🛡️ TTC {decision.ttc:.2f} s a {decision.distance:.1f} cm → {decision.action.upper()}")
+        if self.on_decision:
+            self.on_decision(decision)
+
+    def reset(self):
+        """Descarta la historia (al conectar)"""
+        with self._lock:
+            self.estimator.reset()
+
+    def get_metrics(self) -> Dict:
+        latencies = sorted(self.decision_latencies)
+        return {
+            "stops": self.stops,
+            "slowdowns": self.slowdowns,
+            "avg_decision_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            "max_decision_ms": latencies[-1] * 1000 if latencies else 0.0,
+        }
+
+    def close(self):
+        for subscription in self._subscriptions:
+            self.comm.events.unsubscribe(subscription)
@@ -0,0 +1,350 @@
+"""
+Modo de dos procesos: la comunicación fuera del proceso de la GUI
+
+Todo lo que traba el mainloop de Tk (un messagebox modal, el SMS síncrono,
+redibujar gráficas) también compite por el GIL con el hilo de escucha. Con
+WORKER_PROCESS_ENABLED, ESP32Communication, el monitor y la seguridad (STOP
+ante colisión y frenado por TTC) corren en un proceso aparte:
+
+- GUI -> trabajador: una multiprocessing.Queue de comandos ("send", "frame",
+  "control", "connect", ...)
+- trabajador -> GUI: un EventRing en memoria compartida con los mensajes del
+  ESP32 ya interpretados y, cada WORKER_STATE_INTERVAL, una instantánea de
+  estadísticas, reloj y enlace
+
+Del lado de la GUI, RemoteCommunication expone la misma interfaz que usa el
+controlador (connect, send_command, events, monitor, clock...) y vuelve a
+publicar los eventos en el bus local, así que los consumidores no cambian.
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+import multiprocessing
+from typing import Callable, Dict, List, Optional
+import config
+from events import EventBus
+from eventring import EventRing
+from telemetry import TelemetryHistory
+
+# Tópicos que cruzan a la GUI (TIME y HEARTBEAT solo los usa el trabajador)
+FORWARDED_TOPICS = (EventBus.SPEED, EventBus.DISTANCE, EventBus.COLLISION, EventBus.ESP32_LOGS,
+                    EventBus.ACK, EventBus.MACRO, EventBus.LINK)
+
+# Registros del anillo que no son eventos del bus
+_CONNECTED = "connected"
+_STATE = "state"
+_TTC = "ttc"
+
+
+def _pwm_of(command: str, current: int) -> int:
+    """PWM que deja aplicado un comando (para el PWM reducido del frenado por TTC)"""
+    if command.startswith("SPEED_SET:"):
+        return int(command[10:])
+    if command == config.CMD_SPEED_LOW:
+        return config.SPEED_LOW
+    if command == config.CMD_SPEED_HIGH:
+        return config.SPEED_HIGH
+    if command.startswith("DRIVE:"):
+        return min(abs(int(command[6:].partition(":")[0])), config.SPEED_MAX)
+    return current
+
+
+class CommunicationWorker:
+    """Lado del proceso de comunicación: atiende la cola y llena el anillo"""
+
+    def __init__(self, ring: EventRing, commands, state_interval: float = config.WORKER_STATE_INTERVAL):
+        from communication import ESP32Communication
+        from monitoring import CommunicationMonitor
+
+        self.ring = ring
+        # El anillo admite un solo productor y aquí escriben tres hilos (escucha, vigía del
+        # enlace y este bucle): el lock los serializa dentro del proceso
+        self._ring_lock = threading.Lock()
+        self.commands = commands
+        self.state_interval = state_interval
+        self.events = EventBus()
+        self.monitor = CommunicationMonitor()
+        self.comm = ESP32Communication(monitor=self.monitor, events=self.events)
+        self.pwm = config.SPEED_LOW
+        self._latency_since = 0.0
+
+        # Seguridad en este proceso: no depende de que la GUI esté libre
+        self.events.subscribe(EventBus.COLLISION, self._stop_on_collision, name="worker_stop_on_collision")
+        self.collision_guard = None
+        if config.TTC_GUARD_ENABLED:
+            from ttc import CollisionGuard
+            self.collision_guard = CollisionGuard(
+                self.comm,
+                rtt_provider=lambda: self.comm.clock.rtt,
+                pwm_provider=lambda: self.pwm,
+                on_decision=lambda decision: self.publish((_TTC, decision))
+            )
+        for topic in FORWARDED_TOPICS:
+            self.events.subscribe(topic, lambda payload, t=topic: self.publish((t, payload)),
+                                  name=f"forward_{topic}")
+                                  
+    def publish(self, item) -> bool:
+        """Encola un evento para la GUI desde cualquier hilo; False si se descartó"""
+        with self._ring_lock:
+            return self.ring.put(item)
+
+    def _stop_on_collision(self, alert):
+        self.comm.send_command(config.CMD_STOP)
+
+    def run(self):
+        """Atiende comandos hasta recibir "close" o perder a la GUI"""
+        next_state = time.time()
+        while True:
+            try:
+                message = self.commands.get(timeout=max(0.0, next_state - time.time()))
+            except queue.Empty:
+                message = None
+            except (EOFError, OSError):
+                break
+            if message is not None and not self._handle(message):
+                break
+            if time.time() >= next_state:
+                self.publish((_STATE, self.get_state()))
+                next_state = time.time() + self.state_interval
+        self.comm.disconnect()
+        self.events.close()
+
+    def _handle(self, message) -> bool:
+        kind, args = message[0], message[1:]
+        if kind == "send":
+            self.pwm = _pwm_of(args[0], self.pwm)
+            self.comm.send_command(args[0])
+        elif kind == "frame":
+            for command in args[0]:
+                self.pwm = _pwm_of(command, self.pwm)
+            self.comm.send_frame(args[0])
+        elif kind == "control":
+            self.pwm = _pwm_of(args[0], self.pwm)
+            self.comm.send_control(args[0])
+        elif kind == "connect":
+            self.comm.ip, self.comm.port = args
+            ok = self.comm.connect()
+            if ok and self.collision_guard:
+                self.collision_guard.reset()
+            self.publish((_CONNECTED, ok))
+            self.publish((_STATE, self.get_state()))
+        elif kind == "disconnect":
+            self.comm.disconnect()
+            self.publish((_STATE, self.get_state()))
+        elif kind == "reset":
+            self.monitor.reset()
+        elif kind == "close":
+            return False
+        return True
+
+    def get_state(self) -> Dict:
+        """Instantánea para la GUI (todo serializable)"""
+        now = time.time()
+        latencies = [(sample[0], sample[3]) for sample in
+                     self.monitor.history.query(TelemetryHistory.LATENCY, self._latency_since, now, resolution=0)
+                     if sample[0] > self._latency_since]
+        if latencies:
+            self._latency_since = latencies[-1][0]
+        return {
+            "connected": self.comm.is_connected(),
+            "summary": self.monitor.get_statistics_summary(),
+            "log": self.monitor.get_log_messages()[-20:],
+            "latencies": latencies,
+            "clock": self.comm.clock.get_status(),
+            "rtt": self.comm.clock.rtt,
+            "link_state": self.comm.link_state,
+            "logs_pushed": self.comm.logs_pushed,
+            "ttc": self.collision_guard.get_metrics() if self.collision_guard else None,
+            "sent_at": now,
+        }
+
+
+def _run_worker(ring_name: str, commands, quiet: bool):
+    """Punto de entrada del proceso de comunicación"""
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+    ring = EventRing.attach(ring_name)
+    try:
+        CommunicationWorker(ring, commands).run()
+    finally:
+        ring.close()
+
+
+class _RemoteClock:
+    """Lo que la GUI consulta del reloj sincronizado, según la última instantánea"""
+
+    def __init__(self):
+        self.rtt = 0.0
+        self.status: Dict = {"synchronized": False}
+
+    def get_status(self) -> Dict:
+        return self.status
+
+
+class RemoteMonitor:
+    """Vista en la GUI del monitor que vive en el proceso de comunicación"""
+
+    def __init__(self, send: Callable):
+        self._send = send
+        self.history = TelemetryHistory()  # Latencias del trabajador más lo que registra la GUI
+        self.summary: Dict = {}
+        self.log: List[str] = []
+
+    def reset(self):
+        self.summary, self.log = {}, []
+        self._send(("reset",))
+
+    def get_statistics_summary(self) -> Dict:
+        return dict(self.summary)
+
+    def get_log_messages(self) -> List[str]:
+        return list(self.log)
+
+    def get_link_status(self) -> Dict:
+        return self.summary.get("link", {})
+
+    def _apply(self, state: Dict):
+        self.summary = state["summary"]
+        self.log = state["log"]
+        for timestamp, latency in state["latencies"]:
+            self.history.record(TelemetryHistory.LATENCY, latency, timestamp)
+
+
+class RemoteCommunication:
+    """Sustituto de ESP32Communication que delega en el proceso de comunicación"""
+
+    def __init__(self, events: Optional[EventBus] = None,
+                 on_ttc_decision: Optional[Callable] = None,
+                 poll_interval: float = config.WORKER_POLL_INTERVAL, quiet: bool = False):
+        """
+        Args:
+            events: Bus local donde se vuelven a publicar los eventos del ESP32
+            on_ttc_decision: Se llama con cada TTCDecision tomada en el trabajador
+            poll_interval: Espera del hilo lector con el anillo vacío (s)
+            quiet: Descarta las impresiones del trabajador (benchmarks)
+        """
+        self.ip = config.ESP32_IP
+        self.port = config.ESP32_PORT
+        self.events = events or EventBus()
+        self.on_ttc_decision = on_ttc_decision
+        self.poll_interval = poll_interval
+        self.connected = False
+        self.last_command = ""
+        self.clock = _RemoteClock()
+        self.link_state = "ok"
+        self.logs_pushed = False
+        self.ttc_metrics: Optional[Dict] = None
+        self.state_received_at = 0.0
+
+        # "spawn" en todas las plataformas: el trabajador no hereda hilos ni el intérprete de Tk
+        context = multiprocessing.get_context("spawn")
+        self.ring = EventRing.create(config.WORKER_RING_SLOTS, config.WORKER_RING_SLOT_SIZE)
+        self.commands = context.Queue()
+        self.monitor = RemoteMonitor(self.commands.put)
+        self.process = context.Process(target=_run_worker, args=(self.ring.name, self.commands, quiet),
+                                       name="esp32-comm", daemon=True)
+        self.process.start()
+
+        self._connect_reply: "queue.Queue[bool]" = queue.Queue()
+        self._running = True
+        self._reader = threading.Thread(target=self._read_ring, name="worker-ring", daemon=True)
+        self._reader.start()
+
+    # -------------------------
+    # Interfaz de ESP32Communication
+    # -------------------------
+    def connect(self) -> bool:
+        while not self._connect_reply.empty():
+            self._connect_reply.get_nowait()
+        self.commands.put(("connect", self.ip, self.port))
+        try:
+            self.connected = self._connect_reply.get(timeout=config.WORKER_CONNECT_TIMEOUT)
+        except queue.Empty:
+            print("✗ El proceso de comunicación no respondió")
+            self.connected = False
+        return self.connected
+
+    def disconnect(self):
+        self.connected = False
+        self.commands.put(("disconnect",))
+
+    def send_command(self, command: str) -> bool:
+        if not self.connected:
+            return False
+        self.commands.put(("send", command))
+        self.last_command = command
+        return True
+
+    def send_frame(self, commands) -> bool:
+        if not self.connected:
+            return False
+        self.commands.put(("frame", tuple(commands)))
+        return True
+        
+    def send_control(self, command: str) -> bool:
+        if not self.connected:
+            return False
+        self.commands.put(("control", command))
+        self.last_command = command
+        return True
+
+    def request_logs(self):
+        return self.send_command(config.CMD_GET_LOGS)
+        
+    def request_status(self):
+        return self.send_frame(config.STATUS_QUERY)
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def set_ip(self, ip: str):
+        self.ip = ip
+
+    # -------------------------
+    # Anillo de eventos
+    # -------------------------
+    def _read_ring(self):
+        while self._running:
+            items = self.ring.drain()
+            if not items:
+                time.sleep(self.poll_interval)
+                continue
+            for kind, payload in items:
+                self._dispatch(kind, payload)
+
+    def _dispatch(self, kind: str, payload):
+        if kind == _STATE:
+            self.connected = self.connected and payload["connected"]
+            self.clock.rtt = payload["rtt"]
+            self.clock.status = payload["clock"]
+            self.link_state = payload["link_state"]
+            self.logs_pushed = payload["logs_pushed"]
+            self.ttc_metrics = payload["ttc"]
+            self.monitor._apply(payload)
+            self.state_received_at = time.time()
+        elif kind == _CONNECTED:
+            self._connect_reply.put(payload)
+        elif kind == _TTC:
+            if self.on_ttc_decision:
+                self.on_ttc_decision(payload)
+        else:
+            self.events.publish(kind, payload)
+
+    def get_metrics(self) -> Dict:
+        return dict(self.ring.get_metrics(), alive=self.process.is_alive())
+
+    def close(self):
+        """Detiene el proceso de comunicación y libera el anillo"""
+        self.connected = False
+        if self.process.is_alive():
+            self.commands.put(("close",))
+            self.process.join(timeout=3.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        self._running = False
+        self._reader.join(timeout=1.0)
+        self.commands.close()
+        self.ring.close()
@@ -2,6 +2,7 @@
 #include <Wire.h>
 #include <WiFiClient.h>
 #include <WiFiAP.h>
+#include <WiFiUdp.h>
 #include "MPU6050.h"
 #include "driver/gpio.h"
 #include "soc/gpio_reg.h"
@@ -14,6 +15,11 @@ const char* ssid = "ESP32_Carrito";        // Nombre de la red WiFi
 const char* password = "12345678";         // Contraseña (mínimo 8 caracteres)
 WiFiServer server(80);
 
+// Descubrimiento en una red compartida: la PC envía "CARRITO?" por broadcast
+// y el carrito responde "CARRITO:<puerto>:<nombre>" sin abrir una conexión TCP
+#define PUERTO_DESCUBRIMIENTO 4210
+WiFiUDP udpDescubrimiento;
+
 // -------------------------
 // SISTEMA DE LOGS
 // -------------------------
@@ -21,6 +27,8 @@ WiFiServer server(80);
 String logBuffer[MAX_LOGS];
 int logIndex = 0;
 int logCount = 0;
+unsigned long logSeq = 0;           // Número de la última entrada (LOG:<seq>:<texto>)
+WiFiClient* clienteLogs = nullptr;  // Cliente conectado al que se empujan las entradas
 
 // -------------------------
 // MOTORES (L298N) - Optimizado con registros
@@ -40,6 +48,7 @@ int logCount = 0;
 #define IN4_MASK (1ULL << IN4)
 
 int velocidad = 200;   // valor inicial PWM (0-255)
+int velocidadGiro = 255;  // PWM del motor de dirección (proporcional con DRIVE:)
 
 // Estado de movimiento
 bool moviendoAdelante = false;
@@ -57,6 +66,10 @@ volatile long t_start = 0;
 volatile long t_end = 0;
 volatile bool pulseDone = false;
 
+// Última lectura válida, transmitida a la PC para su estimador de TTC
+float ultimaDistancia = -1;
+unsigned long tiempoDistancia = 0;
+
 // -------------------------
 // MPU6050
 // -------------------------
@@ -90,17 +103,75 @@ int velocidadOriginal = 200;                  // Velocidad antes del frenado
 unsigned long lastSensorCheck = 0;
 unsigned long lastSpeedUpdate = 0;
 
+// -------------------------
+// DEADMAN (latidos HB: de la PC)
+// -------------------------
+// Sin latidos durante este tiempo se detienen los motores aunque el socket
+// siga abierto (WiFi fuera de alcance). Se arma con el primer HB: de cada
+// conexión, así una PC sin latidos sigue funcionando como antes
+const unsigned long DEADMAN_TIMEOUT = 500;  // ms
+bool deadmanArmado = false;
+bool deadmanDisparado = false;
+unsigned long ultimoLatido = 0;
+
+// -------------------------
+// ENTREGA CONFIABLE (<comando>#<seq>)
+// -------------------------
+// Cada comando numerado se confirma con OK:<seq> (ERR:<seq> si se rechaza).
+// La PC retransmite los que no confirmamos a tiempo: los números ya
+// ejecutados se recuerdan para confirmarlos otra vez sin repetirlos
+unsigned long ultimoSeqComando = 0;    // Mayor número ejecutado
+unsigned long ventanaSeqComandos = 0;  // Bit i = se ejecutó ultimoSeqComando - i
+
+// -------------------------
+// TRAMAS COMPUESTAS (<op>|<op>|...)
+// -------------------------
+// Varias operaciones en una sola línea (p. ej. SPEED_SET:200|FORWARD): se
+// aplican juntas y la trama se confirma una sola vez
+#define MAX_OPS_TRAMA 4
+bool enTrama = false;  // Se está aplicando una trama: sin OK:<comando> por operación
+
+// -------------------------
+// MANIOBRAS (MACRO:)
+// -------------------------
+#define MAX_PASOS_MACRO 16
+
+struct PasoMacro {
+  char comando;            // 'F', 'B', 'L', 'R' o 'S'
+  int pwm;
+  unsigned long duracion;  // ms
+};
+
+PasoMacro pasosMacro[MAX_PASOS_MACRO];
+int totalPasosMacro = 0;
+int pasoMacro = -1;                 // Paso en ejecución (-1 = sin maniobra)
+long idMacro = 0;
+unsigned long inicioPasoMacro = 0;  // millis() planificado del paso actual
+
 // =========================
 // FUNCIONES DE LOGS
 // =========================
+// Segundos desde el arranque con resolución de milisegundos ("128.345")
+String formatearTiempo(unsigned long ms) {
+  String frac = String(ms % 1000);
+  while (frac.length() < 3) frac = "0" + frac;
+  return String(ms / 1000) + "." + frac;
+}
+
 void addLog(const String& message) {
-  // Agregar timestamp
-  String logMsg = "[" + String(millis()/1000) + "s] " + message;
+  // Agregar timestamp (la PC lo convierte a su reloj con TIME?)
+  String logMsg = "[" + formatearTiempo(millis()) + "s] " + message;
   
   // Agregar al buffer circular
   logBuffer[logIndex] = logMsg;
   logIndex = (logIndex + 1) % MAX_LOGS;
   if (logCount < MAX_LOGS) logCount++;
+  logSeq++;
+  
+  // Empujar la entrada al momento; la PC detecta huecos por el número y los repara con GET_LOGS
+  if (clienteLogs != nullptr && clienteLogs->connected()) {
+    clienteLogs->println("LOG:" + String(logSeq) + ":" + logMsg);
+  }
   
   // También imprimir en Serial
   Serial.println(logMsg);
@@ -116,16 +187,33 @@ String getLogsAsJSON() {
     json += "\"" + logBuffer[idx] + "\"";
   }
   
-  json += "]}";
+  json += "],\"seq\":" + String(logSeq) + "}";
   return json;
 }
 
+// =========================
+// TELEMETRÍA
+// =========================
+// SPEED:<cm/s>:<millis> - la marca de tiempo es la del momento de la medición
+void enviarVelocidad(WiFiClient& client) {
+  client.println("SPEED:" + String(velocidadActual, 2) + ":" + String(tiempoAnterior));
+}
+
+// DIST:<cm>:<millis> - una vez por lectura válida del ultrasónico
+void enviarDistancia(WiFiClient& client) {
+  static unsigned long ultimaEnviada = 0;
+  if (ultimaDistancia > 0 && tiempoDistancia != ultimaEnviada) {
+    client.println("DIST:" + String(ultimaDistancia, 1) + ":" + String(tiempoDistancia));
+    ultimaEnviada = tiempoDistancia;
+  }
+}
+
 // =========================
 // FUNCIONES DE MOTORES
 // =========================
 void aplicarVelocidad() {
   ledcWrite(ENA, velocidad);  // ENA - Motor de tracción
-  ledcWrite(ENB, 255);        // ENB - Motor de dirección (siempre máxima)
+  ledcWrite(ENB, velocidadGiro);  // ENB - Motor de dirección
 }
 
 void detener() {
@@ -199,6 +287,168 @@ void girarIzquierda() {
   }
 }
 
+// DRIVE:<acelerador>:<giro> - control proporcional continuo (-255..255 cada eje)
+// El signo da el sentido y el valor absoluto el PWM; 0 detiene o centra
+void aplicarControl(int acelerador, int giro) {
+  int pwm = constrain(abs(acelerador), 0, 255);
+  velocidadDeseada = pwm;
+  if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
+    velocidad = pwm;
+  }
+  if (acelerador > 0) {
+    avanzar();
+  } else if (acelerador < 0) {
+    retroceder();
+  } else {
+    GPIO.out_w1tc = IN1_MASK | IN2_MASK;
+    moviendoAdelante = false;
+    moviendoAtras = false;
+  }
+  
+  velocidadGiro = constrain(abs(giro), 0, 255);
+  if (giro > 0) {
+    girarDerecha();
+  } else if (giro < 0) {
+    girarIzquierda();
+  } else {
+    GPIO.out_w1tc = IN3_MASK | IN4_MASK;
+    girandoDerecha = false;
+    girandoIzquierda = false;
+  }
+  aplicarVelocidad();
+}
+
+// =========================
+// MANIOBRAS
+// =========================
+char codigoComando(const String& comando) {
+  if (comando == "FORWARD") return 'F';
+  if (comando == "BACKWARD") return 'B';
+  if (comando == "LEFT") return 'L';
+  if (comando == "RIGHT") return 'R';
+  if (comando == "STOP") return 'S';
+  return 0;
+}
+
+// <cmd>,<pwm>,<ms>;<cmd>,<pwm>,<ms>;... - devuelve false si la trama no es válida
+bool cargarMacro(const String& pasos) {
+  int n = 0;
+  int inicio = 0;
+  while (inicio < (int)pasos.length()) {
+    int fin = pasos.indexOf(';', inicio);
+    if (fin < 0) fin = pasos.length();
+    String paso = pasos.substring(inicio, fin);
+    int c1 = paso.indexOf(',');
+    int c2 = paso.indexOf(',', c1 + 1);
+    if (n >= MAX_PASOS_MACRO || c1 < 0 || c2 < 0) return false;
+    char codigo = codigoComando(paso.substring(0, c1));
+    int pwm = paso.substring(c1 + 1, c2).toInt();
+    if (!codigo || pwm < 0 || pwm > 255) return false;
+    pasosMacro[n].comando = codigo;
+    pasosMacro[n].pwm = pwm;
+    pasosMacro[n].duracion = paso.substring(c2 + 1).toInt();
+    n++;
+    inicio = fin + 1;
+  }
+  totalPasosMacro = n;
+  return n > 0;
+}
+
+void iniciarPasoMacro(WiFiClient& client, int paso, unsigned long inicio) {
+  pasoMacro = paso;
+  inicioPasoMacro = inicio;
+  PasoMacro& p = pasosMacro[paso];
+  velocidadGiro = 255;
+  if (p.comando != 'S') {
+    velocidadDeseada = p.pwm;
+    if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
+      velocidad = p.pwm;
+      aplicarVelocidad();
+    }
+  }
+  switch (p.comando) {
+    case 'F': avanzar(); break;
+    case 'B': retroceder(); break;
+    case 'L': girarIzquierda(); break;
+    case 'R': girarDerecha(); break;
+    default: detener(); break;
+  }
+  client.println("MACRO:STEP:" + String(idMacro) + ":" + String(paso) + ":" + String(millis()));
+}
+
+// Llamada en cada vuelta de loop(): cambia de paso con el reloj local
+void avanzarMacro(WiFiClient& client) {
+  if (pasoMacro < 0) return;
+  unsigned long fin = inicioPasoMacro + pasosMacro[pasoMacro].duracion;
+  if ((long)(millis() - fin) < 0) return;
+  if (pasoMacro + 1 < totalPasosMacro) {
+    // Se parte del inicio planificado para que el error no se acumule
+    iniciarPasoMacro(client, pasoMacro + 1, fin);
+  } else {
+    pasoMacro = -1;
+    detener();
+    addLog("Maniobra completada");
+    client.println("MACRO:DONE:" + String(idMacro) + ":" + String(millis()));
+  }
+}
+
+void abortarMacro(WiFiClient& client, const String& motivo) {
+  if (pasoMacro < 0) return;
+  client.println("MACRO:ABORT:" + String(idMacro) + ":" + String(pasoMacro) + ":" + String(millis()));
+  addLog("Maniobra abortada: " + motivo);
+  pasoMacro = -1;
+}
+
+// =========================
+// DESCUBRIMIENTO
+// =========================
+// Llamada en cada vuelta de loop(), con o sin cliente conectado
+void responderDescubrimiento() {
+  int tamano = udpDescubrimiento.parsePacket();
+  if (tamano <= 0) return;
+  char mensaje[16];
+  int leidos = udpDescubrimiento.read(mensaje, sizeof(mensaje) - 1);
+  mensaje[leidos > 0 ? leidos : 0] = '\0';
+  if (strncmp(mensaje, "CARRITO?", 8) != 0) return;
+  udpDescubrimiento.beginPacket(udpDescubrimiento.remoteIP(), udpDescubrimiento.remotePort());
+  udpDescubrimiento.print("CARRITO:80:" + String(ssid));
+  udpDescubrimiento.endPacket();
+}
+
+// =========================
+// ENTREGA CONFIABLE
+// =========================
+// Registra un número de comando; true si ya se había ejecutado (retransmisión)
+bool comandoRepetido(unsigned long seq) {
+  if (seq > ultimoSeqComando) {
+    unsigned long avance = seq - ultimoSeqComando;
+    ventanaSeqComandos = avance >= 32 ? 0 : ventanaSeqComandos << avance;
+    ventanaSeqComandos |= 1;
+    ultimoSeqComando = seq;
+    return false;
+  }
+  unsigned long atras = ultimoSeqComando - seq;
+  if (atras >= 32) return true;  // Demasiado viejo: la PC ya lo dio por perdido
+  unsigned long bit = 1UL << atras;
+  if (ventanaSeqComandos & bit) return true;
+  ventanaSeqComandos |= bit;
+  return false;
+}
+
+// =========================
+// DEADMAN
+// =========================
+// Llamada en cada vuelta de loop() con cliente conectado
+void verificarDeadman(WiFiClient& client) {
+  if (!deadmanArmado || deadmanDisparado) return;
+  if (millis() - ultimoLatido < DEADMAN_TIMEOUT) return;
+  deadmanDisparado = true;
+  abortarMacro(client, "deadman");
+  velocidadGiro = 255;
+  detener();
+  addLog("DEADMAN! Sin latidos de la PC (" + String(DEADMAN_TIMEOUT) + " ms)");
+}
+
 // =========================
 // INTERRUPCIÓN HC-SR04
 // =========================
@@ -283,6 +533,9 @@ void verificarSensoresSeguridad() {
   float d = medirDistancia();
   
   if (d > 0) {
+    ultimaDistancia = d;
+    tiempoDistancia = millis();
+    
     // NO aplicar lógica de seguridad si el usuario está retrocediendo manualmente
     if (moviendoAtras) {
       // Usuario tiene control manual, no interferir
@@ -346,6 +599,167 @@ void verificarSensoresSeguridad() {
   }
 }
 
+// =========================
+// COMANDOS
+// =========================
+// Ejecuta un comando (o una operación de una trama compuesta); false si se rechaza
+bool ejecutarComando(WiFiClient& client, const String& comando) {
+  if (comando.startsWith("HB:")) {
+    // Latido de la PC: eco inmediato para que mida el enlace y rearmar el deadman
+    ultimoLatido = millis();
+    deadmanArmado = true;
+    deadmanDisparado = false;
+    client.println(comando);
+  }
+  else if (comando.startsWith("SPEED_SET:")) {
+    int newSpeed = comando.substring(10).toInt();
+    if (newSpeed >= 0 && newSpeed <= 255) {
+      velocidadDeseada = newSpeed;
+      if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
+        velocidad = newSpeed;
+        aplicarVelocidad();
+        addLog("Velocidad PWM=" + String(velocidad));
+      }
+      enviarVelocidad(client);
+    } else {
+      return false;
+    }
+  }
+  else if (comando == "SPEED_LOW") {
+    velocidadDeseada = 150;
+    if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
+      velocidad = 150;
+      aplicarVelocidad();
+    }
+    addLog("Velocidad BAJA");
+    enviarVelocidad(client);
+  }
+  else if (comando == "SPEED_HIGH") {
+    velocidadDeseada = 255;
+    if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
+      velocidad = 255;
+      aplicarVelocidad();
+    }
+    addLog("Velocidad ALTA");
+    enviarVelocidad(client);
+  }
+  else if (comando == "FORWARD") {
+    abortarMacro(client, "comando manual");
+    if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
+      avanzar();
+      addLog("CMD: AVANZAR");
+    }
+    if (!enTrama) client.println("OK:FORWARD");
+  }
+  else if (comando == "BACKWARD") {
+    abortarMacro(client, "comando manual");
+    // BACKWARD siempre se ejecuta, sin importar modos automáticos
+    retroceder();
+    addLog("CMD: RETROCEDER (forzado)");
+    if (!enTrama) client.println("OK:BACKWARD");
+  }
+  else if (comando == "LEFT") {
+    abortarMacro(client, "comando manual");
+    velocidadGiro = 255;
+    if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
+      girarIzquierda();
+      addLog("CMD: IZQUIERDA");
+    }
+    if (!enTrama) client.println("OK:LEFT");
+  }
+  else if (comando == "RIGHT") {
+    abortarMacro(client, "comando manual");
+    velocidadGiro = 255;
+    if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
+      girarDerecha();
+      addLog("CMD: DERECHA");
+    }
+    if (!enTrama) client.println("OK:RIGHT");
+  }
+  else if (comando == "STOP") {
+    abortarMacro(client, "comando manual");
+    detener();
+    addLog("CMD: DETENER");
+    if (!enTrama) client.println("OK:STOP");
+  }
+  else if (comando.startsWith("DRIVE:")) {
+    // Flujo continuo a ~20 Hz: sin respuesta ni log para no saturar el enlace
+    abortarMacro(client, "comando manual");
+    int sep = comando.indexOf(':', 6);
+    if (sep > 0) {
+      aplicarControl(comando.substring(6, sep).toInt(), comando.substring(sep + 1).toInt());
+    }
+  }
+  else if (comando.startsWith("MACRO:")) {
+    // MACRO:<id>:<pasos> - la maniobra se ejecuta aquí, sin un viaje por paso
+    abortarMacro(client, "reemplazada");
+    int sep = comando.indexOf(':', 6);
+    String id = comando.substring(6, sep < 0 ? comando.length() : sep);
+    if (sep > 0 && cargarMacro(comando.substring(sep + 1))) {
+      idMacro = id.toInt();
+      addLog("Maniobra " + id + ": " + String(totalPasosMacro) + " pasos");
+      client.println("OK:MACRO:" + id);
+      iniciarPasoMacro(client, 0, millis());
+    } else {
+      client.println("ERR:MACRO:" + id);
+      return false;
+    }
+  }
+  else if (comando == "GET_SPEED") {
+    enviarVelocidad(client);
+  }
+  else if (comando.startsWith("TIME?:")) {
+    // Sincronización de reloj: la PC estima desfase y deriva con estas respuestas;
+    // el número de la solicitud vuelve en la respuesta para emparejarlas
+    client.println("TIME:" + comando.substring(6) + ":" + String(millis()));
+  }
+  else if (comando == "TIME?") {
+    // PC anterior, sin número de solicitud
+    client.println("TIME:" + String(millis()));
+  }
+  else if (comando == "GET_LOGS") {
+    // Enviar logs en formato JSON
+    client.println("LOGS:" + getLogsAsJSON());
+  }
+  else {
+    return false;
+  }
+  return true;
+}
+
+// Operaciones permitidas en una trama compuesta (estado y consultas, sin MACRO: ni HB:)
+bool operacionValida(const String& op) {
+  if (op.startsWith("SPEED_SET:")) {
+    int valor = op.substring(10).toInt();
+    return valor >= 0 && valor <= 255;
+  }
+  return op == "FORWARD" || op == "BACKWARD" || op == "LEFT" || op == "RIGHT" || op == "STOP" ||
+         op == "SPEED_LOW" || op == "SPEED_HIGH" || op == "GET_SPEED" || op == "GET_LOGS";
+}
+
+// Trama compuesta "<op>|<op>|...": se valida entera antes de aplicar nada y se
+// aplica en la misma vuelta de loop(), sin que los motores vean un estado intermedio
+bool ejecutarTrama(WiFiClient& client, const String& trama) {
+  String ops[MAX_OPS_TRAMA];
+  int total = 0;
+  int inicio = 0;
+  while (inicio <= (int)trama.length()) {
+    int fin = trama.indexOf('|', inicio);
+    if (fin < 0) fin = trama.length();
+    if (total == MAX_OPS_TRAMA) return false;
+    ops[total] = trama.substring(inicio, fin);
+    if (!operacionValida(ops[total])) return false;
+    total++;
+    inicio = fin + 1;
+  }
+  enTrama = true;  // Una sola confirmación (OK:<seq>) para toda la trama
+  for (int i = 0; i < total; i++) {
+    ejecutarComando(client, ops[i]);
+  }
+  enTrama = false;
+  return true;
+}
+
 // =========================
 // SETUP
 // =========================
@@ -397,6 +811,7 @@ void setup() {
   // Iniciar servidor
   server.begin();
   Serial.println("✓ Servidor iniciado en puerto 80");
+  udpDescubrimiento.begin(PUERTO_DESCUBRIMIENTO);
 
 
 
@@ -413,23 +828,38 @@ void loop() {
     verificarSensoresSeguridad();
     lastSensorCheck = millis();
   }
+  responderDescubrimiento();
 
   // Manejar cliente WiFi
   WiFiClient client = server.available();
   if (client) {
+    clienteLogs = &client;
     addLog("Cliente conectado");
     lastSpeedUpdate = millis();
+    deadmanArmado = false;
+    ultimoSeqComando = 0;  // La PC numera desde 1 en cada conexión
+    ventanaSeqComandos = 0;
     
     while (client.connected()) {
       // Verificar sensores cada 100ms durante conexión
       if (millis() - lastSensorCheck >= 100) {
         verificarSensoresSeguridad();
+        enviarDistancia(client);
         lastSensorCheck = millis();
+        
+        // Una detención o reversa automática termina la maniobra
+        if (modoReversaAutomatica || (modoFrenadoAutomatico && velocidad == 0)) {
+          abortarMacro(client, "obstaculo");
+        }
       }
       
+      avanzarMacro(client);
+      verificarDeadman(client);
+      responderDescubrimiento();
+      
       // Enviar velocidad cada 1000ms (1 seg) para reducir tráfico WiFi
       if (millis() - lastSpeedUpdate >= 1000) {
-        client.println("SPEED:" + String(velocidadActual, 2));
+        enviarVelocidad(client);
         lastSpeedUpdate = millis();
       }
       
@@ -438,74 +868,29 @@ void loop() {
         String comando = client.readStringUntil('\n');
         comando.trim();
         
-        if (comando.startsWith("SPEED_SET:")) {
-          int newSpeed = comando.substring(10).toInt();
-          if (newSpeed >= 0 && newSpeed <= 255) {
-            velocidadDeseada = newSpeed;
-            if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
-              velocidad = newSpeed;
-              aplicarVelocidad();
-              addLog("Velocidad PWM=" + String(velocidad));
-            }
-            client.println("SPEED:" + String(velocidadActual, 2));
-          }
-        }
-        else if (comando == "SPEED_LOW") {
-          velocidadDeseada = 150;
-          if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
-            velocidad = 150;
-            aplicarVelocidad();
-          }
-          addLog("Velocidad BAJA");
-          client.println("SPEED:" + String(velocidadActual, 2));
-        }
-        else if (comando == "SPEED_HIGH") {
-          velocidadDeseada = 255;
-          if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
-            velocidad = 255;
-            aplicarVelocidad();
-          }
-          addLog("Velocidad ALTA");
-          client.println("SPEED:" + String(velocidadActual, 2));
+        // <comando>#<seq>: separar el número de secuencia
+        long seqComando = -1;
+        int marcaSeq = comando.lastIndexOf('#');
+        if (marcaSeq > 0) {
+          seqComando = comando.substring(marcaSeq + 1).toInt();
+          comando = comando.substring(0, marcaSeq);
         }
-        else if (comando == "FORWARD") {
-          if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
-            avanzar();
-            addLog("CMD: AVANZAR");
-          }
-          client.println("OK:FORWARD");
-        }
-        else if (comando == "BACKWARD") {
-          // BACKWARD siempre se ejecuta, sin importar modos automáticos
-          retroceder();
-          addLog("CMD: RETROCEDER (forzado)");
-          client.println("OK:BACKWARD");
-        }
-        else if (comando == "LEFT") {
-          if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
-            girarIzquierda();
-            addLog("CMD: IZQUIERDA");
-          }
-          client.println("OK:LEFT");
-        }
-        else if (comando == "RIGHT") {
-          if (!modoFrenadoAutomatico && !modoReversaAutomatica) {
-            girarDerecha();
-            addLog("CMD: DERECHA");
-          }
-          client.println("OK:RIGHT");
+        bool repetido = seqComando > 0 && comandoRepetido((unsigned long)seqComando);
+        bool rechazado = false;
+        
+        if (repetido) {
+          // Retransmisión de un comando ya ejecutado: solo se vuelve a confirmar
         }
-        else if (comando == "STOP") {
-          detener();
-          addLog("CMD: DETENER");
-          client.println("OK:STOP");
+        else if (comando.indexOf('|') >= 0) {
+          rechazado = !ejecutarTrama(client, comando);
         }
-        else if (comando == "GET_SPEED") {
-          client.println("SPEED:" + String(velocidadActual, 2));
+        else {
+          rechazado = !ejecutarComando(client, comando);
         }
-        else if (comando == "GET_LOGS") {
-          // Enviar logs en formato JSON
-          client.println("LOGS:" + getLogsAsJSON());
+        
+        // Confirmación después de la respuesta propia del comando
+        if (seqComando > 0) {
+          client.println(String(rechazado ? "ERR:" : "OK:") + String(seqComando) + (repetido ? ":DUP" : ""));
         }
       }
       
@@ -513,8 +898,15 @@ void loop() {
       delay(10);
     }
     
+    clienteLogs = nullptr;
     client.stop();
     addLog("Cliente desconectado");
+    
+    // Sin PC no hay quien aborte la maniobra: detener el carrito
+    if (pasoMacro >= 0) {
+      pasoMacro = -1;
+      detener();
+    }
   }
   
   // Pequeño delay para reducir consumo CPU en loop vacío